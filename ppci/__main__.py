@@ -20,6 +20,7 @@ valid_programs = [
     "ld",
     "link",
     "llc",
+    "mkruntime",
     "mkuimage",
     "objcopy",
     "objdump",
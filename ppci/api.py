@@ -17,7 +17,8 @@ from .lang.pascal import pascal_to_ir
 from .lang.ws import ws_to_ir
 from .lang.python import python_to_ir, ir_to_python
 from .wasm import wasm_to_ir, read_wasm
-from .irutils import verify_module
+from .irutils import verify_module, apply_profile, from_binary
+from .irutils.binary import is_binary as is_binary_ir
 from .utils.reporting import DummyReportGenerator, HtmlReportGenerator
 from .opt.transform import DeleteUnusedInstructionsPass
 from .opt.transform import RemoveAddZeroPass
@@ -28,20 +29,23 @@ from .opt import CleanPass
 from .opt.mem2reg import Mem2RegPromotor
 from .opt.cjmp import CJumpPass
 from .opt.tailcall import TailCallOptimization
+from .opt.inline import InlinePass
 from .codegen import CodeGenerator
 from .binutils.linker import link
+from .binutils.lto import serialize_ir
 from .binutils.archive import archive
 from .binutils.outstream import BinaryOutputStream, TextOutputStream
 from .binutils.outstream import MasterOutputStream, FunctionOutputStream
 from .binutils.objectfile import ObjectFile, get_object
 from .binutils.debuginfo import DebugInfo
 from .binutils.disasm import Disassembler
-from .format.hexfile import HexFile
+from .format.hexfile import write_hex
 from .format.elf import write_elf
 from .format.exefile import ExeWriter
 from .format import uboot_image
 from .format.ldb import write_ldb
 from .build.tasks import TaskError, TaskRunner
+from .build.cache import get_compile_cache, c_cache_key, sources_cache_key
 from .build.recipe import RecipeLoader
 from .common import CompilerError, DiagnosticsManager, get_file
 from .arch import get_arch, get_current_arch
@@ -184,7 +188,9 @@ def disasm(data, march):
 OPT_LEVELS = ("0", "1", "2", "s")
 
 
-def optimize(ir_module, level=0, reporter=None):
+def optimize(
+    ir_module, level=0, reporter=None, verify="full", profile=None
+):
     """Run a bag of tricks against the :doc:`ir-code<ir/index>`.
 
     This is an in-place operation!
@@ -194,9 +200,15 @@ def optimize(ir_module, level=0, reporter=None):
         level: The optimization level, 0 is default. Can be 0,1,2 or s
             0: No optimization
             1: some optimization
-            2: more optimization
-            s: optimize for size
+            2: more optimization, including inlining
+            s: optimize for size, only inline when code gets smaller
         reporter: Report detailed log to this reporter
+        verify: The verification level, 'full' (default) verifies all
+            functions, 'fast' skips functions which were not changed since
+            they were last verified.
+        profile: An optional :class:`ppci.irutils.profile.Profile` with
+            block execution counts. The counts are attached to the blocks,
+            and guide inlining, block layout and register allocation.
     """
     logger = logging.getLogger("optimize")
     level = str(level)
@@ -209,13 +221,16 @@ def optimize(ir_module, level=0, reporter=None):
         reporter.dump_ir(ir_module)
 
     assert level in OPT_LEVELS
+    if profile is not None:
+        apply_profile(ir_module, profile)
+
     if level == "0":
         return
 
     # TODO: differentiate between optimization levels!
 
     # Optimization passes (bag of tricks) run them three times:
-    opt_passes = [
+    function_passes = [
         Mem2RegPromotor(),
         RemoveAddZeroPass(),
         ConstantFolder(),
@@ -224,13 +239,20 @@ def optimize(ir_module, level=0, reporter=None):
         LoadAfterStorePass(),
         DeleteUnusedInstructionsPass(),
         CleanPass(),
-    ] * 3
+    ]
+    opt_passes = function_passes * 3
+
+    # Inline after the first round, when the functions are cleaned up and
+    # their size is known. The next rounds clean up the inlined code:
+    if level in ("2", "s") or profile is not None:
+        inliner = InlinePass(optimize_size=level == "s")
+        opt_passes.insert(len(function_passes), inliner)
 
     if level == "3":
         opt_passes.append(CJumpPass())
 
     # Run the passes over the module:
-    verify_module(ir_module)
+    verify_module(ir_module, level=verify)
     for opt_pass in opt_passes:
         opt_pass.run(ir_module)
         # reporter.message('{} after {}:'.format(ir_module, opt_pass))
@@ -242,11 +264,17 @@ def optimize(ir_module, level=0, reporter=None):
         reporter.message("{} {}".format(ir_module, ir_module.stats()))
         reporter.dump_ir(ir_module)
 
-    verify_module(ir_module)
+    verify_module(ir_module, level=verify)
 
 
 def ir_to_stream(
-    ir_module, march, output_stream, reporter=None, debug=False, opt="speed"
+    ir_module,
+    march,
+    output_stream,
+    reporter=None,
+    debug=False,
+    opt="speed",
+    verify="full",
 ):
     """Translate IR module to output stream."""
     march = get_arch(march)
@@ -255,7 +283,7 @@ def ir_to_stream(
         reporter = DummyReportGenerator()
 
     code_generator = CodeGenerator(march, reporter, optimize_for=opt)
-    verify_module(ir_module)
+    verify_module(ir_module, level=verify)
 
     # Code generation:
     code_generator.generate(ir_module, output_stream, debug=debug)
@@ -271,7 +299,13 @@ def ir_to_assembly(ir_modules, march, add_binary=False):
 
 
 def ir_to_object(
-    ir_modules, march, reporter=None, debug=False, opt="speed", outstream=None
+    ir_modules,
+    march,
+    reporter=None,
+    debug=False,
+    opt="speed",
+    outstream=None,
+    verify="full",
 ):
     """Translate IR-modules into code for the given architecture.
 
@@ -283,6 +317,7 @@ def ir_to_object(
         debug (bool): include debugging information
         opt (str): optimization goal. Can be 'speed', 'size' or 'co2'.
         outstream: instruction stream to write instructions to
+        verify (str): IR verification level, 'full' or 'fast'.
 
     Returns:
         ObjectFile: An object file
@@ -317,6 +352,7 @@ def ir_to_object(
             reporter=reporter,
             debug=debug,
             opt=opt,
+            verify=verify,
         )
 
     reporter.message("All modules generated!")
@@ -331,6 +367,8 @@ def cc(
     opt_level=0,
     debug=False,
     reporter=None,
+    cache=None,
+    lto=False,
 ):
     """C compiler. compiles a single source file into an object file.
 
@@ -339,6 +377,10 @@ def cc(
         march: The architecture for which to compile
         coptions: options for the C frontend
         debug: Create debug info when set to True
+        cache: a :class:`ppci.build.cache.CompileCache` or a directory
+            name. When given, the object is looked up in this cache by
+            the preprocessed source.
+        lto: Attach the IR-code to the object for link time optimization.
 
     Returns:
         an object file
@@ -359,11 +401,26 @@ def cc(
     if not coptions:
         coptions = COptions()
 
+    cache = get_compile_cache(cache)
+    if cache is not None:
+        key, source = c_cache_key(
+            source, march, coptions, opt_level, debug, lto
+        )
+        obj = cache.get(key)
+        if obj is not None:
+            reporter.message("Object retrieved from {}".format(cache))
+            return obj
+
     ir_module = c_to_ir(source, march, coptions=coptions, reporter=reporter)
     reporter.message("{} {}".format(ir_module, ir_module.stats()))
     reporter.dump_ir(ir_module)
     optimize(ir_module, level=opt_level, reporter=reporter)
-    return ir_to_object([ir_module], march, debug=debug, reporter=reporter)
+    ir_data = serialize_ir([ir_module]) if lto else None
+    obj = ir_to_object([ir_module], march, debug=debug, reporter=reporter)
+    obj.ir = ir_data
+    if cache is not None:
+        cache.put(key, obj)
+    return obj
 
 
 def wasmcompile(source: io.TextIOBase, march, opt_level=2, reporter=None):
@@ -386,9 +443,27 @@ def wasmcompile(source: io.TextIOBase, march, opt_level=2, reporter=None):
 
 
 def llc(source, march):
-    """ Compile llvm assembly source into machine code """
+    """Compile llvm assembly source or binary ppci IR-code into machine code.
+
+    Args:
+        source: a file with llvm assembly, or binary IR-code as bytes,
+            as a file opened in binary mode or as a filename.
+        march: the architecture for which to compile.
+    """
     march = get_arch(march)
-    ir_module = llvm_to_ir(source)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    elif isinstance(source, io.BufferedIOBase):
+        source = source.read()
+
+    if isinstance(source, bytes):
+        if is_binary_ir(source):
+            ir_module = from_binary(source)
+        else:
+            ir_module = llvm_to_ir(io.StringIO(source.decode("utf-8")))
+    else:
+        ir_module = llvm_to_ir(source)
     return ir_to_object([ir_module], march)
 
 
@@ -400,6 +475,8 @@ def c3c(
     reporter=None,
     debug=False,
     outstream=None,
+    cache=None,
+    lto=False,
 ):
     """Compile a set of sources into binary format for the given target.
 
@@ -410,6 +487,11 @@ def c3c(
         march: the architecture for which to compile.
         reporter: reporter to write compilation report to
         debug: include debugging information
+        cache: a :class:`ppci.build.cache.CompileCache` or a directory
+            name. When given, the object is looked up in this cache by
+            the contents of sources and includes. Not used together with
+            an outstream.
+        lto: attach the IR-code to the object for link time optimization.
 
     Returns:
         An object file
@@ -425,12 +507,23 @@ def c3c(
     """
     reporter = get_reporter(reporter)
     march = get_arch(march)
+    cache = get_compile_cache(cache) if outstream is None else None
+    if cache is not None:
+        key, (sources, includes) = sources_cache_key(
+            "c3", [sources, includes], march, opt_level, debug, lto
+        )
+        obj = cache.get(key)
+        if obj is not None:
+            reporter.message("Object retrieved from {}".format(cache))
+            return obj
+
     ir_module = c3_to_ir(sources, includes, march, reporter=reporter)
 
     optimize(ir_module, level=opt_level, reporter=reporter)
 
     opt_cg = "size" if opt_level == "s" else "speed"
-    return ir_to_object(
+    ir_data = serialize_ir([ir_module]) if lto else None
+    obj = ir_to_object(
         [ir_module],
         march,
         debug=debug,
@@ -438,14 +531,22 @@ def c3c(
         opt=opt_cg,
         outstream=outstream,
     )
+    obj.ir = ir_data
+    if cache is not None:
+        cache.put(key, obj)
+    return obj
 
 
-def pascal(sources, march, opt_level=0, reporter=None, debug=False):
+def pascal(
+    sources, march, opt_level=0, reporter=None, debug=False, cache=None
+):
     """Compile a set of pascal-sources for the given target.
 
     Args:
         sources: a collection of sources that will be compiled.
         march: the architecture for which to compile.
+        cache: a :class:`ppci.build.cache.CompileCache` or a directory
+            name to lookup the object in.
 
     Returns:
         An object file
@@ -453,9 +554,22 @@ def pascal(sources, march, opt_level=0, reporter=None, debug=False):
     march = get_arch(march)
     if not reporter:  # pragma: no cover
         reporter = DummyReportGenerator()
+    cache = get_compile_cache(cache)
+    if cache is not None:
+        key, (sources,) = sources_cache_key(
+            "pascal", [sources], march, opt_level, debug
+        )
+        obj = cache.get(key)
+        if obj is not None:
+            reporter.message("Object retrieved from {}".format(cache))
+            return obj
+
     sources = [get_file(fn) for fn in sources]
     ir_modules = pascal_to_ir(sources, march)
-    return ir_to_object(ir_modules, march, reporter=reporter, debug=debug)
+    obj = ir_to_object(ir_modules, march, reporter=reporter, debug=debug)
+    if cache is not None:
+        cache.put(key, obj)
+    return obj
 
 
 def bfcompile(source, target, reporter=None):
@@ -530,10 +644,8 @@ def objcopy(obj: ObjectFile, image_name: str, fmt: str, output_filename):
 
     elif fmt == "hex":
         image = obj.get_image(image_name)
-        hexfile = HexFile()
-        hexfile.add_region(image.address, image.data)
         with open(output_filename, "wt", encoding="utf8") as output_file:
-            hexfile.save(output_file)
+            write_hex(output_file, [(image.address, image.data)])
     elif fmt == "ldb":
         # TODO: fix this some other way to extract debug info
         with open(output_filename, "wt", encoding="utf8") as output_file:
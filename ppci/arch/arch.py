@@ -153,8 +153,14 @@ class Architecture(MachineArchitecture):
     @lru_cache(maxsize=30)
     def get_compiler_rt_lib(self):
         """Gets the runtime for the compiler. Returns an object with the
-        compiler runtime for this architecture"""
-        return self.get_runtime()
+        compiler runtime for this architecture.
+
+        The object is kept in a cache on disk, so that the runtime is
+        compiled only once, instead of in every process.
+        """
+        from ..build.cache import get_cached_runtime
+
+        return get_cached_runtime(self)
 
     runtime = property(get_compiler_rt_lib)
 
@@ -163,3 +169,10 @@ class Architecture(MachineArchitecture):
         relocations.
         """
         raise NotImplementedError("ELF format relocations")
+
+    def get_reloc_name(self, r_type):
+        """Get the name of the relocation for an ELF relocation type.
+
+        Re-implement this function to support importing ELF files.
+        """
+        raise NotImplementedError("ELF format relocations")
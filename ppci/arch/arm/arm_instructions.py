@@ -861,6 +861,22 @@ class Mrc(McrBase):
     )
 
 
+# Timing for the instruction scheduler. Loads have a load-use delay of one
+# cycle, like on arm9 and cortex-a cores. Instructions which use or set the
+# condition flags are not listed, so they are never moved.
+arm_isa.timing(
+    Mov1, Mov2, Add, And, Eor, Orr, Sub, Lsl1, Lsr1, Asr, Adr, AddImm
+)
+arm_isa.timing(AndImm, EorImm, OrrImm, RsbImm, SubImm)
+arm_isa.timing(Mul1, Mls, latency=3)
+arm_isa.timing(Sdiv, Udiv, latency=12)
+arm_isa.timing(
+    Ldr1, Ldrb, Ldrsb, Ldrh_imm, Ldrsh_imm, Ldrsh_reg, latency=2, load=True
+)
+arm_isa.timing(Ldr3, latency=2)  # Literal pool loads of constants
+arm_isa.timing(Str1, Strb, store=True)
+
+
 # Instruction selection patterns:
 @arm_isa.pattern(
     "mem",
@@ -111,8 +111,10 @@ class AvrArch(Architecture):
         from ...api import asm, c3c, link
 
         obj1 = asm(io.StringIO(asm_rt_src), self)
-        c3_sources = get_runtime_files(["sdiv", "smul"])
-        obj2 = c3c(c3_sources, [], self)
+        c3_sources = get_runtime_files(
+            ["sdiv", "smul"], self.info.get_size("int")
+        )
+        obj2 = c3c(c3_sources, [], self, opt_level=2)
         obj = link([obj1, obj2], partial_link=True)
         return obj
 
@@ -13,6 +13,8 @@ Pattern = namedtuple(
     ["non_term", "tree", "size", "cycles", "energy", "condition", "method"],
 )
 
+Timing = namedtuple("Timing", ["latency", "load", "store"])
+
 
 class Isa:
     """Container type for an instruction set.
@@ -23,6 +25,9 @@ class Isa:
     Isa's can be merged into new isa's which can be used to define target.
     For example the arm without FPU can be combined with the FPU isa
     to expand the supported functions.
+
+    For the instruction scheduler, an isa holds the timing of its
+    instructions, and the number of instructions issued per cycle.
     """
 
     def __init__(self):
@@ -30,6 +35,8 @@ class Isa:
         self.relocation_map = {}
         self.patterns = []
         self.peepholes = []
+        self.timings = {}
+        self.issue_width = 1
 
     def __add__(self, other):
         assert isinstance(other, Isa)
@@ -38,6 +45,9 @@ class Isa:
         isa3.patterns = self.patterns + other.patterns
         isa3.relocation_map = self.relocation_map.copy()
         isa3.relocation_map.update(other.relocation_map)
+        isa3.timings = self.timings.copy()
+        isa3.timings.update(other.timings)
+        isa3.issue_width = max(self.issue_width, other.issue_width)
         return isa3
 
     def add_instruction(self, instruction):
@@ -61,6 +71,22 @@ class Isa:
         self.peepholes.append(function)
         return function
 
+    def timing(self, *instructions, latency=1, load=False, store=False):
+        """Declare the timing of instructions for the scheduler.
+
+        Args:
+            instructions: the instruction classes with this timing.
+            latency: the number of cycles before the result can be used.
+            load: whether the instructions read memory.
+            store: whether the instructions write memory.
+
+        Only instructions with a timing are moved by the scheduler. Do not
+        declare instructions which read or write condition flags or other
+        state which is not an operand.
+        """
+        for instruction in instructions:
+            self.timings[instruction] = Timing(latency, load, store)
+
     def pattern(
         self, non_term, tree, condition=None, size=1, cycles=1, energy=1
     ):
@@ -235,8 +235,10 @@ class MicroBlazeArch(Architecture):
         from ...api import c3c
         from ..runtime import get_runtime_files
 
-        c3_sources = get_runtime_files(["divsi3", "mulsi3"])
-        obj = c3c(c3_sources, [], self)
+        c3_sources = get_runtime_files(
+            ["divsi3", "mulsi3"], self.info.get_size("int")
+        )
+        obj = c3c(c3_sources, [], self, opt_level=2)
         return obj
 
 
@@ -495,6 +495,7 @@ def pattern_jmp(context, tree):
 
 @isa.pattern("stm", "CJMPI32(reg, reg)")
 @isa.pattern("stm", "CJMPI8(reg, reg)")
+@isa.pattern("stm", "CJMPU32(reg, reg)")
 @isa.pattern("stm", "CJMPU8(reg, reg)")
 def pattern_cjmp(context, tree, c0, c1):
     op, yes_label, no_label = tree.value
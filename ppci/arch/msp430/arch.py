@@ -235,12 +235,16 @@ class Msp430Arch(Architecture):
         from ...api import asm, c3c, link
 
         march = "msp430"
-        c3_sources = get_runtime_files(["divsi3", "mulsi3"])
+        c3_sources = get_runtime_files(
+            ["divsi3", "mulsi3"], self.info.get_size("int")
+        )
         # report_generator = HtmlReportGenerator(
         # open('msp430.html', 'wt', encoding='utf8'))
         with DummyReportGenerator() as reporter:
             obj1 = asm(io.StringIO(RT_ASM_SRC), march)
-            obj2 = c3c(c3_sources, [], march, reporter=reporter)
+            obj2 = c3c(
+                c3_sources, [], march, opt_level=2, reporter=reporter
+            )
             obj = link([obj1, obj2], partial_link=True)
         return obj
 
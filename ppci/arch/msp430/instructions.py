@@ -530,15 +530,40 @@ def pattern_cjmp_i8(context, tree, lhs, rhs):
     emit_cmp(context, Cmpb, lhs, rhs, op, true_tgt, false_tgt)
 
 
-def emit_cmp(context, cmp_ins, lhs, rhs, op, true_tgt, false_tgt):
-    opnames = {
-        "<": (Jl, False),
-        ">": (Jl, True),
-        "==": (Jz, False),
-        "!=": (Jne, False),
-        ">=": (Jge, False),
-        "<=": (Jge, True),
-    }
+@isa.pattern("stm", "CJMPU16(reg, reg)", size=10)
+def pattern_cjmp_u16(context, tree, lhs, rhs):
+    op, true_tgt, false_tgt = tree.value
+    emit_cmp(context, Cmp, lhs, rhs, op, true_tgt, false_tgt, signed=False)
+
+
+@isa.pattern("stm", "CJMPU8(reg, reg)", size=10)
+def pattern_cjmp_u8(context, tree, lhs, rhs):
+    op, true_tgt, false_tgt = tree.value
+    emit_cmp(context, Cmpb, lhs, rhs, op, true_tgt, false_tgt, signed=False)
+
+
+def emit_cmp(
+    context, cmp_ins, lhs, rhs, op, true_tgt, false_tgt, signed=True
+):
+    if signed:
+        opnames = {
+            "<": (Jl, False),
+            ">": (Jl, True),
+            "==": (Jz, False),
+            "!=": (Jne, False),
+            ">=": (Jge, False),
+            "<=": (Jge, True),
+        }
+    else:
+        # The carry flag is set when there is no borrow:
+        opnames = {
+            "<": (Jnc, False),
+            ">": (Jnc, True),
+            "==": (Jz, False),
+            "!=": (Jne, False),
+            ">=": (Jc, False),
+            "<=": (Jc, True),
+        }
     op_ins, swap_ops = opnames[op]
     if swap_ops:
         # Swap operands here!
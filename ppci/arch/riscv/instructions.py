@@ -672,6 +672,15 @@ Divu = make_mext("divu", 0b101)
 Rem = make_mext("rem", 0b110)
 Remu = make_mext("remu", 0b111)
 
+# Timing for the instruction scheduler, based on a classic five stage
+# pipeline with a load-use delay of one cycle:
+isa.timing(Addr, Subr, Sll, Slt, Sltu, Xorr, Srl, Sra, Orr, Andr, Movr)
+isa.timing(Slli, Srli, Srai, Addi, Slti, Sltiu, Xori, Ori, Andi, Lui)
+isa.timing(Mul, latency=3)
+isa.timing(Div, Divu, Rem, Remu, latency=34)
+isa.timing(Lb, Lh, Lw, Lbu, Lhu, latency=2, load=True)
+isa.timing(Sb, Sh, Sw, store=True)
+
 # Instruction selection patterns:
 
 
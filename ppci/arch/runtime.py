@@ -6,49 +6,133 @@ signed integer division.
 The same naming conventions are used as in gcc.
 
 https://gcc.gnu.org/onlinedocs/gccint/Integer-library-routines.html
+
+The routines work on unsigned words of the size of an int. They avoid
+shifts, since on machines without multiplier, like the msp430 and the
+avr, shifts are loops as well:
+
+- Multiplication adds the multiplicand for each set bit of the smallest
+  operand, four bits per loop iteration, and stops when no set bits
+  are left.
+- Division first skips the leading zero bytes and bits of the dividend,
+  and then determines one quotient bit per iteration, so the number of
+  iterations is the bit length of the dividend instead of the word size.
+- The signed variants work on the magnitudes, and fix the sign of the
+  result afterwards. The remainder has the sign of the dividend.
 """
 
 import io
 
 
-def get_runtime_files(names):
+def get_runtime_files(names, int_size=4):
     """Get a list of files with the required names.
 
     For example:
 
         get_runtime_files(['__divsi3', '__udivsi3'])
 
+    The int_size is the size of an int in bytes on the target machine.
     """
     files = []
+    files.append(io.StringIO(make_word_src(int_size)))
     files.append(io.StringIO(RT_MUL_C3_SRC))
     files.append(io.StringIO(RT_DIV_C3_SRC))
     return files
 
 
+def make_word_src(int_size):
+    """ Create the definition of the unsigned word type and its constants """
+    bits = int_size * 8
+    return RT_WORD_C3_SRC.format(
+        bits=bits,
+        high_bit=hex(1 << (bits - 1)),
+        high_byte=hex(0xFF << (bits - 8)),
+    )
+
+
+RT_WORD_C3_SRC = """
+module runtime;
+
+type uint{bits}_t word;
+
+const int word_bits = {bits};
+const word zero = 0;
+const word one = 1;
+const word byte_bits = 8;
+const word high_bit = {high_bit};
+const word high_byte = {high_byte};
+"""
+
 RT_MUL_C3_SRC = """
 module runtime;
 
 function int mulsi3(int a, int b)
 {
-  return mul_helper(a, b);
+  // Multiply the magnitudes, so that small negative operands are fast:
+  if (a < 0)
+  {
+    if (b < 0)
+    {
+      return cast<int>(mul_helper(cast<word>(-a), cast<word>(-b)));
+    }
+    return -cast<int>(mul_helper(cast<word>(-a), cast<word>(b)));
+  }
+  else if (b < 0)
+  {
+    return -cast<int>(mul_helper(cast<word>(a), cast<word>(-b)));
+  }
+  return cast<int>(mul_helper(cast<word>(a), cast<word>(b)));
 }
 
 function int umulsi3(int a, int b)
 {
-  return mul_helper(a, b);
+  return cast<int>(mul_helper(cast<word>(a), cast<word>(b)));
 }
 
-function int mul_helper(int a, int b)
+function word mul_helper(word a, word b)
 {
-  var int res = 0;
-  while (b > 0)
+  var word res = 0;
+  var word mask = 1;
+
+  // Loop over the set bits of the smallest operand:
+  if (a < b)
+  {
+    var word tmp = a;
+    a = b;
+    b = tmp;
+  }
+
+  // Handle four bits per iteration, and clear each handled bit in b:
+  while (b != zero)
   {
-    if ((b & 1) == 1)
+    if ((b & mask) != zero)
+    {
+      res += a;
+      b -= mask;
+    }
+    a += a;
+    mask += mask;
+    if ((b & mask) != zero)
+    {
+      res += a;
+      b -= mask;
+    }
+    a += a;
+    mask += mask;
+    if ((b & mask) != zero)
+    {
+      res += a;
+      b -= mask;
+    }
+    a += a;
+    mask += mask;
+    if ((b & mask) != zero)
     {
       res += a;
+      b -= mask;
     }
-    a = a << 1;
-    b = b >> 1;
+    a += a;
+    mask += mask;
   }
   return res;
 }
@@ -60,53 +144,108 @@ module runtime;
 
 function int divsi3(int a, int b)
 {
-  return udiv_helper(a, b, 0);
+  var word quotient;
+  if (a < 0)
+  {
+    if (b < 0)
+    {
+      return cast<int>(udiv_helper(cast<word>(-a), cast<word>(-b), 0));
+    }
+    quotient = udiv_helper(cast<word>(-a), cast<word>(b), 0);
+    return -cast<int>(quotient);
+  }
+  else if (b < 0)
+  {
+    quotient = udiv_helper(cast<word>(a), cast<word>(-b), 0);
+    return -cast<int>(quotient);
+  }
+  return cast<int>(udiv_helper(cast<word>(a), cast<word>(b), 0));
 }
 
 function int udivsi3(int a, int b)
 {
-  return udiv_helper(a, b, 0);
+  return cast<int>(udiv_helper(cast<word>(a), cast<word>(b), 0));
 }
 
 function int modsi3(int a, int b)
 {
-  return udiv_helper(a, b, 1);
+  if (b < 0)
+  {
+    b = -b;
+  }
+  if (a < 0)
+  {
+    return -cast<int>(udiv_helper(cast<word>(-a), cast<word>(b), 1));
+  }
+  return cast<int>(udiv_helper(cast<word>(a), cast<word>(b), 1));
 }
 
 function int umodsi3(int a, int b)
 {
-  return udiv_helper(a, b, 1);
+  return cast<int>(udiv_helper(cast<word>(a), cast<word>(b), 1));
 }
 
-function int udiv_helper(int num, int den, int remainder)
+function word udiv_helper(word num, word den, int remainder)
 {
-  var int res = 0;
-  var int current = 1;
+  var word rem;
+  var int count;
 
-  while (den < num)
+  // Quick answers when the quotient is 0 or 1:
+  if (num < den)
   {
-    den = den << 1;
-    current = current << 1;
+    if (remainder != 0)
+    {
+      return num;
+    }
+    return 0;
   }
 
-  while (current != 0)
+  if ((den & high_bit) != zero)
   {
-    if (num >= den)
+    if (remainder != 0)
     {
-      num -= den;
-      res = res | current;
+      return num - den;
     }
-    den = den >> 1;
-    current = current >> 1;
+    return 1;
   }
 
-  // Return remainer if needed:
-  if (remainder != 0)
+  // Normalise the dividend, by skipping its leading zeros:
+  count = word_bits;
+  while ((num & high_byte) == zero)
   {
-    res = num;
+    num = num << byte_bits;
+    count -= 8;
   }
 
-  return res;
+  while ((num & high_bit) == zero)
+  {
+    num += num;
+    count -= 1;
+  }
+
+  // Shift the dividend into the remainder, and the quotient into num:
+  rem = 0;
+  while (count > 0)
+  {
+    rem += rem;
+    if ((num & high_bit) != zero)
+    {
+      rem += one;
+    }
+    num += num;
+    if (rem >= den)
+    {
+      rem -= den;
+      num += one;
+    }
+    count -= 1;
+  }
+
+  if (remainder != 0)
+  {
+    return rem;
+  }
+  return num;
 }
 
 """
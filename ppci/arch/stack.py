@@ -47,6 +47,11 @@ class Frame:
         self.debug_db = debug_db  # Eventual debug information
         self.fp_location = fp_location
         self.instructions = []
+
+        # Execution frequency estimates of instructions, used to weigh spill
+        # costs. Only instructions of profiled code have a weight:
+        self.instruction_weights = {}
+        self.current_weight = None
         self.used_regs = set()
         self.is_leaf = False  # TODO: detect leaf functions
         self.out_calls = []
@@ -120,10 +125,6 @@ class Frame:
         # assert register in alias
         return any(r in self.used_regs for r in alias[register.get_real()])
 
-    def live_ranges(self, vreg):
-        """ Determine the live range of some register """
-        return self.cfg._live_ranges[vreg]
-
     def new_reg(self, cls, twain=""):
         """ Retrieve a new virtual register """
         tmp_name = self.temps.__next__() + twain
@@ -139,16 +140,31 @@ class Frame:
         """ Append an abstract instruction to the end of this frame """
         assert isinstance(ins, Instruction)
         self.instructions.append(ins)
+        if self.current_weight is not None:
+            self.instruction_weights[ins] = self.current_weight
         return ins
 
+    def weight_of(self, instruction):
+        """ Get the estimated execution frequency of an instruction """
+        return self.instruction_weights.get(instruction, 1)
+
     def insert_code_before(self, instruction, code):
         """ Insert a code sequence before an instruction """
         pt = self.instructions.index(instruction)
         for idx, ins in enumerate(code):
             self.instructions.insert(idx + pt, ins)
+        self._inherit_weight(instruction, code)
 
     def insert_code_after(self, instruction, code):
         """ Insert a code sequence after an instruction """
         pt = self.instructions.index(instruction) + 1
         for idx, ins in enumerate(code):
             self.instructions.insert(idx + pt, ins)
+        self._inherit_weight(instruction, code)
+
+    def _inherit_weight(self, instruction, code):
+        """ Inserted code executes as often as the instruction near it """
+        if instruction in self.instruction_weights:
+            weight = self.instruction_weights[instruction]
+            for ins in code:
+                self.instruction_weights[ins] = weight
@@ -21,6 +21,7 @@ Calling conventions
 """
 
 from ... import ir
+from ...common import CompilerError
 from ..arch import Architecture
 from ..arch_info import ArchInfo, TypeInfo
 from ..generic_instructions import Label, RegisterUseDef
@@ -673,6 +674,14 @@ class X86_64Arch(Architecture):
             r_type = elf_support.elf_reloc_mapping[reloc_type]
         return r_type
 
+    def get_reloc_name(self, r_type):
+        """ Get the relocation name of an ELF relocation type. """
+        if r_type not in elf_support.elf_reloc_names:
+            raise CompilerError(
+                "Unsupported ELF relocation type {}".format(r_type)
+            )
+        return elf_support.elf_reloc_names[r_type]
+
 
 def round_up16(s, already_taken):
     total = s + already_taken
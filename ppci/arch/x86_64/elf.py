@@ -42,3 +42,12 @@ elf_reloc_mapping = {
     "abs32": R_X86_64_32,
     "absaddr64": R_X86_64_64,
 }
+
+# Relocations which can be imported, and how ppci applies them:
+elf_reloc_names = {
+    R_X86_64_PC32: "rel32",
+    R_X86_64_PLT32: "rel32",
+    R_X86_64_64: "abs64",
+    R_X86_64_32: "abs32",
+    R_X86_64_32S: "abs32",
+}
@@ -155,7 +155,7 @@ class Abs32Relocation(Relocation):
     name = "abs32"
 
     def calc(self, sym_value, reloc_value):
-        return sym_value
+        return sym_value + self.addend
 
 
 @isa.register_relocation
@@ -176,7 +176,7 @@ class Abs64Relocation(Relocation):
     name = "abs64"
 
     def calc(self, sym_value, reloc_value):
-        return wrap_negative(sym_value, 64)
+        return wrap_negative(sym_value + self.addend, 64)
 
 
 # Actual instructions:
@@ -54,8 +54,10 @@ class XtensaArch(Architecture):
         """ Retrieve the runtime for this target """
         from ...api import c3c
 
-        c3_sources = get_runtime_files(["divsi3", "mulsi3"])
-        obj = c3c(c3_sources, [], self)
+        c3_sources = get_runtime_files(
+            ["divsi3", "mulsi3"], self.info.get_size("int")
+        )
+        obj = c3c(c3_sources, [], self, opt_level=2)
         return obj
 
     def determine_arg_locations(self, arg_types):
@@ -882,6 +882,16 @@ class Xor(XtensaCoreInstruction):
     syntax = Syntax(["xor", " ", r, ",", " ", s, ",", " ", t])
 
 
+# Timing for the instruction scheduler. A loaded value is available two
+# cycles after the load. The shifts by register use the shift amount
+# register, which is not an operand, so they are never moved.
+core_isa.timing(Abs, Add, Addi, Addmi, Addx2, Addx4, Addx8, And, Mov, Movi)
+core_isa.timing(Neg, Or, Sext, Srli, Sub, Subx2, Subx4, Subx8, Xor)
+core_isa.timing(L8ui, L16si, L16ui, L32i, latency=2, load=True)
+core_isa.timing(L32r, latency=2)  # Literal pool loads of constants
+core_isa.timing(S8i, S16i, S32i, store=True)
+
+
 # Extra handy instructions:
 class Push(XtensaMacroInstruction):
     """ Push a register on stack """
@@ -7,7 +7,7 @@
 import re
 from ..lang.tools.grammar import Grammar
 from ..lang.tools.earley import EarleyParser
-from ..lang.tools.baselex import BaseLexer, EPS, EOF
+from ..lang.tools.baselex import BaseLexer, EPS, EOF, GLYPH
 from ..common import make_num
 from ..arch.generic_instructions import Label, Alignment, SectionInstruction
 from ..arch.generic_instructions import DebugData, Global
@@ -30,25 +30,15 @@ class AsmLexer(BaseLexer):
             ("NUMBER", r"\d+", self.handle_number),
             ("ID", id_regex, self.handle_id),
             ("SKIP", r"[ \t]", None),
-            (
-                "GLYPH",
-                "|".join(re.escape(c) for c in Syntax.GLYPHS),
-                lambda typ, val: (val, val),
-            ),
-            ("STRING", r"'.*?'", lambda typ, val: (typ, val[1:-1])),
+            ("GLYPH", "|".join(re.escape(c) for c in Syntax.GLYPHS), GLYPH),
+            ("STRING", r"'[^'\n]*'", lambda typ, val: (typ, val[1:-1])),
             ("COMMENT", r";.*", None),
         ]
-        super().__init__(tok_spec)
-        self.kws = set(kws)
+        super().__init__(tok_spec, keywords=kws)
 
     def handle_id(self, typ, val):
-        if val.lower() in self.kws:
-            typ = val.lower()
-        return typ, val
-
-    def add_keyword(self, keyword):
-        """ Add a keyword """
-        self.kws.add(keyword)
+        """ Keywords are not case sensitive """
+        return self.keyword_map.get(val.lower(), typ), val
 
     def handle_number(self, typ, val):
         """ Handle a number during lexing """
@@ -136,7 +126,7 @@ class BaseAssembler:
 
     def add_keyword(self, keyword):
         """ Add a keyword to the grammar """
-        if keyword not in self.lexer.kws:
+        if keyword not in self.lexer.keyword_map:
             self.parser.g.add_terminal(keyword)
             self.lexer.add_keyword(keyword)
 
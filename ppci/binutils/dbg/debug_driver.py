@@ -51,3 +51,7 @@ class DebugDriver(abc.ABC):  # pragma: no cover
     def get_registers(self, registers):
         """ Get the values for a range of registers """
         raise NotImplementedError()
+
+    def prefetch_mem(self, address, size):
+        """ Hint that the given memory range is about to be read """
+        pass
@@ -253,6 +253,22 @@ class Debugger:
         """ Write binary data to memory location """
         return self.driver.write_mem(address, data)
 
+    def prefetch_frame(self):
+        """Fetch the stack frame of the current function in one go.
+
+        Local variables live at an offset from the frame pointer. Loading
+        the whole frame at once saves a round trip per variable.
+        """
+        ranges = []
+        for variable in self.local_vars().values():
+            if isinstance(variable.address, FpOffsetAddress):
+                address = self.calc_address(variable.address)
+                ranges.append((address, address + self.sizeof(variable.typ)))
+        if ranges:
+            begin = min(r[0] for r in ranges)
+            end = max(r[1] for r in ranges)
+            self.driver.prefetch_mem(begin, end - begin)
+
     # Expressions:
     def eval_c3_str(self, expr):
         # Create a context for the expression to exist:
@@ -262,12 +278,16 @@ class Debugger:
         c3_expr = self.expr_parser.parse(expr, context)
 
         # Eval expr:
+        if self.is_halted:
+            self.prefetch_frame()
         val = self.eval_c3_expr(c3_expr)
 
         return val
 
     def sizeof(self, typ):
         """ Determine the size of a debug type """
+        if isinstance(typ, DebugPointerType):
+            return self.arch.info.get_size("ptr")
         return typ.sizeof()
         # TODO: obsolete:
         if isinstance(typ, DebugBaseType):
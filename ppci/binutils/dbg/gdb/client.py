@@ -3,6 +3,7 @@
 """
 
 import abc
+import asyncio
 import binascii
 import logging
 import struct
@@ -10,7 +11,8 @@ import string
 import queue
 from threading import Thread
 from ..debug_driver import DebugDriver, DebugState
-from .rsp import RspHandler
+from .rsp import RspHandler, AsyncRspHandler, RspError
+from .memcache import MemoryCache
 
 INTERRUPT = 2
 BRKPOINT = 5
@@ -36,23 +38,6 @@ class ThreadedCommHandler(GdbCommHandler):
         self.rxqueue.get()
 
 
-# Idea: the gdb class should work threaded and non-threaded. How to do it?
-# class AsyncCommHandler(GdbCommHandler):
-#    """ Communicate using asyncio """
-#    def __init__(self):
-#        self.event_loop = None
-#
-#    def recv_loop(self):
-#        while True:
-#            data = await recv()
-#
-#    def recv(self):
-#        if queue:
-#            pass
-#        else:
-#            yield to ioloop
-
-
 class GdbDebugDriver(DebugDriver):
     """Implement debugging via the GDB remote interface.
 
@@ -69,17 +54,34 @@ class GdbDebugDriver(DebugDriver):
     sending and receiving of bytes. The protocol must be able to
     work using sockets and threads, serial port and threads and asyncio
     sockets.
+
+    While the target is stopped, memory reads are cached in pages of
+    `page_size` bytes, so that evaluating a struct or an array costs a
+    single round trip. Pass `memory_cache=False` when reading memory
+    mapped peripherals which change behind our back.
     """
 
     logger = logging.getLogger("gdbclient")
 
-    def __init__(self, arch, transport, pcresval=0, swbrkpt=False):
+    def __init__(
+        self,
+        arch,
+        transport,
+        pcresval=0,
+        swbrkpt=False,
+        memory_cache=True,
+        page_size=64,
+    ):
         super().__init__()
         self.arch = arch
         self.transport = transport
         self.status = DebugState.RUNNING
         self.pcresval = pcresval
         self._register_value_cache = {}  # Cached map of register values
+        if memory_cache:
+            self._memory_cache = MemoryCache(self._fetch_mem, page_size)
+        else:
+            self._memory_cache = None
         self.swbrkpt = swbrkpt
         self.stopreason = INTERRUPT
 
@@ -171,9 +173,15 @@ class GdbDebugDriver(DebugDriver):
     def _start(self):
         """ Update state to started """
         self.status = DebugState.RUNNING
-        self._register_value_cache.clear()
+        self._invalidate_caches()
         self.events.on_start()
 
+    def _invalidate_caches(self):
+        """ Forget cached registers and memory, the target has moved on """
+        self._register_value_cache.clear()
+        if self._memory_cache is not None:
+            self._memory_cache.invalidate()
+
     def _stop(self):
         self.status = DebugState.STOPPED
         self.events.on_stop()
@@ -188,6 +196,7 @@ class GdbDebugDriver(DebugDriver):
         assert pkt.startswith(("S", "T"))
         code = int(pkt[1:3], 16)  # signal number
         self.stopreason = code
+        self._invalidate_caches()
 
         if pkt.startswith("T"):
             rest = pkt[3:]
@@ -244,7 +253,13 @@ class GdbDebugDriver(DebugDriver):
 
     def get_registers(self, registers):
         if self.status == DebugState.STOPPED:
-            regs = self._get_general_registers()
+            if all(
+                r in self._register_value_cache
+                for r in self.arch.gdb_registers
+            ):
+                regs = dict(self._register_value_cache)
+            else:
+                regs = self._get_general_registers()
         else:
             self.logger.warning("Cannot read registers while running")
             regs = {}
@@ -259,6 +274,9 @@ class GdbDebugDriver(DebugDriver):
         for register in self.arch.gdb_registers:
             size = register.bitsize // 8
             reg_data = data[offset : offset + size]
+            if len(reg_data) < size:
+                # Not reported, _get_register reads it with `p`
+                break
             value = self._unpack_register(register, reg_data)
             res[register] = value
             # self.logger.debug('reg %s = %s', register, value)
@@ -285,29 +303,41 @@ class GdbDebugDriver(DebugDriver):
                 offset += size
             data = binascii.b2a_hex(data).decode("ascii")
             res = self._send_command("G %s" % data)
+            self._register_value_cache.clear()
             if res == "OK":
                 self.logger.debug("Register written")
             else:
                 self.logger.warning("Registers writing failed: %s", res)
 
     def _get_register(self, register):
-        """ Get a single register """
+        """Get a single register.
+
+        All registers are retrieved at once with the `g` command, so that
+        subsequent register reads are served from the cache. A register
+        missing from that reply is read on its own with the `p` command.
+        """
         if self.status == DebugState.STOPPED:
-            if register in self._register_value_cache:
-                value = self._register_value_cache[register]
-            else:
-                idx = self.arch.gdb_registers.index(register)
-                data = self._send_command("p %x" % idx)
-                data = binascii.a2b_hex(data.encode("ascii"))
-                value = self._unpack_register(register, data)
+            if register not in self._register_value_cache:
+                self._get_general_registers()
+            if register not in self._register_value_cache:
+                value = self._read_register(register)
                 self._register_value_cache[register] = value
-            return value
+            return self._register_value_cache[register]
         else:
             self.logger.warning(
                 "Cannot read register %s while not stopped", register
             )
             return 0
 
+    def _read_register(self, register):
+        """ Execute the gdb `p` command """
+        if register not in self.arch.gdb_registers:
+            raise RspError("Register {} is unknown to gdb".format(register))
+        idx = self.arch.gdb_registers.index(register)
+        return decode_register(
+            self.arch, register, self._send_command("p%x" % idx)
+        )
+
     def _set_register(self, register, value):
         """ Set a single register """
         if self.status == DebugState.STOPPED:
@@ -315,6 +345,7 @@ class GdbDebugDriver(DebugDriver):
             value = self._pack_register(register, value)
             value = binascii.b2a_hex(value).decode("ascii")
             res = self._send_command("P %x=%s" % (idx, value))
+            self._register_value_cache.pop(register, None)
             if res == "OK":
                 self.logger.debug("Register written")
             else:
@@ -322,28 +353,8 @@ class GdbDebugDriver(DebugDriver):
 
     def _unpack_register(self, register, data):
         """ Fetch a register from some data """
-        from ....arch.arch_info import Endianness
-
-        if self.arch.info.endianness == Endianness.BIG:
-            endian_fmt = ">"
-        else:
-            endian_fmt = "<"
-
-        fmts = {
-            8: "{}Q".format(endian_fmt),
-            4: "{}I".format(endian_fmt),
-            2: "{}H".format(endian_fmt),
-            1: "{}B".format(endian_fmt),
-        }
-
-        size = register.bitsize // 8
-        if len(data) == size:
-            if size == 3:
-                # TODO: endianess!
-                value = data[0] + (data[1] << 8) + (data[2] << 16)
-            else:
-                (value,) = struct.unpack(fmts[size], data)
-        else:
+        value = unpack_register(self.arch, register, data)
+        if value is None:
             self.logger.error("Could not read register %s", register)
             value = 0
         return value
@@ -351,10 +362,7 @@ class GdbDebugDriver(DebugDriver):
     @staticmethod
     def _pack_register(register, value):
         """ Put some data in a register """
-        fmts = {8: "<Q", 4: "<I", 2: "<H", 1: "<B"}
-        size = register.bitsize // 8
-        data = struct.pack(fmts[size], value)
-        return data
+        return pack_register(register, value)
 
     def set_breakpoint(self, address: int):
         """ Set a breakpoint """
@@ -381,13 +389,33 @@ class GdbDebugDriver(DebugDriver):
     def read_mem(self, address: int, size: int):
         """ Read memory from address """
         if self.status == DebugState.STOPPED:
+            if self._memory_cache is not None:
+                data = self._memory_cache.read(address, size)
+                if data is not None:
+                    return data
+                # Fetching whole pages failed, perhaps a page crosses
+                # into unmapped memory, read the exact range instead.
             res = self._send_command("m %x,%x" % (address, size))
-            ret = binascii.a2b_hex(res.encode("ascii"))
-            return ret
+            return decode_memory(res, address)
         else:
             self.logger.warning("Cannot read memory, target not stopped!")
             return bytes()
 
+    def prefetch_mem(self, address: int, size: int):
+        """ Load a memory range into the cache with as few reads
+        as possible """
+        if self._memory_cache is None:
+            return
+        if self.status == DebugState.STOPPED:
+            self._memory_cache.prefetch(address, size)
+
+    def _fetch_mem(self, address: int, size: int):
+        """ Read memory for the cache, returns None on error reply """
+        res = self._send_command("m %x,%x" % (address, size))
+        if len(res) % 2:  # Error replies are of the form 'Enn'
+            return None
+        return binascii.a2b_hex(res.encode("ascii"))
+
     def write_mem(self, address: int, data):
         """ Write memory """
         if self.status == DebugState.STOPPED:
@@ -396,8 +424,12 @@ class GdbDebugDriver(DebugDriver):
             res = self._send_command("M %x,%x:%s" % (address, length, data))
             if res == "OK":
                 self.logger.debug("Memory written")
+                if self._memory_cache is not None:
+                    self._memory_cache.write(address, binascii.a2b_hex(data))
             else:
                 self.logger.warning("Memory write failed: %s", res)
+                if self._memory_cache is not None:
+                    self._memory_cache.invalidate()
         else:
             self.logger.warning("Cannot write memory, target not stopped!")
 
@@ -421,6 +453,424 @@ class GdbDebugDriver(DebugDriver):
         self._rsp.sendpkt(message)
 
 
+class AsyncGdbDebugDriver(DebugDriver):
+    """Debug a target via the GDB remote protocol using asyncio.
+
+    All target operations are coroutines, so that many targets can be
+    driven from a single event loop. Commands are pipelined: large memory
+    transfers are split according to the `PacketSize` reported by the
+    server and all parts are sent without waiting for earlier replies.
+    When the server supports it, no-ack mode is enabled.
+
+    Stop replies are processed as they arrive, use :meth:`wait_stopped`
+    to wait for the target to halt.
+    """
+
+    logger = logging.getLogger("gdbclient")
+
+    def __init__(self, arch, transport, pcresval=0):
+        super().__init__()
+        self.arch = arch
+        self.transport = transport
+        self.status = DebugState.RUNNING
+        self.pcresval = pcresval
+        self.stopreason = INTERRUPT
+        self.packet_size = 0x400
+        self._register_value_cache = {}
+        self._stopped = None
+        self._rsp = AsyncRspHandler(transport)
+        self._rsp.on_stop = self._process_stop_status
+
+    def __str__(self):
+        return "Async gdb debug driver via {}".format(self.transport)
+
+    async def connect(self):
+        """ Connect to the target and negotiate protocol features """
+        self._stopped = asyncio.Event()
+        await self.transport.connect()
+        self._rsp.start()
+        features = await self._send_command("qSupported")
+        supported = set()
+        for feature in features.split(";"):
+            if feature.startswith("PacketSize="):
+                self.packet_size = int(feature[len("PacketSize=") :], 16)
+            elif feature.endswith("+"):
+                supported.add(feature[:-1])
+        if "QStartNoAckMode" in supported:
+            if await self._send_command("QStartNoAckMode") == "OK":
+                self._rsp.ack_mode = False
+                self.logger.debug("No-ack mode enabled")
+
+    async def disconnect(self):
+        """ Disconnect from the target """
+        await self._rsp.close()
+        await self.transport.disconnect()
+
+    def get_status(self):
+        return self.status
+
+    async def wait_stopped(self, timeout=None):
+        """ Wait until the target halts """
+        await asyncio.wait_for(self._stopped.wait(), timeout)
+
+    async def run(self):
+        """ Continue execution """
+        if self.status != DebugState.STOPPED:
+            self.logger.warning("Already running!")
+        self._start()
+        self._rsp.sendpkt("c")
+        await self.transport.drain()
+
+    async def restart(self):
+        """ restart the device """
+        if self.status == DebugState.STOPPED:
+            await self.set_pc(self.pcresval)
+            await self.run()
+        else:
+            self.logger.warning("Cannot restart, still running!")
+
+    async def step(self):
+        """ Single step the device """
+        if self.status == DebugState.STOPPED:
+            self._start()
+            self._rsp.sendpkt("s")
+            await self.transport.drain()
+        else:
+            self.logger.warning("Cannot step, still running!")
+
+    async def stop(self):
+        """ Interrupt the target and wait for it to halt """
+        if self.status == DebugState.RUNNING:
+            self.logger.debug("Sending RAW stop 0x3")
+            self.transport.send(bytes([0x03]))
+            await self.transport.drain()
+            await self.wait_stopped(timeout=3)
+        else:
+            self.logger.warning("Cannot stop if not running")
+
+    def _start(self):
+        self.status = DebugState.RUNNING
+        self._stopped.clear()
+        self._register_value_cache.clear()
+        self.events.on_start()
+
+    def _process_stop_status(self, pkt):
+        """ Handle a stop reply packet, called from the receive loop """
+        if pkt.startswith(("W", "X")):
+            self.logger.info("Target exited: %s", pkt)
+            self.status = DebugState.FINISHED
+            self._stopped.set()
+            return
+
+        self.stopreason = int(pkt[1:3], 16)
+        self._register_value_cache.clear()
+        if pkt.startswith("T"):
+            for pair in pkt[3:].split(";"):
+                if ":" not in pair:
+                    continue
+                name, value = pair.split(":", 1)
+                if is_hex(name) and int(name, 16) < len(
+                    self.arch.gdb_registers
+                ):
+                    register = self.arch.gdb_registers[int(name, 16)]
+                    value = unpack_register(
+                        self.arch, register, bytes.fromhex(value)
+                    )
+                    if value is not None:
+                        self._register_value_cache[register] = value
+        self.logger.debug("Target stopped..")
+        self.status = DebugState.STOPPED
+        self._stopped.set()
+        self.events.on_stop()
+
+    async def get_pc(self):
+        """ read the PC of the device """
+        return await self._get_register(self.arch.gdb_pc)
+
+    async def set_pc(self, value):
+        """ set the PC of the device """
+        await self._set_register(self.arch.gdb_pc, value)
+
+    async def get_fp(self):
+        return 0x100
+
+    async def get_registers(self, registers):
+        """ Get register values, all registers are read at once """
+        if self.status != DebugState.STOPPED:
+            self.logger.warning("Cannot read registers while running")
+            return {}
+        if not all(
+            r in self._register_value_cache for r in self.arch.gdb_registers
+        ):
+            await self._get_general_registers()
+        values = {}
+        for register in registers:
+            if register not in self._register_value_cache:
+                value = await self._read_register(register)
+                self._register_value_cache[register] = value
+            values[register] = self._register_value_cache[register]
+        return values
+
+    async def _get_general_registers(self):
+        """ Execute the gdb `g` command """
+        data = await self._send_command("g")
+        data = binascii.a2b_hex(data.encode("ascii"))
+        offset = 0
+        for register in self.arch.gdb_registers:
+            size = register.bitsize // 8
+            value = unpack_register(
+                self.arch, register, data[offset : offset + size]
+            )
+            if value is None:
+                # Not reported, _get_register reads it with `p`
+                break
+            self._register_value_cache[register] = value
+            offset += size
+
+    async def _read_register(self, register):
+        """ Execute the gdb `p` command """
+        if register not in self.arch.gdb_registers:
+            raise RspError("Register {} is unknown to gdb".format(register))
+        idx = self.arch.gdb_registers.index(register)
+        reply = await self._send_command("p%x" % idx)
+        return decode_register(self.arch, register, reply)
+
+    async def set_registers(self, regvalues):
+        if self.status == DebugState.STOPPED:
+            data = bytearray()
+            for register in self.arch.gdb_registers:
+                data.extend(pack_register(register, regvalues[register]))
+            data = binascii.b2a_hex(data).decode("ascii")
+            res = await self._send_command("G %s" % data)
+            self._register_value_cache.clear()
+            if res != "OK":
+                self.logger.warning("Registers writing failed: %s", res)
+
+    async def _get_register(self, register):
+        if self.status != DebugState.STOPPED:
+            self.logger.warning(
+                "Cannot read register %s while not stopped", register
+            )
+            return 0
+        if register not in self._register_value_cache:
+            await self._get_general_registers()
+        if register not in self._register_value_cache:
+            value = await self._read_register(register)
+            self._register_value_cache[register] = value
+        return self._register_value_cache[register]
+
+    async def _set_register(self, register, value):
+        if self.status == DebugState.STOPPED:
+            idx = self.arch.gdb_registers.index(register)
+            value = binascii.b2a_hex(pack_register(register, value))
+            res = await self._send_command(
+                "P %x=%s" % (idx, value.decode("ascii"))
+            )
+            self._register_value_cache.pop(register, None)
+            if res != "OK":
+                self.logger.warning("Register write failed: %s", res)
+
+    async def set_breakpoint(self, address: int):
+        """ Set a breakpoint """
+        res = await self._send_command("Z0,%x,4" % address)
+        if res != "OK":
+            self.logger.warning("Breakpoint not set: %s", res)
+
+    async def clear_breakpoint(self, address: int):
+        """ Clear a breakpoint """
+        res = await self._send_command("z0,%x,4" % address)
+        if res != "OK":
+            self.logger.warning("Breakpoint not cleared: %s", res)
+
+    @property
+    def max_transfer_size(self):
+        """ Maximum number of memory bytes in a single packet """
+        # Hex encoding doubles the size, reserve room for the header.
+        return max(1, (self.packet_size - 32) // 2)
+
+    async def read_mem(self, address: int, size: int):
+        """ Read memory, pipelining a packet per `PacketSize` chunk """
+        if self.status != DebugState.STOPPED:
+            self.logger.warning("Cannot read memory, target not stopped!")
+            return bytes()
+        chunk = self.max_transfer_size
+        futures = [
+            self._rsp.command(
+                "m %x,%x" % (address + offset, min(chunk, size - offset))
+            )
+            for offset in range(0, size, chunk)
+        ]
+        await self.transport.drain()
+        replies = await asyncio.gather(*futures)
+        return b"".join(
+            decode_memory(reply, address + offset)
+            for reply, offset in zip(replies, range(0, size, chunk))
+        )
+
+    async def write_mem(self, address: int, data):
+        """ Write memory, pipelining a packet per `PacketSize` chunk """
+        if self.status != DebugState.STOPPED:
+            self.logger.warning("Cannot write memory, target not stopped!")
+            return
+        chunk = self.max_transfer_size
+        futures = []
+        for offset in range(0, len(data), chunk):
+            part = data[offset : offset + chunk]
+            futures.append(
+                self._rsp.command(
+                    "M %x,%x:%s"
+                    % (
+                        address + offset,
+                        len(part),
+                        binascii.b2a_hex(part).decode("ascii"),
+                    )
+                )
+            )
+        await self.transport.drain()
+        for res in await asyncio.gather(*futures):
+            if res != "OK":
+                self.logger.warning("Memory write failed: %s", res)
+
+    async def _send_command(self, command, timeout=3):
+        """ Send a gdb command and wait for the response """
+        future = self._rsp.command(command)
+        await self.transport.drain()
+        return await asyncio.wait_for(future, timeout)
+
+
+class BlockingDebugDriver(DebugDriver):
+    """Use an asyncio debug driver from blocking code.
+
+    This runs an event loop in a background thread and waits for the
+    coroutines of the wrapped driver. Use this to connect an
+    :class:`AsyncGdbDebugDriver` to the debugger command line interfaces.
+    """
+
+    def __init__(self, driver, timeout=5):
+        # Share events with the wrapped driver.
+        self.events = driver.events
+        self.driver = driver
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def __str__(self):
+        return str(self.driver)
+
+    def _call(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(self.timeout)
+
+    def connect(self):
+        self._call(self.driver.connect())
+
+    def disconnect(self):
+        self._call(self.driver.disconnect())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    def get_status(self):
+        return self.driver.get_status()
+
+    def run(self):
+        self._call(self.driver.run())
+
+    def restart(self):
+        self._call(self.driver.restart())
+
+    def step(self):
+        self._call(self.driver.step())
+        self._call(self.driver.wait_stopped())
+
+    def stop(self):
+        self._call(self.driver.stop())
+
+    def get_pc(self):
+        return self._call(self.driver.get_pc())
+
+    def set_pc(self, value):
+        self._call(self.driver.set_pc(value))
+
+    def get_fp(self):
+        return self._call(self.driver.get_fp())
+
+    def get_registers(self, registers):
+        return self._call(self.driver.get_registers(registers))
+
+    def set_registers(self, regvalues):
+        self._call(self.driver.set_registers(regvalues))
+
+    def set_breakpoint(self, address):
+        self._call(self.driver.set_breakpoint(address))
+
+    def clear_breakpoint(self, address):
+        self._call(self.driver.clear_breakpoint(address))
+
+    def read_mem(self, address, size):
+        return self._call(self.driver.read_mem(address, size))
+
+    def write_mem(self, address, data):
+        self._call(self.driver.write_mem(address, data))
+
+
+def unpack_register(arch, register, data):
+    """ Decode a register value, returns None if data has the wrong size """
+    from ....arch.arch_info import Endianness
+
+    if arch.info.endianness == Endianness.BIG:
+        endian_fmt = ">"
+    else:
+        endian_fmt = "<"
+
+    fmts = {
+        8: "{}Q".format(endian_fmt),
+        4: "{}I".format(endian_fmt),
+        2: "{}H".format(endian_fmt),
+        1: "{}B".format(endian_fmt),
+    }
+
+    size = register.bitsize // 8
+    if len(data) != size:
+        return None
+    if size == 3:
+        # TODO: endianess!
+        return data[0] + (data[1] << 8) + (data[2] << 16)
+    (value,) = struct.unpack(fmts[size], data)
+    return value
+
+
+def pack_register(register, value):
+    """ Encode a register value """
+    fmts = {8: "<Q", 4: "<I", 2: "<H", 1: "<B"}
+    size = register.bitsize // 8
+    return struct.pack(fmts[size], value)
+
+
+def decode_register(arch, register, reply: str) -> int:
+    """ Decode the reply to a `p` command, raise RspError on failure """
+    value = None
+    if is_hex(reply) and len(reply) % 2 == 0:
+        value = unpack_register(arch, register, bytes.fromhex(reply))
+    if value is None:
+        raise RspError(
+            "Target did not report register {}: {}".format(register, reply)
+        )
+    return value
+
+
 def is_hex(text: str) -> bool:
     """ Check if the given text is hexadecimal """
     return all(c in string.hexdigits for c in text)
+
+
+def decode_memory(reply: str, address: int) -> bytes:
+    """ Decode the reply to a memory read, error replies are 'Enn' """
+    if reply.startswith("E") and len(reply) % 2:
+        raise RspError(
+            "Reading memory at 0x{:x} failed: {}".format(address, reply)
+        )
+    try:
+        return binascii.a2b_hex(reply.encode("ascii"))
+    except binascii.Error as ex:
+        raise RspError("Bad memory reply {}: {}".format(reply, ex))
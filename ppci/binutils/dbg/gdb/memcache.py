@@ -0,0 +1,119 @@
+""" Page granular cache for target memory.
+
+Reading target memory over a serial line or TCP link is slow, mainly
+because of the round trip per packet. This cache keeps whole pages of
+target memory, and fetches adjacent missing pages with a single request.
+
+The cache is only valid while the target is halted. It must be
+invalidated as soon as the target is resumed or stepped.
+"""
+
+import logging
+
+
+class MemoryCache:
+    """Cache target memory in pages of `page_size` bytes.
+
+    The `fetch` callable is used to retrieve memory from the target. It
+    is called with an address and a size, and must return the bytes read,
+    or None when the memory could not be read.
+    """
+
+    logger = logging.getLogger("memcache")
+
+    def __init__(self, fetch, page_size=64, max_fetch_size=1024):
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError("page_size must be a power of two")
+        self.fetch = fetch
+        self.page_size = page_size
+        self.max_fetch_size = max(max_fetch_size, page_size)
+        self._pages = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._pages)
+
+    def invalidate(self):
+        """ Forget all cached memory """
+        self._pages.clear()
+
+    def read(self, address: int, size: int):
+        """ Read memory, fetching missing pages from the target.
+
+        Returns None when the pages could not be fetched, in which
+        case the caller may retry with an exact read.
+        """
+        if size <= 0:
+            return bytes()
+        pages = self._page_range(address, size)
+        if not self._load_pages(pages):
+            return None
+
+        data = bytearray()
+        for page in pages:
+            data.extend(self._pages[page])
+        offset = address - pages[0]
+        return bytes(data[offset : offset + size])
+
+    def prefetch(self, address: int, size: int):
+        """ Load the given memory range into the cache """
+        if size > 0:
+            self._load_pages(self._page_range(address, size))
+
+    def write(self, address: int, data):
+        """ Update cached pages after memory was written on the target """
+        page_size = self.page_size
+        end = address + len(data)
+        for page in self._page_range(address, len(data)):
+            if page in self._pages:
+                start = max(page, address)
+                stop = min(page + page_size, end)
+                content = bytearray(self._pages[page])
+                content[start - page : stop - page] = data[
+                    start - address : stop - address
+                ]
+                self._pages[page] = bytes(content)
+
+    def _page_range(self, address, size):
+        page_size = self.page_size
+        first = address & ~(page_size - 1)
+        last = (address + size - 1) & ~(page_size - 1)
+        return list(range(first, last + page_size, page_size))
+
+    def _load_pages(self, pages):
+        """ Make sure the given pages are cached.
+
+        Runs of adjacent missing pages are retrieved with one fetch.
+        """
+        missing = [page for page in pages if page not in self._pages]
+        self.hits += len(pages) - len(missing)
+        self.misses += len(missing)
+        for start, size in self._group_runs(missing):
+            data = self.fetch(start, size)
+            if data is None or len(data) != size:
+                self.logger.debug(
+                    "Could not fetch 0x%x bytes at 0x%x", size, start
+                )
+                return False
+            for offset in range(0, size, self.page_size):
+                self._pages[start + offset] = bytes(
+                    data[offset : offset + self.page_size]
+                )
+        return True
+
+    def _group_runs(self, pages):
+        """ Combine sorted page addresses into (address, size) runs """
+        page_size = self.page_size
+        runs = []
+        for page in pages:
+            if runs:
+                start, size = runs[-1]
+                if (
+                    start + size == page
+                    and size + page_size <= self.max_fetch_size
+                ):
+                    runs[-1] = (start, size + page_size)
+                    continue
+            runs.append((page, page_size))
+        return runs
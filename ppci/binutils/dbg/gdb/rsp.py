@@ -4,11 +4,19 @@ A packet is send, and then it is acknowledged by a '+'.
 
 """
 
+import asyncio
+import collections
 import logging
 from queue import Queue
 from threading import Lock
 
 
+class RspError(Exception):
+    """ The gdb server replied with an error """
+
+    pass
+
+
 class RspHandler:
     """ Handle packet handling with the '+' as ack and '-' as nack """
 
@@ -96,6 +104,164 @@ class RspHandler:
         return pkt
 
 
+class AsyncRspHandler:
+    """Asyncio variant of the RSP packet handler.
+
+    Commands are pipelined: several packets can be in flight, and their
+    replies are matched in order. Stop replies (S, T, W and X packets)
+    are not replies to a command but are handed to `on_stop`. Console
+    output of the target (O packets) is handed to `on_console`.
+
+    When the server agreed to no-ack mode, set `ack_mode` to False and
+    packets are no longer acknowledged.
+    """
+
+    logger = logging.getLogger("rsp-handler")
+    stop_codes = "STWX"
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.ack_mode = True
+        self.on_stop = None
+        self.on_console = None
+        self._pending = collections.deque()  # Futures waiting for reply
+        self._unacked = collections.deque()  # Packets waiting for a '+'
+        self._buffer = bytearray()
+        self._reader_task = None
+
+    def start(self):
+        """ Start processing incoming data """
+        self._reader_task = asyncio.ensure_future(self._receive_loop())
+
+    async def close(self):
+        """ Stop processing incoming data """
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        self._fail_pending(ConnectionError("Connection closed"))
+
+    def sendpkt(self, data):
+        """ Send a packet for which no reply is expected """
+        wire_data = RspHandler.rsp_pack(data).encode("ascii")
+        self.logger.debug("--> %s", wire_data)
+        if self.ack_mode:
+            self._unacked.append(wire_data)
+        self.transport.send(wire_data)
+
+    def command(self, data):
+        """Send a command, returns a future for the reply.
+
+        Awaiting the future is not required before sending the next
+        command, which allows pipelining a series of commands.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append(future)
+        self.sendpkt(data)
+        return future
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                data = await self.transport.recv()
+                if not data:
+                    break
+                self._buffer.extend(data)
+                self._process_buffer()
+        finally:
+            self._fail_pending(ConnectionError("Connection closed"))
+
+    def _fail_pending(self, exception):
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(exception)
+
+    def _process_buffer(self):
+        buf = self._buffer
+        while buf:
+            first = buf[0]
+            if first == ord("+"):
+                if self._unacked:
+                    self._unacked.popleft()
+                del buf[0]
+            elif first == ord("-"):
+                if self._unacked:
+                    self.logger.warning("Resending %s", self._unacked[0])
+                    self.transport.send(self._unacked[0])
+                del buf[0]
+            elif first == ord("$"):
+                end = buf.find(b"#")
+                if end < 0 or len(buf) < end + 3:
+                    break  # Wait for the rest of the packet
+                pkt = buf[: end + 3].decode("ascii")
+                del buf[: end + 3]
+                self._process_packet(pkt)
+            else:
+                self.logger.debug("skipping %s", bytes(buf[:1]))
+                del buf[0]
+
+    def _process_packet(self, pkt):
+        self.logger.debug("<-- %s", pkt)
+        try:
+            payload = RspHandler.rsp_unpack(pkt)
+        except ValueError as ex:
+            self.logger.warning("Bad packet %s", ex)
+            if self.ack_mode:
+                self.transport.send(b"-")
+            return
+
+        if self.ack_mode:
+            self.transport.send(b"+")
+        payload = rsp_decode(payload)
+        if payload[:1] and payload[0] in self.stop_codes:
+            if self.on_stop:
+                self.on_stop(payload)
+        elif payload.startswith("O") and payload != "OK":
+            self._process_console(payload[1:])
+        elif self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_result(payload)
+        else:
+            self.logger.warning("Unexpected packet %s", payload)
+
+    def _process_console(self, data):
+        try:
+            text = bytes.fromhex(data).decode("ascii", errors="replace")
+        except ValueError:
+            self.logger.warning("Bad console output %s", data)
+            return
+        if self.on_console:
+            self.on_console(text)
+        else:
+            self.logger.info("Target output: %s", text)
+
+
+def rsp_decode(data):
+    """ Undo escaping and run length encoding of packet data """
+    if "}" not in data and "*" not in data:
+        return data
+    res = []
+    i = 0
+    while i < len(data):
+        c = data[i]
+        if c == "}":
+            i += 1
+            res.append(chr(ord(data[i]) ^ 0x20))
+        elif c == "*" and res:
+            # Run length encoding: repeat last character
+            res.append(res[-1][-1] * (ord(data[i + 1]) - 29))
+            i += 1
+        else:
+            res.append(c)
+        i += 1
+    return "".join(res)
+
+
 def decoder():
     """Process a single byte. Keep track of the packet.
 
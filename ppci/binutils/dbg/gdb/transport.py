@@ -3,6 +3,7 @@
 """
 
 import abc
+import asyncio
 import logging
 import socket
 import select
@@ -89,3 +90,44 @@ class TCP(ThreadedTransport):
         #    self.logger.error('Receiver thread terminated: %s', ex)
         finally:
             self.logger.info("Receiver thread finished")
+
+
+class AsyncTCP:
+    """ Asyncio based tcp connection to a gdb server """
+
+    logger = logging.getLogger("transport")
+
+    def __init__(self, port, host="localhost"):
+        self._host = host
+        self._port = port
+        self._reader = None
+        self._writer = None
+
+    def __str__(self):
+        return "Async tcp {}:{}".format(self._host, self._port)
+
+    async def connect(self):
+        """ Open the connection """
+        self.logger.info("Connecting to %s:%s", self._host, self._port)
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host, self._port
+        )
+
+    async def disconnect(self):
+        """ Close the connection """
+        self.logger.info("Disconnecting")
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._reader = self._writer = None
+
+    async def recv(self):
+        """ Receive available data, returns empty bytes when closed """
+        return await self._reader.read(4096)
+
+    def send(self, data):
+        """ Queue data for sending """
+        self._writer.write(data)
+
+    async def drain(self):
+        """ Wait until the send buffer is flushed """
+        await self._writer.drain()
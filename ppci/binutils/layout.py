@@ -1,4 +1,4 @@
-from ..lang.tools.baselex import BaseLexer, EOF, EPS
+from ..lang.tools.baselex import BaseLexer, EOF, EPS, GLYPH, KEYWORD
 from ..lang.tools.grammar import Grammar
 from ..lang.tools.lr import LrParserBuilder
 from ..common import make_num, get_file
@@ -126,21 +126,16 @@ class LayoutLexer(BaseLexer):
         tok_spec = [
             ("HEXNUMBER", r"0x[\da-fA-F]+", self.handle_number),
             ("NUMBER", r"\d+", self.handle_number),
-            ("ID", r"[_A-Za-z][_A-Za-z\d_]*", self.handle_id),
+            ("ID", r"[_A-Za-z][_A-Za-z\d_]*", KEYWORD),
             ("SKIP", r"[ \t\r\n]", None),
             (
                 "LEESTEKEN",
                 r":=|[\.,=:\-+*\[\]/\(\)]|>=|<=|<>|>|<|}|{",
-                lambda typ, val: (val, val),
+                GLYPH,
             ),
-            ("STRING", r"'.*?'", lambda typ, val: (typ, val[1:-1])),
+            ("STRING", r"'[^'\n]*'", lambda typ, val: (typ, val[1:-1])),
         ]
-        super().__init__(tok_spec)
-
-    def handle_id(self, typ, val):
-        if val in self.kws:
-            typ = val
-        return typ, val
+        super().__init__(tok_spec, keywords=self.kws)
 
     def handle_number(self, typ, val):
         val = make_num(val)
@@ -8,6 +8,7 @@ from .layout import Layout, Section, SectionData, SymbolDefinition, Align
 from .layout import get_layout
 from .debuginfo import SymbolIdAdjustingReplicator, DebugInfo
 from .archive import get_archive
+from .lto import link_time_optimize
 
 
 def link(
@@ -20,6 +21,7 @@ def link(
     extra_symbols=None,
     libraries=None,
     entry=None,
+    lto=False,
 ):
     """Links the iterable of objects into one using the given layout.
 
@@ -35,6 +37,8 @@ def link(
             linking.
         libraries: a list of libraries to use when searching for symbols.
         entry: the entry symbol where execution should begin.
+        lto (bool): perform link time optimization. Objects which carry
+            IR-code are merged and compiled again as a whole.
 
     Returns:
         The linked object file
@@ -66,6 +70,20 @@ def link(
 
     libraries = list(map(get_archive, libraries)) if libraries else []
 
+    if lto:
+        if not entry and layout and layout.entry:
+            lto_entry = layout.entry.symbol_name
+        else:
+            lto_entry = entry
+        objects = link_time_optimize(
+            objects,
+            entry=lto_entry,
+            libraries=libraries,
+            partial_link=partial_link,
+            reporter=reporter,
+            debug=debug,
+        )
+
     linker = Linker(march, reporter)
     output_obj = linker.link(
         objects,
@@ -76,6 +94,10 @@ def link(
         libraries=libraries,
         entry_symbol_name=entry,
     )
+
+    if lto and partial_link and len(objects) == 1:
+        # All code came from IR-code, keep it for the final link:
+        output_obj.ir = objects[0].ir
     return output_obj
 
 
@@ -0,0 +1,108 @@
+""" Link time optimization.
+
+Objects can carry the IR-code they were compiled from, next to their
+machine code. During a link with link time optimization, the IR-code of
+all these objects is merged into a single module. Functions and
+variables which are not referred to from outside this module are made
+local, functions are inlined across the boundaries of the original
+modules where this does not grow the code, and unused functions and
+variables are removed.
+Finally, code is generated for the whole module at once, and this code
+replaces the objects carrying IR-code.
+
+Objects without IR-code, such as assembled objects and libraries, are
+linked as usual.
+"""
+
+import logging
+from itertools import chain
+from ..irutils import ir_link, internalize, to_binary, from_binary
+from ..opt import DeleteUnusedGlobalsPass
+
+
+logger = logging.getLogger("lto")
+
+
+def serialize_ir(ir_modules):
+    """Get the IR-code of the given modules to attach to an object.
+
+    Call this before code generation, since the modules are serialized
+    as they are. Several modules are linked into one module.
+    """
+    if len(ir_modules) == 1:
+        ir_module = ir_modules[0]
+    else:
+        copies = [from_binary(to_binary(m)) for m in ir_modules]
+        ir_module = ir_link(copies, name=ir_modules[0].name)
+    return to_binary(ir_module)
+
+
+def link_time_optimize(
+    objects,
+    entry=None,
+    libraries=(),
+    partial_link=False,
+    reporter=None,
+    debug=False,
+):
+    """Generate code for all objects which carry IR-code at once.
+
+    Args:
+        objects: the objects to link.
+        entry: the name of the entry symbol, if any.
+        libraries: the libraries which will be searched for symbols.
+        partial_link: when true, all global symbols are kept, and the
+            resulting object carries the merged IR-code again.
+        reporter: reporter to write the compilation report to.
+        debug: when true, generate debug information. Note that IR-code
+            contains no debug information of the original source.
+
+    Returns:
+        The objects to link, where the objects carrying IR-code are
+        replaced by a single object.
+    """
+    from ..api import optimize, ir_to_object
+
+    ir_objects = [obj for obj in objects if obj.ir is not None]
+    if not ir_objects:
+        return objects
+
+    logger.info("Link time optimizing %s objects", len(ir_objects))
+    ir_modules = [from_binary(obj.ir) for obj in ir_objects]
+    ir_module = ir_link(ir_modules, name="lto")
+
+    if not partial_link:
+        # Only symbols referred to by other objects, or by externals which
+        # could not be resolved in the IR-code, stay global:
+        exported = set(e.name for e in ir_module.externals)
+        if entry:
+            exported.add(entry)
+        other_objects = [obj for obj in objects if obj.ir is None]
+        for obj in chain(other_objects, *libraries):
+            exported.update(s.name for s in obj.symbols if s.undefined)
+        count = internalize(ir_module, exported)
+        logger.debug("Internalized %s definitions", count)
+
+    # The modules were already optimized, with inlining at their own
+    # optimization level. Across the modules, only inline where the code
+    # does not grow, such as functions called only once:
+    optimize(ir_module, level="s", reporter=reporter)
+    DeleteUnusedGlobalsPass().run(ir_module)
+    logger.debug("Merged module %s", ir_module.stats())
+
+    if partial_link:
+        ir_data = to_binary(ir_module)
+    obj = ir_to_object(
+        [ir_module], ir_objects[0].arch, reporter=reporter, debug=debug
+    )
+    if partial_link:
+        obj.ir = ir_data
+
+    # Put the new object at the place of the first object with IR-code:
+    result = []
+    for input_object in objects:
+        if input_object.ir is None:
+            result.append(input_object)
+        elif input_object is ir_objects[0]:
+            result.append(obj)
+    return result
@@ -25,6 +25,10 @@ from . import debuginfo
 def get_object(obj):
     """ Try hard to load an object """
     if not isinstance(obj, ObjectFile):
+        from ..format.elf.reader import is_elf_file, read_elf_object
+
+        if is_elf_file(obj):
+            return read_elf_object(obj)
         f = get_file(obj)
         obj = ObjectFile.load(f)
         f.close()
@@ -146,9 +150,6 @@ class Section:
             and (self.alignment == other.alignment)
         )
 
-    def __hash__(self):
-        return id(self)
-
 
 class Image:
     """Memory image.
@@ -176,9 +177,6 @@ class Image:
             self.name, self.size, self.address
         )
 
-    def __hash__(self):
-        return id(self)
-
     @property
     def data(self):
         """ Get the data of this memory """
@@ -236,6 +234,7 @@ class ObjectFile:
         self.debug_info = None
         self.arch = arch
         self.entry_symbol_id = None  # object file entry point
+        self.ir = None  # Optional binary IR-code for link time optimization
 
     def __repr__(self):
         return "CodeObject of {} bytes".format(self.byte_size)
@@ -418,6 +417,9 @@ def serialize(x):
 
         if x.entry_symbol_id is not None:
             res["entry_symbol_id"] = x.entry_symbol_id
+
+        if x.ir is not None:
+            res["ir"] = bin2asc(x.ir)
     elif isinstance(x, Image):
         res["name"] = x.name
         res["address"] = hex(x.address)
@@ -504,4 +506,7 @@ def deserialize(data):
 
     if "debug" in data:
         obj.debug_info = debuginfo.deserialize(data["debug"])
+
+    if "ir" in data:
+        obj.ir = asc2bin(data["ir"])
     return obj
@@ -7,6 +7,7 @@ module
 """
 
 from .tasks import Task, TaskError, register_task
+from .cache import CompileCache
 from ..utils.reporting import HtmlReportGenerator, DummyReportGenerator
 from .. import api
 from ..lang.tools.common import ParserException
@@ -55,6 +56,11 @@ class OutputtingTask(Task):
         with open(output_filename, 'wt', encoding='utf8') as output_file:
             obj.save(output_file)
 
+    def get_cache(self):
+        """ Get the object cache given by the 'cache' argument, if any """
+        if 'cache' in self.arguments:
+            return CompileCache(self.relpath(self.arguments['cache']))
+
 
 @register_task
 class AssembleTask(OutputtingTask):
@@ -103,11 +109,13 @@ class C3CompileTask(OutputtingTask):
 
         debug = bool(self.get_argument('debug', default=False))
         opt = int(self.get_argument('optimize', default='0'))
+        lto = bool(self.get_argument('lto', default=False))
 
         with reporter:
             obj = api.c3c(
                 sources, includes, arch, opt_level=opt,
-                reporter=reporter, debug=debug)
+                reporter=reporter, debug=debug, cache=self.get_cache(),
+                lto=lto)
 
         self.store_object(obj)
 
@@ -133,20 +141,24 @@ class CCompileTask(OutputtingTask):
 
         debug = bool(self.get_argument('debug', default=False))
         opt = int(self.get_argument('optimize', default='0'))
+        lto = bool(self.get_argument('lto', default=False))
 
         coptions = api.COptions()
         coptions.add_include_paths(includes)
 
+        cache = self.get_cache()
         with reporter:
             objs = []
             for source in sources:
                 with open(source, 'r') as f:
                     obj = api.cc(
                         f, arch, coptions=coptions, opt_level=opt,
-                        reporter=reporter, debug=debug)
+                        reporter=reporter, debug=debug, cache=cache,
+                        lto=lto)
                 objs.append(obj)
             obj = api.link(
-                objs, partial_link=True, reporter=reporter, debug=debug)
+                objs, partial_link=True, reporter=reporter, debug=debug,
+                lto=lto)
 
         self.store_object(obj)
 
@@ -170,7 +182,9 @@ class PascalCompileTask(OutputtingTask):
         opt = int(self.get_argument('optimize', default='0'))
 
         with reporter:
-            obj = api.pascal(sources, arch, opt_level=opt, reporter=reporter)
+            obj = api.pascal(
+                sources, arch, opt_level=opt, reporter=reporter,
+                cache=self.get_cache())
             obj = api.link(
                 (obj,), partial_link=True, reporter=reporter, debug=debug)
 
@@ -212,11 +226,12 @@ class LinkTask(OutputtingTask):
         objects = self.open_file_set(self.get_argument('objects'))
         debug = bool(self.get_argument('debug', default=False))
         partial = bool(self.get_argument('partial', default=False))
+        lto = bool(self.get_argument('lto', default=False))
 
         try:
             obj = api.link(
                 objects, layout=layout, use_runtime=True,
-                partial_link=partial, debug=debug)
+                partial_link=partial, debug=debug, lto=lto)
         except CompilerError as err:
             raise TaskError(err.msg)
 
@@ -0,0 +1,558 @@
+""" Persistent compile cache.
+
+Compiling an unchanged source file always yields the same object file.
+This cache stores object files on disk, keyed by a hash over the
+(preprocessed) source text, the target architecture, the compiler options
+and the ppci version, much like ccache does.
+
+The cache directory contains one file per object. The modification
+time of a file is its last use, and when the total size exceeds the
+configured maximum, the least recently used objects are evicted. Usage
+statistics are kept in a separate file. Several processes can share a
+cache directory, and problems with the cache, such as a full disk or a
+read-only directory, are logged and otherwise ignored.
+
+The compiler runtime of each machine is cached in the same way, in a
+cache directory shared by all runs (see :func:`get_cached_runtime`).
+The interfaces of included c3 packages are kept next to it
+(see :mod:`ppci.lang.c3.interface`).
+
+.. doctest::
+
+    >>> import io, tempfile
+    >>> from ppci.api import c3c
+    >>> from ppci.build.cache import CompileCache
+    >>> cache = CompileCache(tempfile.mkdtemp())
+    >>> source = "module main; var int a;"
+    >>> obj = c3c([io.StringIO(source)], [], 'arm', cache=cache)
+    >>> obj = c3c([io.StringIO(source)], [], 'arm', cache=cache)
+    >>> cache.hits, cache.misses
+    (1, 1)
+
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import zlib
+from .. import __version__
+from ..binutils.objectfile import ObjectFile
+from ..common import get_file
+
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+class CompileCache:
+    """ A size bounded, least recently used object file cache on disk. """
+
+    logger = logging.getLogger("cache")
+    stats_name = "stats.json"
+    lock_name = "lock"
+    suffix = ".obj.z"
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        self._pending_stats = self._initial_stats()
+        self._last_touch = 0
+
+    def __repr__(self):
+        return "Compile cache at {}".format(self.directory)
+
+    @staticmethod
+    def make_key(*parts):
+        """ Create a cache key from the given string or bytes parts """
+        hasher = hashlib.sha256()
+        for part in ("ppci", __version__) + parts:
+            if isinstance(part, str):
+                part = part.encode("utf8")
+            # Prefix with length, so that parts cannot blend together:
+            hasher.update(str(len(part)).encode("ascii") + b":")
+            hasher.update(part)
+        return hasher.hexdigest()
+
+    @property
+    def hits(self):
+        return self._get_stats()["hits"]
+
+    @property
+    def misses(self):
+        return self._get_stats()["misses"]
+
+    @property
+    def bytes_saved(self):
+        """ Total size of the objects which were served from cache """
+        return self._get_stats()["bytes_saved"]
+
+    @property
+    def size(self):
+        """ Total size of the cached objects on disk """
+        return sum(size for _, size, _ in self._scan())
+
+    def __len__(self):
+        return len(self._scan())
+
+    def __contains__(self, key):
+        return os.path.exists(self._object_path(key))
+
+    def get(self, key):
+        """ Retrieve an object file, returns None on a cache miss """
+        return self._lookup(key, lambda t: ObjectFile.load(io.StringIO(t)))
+
+    def get_text(self, key):
+        """ Retrieve a text, returns None on a cache miss """
+        return self._lookup(key, lambda text: text)
+
+    def _lookup(self, key, load):
+        value = None
+        filename = self._object_path(key)
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+        except OSError:
+            pass  # Not in the cache
+        else:
+            try:
+                text = zlib.decompress(data).decode("utf8")
+                value = load(text)
+            except (ValueError, zlib.error) as ex:
+                self.logger.warning("Dropping broken cache entry: %s", ex)
+                self._remove(filename)
+
+        if value is None:
+            self._pending_stats["misses"] += 1
+        else:
+            self._pending_stats["hits"] += 1
+            self._pending_stats["bytes_saved"] += len(text)
+            self._touch(filename)
+        self._save_stats()
+        return value
+
+    def put(self, key, obj):
+        """ Store an object file in the cache """
+        output = io.StringIO()
+        obj.save(output)
+        self.put_text(key, output.getvalue())
+
+    def put_text(self, key, text):
+        """ Store a text in the cache """
+        data = zlib.compress(text.encode("utf8"))
+        filename = self._object_path(key)
+        try:
+            self._write_file(filename, data)
+        except OSError as ex:
+            self.logger.warning("Could not store cache entry: %s", ex)
+            return
+        self._touch(filename)
+        self._evict()
+
+    def get_or_compile(self, key, compile_function):
+        """ Get object from cache, or compile it and store it """
+        obj = self.get(key)
+        if obj is None:
+            obj = compile_function()
+            self.put(key, obj)
+        return obj
+
+    def clear(self):
+        """ Remove all objects and reset statistics """
+        for filename, _, _ in self._scan():
+            self._remove(filename)
+        self._pending_stats = self._initial_stats()
+        self._remove(os.path.join(self.directory, self.stats_name))
+
+    def statistics(self):
+        """ Get a dictionary with cache statistics """
+        stats = self._get_stats()
+        entries = self._scan()
+        stats["entries"] = len(entries)
+        stats["size"] = sum(size for _, size, _ in entries)
+        stats["max_size"] = self.max_size
+        return stats
+
+    def report(self):
+        """ Create a human readable text with the cache statistics """
+        lines = ["{}:".format(self)]
+        for name, value in sorted(self.statistics().items()):
+            lines.append("  {:12} {}".format(name, value))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _initial_stats():
+        return {"hits": 0, "misses": 0, "bytes_saved": 0}
+
+    def _object_path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _scan(self):
+        """ Get the filename, size and last use of all cached objects """
+        entries = []
+        try:
+            subdirectories = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in subdirectories:
+            subdirectory = os.path.join(self.directory, name)
+            if not os.path.isdir(subdirectory):
+                continue
+            try:
+                filenames = os.listdir(subdirectory)
+            except OSError:
+                continue
+            for filename in filenames:
+                if not filename.endswith(self.suffix):
+                    continue
+                filename = os.path.join(subdirectory, filename)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue  # Removed by another process
+                entries.append((filename, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _touch(self, filename):
+        """ Mark an object as used, by setting its modification time """
+        # Make sure that the order of uses is kept, also when the clock
+        # has a coarse resolution:
+        now = max(time.time(), self._last_touch + 0.001)
+        self._last_touch = now
+        try:
+            os.utime(filename, (now, now))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """ Drop least recently used objects until we fit """
+        entries = self._scan()
+        size = sum(size for _, size, _ in entries)
+        if size <= self.max_size:
+            return
+        with self._lock() as locked:
+            if not locked:
+                return  # Another process is cleaning up
+            for filename, entry_size, _ in sorted(
+                entries, key=lambda e: e[2]
+            ):
+                if size <= self.max_size:
+                    break
+                self.logger.debug("Evicting %s", filename)
+                self._remove(filename)
+                size -= entry_size
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def _load_stats(self):
+        stats = self._initial_stats()
+        filename = os.path.join(self.directory, self.stats_name)
+        try:
+            with open(filename, "r") as f:
+                saved = json.load(f)
+            for name in stats:
+                stats[name] += int(saved.get(name, 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass  # No or broken statistics
+        return stats
+
+    def _get_stats(self):
+        stats = self._load_stats()
+        for name, value in self._pending_stats.items():
+            stats[name] += value
+        return stats
+
+    def _save_stats(self):
+        """Add the statistics of this process to the statistics on disk.
+
+        This is best effort, when the statistics cannot be written now,
+        they are kept and written next time.
+        """
+        with self._lock() as locked:
+            if not locked:
+                return
+            stats = self._get_stats()
+            data = json.dumps(stats, sort_keys=True).encode("utf8")
+            try:
+                self._write_file(
+                    os.path.join(self.directory, self.stats_name), data
+                )
+            except OSError as ex:
+                self.logger.debug("Could not save cache statistics: %s", ex)
+            else:
+                self._pending_stats = self._initial_stats()
+
+    @contextlib.contextmanager
+    def _lock(self, timeout=2.0, stale=30.0):
+        """Lock the cache directory against other processes.
+
+        Yields whether the lock was taken. A lock older than `stale`
+        seconds is left behind by a crashed process, and is broken.
+        """
+        filename = os.path.join(self.directory, self.lock_name)
+        deadline = time.time() + timeout
+        while True:
+            try:
+                fd = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(filename) > stale:
+                        self._remove(filename)
+                        continue
+                except OSError:
+                    continue  # Released meanwhile
+                if time.time() > deadline:
+                    yield False
+                    return
+                time.sleep(0.01)
+            except OSError:
+                yield False  # Cannot write into the cache
+                return
+            else:
+                break
+
+        os.close(fd)
+        try:
+            yield True
+        finally:
+            self._remove(filename)
+
+    @staticmethod
+    def _write_file(filename, data):
+        """ Write a file atomically, so readers never see partial data """
+        directory = os.path.dirname(filename)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_filename, filename)
+        except OSError:
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+            raise
+
+
+def get_compile_cache(cache):
+    """ Turn the given argument into a cache, or None """
+    if cache is None or isinstance(cache, CompileCache):
+        return cache
+    return CompileCache(cache)
+
+
+def snapshot_sources(sources):
+    """Read the given sources into memory.
+
+    Returns the text of each source and fresh file like objects
+    which can be handed to the compiler.
+    """
+    texts, files = [], []
+    for source in sources:
+        if isinstance(source, str):
+            filename = source
+            with open(source, "r") as f:
+                text = f.read()
+        else:
+            source = get_file(source)
+            filename = getattr(source, "name", None)
+            text = source.read()
+        copy = io.StringIO(text)
+        if filename is not None:
+            copy.name = filename
+        texts.append((filename or "", text))
+        files.append(copy)
+    return texts, files
+
+
+def options_key(march, opt_level, debug, *extra):
+    """ Create the part of the key which depends on compiler options """
+    from ..arch import get_arch
+
+    march = get_arch(march)
+    return (march.make_id_str(), str(opt_level), str(bool(debug))) + tuple(
+        str(e) for e in extra
+    )
+
+
+def lto_key(lto):
+    """ Objects with IR-code for link time optimization differ """
+    return ("lto",) if lto else ()
+
+
+def c_cache_key(source, march, coptions, opt_level, debug, lto=False):
+    """Determine the cache key for a C source file.
+
+    Returns the key and a file like object to compile the source from.
+    """
+    from ..lang.c import preprocess
+
+    _, (copy,) = snapshot_sources([source])
+    filename = getattr(copy, "name", None)
+    preprocess_input = io.StringIO(copy.getvalue())
+    if filename is not None:
+        preprocess_input.name = filename
+    output = io.StringIO()
+    preprocess(preprocess_input, output, coptions)
+    settings = json.dumps(coptions.settings, sort_keys=True)
+    key = CompileCache.make_key(
+        "c",
+        output.getvalue(),
+        settings,
+        *options_key(march, opt_level, debug, *lto_key(lto)),
+    )
+    return key, copy
+
+
+def sources_cache_key(
+    language, source_sets, march, opt_level, debug, lto=False
+):
+    """Determine the cache key for one or more sets of sources.
+
+    Returns the key and for each set the file like objects to compile the
+    sources from.
+    """
+    parts = [language]
+    file_sets = []
+    for sources in source_sets:
+        texts, files = snapshot_sources(sources)
+        parts.append(str(len(texts)))
+        for filename, text in texts:
+            parts.extend([filename, text])
+        file_sets.append(files)
+    key = CompileCache.make_key(
+        *parts, *options_key(march, opt_level, debug, *lto_key(lto))
+    )
+    return key, file_sets
+
+
+def default_cache_directory():
+    """Get the directory for caches which are shared between runs.
+
+    This is ``$PPCI_CACHE_DIR`` when set, or else ``ppci`` in the user
+    cache directory. An empty ``$PPCI_CACHE_DIR`` disables the cache
+    and None is returned.
+    """
+    if "PPCI_CACHE_DIR" in os.environ:
+        return os.environ["PPCI_CACHE_DIR"] or None
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "ppci")
+
+
+def get_runtime_cache(directory=None):
+    """Get the cache for compiler runtime objects, or None when disabled.
+
+    The runtime objects are placed in the ``runtime`` subdirectory of the
+    given directory, which defaults to :func:`default_cache_directory`.
+    """
+    return get_shared_cache("runtime", directory)
+
+
+def get_interface_cache(directory=None):
+    """Get the cache for c3 module interfaces, or None when disabled.
+
+    The interfaces are placed in the ``c3`` subdirectory of the given
+    directory, which defaults to :func:`default_cache_directory`.
+    """
+    return get_shared_cache("c3", directory)
+
+
+def get_shared_cache(name, directory=None):
+    """ Get the cache in the given subdirectory, or None when disabled """
+    if directory is None:
+        directory = default_cache_directory()
+        if directory is None:
+            return None
+    try:
+        return CompileCache(os.path.join(directory, name))
+    except OSError as ex:
+        CompileCache.logger.warning("Cache %s unavailable: %s", name, ex)
+        return None
+
+
+_package_digest = None
+
+
+def package_digest():
+    """Get a digest over all files of the ppci package.
+
+    Any change to the compiler can change the generated code, so caches
+    which outlive a single run key on this digest. It is determined once
+    per process.
+    """
+    global _package_digest
+    if _package_digest is None:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        hasher = hashlib.sha256()
+        for directory, subdirectories, filenames in os.walk(root):
+            subdirectories[:] = sorted(
+                name for name in subdirectories if name != "__pycache__"
+            )
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                with open(path, "rb") as f:
+                    data = f.read()
+                name = os.path.relpath(path, root)
+                hasher.update("{}:{}:".format(name, len(data)).encode("utf8"))
+                hasher.update(data)
+        _package_digest = hasher.hexdigest()
+    return _package_digest
+
+
+def runtime_cache_key(march):
+    """Determine the cache key of the compiler runtime of a machine.
+
+    Next to the machine id, the key includes a digest of the ppci package
+    (see :func:`package_digest`), so that changes to the compiler result
+    in a new object. Raises an OSError when the package files cannot
+    be read.
+    """
+    return CompileCache.make_key(
+        "runtime", march.make_id_str(), package_digest()
+    )
+
+
+def get_cached_runtime(march, cache=None):
+    """Get the compiler runtime object of the given machine.
+
+    The object is loaded from the runtime cache, or created with
+    the ``get_runtime`` method of the machine and then stored.
+    """
+    if cache is None:
+        cache = get_runtime_cache()
+        if cache is None:
+            return march.get_runtime()
+
+    try:
+        key = runtime_cache_key(march)
+    except OSError as ex:
+        cache.logger.warning("Runtime cache key unavailable: %s", ex)
+        return march.get_runtime()
+
+    try:
+        obj = cache.get(key)
+    except OSError as ex:
+        cache.logger.warning("Runtime cache not readable: %s", ex)
+        obj = None
+
+    if obj is None:
+        obj = march.get_runtime()
+        try:
+            cache.put(key, obj)
+        except OSError as ex:
+            cache.logger.warning("Could not store runtime: %s", ex)
+    else:
+        # The object was loaded for an equal, but other, machine instance:
+        obj.arch = march
+    return obj
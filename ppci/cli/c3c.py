@@ -9,8 +9,10 @@ result in any code.
 import argparse
 from .base import base_parser, march_parser
 from .compile_base import compile_parser, do_compile
+from .compile_base import use_object_cache, load_cached_object
 from .base import LogSetup, get_arch_from_args
 from .. import api
+from ..build.cache import sources_cache_key
 
 
 parser = argparse.ArgumentParser(
@@ -35,12 +37,26 @@ def c3c(args=None):
     with LogSetup(args) as log_setup:
         # Compile sources:
         march = get_arch_from_args(args)
+        sources, includes = args.sources, args.include
+        cache_key = None
+        if use_object_cache(args):
+            cache_key, (sources, includes) = sources_cache_key(
+                "c3", [sources, includes], march, args.O, args.g, args.lto
+            )
+            if load_cached_object(cache_key, args):
+                return
 
         ir_module = api.c3_to_ir(
-            args.sources, args.include, march, reporter=log_setup.reporter
+            sources, includes, march, reporter=log_setup.reporter
         )
 
-        do_compile([ir_module], march, log_setup.reporter, log_setup.args)
+        do_compile(
+            [ir_module],
+            march,
+            log_setup.reporter,
+            log_setup.args,
+            cache_key=cache_key,
+        )
 
 
 if __name__ == "__main__":
@@ -8,10 +8,12 @@ computer architectures.
 import argparse
 from .base import base_parser, march_parser
 from .compile_base import compile_parser, do_compile
+from .compile_base import use_object_cache, load_cached_object
 from .base import LogSetup, get_arch_from_args
 from .. import api
 from ..lang.c import create_ast, CAstPrinter
 from ..lang.c.options import COptions, coptions_parser
+from ..build.cache import CompileCache, c_cache_key
 
 
 parser = argparse.ArgumentParser(
@@ -74,16 +76,36 @@ def cc(args=None):
                     )
                     printer.print(ast)
         else:
+            sources = args.sources
+            cache_key = None
+            if use_object_cache(args):
+                keys, sources = [], []
+                for src in args.sources:
+                    key, src = c_cache_key(
+                        src, march, coptions, args.O, args.g, args.lto
+                    )
+                    keys.append(key)
+                    sources.append(src)
+                cache_key = CompileCache.make_key(*keys)
+                if load_cached_object(cache_key, args):
+                    return
+
             ir_modules = []
-            
-            for src in args.sources:
+            for src in sources:
                 # Compile and optimize in any case:
                 ir_module = api.c_to_ir(
                     src, march, coptions=coptions, reporter=log_setup.reporter
                 )
                 ir_modules.append(ir_module)
 
-            do_compile(ir_modules, march, log_setup.reporter, log_setup.args)
+            do_compile(
+                ir_modules,
+                march,
+                log_setup.reporter,
+                log_setup.args,
+                cache_key=cache_key,
+            )
+
 
 if __name__ == "__main__":
     cc()
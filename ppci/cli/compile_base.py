@@ -9,6 +9,8 @@ from ..binutils.outstream import TextOutputStream
 from .base import out_parser
 from ..wasm import ir_to_wasm
 from ..irutils.instrument import add_tracer
+from ..binutils.lto import serialize_ir
+from ..build.cache import CompileCache
 
 
 compile_parser = argparse.ArgumentParser(add_help=False, parents=[out_parser])
@@ -27,6 +29,12 @@ compile_parser.add_argument(
     action="store_true",
     default=False,
 )
+compile_parser.add_argument(
+    "--ir-binary",
+    help="Output ppci ir-code in binary format, do not generate code",
+    action="store_true",
+    default=False,
+)
 compile_parser.add_argument(
     "--wasm",
     help="Output WASM (WebAssembly)",
@@ -45,9 +53,40 @@ compile_parser.add_argument(
     action="store_true",
     default=False,
 )
+compile_parser.add_argument(
+    "--lto",
+    help="Embed IR-code in the object for link time optimization",
+    action="store_true",
+    default=False,
+)
+compile_parser.add_argument(
+    "--cache",
+    help="Cache object files in the given directory",
+    metavar="dir",
+)
+
+
+def use_object_cache(args):
+    """ Check if the object cache applies to the requested output """
+    return bool(args.cache) and not (
+        args.ir or args.ir_binary or args.S or args.wasm or args.pycode
+        or args.instrument_functions
+    )
 
 
-def do_compile(ir_modules, march, reporter, args):
+def load_cached_object(cache_key, args):
+    """ Write the output object from the cache, returns True on a hit """
+    cache = CompileCache(args.cache)
+    obj = cache.get(cache_key)
+    if obj is None:
+        return False
+    with open(args.output, "w") as output:
+        obj.save(output)
+    logging.getLogger("cache").info(cache.report())
+    return True
+
+
+def do_compile(ir_modules, march, reporter, args, cache_key=None):
     """ Handle the proper output action """
 
     # Optimize:
@@ -66,6 +105,13 @@ def do_compile(ir_modules, march, reporter, args):
         with open(args.output, "w") as output:
             for ir_module in ir_modules:
                 irutils.Writer(file=output).write(ir_module)
+    elif args.ir_binary:  # Stop after ir code generation
+        if len(ir_modules) == 1:
+            ir_module = ir_modules[0]
+        else:
+            ir_module = irutils.ir_link(ir_modules, name=ir_modules[0].name)
+        with open(args.output, "wb") as output:
+            irutils.write_binary(ir_module, output)
     elif args.S:  # Output assembly code
         with open(args.output, "w") as output:
             stream = TextOutputStream(printer=march.asm_printer, f=output)
@@ -81,11 +127,18 @@ def do_compile(ir_modules, march, reporter, args):
         with open(args.output, "w") as output:
             api.ir_to_python(ir_modules, output, reporter=reporter)
     else:  # Full object output
+        ir_data = serialize_ir(ir_modules) if args.lto else None
         obj = api.ir_to_object(
             ir_modules, march, reporter=reporter, debug=args.g
         )
+        obj.ir = ir_data
         with open(args.output, "w") as output:
             obj.save(output)
 
+        if cache_key is not None:
+            cache = CompileCache(args.cache)
+            cache.put(cache_key, obj)
+            logging.getLogger("cache").info(cache.report())
+
         # TODO: link objects together?
         logging.warning("TODO: Linking with stdlibs")
@@ -6,6 +6,9 @@ import importlib
 from .base import base_parser, march_parser, get_arch_from_args, LogSetup
 from ..binutils.dbg import Debugger
 from ..binutils.dbg.cli import DebugCli
+from ..binutils.dbg.gdb.client import GdbDebugDriver, AsyncGdbDebugDriver
+from ..binutils.dbg.gdb.client import BlockingDebugDriver
+from ..binutils.dbg.gdb.transport import TCP, AsyncTCP
 
 
 parser = argparse.ArgumentParser(
@@ -16,6 +19,17 @@ parser.add_argument(
     help="debug driver to use. Specify in the format: module:class",
     default="ppci.binutils.dbg:DummyDebugDriver",
 )
+parser.add_argument(
+    "--gdb-port",
+    help="connect to a gdb server on localhost at this port",
+    type=int,
+)
+parser.add_argument(
+    "--gdb-async",
+    help="use the asyncio gdb client which pipelines packets",
+    action="store_true",
+    default=False,
+)
 
 
 def dbg(args=None):
@@ -23,13 +37,26 @@ def dbg(args=None):
     args = parser.parse_args(args)
     with LogSetup(args):
         march = get_arch_from_args(args)
-        driver_module_name, driver_class_name = args.driver.split(":")
-        driver_module = importlib.import_module(driver_module_name)
-        driver_class = getattr(driver_module, driver_class_name)
-        driver = driver_class()
+        if args.gdb_port:
+            if args.gdb_async:
+                driver = BlockingDebugDriver(
+                    AsyncGdbDebugDriver(march, AsyncTCP(args.gdb_port))
+                )
+            else:
+                driver = GdbDebugDriver(march, TCP(args.gdb_port))
+            driver.connect()
+        else:
+            driver_module_name, driver_class_name = args.driver.split(":")
+            driver_module = importlib.import_module(driver_module_name)
+            driver_class = getattr(driver_module, driver_class_name)
+            driver = driver_class()
         debugger = Debugger(march, driver)
         cli = DebugCli(debugger)
-        cli.cmdloop()
+        try:
+            cli.cmdloop()
+        finally:
+            if args.gdb_port:
+                driver.disconnect()
 
 
 if __name__ == "__main__":
@@ -16,7 +16,7 @@ parser = argparse.ArgumentParser(
     parents=[base_parser, out_parser],
 )
 parser.add_argument(
-    "obj", type=argparse.FileType("r"), nargs="+", help="the object to link"
+    "obj", nargs="+", help="the object to link, a ppci or ELF object file"
 )
 parser.add_argument(
     "--library",
@@ -50,6 +50,12 @@ parser.add_argument(
     help="Use entry as the starting symbol of execution of the program.",
     default=None,
 )
+parser.add_argument(
+    "--lto",
+    help="Perform link time optimization on objects carrying IR-code",
+    action="store_true",
+    default=False,
+)
 
 
 def link(args=None):
@@ -64,6 +70,7 @@ def link(args=None):
             partial_link=relocatable,
             entry=args.entry,
             libraries=args.library,
+            lto=args.lto,
         )
         if relocatable:
             with open(args.output, "w") as output:
@@ -1,17 +1,27 @@
-""" LLVM static compiler. """
+""" LLVM static compiler.
+
+The source is llvm assembly, or binary ppci ir-code as written by the
+``--ir-binary`` option of the compilers.
+"""
 
 
 import argparse
+import io
 from .base import base_parser, march_parser, LogSetup
 from .base import get_arch_from_args
 from .compile_base import compile_parser, do_compile
-from .. import api
+from .. import api, irutils
+from ..irutils.binary import is_binary
 
 
 parser = argparse.ArgumentParser(
-    description=__doc__, parents=[base_parser, march_parser, compile_parser]
+    description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    parents=[base_parser, march_parser, compile_parser],
+)
+parser.add_argument(
+    "source", help="source file", type=argparse.FileType("rb")
 )
-parser.add_argument("source", help="source file", type=argparse.FileType("r"))
 
 
 def llc(args=None):
@@ -19,7 +29,13 @@ def llc(args=None):
     args = parser.parse_args(args)
     with LogSetup(args) as log_setup:
         march = get_arch_from_args(args)
-        ir_module = api.llvm_to_ir(args.source)
+        data = args.source.read()
+        if is_binary(data):
+            ir_module = irutils.from_binary(data)
+        else:
+            source = io.StringIO(data.decode("utf-8"))
+            source.name = args.source.name
+            ir_module = api.llvm_to_ir(source)
         do_compile([ir_module], march, log_setup.reporter, log_setup.args)
 
 
@@ -0,0 +1,72 @@
+""" Compiler runtime prebuild utility.
+
+Compiles the compiler runtime of the given machines, or of all machines,
+and stores it in the runtime cache. Later link steps load the runtime
+from this cache instead of compiling it again.
+"""
+
+
+import argparse
+import logging
+from .base import base_parser, LogSetup
+from ..arch import get_arch
+from ..arch.target_list import target_names
+from ..build.cache import default_cache_directory, get_runtime_cache
+from ..build.cache import get_cached_runtime, runtime_cache_key
+
+
+parser = argparse.ArgumentParser(
+    description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    parents=[base_parser],
+)
+parser.add_argument(
+    "machine",
+    nargs="*",
+    help="machine with options, for example riscv:rvc (default: all)",
+)
+parser.add_argument(
+    "--cache-dir",
+    help="cache directory (default: {})".format(default_cache_directory()),
+)
+parser.add_argument(
+    "--clear",
+    action="store_true",
+    default=False,
+    help="remove all cached runtime objects first",
+)
+
+
+def mkruntime(args=None):
+    """ Prebuild the compiler runtime """
+    args = parser.parse_args(args)
+    with LogSetup(args):
+        cache = get_runtime_cache(args.cache_dir)
+        if cache is None:
+            parser.error("the runtime cache is disabled")
+
+        if args.clear:
+            cache.clear()
+
+        logger = logging.getLogger("mkruntime")
+        for name in args.machine or target_names:
+            march = get_arch(name)
+            if not hasattr(march, "assembler"):
+                logger.info("%s has no assembler, skipping", name)
+                continue
+            try:
+                cached = runtime_cache_key(march) in cache
+            except OSError as ex:
+                parser.error("cannot determine the cache key: {}".format(ex))
+            obj = get_cached_runtime(march, cache=cache)
+            logger.info(
+                "%s runtime: %s bytes (%s)",
+                march.make_id_str(),
+                obj.byte_size,
+                "cached" if cached else "compiled",
+            )
+        logging.getLogger("cache").info(cache.report())
+
+
+if __name__ == "__main__":
+    mkruntime()
@@ -1,24 +1,50 @@
-""" Optimizer """
+""" Optimizer
+
+The input is ppci ir-code in textual or in binary format.
+"""
 
 
 import argparse
+import io
 from .base import base_parser, LogSetup
 from .. import api, irutils
+from ..irutils.binary import is_binary
 
 
-parser = argparse.ArgumentParser(description=__doc__, parents=[base_parser])
+parser = argparse.ArgumentParser(
+    description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    parents=[base_parser],
+)
 parser.add_argument("-O", help="Optimization level", default=2, type=int)
-parser.add_argument("input", help="input file", type=argparse.FileType("r"))
-parser.add_argument("output", help="output file", type=argparse.FileType("w"))
+parser.add_argument(
+    "--binary",
+    help="write the output in binary format",
+    action="store_true",
+    default=False,
+)
+parser.add_argument("input", help="input file", type=argparse.FileType("rb"))
+parser.add_argument(
+    "output", help="output file", type=argparse.FileType("wb")
+)
 
 
 def opt(args=None):
     """ Optimize a single IR-file """
     args = parser.parse_args(args)
-    module = irutils.Reader().read(args.input)
+    data = args.input.read()
+    if is_binary(data):
+        module = irutils.from_binary(data)
+    else:
+        module = irutils.Reader().read(io.StringIO(data.decode("utf-8")))
     with LogSetup(args):
         api.optimize(module, level=args.O)
-    irutils.Writer(file=args.output).write(module)
+    if args.binary:
+        irutils.write_binary(module, args.output)
+    else:
+        f = io.StringIO()
+        irutils.Writer(file=f).write(module)
+        args.output.write(f.getvalue().encode("utf-8"))
 
 
 if __name__ == "__main__":
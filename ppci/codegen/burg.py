@@ -73,11 +73,11 @@ class BurgLexer(baselex.BaseLexer):
 
     def __init__(self):
         tok_spec = [
-            ("id", r"[A-Za-z][A-Za-z\d_]*", lambda typ, val: (typ, val)),
-            ("kw", r"%[A-Za-z][A-Za-z\d_]*", lambda typ, val: (val, val)),
+            ("id", r"[A-Za-z][A-Za-z\d_]*", baselex.TEXT),
+            ("kw", r"%[A-Za-z][A-Za-z\d_]*", baselex.GLYPH),
             ("number", r"\d+", lambda typ, val: (typ, int(val))),
             ("STRING", r"'[^']*'", lambda typ, val: ("string", val[1:-1])),
-            ("OTHER", r"[:;\|\(\),]", lambda typ, val: (val, val)),
+            ("OTHER", r"[:;\|\(\),]", baselex.GLYPH),
             ("SKIP", r"[ ]", None),
         ]
         super().__init__(tok_spec)
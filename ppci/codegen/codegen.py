@@ -45,7 +45,8 @@ class CodeGenerator:
         self.instruction_selector = InstructionSelector1(
             arch, self.sgraph_builder, reporter, weights=selection_weights
         )
-        self.instruction_scheduler = InstructionScheduler()
+        self.instruction_scheduler = InstructionScheduler(arch.isa)
+        self.schedule = optimize_for == "speed"
         self.register_allocator = GraphColoringRegisterAllocator(
             arch, self.instruction_selector, reporter
         )
@@ -216,8 +217,10 @@ class CodeGenerator:
             # reporter.message('Selection graph')
             # reporter.dump_sgraph(sgraph)
 
-            # Schedule instructions:
-            # self.instruction_scheduler.schedule(sgraph, frame)
+        # Schedule instructions:
+        if self.schedule:
+            self.logger.debug("Scheduling instructions")
+            self.instruction_scheduler.schedule(frame)
 
     def emit_frame_to_stream(self, frame, output_stream, debug=False):
         """
@@ -277,14 +280,6 @@ class CodeGenerator:
         for dd in debug_data:
             output_stream.emit(dd)
 
-        # Check if we know what variables are live
-        for tmp in frame.ig.temp_map:
-            if self.debug_db.contains(tmp):
-                self.debug_db.get(tmp)
-                # print(tmp, di)
-                # frame.live_ranges(tmp)
-                # print('live ranges:', lr)
-
     def _generate_inline_assembly(
         self, assembly_source, output_registers, input_registers, ostream
     ):
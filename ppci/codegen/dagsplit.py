@@ -6,6 +6,7 @@ The selection dag is splitted into trees by this module.
 
 import logging
 from .. import ir
+from ..irutils.profile import block_layout
 from ..utils.tree import Tree
 
 
@@ -30,8 +31,9 @@ class DagSplitter:
         forest = []
         self.assign_vregs(sgraph, function_info)
 
-        # Process other blocks:
-        for ir_block in ir_function:
+        # Process other blocks, placing hot blocks together when the
+        # function is profiled:
+        for ir_block in block_layout(ir_function):
             block_trees = self.split_group_into_trees(
                 sgraph, function_info, ir_block
             )
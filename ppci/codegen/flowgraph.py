@@ -1,32 +1,66 @@
 import logging
-from collections import defaultdict
-from ..graph.digraph import DiGraph, DiNode, dfs
+from collections import deque
+from ..graph.digraph import DiGraph, DiNode
 
 
 class FlowGraphNode(DiNode):
     """A node in the flow graph. A node can contain more than one
-    instruction."""
+    instruction.
+
+    The gen, kill and liveness information is stored as bitsets, in which
+    each bit corresponds to a register numbered by the flow graph.
+    """
 
     def __init__(self, g, ins):
         super().__init__(g)
-        self.gen = set()
-        self.kill = set()
-        self.live_in = set()
-        self.live_out = set()
+        self.gen_mask = 0
+        self.kill_mask = 0
+        self.live_in_mask = 0
+        self.live_out_mask = 0
         self.instructions = []
+        self.instruction_masks = []  # (gen, kill) per instruction
 
         # Start with the instruction itself..
         self.add_instruction(ins)
 
     def add_instruction(self, ins):
         """ Bundle the instruction into the current node. """
-        ins.gen = set(ins.used_registers)
-        ins.kill = set(ins.defined_registers)
+        gen = self.graph.mask(ins.used_registers)
+        kill = self.graph.mask(ins.defined_registers)
         self.instructions.append(ins)
+        self.instruction_masks.append((gen, kill))
 
         # Combine gen and kill effects of the node and the new instruction:
-        self.gen = self.gen | (ins.gen - self.kill)
-        self.kill = self.kill | ins.kill
+        self.gen_mask |= gen & ~self.kill_mask
+        self.kill_mask |= kill
+
+    @property
+    def gen(self):
+        return set(self.graph.registers_in(self.gen_mask))
+
+    @property
+    def kill(self):
+        return set(self.graph.registers_in(self.kill_mask))
+
+    @property
+    def live_in(self):
+        return set(self.graph.registers_in(self.live_in_mask))
+
+    @property
+    def live_out(self):
+        return set(self.graph.registers_in(self.live_out_mask))
+
+    def backward_liveness(self):
+        """Visit the instructions of this node in reverse order.
+
+        Yields each instruction with its gen, kill and live out masks.
+        """
+        live = self.live_out_mask
+        for ins, (gen, kill) in zip(
+            reversed(self.instructions), reversed(self.instruction_masks)
+        ):
+            yield ins, gen, kill, live
+            live = gen | (live & ~kill)
 
     def __repr__(self):
         r = "CFG-node({})".format(len(self.instructions))
@@ -35,9 +69,9 @@ class FlowGraphNode(DiNode):
     @property
     def longrepr(self):
         r = str(self)
-        if self.gen:
+        if self.gen_mask:
             r += " gen:" + ", ".join(str(u) for u in self.gen)
-        if self.kill:
+        if self.kill_mask:
             r += " kill:" + ", ".join(str(d) for d in self.kill)
         r += " live_out={}, live_in={}".format(self.live_out, self.live_in)
         r += ", Succ={}, Pred={}".format(self.successors, self.predecessors)
@@ -52,7 +86,11 @@ class FlowGraph(DiGraph):
         super().__init__()
         self.logger = logging.getLogger("flowgraph")
         self._map = {}
-        self._live_ranges = defaultdict(list)
+
+        # Registers are numbered in order of appearance, so that sets
+        # of registers can be represented as bitsets:
+        self.registers = []
+        self._register_numbers = {}
 
         # TODO: make this very tricky part of code better readable!!!
 
@@ -102,7 +140,50 @@ class FlowGraph(DiGraph):
             self.add_node(node)
         return self._map[ins]
 
-    # def live_range(
+    def mask(self, registers):
+        """ Get the bitset of the given registers, numbering new ones """
+        numbers = self._register_numbers
+        mask = 0
+        for register in registers:
+            number = numbers.get(register, None)
+            if number is None:
+                number = len(self.registers)
+                numbers[register] = number
+                self.registers.append(register)
+            mask |= 1 << number
+        return mask
+
+    def registers_in(self, mask):
+        """ Get the registers in the given bitset, in numbering order """
+        registers = self.registers
+        result = []
+        while mask:
+            lowest = mask & -mask
+            result.append(registers[lowest.bit_length() - 1])
+            mask ^= lowest
+        return result
+
+    def post_order(self):
+        """ Get all nodes in post order, unreachable nodes included """
+        visited = set()
+        order = []
+        for root in self.nodes:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(root.successors))]
+            while stack:
+                node, successors = stack[-1]
+                for successor in successors:
+                    if successor not in visited:
+                        visited.add(successor)
+                        stack.append((successor, iter(successor.successors)))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        return order
+
     def calculate_liveness(self):
         """ Calculate liveness in CFG: """
         ###
@@ -111,53 +192,52 @@ class FlowGraph(DiGraph):
         #  out[n] = for s in n.succ in union in[s]
         ###
         for node in self:
-            node.live_in = set()
-            node.live_out = set()
-
-        # Sort flowgraph nodes by backward depth first search:
-        # TODO: cfg_nodes = [x[1] for x in dfs(self.nodes[0], reverse=True)]
-        cfg_nodes = list(self.nodes)
-
-        # Dataflow fixed point iteration over the nodes in the CFG:
+            node.live_in_mask = node.gen_mask
+            node.live_out_mask = 0
+
+        # Visit nodes in post order, which is reverse post order on the
+        # reversed flow graph, so successors are mostly visited first.
+        # Only predecessors of changed nodes are visited again.
+        worklist = deque(self.post_order())
+        pending = set(worklist)
         n_iterations = 0
-        change = True
-        while change:
-            change = False
-            for node in cfg_nodes:
-                _in = node.live_in
-                _out = node.live_out
-                node.live_in = node.gen | (node.live_out - node.kill)
-                if node.successors:
-                    node.live_out = set.union(
-                        *(s.live_in for s in node.successors)
-                    )
-                else:
-                    node.live_out = set()
-
-                # Record for change:
-                change = (
-                    change or (_in != node.live_in) or (_out != node.live_out)
-                )
+        while worklist:
+            node = worklist.popleft()
+            pending.remove(node)
             n_iterations += 1
 
-        # In one pass fix all instructions:
-        for node in self:
-            assert len(node.instructions) > 0
-            ins2 = node.instructions[-1]
-            ins2.live_out = node.live_out  # Propagate into last instruction
-            ins2.live_in = ins2.gen | (ins2.live_out - ins2.kill)
-            if len(node.instructions) > 1:
-                for ins in reversed(node.instructions[:-1]):
-                    ins1 = ins
+            live_out = 0
+            for successor in node.successors:
+                live_out |= successor.live_in_mask
+            node.live_out_mask = live_out
 
-                    ins1.live_out = ins2.live_in
-                    ins1.live_in = ins1.gen | (ins1.live_out - ins1.kill)
-
-                    for vreg in ins2.live_in & ins1.live_out:
-                        self._live_ranges[vreg].append((ins1, ins2))
-
-                    ins2 = ins1
+            live_in = node.gen_mask | (live_out & ~node.kill_mask)
+            if live_in != node.live_in_mask:
+                node.live_in_mask = live_in
+                for predecessor in node.predecessors:
+                    if predecessor not in pending:
+                        pending.add(predecessor)
+                        worklist.append(predecessor)
 
         self.logger.debug(
-            "Iterations: %s,  nodes: %s", n_iterations, len(self)
+            "Iterations: %s, nodes: %s, registers: %s",
+            n_iterations,
+            len(self),
+            len(self.registers),
         )
+
+    def instruction_liveness(self):
+        """Determine the registers which are live around each instruction.
+
+        Call this after :meth:`calculate_liveness`. Returns a dictionary
+        with a (live_in, live_out) tuple of register sets per instruction.
+        """
+        liveness = {}
+        for node in self:
+            for ins, gen, kill, live_out in node.backward_liveness():
+                live_in = gen | (live_out & ~kill)
+                liveness[ins] = (
+                    set(self.registers_in(live_in)),
+                    set(self.registers_in(live_out)),
+                )
+        return liveness
@@ -1,11 +1,167 @@
 """
     This algorithm takes the selected instructions and schedules them in
     a linear form.
+
+    A list scheduler is used. Before register allocation, the instructions
+    between two unmovable instructions are placed in a dependency graph.
+    The edges of this graph are formed by the registers which are defined
+    and used, and by the order of memory accesses. All memory accesses
+    keep their order, so that volatile accesses, such as memory mapped
+    registers, are never swapped. Then, cycle by cycle,
+    the ready instructions with the longest path to the end of the region
+    are issued first. This fills the delay after a load or multiply with
+    independent instructions.
+
+    The latencies and the issue width are taken from the instruction set,
+    see :meth:`ppci.arch.isa.Isa.timing`. Instructions without a timing,
+    such as labels, jumps, calls and debug information, are never moved.
 """
 
+import logging
+
 
 class InstructionScheduler:
-    def schedule(self, graph, frame):
-        # TODO: schedule traces in better order.
-        # This is optional!
-        pass
+    """ List scheduler for the instructions of a frame """
+
+    logger = logging.getLogger("scheduler")
+
+    def __init__(self, isa):
+        self.timings = isa.timings
+        self.issue_width = isa.issue_width
+
+    def schedule(self, frame):
+        """ Reorder the instructions of the given frame """
+        instructions = []
+        region = []
+        for instruction in frame.instructions:
+            if self.is_movable(instruction):
+                region.append(instruction)
+            else:
+                instructions.extend(self.schedule_region(region))
+                region = []
+                instructions.append(instruction)
+        instructions.extend(self.schedule_region(region))
+        assert len(instructions) == len(frame.instructions)
+        frame.instructions = instructions
+
+    def get_timing(self, instruction):
+        """ Get the timing of an instruction, or None if it has none """
+        return self.timings.get(type(instruction))
+
+    def is_movable(self, instruction):
+        """Test if an instruction may be moved.
+
+        Instructions which define a hardware register, such as argument
+        moves before a call, stay in place to keep their live range short.
+        """
+        if self.get_timing(instruction) is None or instruction.jumps:
+            return False
+        defined = instruction.defined_registers + instruction.clobbers
+        return not any(register.is_colored for register in defined)
+
+    def schedule_region(self, region):
+        """ Schedule a list of movable instructions """
+        if len(region) < 2:
+            return region
+
+        latencies = [self.get_timing(i).latency for i in region]
+        successors = self.build_graph(region, latencies)
+
+        # Determine the length of the longest path to the end of the region:
+        heights = list(latencies)
+        for index in reversed(range(len(region))):
+            for successor, latency in successors[index].items():
+                heights[index] = max(
+                    heights[index], latency + heights[successor]
+                )
+
+        pending = [0] * len(region)
+        for edges in successors:
+            for successor in edges:
+                pending[successor] += 1
+        earliest = [0] * len(region)
+        ready = [index for index, count in enumerate(pending) if count == 0]
+        order = []
+        cycle = 0
+        stalls = 0
+        while ready:
+            issued = 0
+            while issued < self.issue_width:
+                candidates = [i for i in ready if earliest[i] <= cycle]
+                if not candidates:
+                    break
+                best = max(candidates, key=lambda i: (heights[i], -i))
+                ready.remove(best)
+                order.append(best)
+                issued += 1
+                for successor, latency in successors[best].items():
+                    earliest[successor] = max(
+                        earliest[successor], cycle + latency
+                    )
+                    pending[successor] -= 1
+                    if pending[successor] == 0:
+                        ready.append(successor)
+            if not issued:
+                stalls += 1
+            cycle += 1
+
+        self.logger.debug(
+            "Scheduled %s instructions in %s cycles with %s stalls",
+            len(region),
+            cycle,
+            stalls,
+        )
+        return [region[index] for index in order]
+
+    def build_graph(self, region, latencies):
+        """Create the dependency graph of the given instructions.
+
+        Returns for each instruction a map from the instructions which
+        depend on it to the number of cycles they must wait.
+        """
+        successors = [{} for _ in region]
+
+        def add_edge(source, target, latency):
+            edges = successors[source]
+            edges[target] = max(edges.get(target, 0), latency)
+
+        last_def = {}
+        readers = {}
+        last_store = None
+        last_access = None
+        for index, instruction in enumerate(region):
+            timing = self.get_timing(instruction)
+            used = instruction.used_registers
+            defined = instruction.defined_registers + instruction.clobbers
+
+            # Read after write:
+            for register in used:
+                if register in last_def:
+                    source = last_def[register]
+                    add_edge(source, index, latencies[source])
+
+            # Write after write and write after read:
+            for register in defined:
+                if register in last_def:
+                    add_edge(last_def[register], index, 1)
+                for reader in readers.get(register, ()):
+                    add_edge(reader, index, 0)
+
+            # Memory accesses keep their order, since the selected
+            # instructions do not tell which accesses are volatile:
+            if timing.load or timing.store:
+                if last_store is not None:
+                    add_edge(last_store, index, 1)
+                if last_access is not None:
+                    add_edge(last_access, index, 0)
+
+            for register in used:
+                readers.setdefault(register, []).append(index)
+            for register in defined:
+                last_def[register] = index
+                readers[register] = []
+            if timing.store:
+                last_store = index
+            if timing.load or timing.store:
+                last_access = index
+        return successors
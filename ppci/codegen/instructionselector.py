@@ -365,12 +365,24 @@ class InstructionSelector1:
         # Create a context that can emit instructions:
         context = InstructionContext(frame, self.arch)
 
+        # Weigh instructions by the profile, if any. The prologue and
+        # epilogue run as often as the entry block:
+        block_weights = {
+            function_info.label_map[block]: block.execution_count + 1
+            for block in ir_function
+            if block.execution_count is not None
+        }
+        if ir_function.entry.execution_count is not None:
+            entry_weight = ir_function.entry.execution_count + 1
+            block_weights[function_info.epilog_label] = entry_weight
+            frame.current_weight = entry_weight
+
         args = list(zip(function_info.arg_types, function_info.arg_vregs))
         for instruction in self.arch.gen_function_enter(args):
             context.emit(instruction)
 
         # Generate proper instructions:
-        self.munch_trees(context, forest)
+        self.munch_trees(context, forest, block_weights)
 
         # Generate function tail:
         if isinstance(ir_function, ir.Function):
@@ -380,13 +392,14 @@ class InstructionSelector1:
 
         for instruction in self.arch.gen_function_exit(rv):
             context.emit(instruction)
+        frame.current_weight = None
 
         # TODO!!!
         # Emit code between blocks:
         # for instruction in self.arch.between_blocks(frame):
         #    frame.emit(instruction)
 
-    def munch_trees(self, context, trees):
+    def munch_trees(self, context, trees, block_weights=None):
         """Consume a dag and match it using the matcher to the frame.
         DAG matching is NP-complete.
 
@@ -397,12 +410,17 @@ class InstructionSelector1:
         A different approach is use 0-1 programming, like the NOLTIS algo.
 
         TODO: implement different strategies.
+
+        When block_weights maps block labels to execution frequencies,
+        the instructions of each block are given the weight of its label.
         """
 
         # Match all splitted trees:
         for tree in trees:
             # Invoke dynamic programming matcher machinery:
             if isinstance(tree, Instruction):
+                if block_weights and tree in block_weights:
+                    context.frame.current_weight = block_weights[tree]
                 context.emit(tree)
             else:
                 assert isinstance(tree, Tree)
@@ -50,29 +50,36 @@ class InterferenceGraph(MaskableGraph):
         return self._use_map[tmp]
 
     def calculate_interference(self, flowgraph):
-        """ Construct interference graph """
+        """ Construct interference graph from the liveness bitsets """
+        registers_in = flowgraph.registers_in
+        done = set()  # Register bitsets for which edges are present
         for n in flowgraph:
-            for ins in n.instructions:
-                # ins.live_out |= ins.
-                for tmp in ins.live_in:
+            for ins, gen, kill, live_out in n.backward_liveness():
+                for tmp in registers_in(gen):
                     self.get_node(tmp)
 
                 # Live out and zero length defined variables:
-                live_and_def = ins.live_out | ins.kill
-
-                # Add interfering edges:
-                for tmp in live_and_def:
-                    n1 = self.get_node(tmp)
-                    for tmp2 in live_and_def - {tmp}:
-                        n2 = self.get_node(tmp2)
-                        self.add_edge(n1, n2)
-
-                    # Add clobbered interfering edges:
-                    for tmp2 in ins.clobbers:
-                        n2 = self.get_node(tmp2)
-                        self.add_edge(n1, n2)
-
-                # Generate usage info:
+                live_and_def = live_out | kill
+                nodes = [
+                    self.get_node(tmp) for tmp in registers_in(live_and_def)
+                ]
+
+                # Add interfering edges, once for each set of registers:
+                if live_and_def not in done:
+                    done.add(live_and_def)
+                    for i, n1 in enumerate(nodes):
+                        for n2 in nodes[i + 1 :]:
+                            self.add_edge(n1, n2)
+
+                # Add clobbered interfering edges:
+                if ins.clobbers:
+                    clobbered = [self.get_node(tmp) for tmp in ins.clobbers]
+                    for n1 in nodes:
+                        for n2 in clobbered:
+                            self.add_edge(n1, n2)
+
+            # Generate usage info:
+            for ins in n.instructions:
                 for reg in ins.defined_registers:
                     self._def_map[reg].append(ins)
                 for reg in ins.used_registers:
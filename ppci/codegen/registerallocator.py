@@ -680,11 +680,18 @@ class GraphColoringRegisterAllocator:
         # introduced during spilling?
         # Select to be spilled variable:
         # Select node with the lowest priority:
+        # Weigh each definition and use with its execution frequency, so
+        # that values used in hot code are spilled last:
+        weight_of = self.frame.weight_of
         p = []
         for n in self.spill_worklist:
             assert not n.is_colored
-            d = sum(len(self.frame.ig.defs(t)) for t in n.temps)
-            u = sum(len(self.frame.ig.uses(t)) for t in n.temps)
+            d = sum(
+                sum(map(weight_of, self.frame.ig.defs(t))) for t in n.temps
+            )
+            u = sum(
+                sum(map(weight_of, self.frame.ig.uses(t))) for t in n.temps
+            )
             priority = (u + d) / n.degree
             self.logger.debug("%s has spill priority=%s", n, priority)
             p.append((n, priority))
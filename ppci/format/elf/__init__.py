@@ -1,8 +1,8 @@
 """ ELF file format module """
 
 from .file import ElfFile
-from .reader import read_elf
+from .reader import read_elf, read_elf_object
 from .writer import write_elf
 
 
-__all__ = ("read_elf", "write_elf", "ElfFile")
+__all__ = ("read_elf", "read_elf_object", "write_elf", "ElfFile")
@@ -1,11 +1,331 @@
 """ Support to process an ELF file.
 """
 
-from .file import ElfFile
+import io
+import logging
+import mmap
+import struct
+from ...arch.arch_info import Endianness
+from ...binutils.objectfile import ObjectFile, RelocationEntry
+from ...common import CompilerError
+from .file import ElfFile, SHN_UNDEF
+from .headers import HeaderTypes, ElfMachine
+from .headers import SectionHeaderType, SectionHeaderFlag
+from .headers import SymbolTableBinding, SymbolTableType
 
 # TODO: move some parts from ElfFile to this file.
 
+logger = logging.getLogger("elf")
+
+ET_REL = 1
+SHN_ABS = 0xFFF1
+SHN_COMMON = 0xFFF2
+
+# Machines for which the architecture can map ELF relocation types:
+arch_map = {
+    ElfMachine.X86_64: "x86_64",
+}
+
 
 def read_elf(f):
     """ Read an ELF file """
     return ElfFile.load(f)
+
+
+def read_elf_object(f, arch=None):
+    """Import a relocatable ELF file (a ``.o`` file) as an object file.
+
+    The file is mapped into memory, and the section data of the resulting
+    object refers to this mapping without copying it. This allows to link
+    object files created by other toolchains.
+
+    Args:
+        f: a filename or a binary file.
+        arch: the architecture of the object, by default derived from
+            the ELF machine type.
+    """
+    if isinstance(f, str):
+        with open(f, "rb") as f2:
+            data = map_file(f2)
+    else:
+        data = map_file(f)
+    return ElfObjectReader(data).read_object(arch)
+
+
+def map_file(f):
+    """ Get a read only memoryview of the contents of a binary file """
+    try:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        # No file on disk or an empty file:
+        data = f.read()
+    return memoryview(data)
+
+
+def is_elf_file(f):
+    """ Check if the given filename or binary file is an ELF file """
+    if isinstance(f, str):
+        with open(f, "rb") as f2:
+            return f2.read(4) == b"\x7FELF"
+    elif isinstance(f, (io.BufferedIOBase, io.RawIOBase)) and f.seekable():
+        position = f.tell()
+        magic = f.read(4)
+        f.seek(position)
+        return magic == b"\x7FELF"
+    else:
+        return False
+
+
+class ElfObjectReader:
+    """Converts the contents of a relocatable ELF file into an object file.
+
+    Allocated sections are merged into the ``code`` and ``data`` sections
+    which are used throughout ppci. Unwind tables, notes and debug
+    sections are ignored.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        if data[0:4] != b"\x7FELF":
+            raise ValueError("Not a valid ELF file")
+        bits = {1: 32, 2: 64}[data[4]]
+        endianness = {1: Endianness.LITTLE, 2: Endianness.BIG}[data[5]]
+        self.header_types = HeaderTypes(bits=bits, endianness=endianness)
+        self.byte_order = "<" if endianness == Endianness.LITTLE else ">"
+        self.elf_header = self.header_types.ElfHeader.deserialize(
+            data[16 : 16 + self.header_types.ElfHeader.size]
+        )
+        self.string_tables = {}
+        self.obj = None
+
+    def read_object(self, arch=None):
+        """ Create an object file from the ELF file """
+        from ...api import get_arch
+
+        if self.elf_header.e_type != ET_REL:
+            raise CompilerError("Only relocatable ELF files can be imported")
+
+        if arch is None:
+            machine = self.elf_header.e_machine
+            if machine not in arch_map:
+                raise CompilerError(
+                    "Unsupported ELF machine {}".format(machine)
+                )
+            arch = arch_map[machine]
+        self.obj = ObjectFile(get_arch(arch))
+
+        self.read_section_headers()
+        self.read_sections()
+        self.read_symbols()
+        self.read_relocations()
+        return self.obj
+
+    def read_section_headers(self):
+        SectionHeader = self.header_types.SectionHeader
+        offset = self.elf_header.e_shoff
+        self.section_headers = []
+        for _ in range(self.elf_header.e_shnum):
+            self.section_headers.append(
+                SectionHeader.deserialize(
+                    self.data[offset : offset + SectionHeader.size]
+                )
+            )
+            offset += self.elf_header.e_shentsize
+        self.section_names = self.section_headers[self.elf_header.e_shstrndx]
+
+    def get_section_data(self, header):
+        """ Get the data of a section, without copying """
+        return self.data[header.sh_offset : header.sh_offset + header.sh_size]
+
+    def get_str(self, strtab, offset):
+        """ Get a string from the given string table section """
+        if strtab.sh_offset not in self.string_tables:
+            data = bytes(self.get_section_data(strtab))
+            self.string_tables[strtab.sh_offset] = data
+        data = self.string_tables[strtab.sh_offset]
+        end = data.find(0, offset)
+        return data[offset:end].decode("utf8")
+
+    def get_section_name(self, header):
+        return self.get_str(self.section_names, header.sh_name)
+
+    def is_loaded(self, header):
+        """ Test if this section contains code or data of the program """
+        types = [
+            SectionHeaderType.PROGBITS,
+            SectionHeaderType.NOBITS,
+            SectionHeaderType.INIT_ARRAY,
+            SectionHeaderType.FINI_ARRAY,
+            SectionHeaderType.PREINIT_ARRAY,
+        ]
+        return (
+            header.sh_type in types
+            and header.sh_flags & SectionHeaderFlag.ALLOC
+            and self.get_section_name(header) != ".eh_frame"
+        )
+
+    def read_sections(self):
+        """Place all loaded sections in the code or data section.
+
+        When a single ELF section ends up in an object section, this
+        object section simply refers to the mapped file.
+        """
+        # Map of ELF section index to object section name and offset:
+        self.section_offsets = {}
+        parts = {"code": [], "data": []}
+        for index, header in enumerate(self.section_headers):
+            if not self.is_loaded(header):
+                continue
+            if header.sh_flags & SectionHeaderFlag.EXECINSTR:
+                name = "code"
+            else:
+                name = "data"
+            parts[name].append((index, header))
+
+        for name, section_parts in parts.items():
+            section = self.obj.get_section(name, create=True)
+            alignment = max(
+                [h.sh_addralign for _, h in section_parts] + [1]
+            )
+            section.alignment = max(section.alignment, alignment)
+            if len(section_parts) == 1:
+                index, header = section_parts[0]
+                if header.sh_type == SectionHeaderType.NOBITS:
+                    section.data = bytearray(header.sh_size)
+                else:
+                    section.data = self.get_section_data(header)
+                self.section_offsets[index] = (name, 0)
+            else:
+                for index, header in section_parts:
+                    self.align(section, header.sh_addralign)
+                    self.section_offsets[index] = (name, section.size)
+                    if header.sh_type == SectionHeaderType.NOBITS:
+                        section.add_data(bytes(header.sh_size))
+                    else:
+                        section.add_data(self.get_section_data(header))
+
+    @staticmethod
+    def align(section, alignment):
+        if alignment > 1 and section.size % alignment:
+            section.add_data(bytes(alignment - section.size % alignment))
+
+    def read_symbols(self):
+        """ Read all symbol tables into the object file """
+        # Map of ELF symbol table section and index to symbol id:
+        self.symbol_ids = {}
+        for table_index, header in enumerate(self.section_headers):
+            if header.sh_type != SectionHeaderType.SYMTAB:
+                continue
+            strtab = self.section_headers[header.sh_link]
+            for index, entry in enumerate(self.iter_symbols(header)):
+                if index == 0:
+                    continue
+                name, value, size, info, shndx = entry
+                symbol_id = self.read_symbol(
+                    name, value, size, info, shndx, strtab
+                )
+                if symbol_id is not None:
+                    self.symbol_ids[(table_index, index)] = symbol_id
+
+    def iter_symbols(self, header):
+        """ Unpack all symbol table entries at once """
+        if self.header_types.bits == 64:
+            fmt = "IBBHQQ"
+        else:
+            fmt = "IIIBBH"
+        data = self.get_section_data(header)
+        for fields in struct.iter_unpack(self.byte_order + fmt, data):
+            if self.header_types.bits == 64:
+                name, info, _, shndx, value, size = fields
+            else:
+                name, value, size, info, _, shndx = fields
+            yield name, value, size, info, shndx
+
+    def read_symbol(self, name, value, size, info, shndx, strtab):
+        binding, typ = info >> 4, info & 0xF
+        if typ == SymbolTableType.SECTION:
+            if shndx not in self.section_offsets:
+                return
+            # Relocations often refer to sections, give them a symbol:
+            name = self.get_section_name(self.section_headers[shndx])
+        elif typ == SymbolTableType.FILE:
+            return
+        else:
+            name = self.get_str(strtab, name)
+
+        if binding == SymbolTableBinding.LOCAL:
+            binding = "local"
+        else:
+            binding = "global"
+        typ = "func" if typ == SymbolTableType.FUNC else "object"
+
+        if shndx == SHN_UNDEF:
+            section = value = None
+        elif shndx == SHN_ABS:
+            section = None
+        elif shndx == SHN_COMMON:
+            # Allocate tentative definitions in the data section:
+            section = "data"
+            data = self.obj.get_section(section, create=True)
+            if isinstance(data.data, memoryview):
+                data.data = bytearray(data.data)
+            self.align(data, value)
+            value = data.size
+            data.add_data(bytes(size))
+        elif shndx in self.section_offsets:
+            section, offset = self.section_offsets[shndx]
+            value += offset
+        else:
+            # Symbol in a section which is not loaded.
+            return
+
+        symbol_id = len(self.obj.symbols)
+        self.obj.add_symbol(
+            symbol_id, name, binding, value, section, typ, size
+        )
+        return symbol_id
+
+    def read_relocations(self):
+        """ Read relocation tables of the loaded sections """
+        arch = self.obj.arch
+        for header in self.section_headers:
+            if header.sh_type not in [
+                SectionHeaderType.RELA,
+                SectionHeaderType.REL,
+            ]:
+                continue
+            if header.sh_info not in self.section_offsets:
+                continue
+            if header.sh_type == SectionHeaderType.REL:
+                raise CompilerError(
+                    "ELF relocations without addend are not supported"
+                )
+            section, offset = self.section_offsets[header.sh_info]
+            for r_offset, r_info, r_addend in self.iter_relocations(header):
+                if self.header_types.bits == 64:
+                    r_sym, r_type = r_info >> 32, r_info & 0xFFFFFFFF
+                else:
+                    r_sym, r_type = r_info >> 8, r_info & 0xFF
+                try:
+                    reloc_type = arch.get_reloc_name(r_type)
+                except NotImplementedError:
+                    raise CompilerError(
+                        "ELF relocations are not supported for {}".format(
+                            arch
+                        )
+                    )
+                symbol_id = self.symbol_ids[(header.sh_link, r_sym)]
+                self.obj.add_relocation(
+                    RelocationEntry(
+                        reloc_type,
+                        symbol_id,
+                        section,
+                        offset + r_offset,
+                        r_addend,
+                    )
+                )
+
+    def iter_relocations(self, header):
+        fmt = "QQq" if self.header_types.bits == 64 else "IIi"
+        data = self.get_section_data(header)
+        return struct.iter_unpack(self.byte_order + fmt, data)
@@ -2,11 +2,15 @@
 
 This module can be used to work with intel hexfiles.
 
+Hexfiles of many megabytes are handled in linear time: records are
+parsed by a generator, appended to ``bytearray`` regions which are kept
+in a sorted index, and written straight from the region data.
 """
 
+import bisect
 import struct
 import binascii
-from ..utils.hexdump import hexdump, chunks
+from ..utils.hexdump import hexdump
 
 
 DATA = 0
@@ -64,7 +68,8 @@ class HexLine:
         return line
 
 
-def hexfields(f):
+def hex_records(f):
+    """ Parse the lines of a hexfile into (address, type, data) tuples """
     for line in f:
         # Strip spaces and newlines:
         line = line.strip()
@@ -76,7 +81,52 @@ def hexfields(f):
         if line[0] != ":":
             # Skip lines that do not start with a ':'
             continue
-        yield HexLine.from_line(line)
+
+        nums = bytes.fromhex(line[1:])
+        if len(nums) != nums[0] + 5:
+            raise HexFileException("byte count field incorrect")
+        if sum(nums) & 0xFF:
+            raise HexFileException("crc incorrect")
+        yield (nums[1] << 8) | nums[2], nums[3], nums[4:-1]
+
+
+def hexfields(f):
+    """ Parse the lines of a hexfile into :class:`HexLine` objects """
+    for address, typ, data in hex_records(f):
+        yield HexLine(address, typ, data)
+
+
+def hex_line(address, typ, data=bytes()):
+    """ Format a single hexfile record """
+    record = bytes((len(data), address >> 8, address & 0xFF, typ)) + data
+    crc = -sum(record) & 0xFF
+    return ":{}{:02x}\n".format(record.hex(), crc)
+
+
+def write_hex(f, regions, start_address=0, record_size=30):
+    """Write (address, data) regions as a hexfile.
+
+    The data of each region can be any bytes like object, for example the
+    data of an image in an object file. The lines are written straight
+    from the data, without intermediate objects.
+    """
+    write = f.write
+    for address, data in regions:
+        data = memoryview(data)
+        ext = address & 0xFFFF0000
+        write(hex_line(0, EXTLINADR, struct.pack(">H", ext >> 16)))
+        address -= ext
+        for offset in range(0, len(data), record_size):
+            if address >= 0x10000:
+                ext += 0x10000
+                write(hex_line(0, EXTLINADR, struct.pack(">H", ext >> 16)))
+                address -= 0x10000
+            chunk = data[offset : offset + record_size]
+            write(hex_line(address, DATA, chunk))
+            address += len(chunk)
+    if start_address:
+        write(hex_line(0, STARTADDR, struct.pack(">I", start_address)))
+    write(hex_line(0, EOF))
 
 
 class HexFile:
@@ -84,6 +134,7 @@ class HexFile:
 
     def __init__(self):
         self.regions = []
+        self._starts = []
         self.start_address = 0
 
     @staticmethod
@@ -92,23 +143,23 @@ class HexFile:
         self = HexFile()
         end_of_file = False
         ext = 0
-        for line in hexfields(open_file):
+        for address, typ, data in hex_records(open_file):
             if end_of_file:
                 raise HexFileException("hexfile line after end of file record")
 
-            if line.typ == DATA:
-                self.add_region(line.address + ext, line.data)
-            elif line.typ == EXTLINADR:
-                ext = (struct.unpack(">H", line.data[0:2])[0]) << 16
-            elif line.typ == EOF:
-                if len(line.data) != 0:
+            if typ == DATA:
+                self.add_region(address + ext, data)
+            elif typ == EXTLINADR:
+                ext = (struct.unpack(">H", data[0:2])[0]) << 16
+            elif typ == EOF:
+                if len(data) != 0:
                     raise HexFileException("end of file not empty")
                 end_of_file = True
-            elif line.typ == STARTADDR:
-                self.start_address = struct.unpack(">I", line.data[0:4])[0]
+            elif typ == STARTADDR:
+                self.start_address = struct.unpack(">I", data[0:4])[0]
             else:  # pragma: no cover
                 raise NotImplementedError(
-                    "record type {0} not implemented".format(line.typ)
+                    "record type {0} not implemented".format(typ)
                 )
         return self
 
@@ -131,51 +182,65 @@ class HexFile:
         return all(rs == ro for rs, ro in zip(regions, oregions))
 
     def add_region(self, address, data):
-        """ Add a chunk of data at the given address """
-        region = HexFileRegion(address, data)
-        self.regions.append(region)
-        self.check()
+        """Add a chunk of data at the given address.
+
+        Adjacent regions are joined. The regions are kept sorted by
+        address, so that this takes constant time when data is added in
+        increasing order, as when loading a hexfile.
+        """
+        regions = self.regions
+        if len(self._starts) != len(regions):
+            # The regions were modified directly, rebuild the index:
+            self.check()
+        starts = self._starts
+        end_address = address + len(data)
+        index = bisect.bisect_right(starts, address)
+        previous = regions[index - 1] if index > 0 else None
+        following = regions[index] if index < len(regions) else None
+        if previous is not None and previous.end_address > address:
+            raise HexFileException("Overlapping regions")
+        if following is not None and end_address > following.address:
+            raise HexFileException("Overlapping regions")
+
+        if previous is not None and previous.end_address == address:
+            region = previous
+            region.add_data(data)
+        else:
+            region = HexFileRegion(address, data)
+            regions.insert(index, region)
+            starts.insert(index, address)
+            index += 1
+
+        if following is not None and end_address == following.address:
+            region.add_data(following.data)
+            del regions[index]
+            del starts[index]
 
     def check(self):
+        """ Sort the regions, join adjacent ones and check for overlap """
         self.regions.sort(key=lambda r: r.address)
-        change = True
-        while change and len(self.regions) > 1:
-            change = False
-            for r1, r2 in zip(self.regions[:-1], self.regions[1:]):
-                if r1.end_address == r2.address:
-                    r1.add_data(r2.data)
-                    self.regions.remove(r2)
-                    change = True
-                elif r1.end_address > r2.address:
-                    raise HexFileException("Overlapping regions")
+        regions = []
+        for region in self.regions:
+            if regions and regions[-1].end_address == region.address:
+                regions[-1].add_data(region.data)
+            elif regions and regions[-1].end_address > region.address:
+                raise HexFileException("Overlapping regions")
+            else:
+                regions.append(region)
+        self.regions[:] = regions
+        self._starts = [r.address for r in regions]
 
     def merge(self, other):
         for region in other.regions:
             self.add_region(region.address, region.data)
 
-    def write_hex_line(self, line):
-        """ Write a single hexfile line """
-        print(line.to_line(), file=self.f)
-
     def save(self, f):
         """ Save hexfile to file-like object """
-        self.f = f
-        for region in self.regions:
-            ext = region.address & 0xFFFF0000
-            self.write_hex_line(
-                HexLine(0, EXTLINADR, struct.pack(">H", ext >> 16))
-            )
-            address = region.address - ext
-            for chunk in chunks(region.data):
-                if address >= 0x10000:
-                    ext += 0x10000
-                    self.write_hex_line(
-                        HexLine(0, EXTLINADR, struct.pack(">H", ext >> 16))
-                    )
-                    address -= 0x10000
-                self.write_hex_line(HexLine(address, DATA, chunk))
-                address += len(chunk)
-        self.write_hex_line(HexLine(0, EOF))
+        write_hex(
+            f,
+            ((region.address, region.data) for region in self.regions),
+            start_address=self.start_address,
+        )
 
 
 class HexFileRegion:
@@ -183,7 +248,7 @@ class HexFileRegion:
 
     def __init__(self, address, data=bytes()):
         self.address = address
-        self.data = data
+        self.data = bytearray(data)
 
     def __repr__(self):
         return "Region at 0x{:08X} of {} bytes".format(
@@ -195,7 +260,7 @@ class HexFileRegion:
 
     def add_data(self, data):
         """ Add data to this region """
-        self.data = self.data + data
+        self.data += data
 
     @property
     def size(self):
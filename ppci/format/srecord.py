@@ -3,10 +3,6 @@
 https://en.wikipedia.org/wiki/SREC_(file_format)
 """
 
-import binascii
-from ..utils.bitfun import value_to_bytes_big_endian
-from ..utils.hexdump import chunks
-
 
 class SRecord:
     address_byte_sizes = {0: 2, 1: 2, 2: 3, 3: 4, 5: 2, 6: 3, 7: 4, 8: 3, 9: 2}
@@ -19,32 +15,42 @@ class SRecord:
         self.data = data
 
     def to_line(self) -> str:
-        addr_size = self.address_byte_sizes[self.typ]
-        addr_data = value_to_bytes_big_endian(self.address, addr_size)
-        data = addr_data + self.data
-
-        # Add count:
-        count = len(data) + 1
-        data = bytes([count]) + data
-
-        # Add crc:
-        crc = sum(data)
-        crc = (~crc) & 0xFF
-        data += bytes([crc])
-        txt_data = binascii.hexlify(data).decode("ascii").upper()
-        line = "S{}{}".format(self.typ, txt_data)
-        return line
+        return srecord_line(self.typ, self.address, self.data)
+
+
+def srecord_line(typ, address, data=bytes()):
+    """ Format a single s-record line, without line ending """
+    addr_size = SRecord.address_byte_sizes[typ]
+    record = (
+        bytes([addr_size + len(data) + 1])
+        + address.to_bytes(addr_size, "big")
+        + data
+    )
+    crc = ~sum(record) & 0xFF
+    return "S{}{}{:02X}".format(typ, record.hex().upper(), crc)
+
+
+def write_srecords(f, data, address=0, record_size=30):
+    """Write data as s-records, straight from the data.
+
+    The smallest address size that fits the data is used.
+    """
+    data = memoryview(data)
+    end_address = address + len(data)
+    if end_address <= 0x10000:
+        data_typ, end_typ = 1, 9
+    elif end_address <= 0x1000000:
+        data_typ, end_typ = 2, 8
+    else:
+        data_typ, end_typ = 3, 7
+    write = f.write
+    write(srecord_line(1, 0, b"HDR") + "\n")
+    for offset in range(0, len(data), record_size):
+        chunk = data[offset : offset + record_size]
+        write(srecord_line(data_typ, address + offset, chunk) + "\n")
+    write(srecord_line(end_typ, 0) + "\n")
 
 
 def write_srecord(obj, f):
     """ Write object to srecord """
-    data = obj.get_section("code").data
-    record = SRecord(1, 0, b"HDR")
-    print(record.to_line(), file=f)
-    address = 0
-    for chunk in chunks(data):
-        record = SRecord(1, address, chunk)
-        print(record.to_line(), file=f)
-        address += len(chunk)
-    record = SRecord(9, 0, bytes())
-    print(record.to_line(), file=f)
+    write_srecords(f, obj.get_section("code").data)
@@ -7,7 +7,27 @@ from .. import ir
 
 
 class CallGraph(DiGraph):
-    pass
+    """ Graph with a node per function and an edge from caller to callee """
+
+    def __init__(self):
+        super().__init__()
+        self.node_map = {}
+
+    def get_node(self, routine):
+        """ Get the node of the given function """
+        return self.node_map[routine]
+
+
+class CallGraphNode(DiNode):
+    """ Node of a function in the call graph """
+
+    def __init__(self, graph, routine):
+        super().__init__(graph)
+        self.routine = routine
+        graph.node_map[routine] = self
+
+    def __repr__(self):
+        return "CallGraphNode({})".format(self.routine.name)
 
 
 def mod_to_call_graph(ir_module) -> CallGraph:
@@ -15,20 +35,74 @@ def mod_to_call_graph(ir_module) -> CallGraph:
     cg = CallGraph()
 
     # Create call graph nodes:
-    node_map = {}
     for routine in ir_module.functions:
-        node_map[routine] = DiNode(cg)
+        CallGraphNode(cg, routine)
     for routine in ir_module.externals:
         if isinstance(routine, ir.ExternalSubRoutine):
-            node_map[routine] = DiNode(cg)
+            CallGraphNode(cg, routine)
 
-    # Add call graph edges:
+    # Add call graph edges, indirect calls are not known:
+    node_map = cg.node_map
     for routine in ir_module.functions:
         n1 = node_map[routine]
         for instruction in routine.get_instructions():
             if isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall)):
                 routine2 = instruction.callee
-                n2 = node_map[routine2]
-                cg.add_edge(n1, n2)
+                if routine2 in node_map:
+                    n2 = node_map[routine2]
+                    cg.add_edge(n1, n2)
 
     return cg
+
+
+def bottom_up_order(call_graph):
+    """Get the strongly connected components of the call graph, callees
+    before their callers.
+
+    A component is a list of nodes which are (mutually) recursive, or a
+    single node. This is the algorithm of Tarjan, without recursion.
+    """
+    # Visit the successors in a fixed order, to get the same order each run:
+    positions = {node: i for i, node in enumerate(call_graph.nodes)}
+
+    def ordered_successors(node):
+        return iter(sorted(node.successors, key=positions.__getitem__))
+
+    numbers = {}
+    low_links = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in call_graph.nodes:
+        if root in numbers:
+            continue
+        numbers[root] = low_links[root] = len(numbers)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, ordered_successors(root))]
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in numbers:
+                    numbers[successor] = low_links[successor] = len(numbers)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, ordered_successors(successor)))
+                    break
+                elif successor in on_stack:
+                    low_links[node] = min(low_links[node], numbers[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low_links[parent] = min(low_links[parent], low_links[node])
+                if low_links[node] == numbers[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
@@ -15,10 +15,6 @@ import logging
 # TODO: this is possibly the third edition of flow graph code.. Merge at will!
 from .digraph import DiGraph, DiNode
 from . import lt
-from .algorithm.fixed_point_dominator import calculate_post_dominators
-from .algorithm.fixed_point_dominator import (
-    calculate_immediate_post_dominators,
-)
 from collections import namedtuple
 
 
@@ -34,6 +30,9 @@ class DomTreeNode:
 
     def below_or_same(self, other):
         """Test if this node is a descendant of this node (or is self)"""
+        if self.interval is None or other.interval is None:
+            # Nodes outside of the tree are only related to themselves.
+            return self is other
         return (
             other.interval[0] <= self.interval[0]
             and self.interval[1] <= other.interval[1]
@@ -41,6 +40,8 @@ class DomTreeNode:
 
     def below(self, other):
         """Test if this node is a descendant of this node."""
+        if self.interval is None or other.interval is None:
+            return False
         return (
             other.interval[0] < self.interval[0]
             and self.interval[1] < other.interval[1]
@@ -121,13 +122,15 @@ class ControlFlowGraph(DiGraph):
 
         # Dominator info:
         self._idom = None  # immediate_dominators
+        self.tree_map = None
+        self.root_tree = None
 
         # Post dominator info:
-        self._pdom = None  # post dominators
-        self._spdom = None  # Strict post dominators
-        self._ipdom = None  # post dominators
+        self._ipdom = None  # immediate post dominators
+        self.post_tree_map = None
+        self.post_root_tree = None
+
         self._reach = None  # Reach map
-        self.root_tree = None
 
     def validate(self):
         """ Run some sanity checks on the control flow graph """
@@ -152,10 +155,21 @@ class ControlFlowGraph(DiGraph):
         return self.tree_map[other].below(self.tree_map[one])
 
     def post_dominates(self, one, other):
-        """ Test whether a node post dominates another node """
-        if self._pdom is None:
+        """Test whether a node post dominates another node.
+
+        Like dominance, this is checked in constant time using the
+        intervals of the post dominator tree.
+        """
+        if self._ipdom is None:
+            self._calculate_post_dominator_info()
+        tree_map = self.post_tree_map
+        return tree_map[other].below_or_same(tree_map[one])
+
+    def strictly_post_dominates(self, one, other):
+        """ Test whether a node strictly post dominates another node """
+        if self._ipdom is None:
             self._calculate_post_dominator_info()
-        return one in self._pdom[other]
+        return self.post_tree_map[other].below(self.post_tree_map[one])
 
     def get_immediate_dominator(self, node):
         """ Retrieve a nodes immediate dominator """
@@ -167,7 +181,7 @@ class ControlFlowGraph(DiGraph):
         """ Retrieve a nodes immediate post dominator """
         if self._ipdom is None:
             self._calculate_post_dominator_info()
-        return self._ipdom[node]
+        return self._ipdom.get(node, None)
 
     def can_reach(self, one, other):
         if self._reach is None:
@@ -182,53 +196,33 @@ class ControlFlowGraph(DiGraph):
         self._idom = lt.calculate_idom(self, self.entry_node)
         self._calculate_dominator_tree()
 
-    def _legacy_dom_sets(self):
-        # Now calculate dominator sets:
-        # Old method used the fixed point iteration:
-
-        # These dominator sets have lookup time O(1) but suffer
-        # from large memory usage.
-        # self._dom = calculate_dominators(self.nodes, self.entry_node)
-        self._dom = {}
-        for parent, t in pre_order(self.root_tree):
-            if parent:
-                self._dom[t.node] = {t.node} | self._dom[parent.node]
-            else:
-                self._dom[t.node] = {t.node}
-            logger.debug("Ugh %s, %s", t.node, len(self._dom[t.node]))
-
-        logger.debug("calculate sdom")
-
-        self._sdom = {}
-        for node in self.nodes:
-            if node not in self._dom:
-                self._dom[node] = {node}
-                self._sdom[node] = set()
-            else:
-                self._sdom[node] = self._dom[node] - {node}
-
-        logger.debug("calculate sdom --> DONE")
-
     def _calculate_dominator_tree(self):
         """ Create a dominator tree. """
+        self.tree_map, self.root_tree = self._build_tree(
+            self._idom, self.entry_node
+        )
+
+    def _build_tree(self, idom, root):
+        """Create a tree from a map of immediate (post) dominators.
 
-        self.tree_map = {}
+        Returns a map from node to tree node and the root of the tree.
+        """
+        tree_map = {}
         for node in self.nodes:
-            self.tree_map[node] = DomTreeNode(node, list(), None)
+            tree_map[node] = DomTreeNode(node, list(), None)
 
         # Add all nodes except for the root node into the tree:
         for node in self.nodes:
-            idom_node = self.get_immediate_dominator(node)
-            if idom_node:
-                parent = self.tree_map[idom_node]
-                node = self.tree_map[node]
-                parent.children.append(node)
-
-        self.root_tree = self.tree_map[self.entry_node]
+            parent = idom.get(node, None)
+            if parent:
+                tree_map[parent].children.append(tree_map[node])
 
-        self._number_dominator_tree()
+        root_tree = tree_map[root]
+        self._number_dominator_tree(root_tree)
+        return tree_map, root_tree
 
-    def _number_dominator_tree(self):
+    @staticmethod
+    def _number_dominator_tree(root_tree):
         """Assign intervals to the dominator tree.
 
         Very cool idea to check if one node dominates
@@ -242,11 +236,14 @@ class ControlFlowGraph(DiGraph):
         nodes. If the interval of node a falls within the
         interval of node b, b dominates a. This allows for
         constant time dominance checking!
+
+        Nodes which are not in the tree, such as unreachable nodes,
+        keep an interval of None.
         """
 
         t = 0
 
-        worklist = [self.root_tree]
+        worklist = [root_tree]
         discovered = {}  # when the node was discovered
         while worklist:
             node = worklist[-1]
@@ -262,22 +259,16 @@ class ControlFlowGraph(DiGraph):
             t += 1
 
     def _calculate_post_dominator_info(self):
-        """Calculate the post dominator sets iteratively.
+        """Calculate the post dominator tree.
 
         Post domination is the same as domination, but then starting at
-        the exit node.
+        the exit node and following the edges backwards.
         """
         self.validate()
 
-        self._pdom = calculate_post_dominators(self.nodes, self.exit_node)
-
-        # Determine strict post dominators:
-        self._spdom = {}
-        for node in self.nodes:
-            self._spdom[node] = self._pdom[node] - {node}
-
-        self._ipdom = calculate_immediate_post_dominators(
-            self.nodes, self._pdom, self._spdom
+        self._ipdom = lt.calculate_idom(self, self.exit_node, reverse=True)
+        self.post_tree_map, self.post_root_tree = self._build_tree(
+            self._ipdom, self.exit_node
         )
 
     def calculate_reach(self):
@@ -25,6 +25,22 @@ class CfgInfo:
     def has_block(self, node):
         return node in self._node_map
 
+    def dominates(self, one, other):
+        """ Test if block one dominates block other, in O(1) """
+        return self.cfg.dominates(self.get_node(one), self.get_node(other))
+
+    def strictly_dominates(self, one, other):
+        """ Test if block one strictly dominates block other, in O(1) """
+        return self.cfg.strictly_dominates(
+            self.get_node(one), self.get_node(other)
+        )
+
+    def post_dominates(self, one, other):
+        """ Test if block one post dominates block other, in O(1) """
+        return self.cfg.post_dominates(
+            self.get_node(one), self.get_node(other)
+        )
+
     def _calculate_df(self):
         self.cfg.calculate_dominance_frontier()
         self.df = {
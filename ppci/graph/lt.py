@@ -15,6 +15,11 @@ logger = logging.getLogger("lt")
 
 
 def calculate_idom(graph, entry, reverse=False):
+    """Calculate the immediate dominator of each node reachable from entry.
+
+    When reverse is True, edges are followed backwards, which yields
+    the immediate post dominators when entry is the exit node.
+    """
     x = LengauerTarjan(reverse)
     return x.compute(graph, entry)
 
@@ -55,7 +60,12 @@ class LengauerTarjan:
 
             # Determine semi dominator for n:
             s = p
-            for v in n.predecessors:
+            predecessors = n.successors if self._reverse else n.predecessors
+            for v in predecessors:
+                if v not in self.dfnum:
+                    # Skip unreachable nodes
+                    continue
+
                 if self.dfnum[v] <= self.dfnum[n]:
                     s2 = v
                 else:
@@ -89,7 +99,7 @@ class LengauerTarjan:
 
     def dfs(self, start_node):
         """ Depth first search nodes """
-        for dfnum, pair in enumerate(dfs(start_node)):
+        for dfnum, pair in enumerate(dfs(start_node, reverse=self._reverse)):
             parent, node = pair
             assert node not in self.dfnum
             self.dfnum[node] = dfnum
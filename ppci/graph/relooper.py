@@ -74,11 +74,20 @@ def print_shape(shape, indent=0, file=None):
         print("   " * indent + "loop", file=file)
         print_shape(shape.body, indent=indent + 1, file=file)
         print("   " * indent + "end-loop", file=file)
+    elif isinstance(shape, MultipleShape):
+        print("   " * indent + "multiple", file=file)
+        for entry, handled in shape.handled.items():
+            print("   " * indent + "case", entry, file=file)
+            print_shape(handled, indent=indent + 1, file=file)
+        print("   " * indent + "end-multiple", file=file)
     elif shape is None:
         pass
     else:  # pragma: no cover
         raise NotImplementedError(str(shape))
 
+    if shape is not None and shape.next is not None:
+        print_shape(shape.next, indent=indent, file=file)
+
 
 class StructureDetector:
     logger = logging.getLogger("structure-detector")
@@ -205,24 +214,336 @@ class StructureDetector:
             return list(reachable_outside_loop)[0]
 
 
+def reloop(ir_function):
+    """Find the structure of a function using the relooper algorithm.
+
+    Contrary to :func:`find_structure`, this works for any control flow
+    graph, including loops with multiple exits and irreducible control
+    flow.
+
+    Args:
+        ir_function: an `ir.SubRoutine` containing a soup-of-blocks.
+
+    Returns:
+        A chain of shapes and a map from control flow nodes to blocks.
+    """
+    cfg, block_map = ir_function_to_graph(ir_function)
+    shape = Relooper().reloop(cfg)
+    rmap = {c: b for b, c in block_map.items()}
+    return shape, rmap
+
+
+# The ways in which a branch to a block is made:
+NEXT = "next"  # Enter the next shape, which follows the branch.
+INLINE = "inline"  # Enter the block of a multiple shape, placed in the branch.
+FALL = "fall"  # Fall to the end of the code of a multiple shape.
+BREAK = "break"  # Break out of the innermost loop.
+CONTINUE = "continue"  # Continue the innermost loop.
+
+
+class Branch:
+    """A branch to a target block, as placed in structured code.
+
+    When a branch cannot reach its target in a single step, it sets the
+    label variable to the target. The code after the loops and multiple
+    shapes it leaves checks this label to take the next step.
+    """
+
+    __slots__ = ("target", "kind", "crossed", "landing", "label")
+
+    def __init__(self, target, kind, crossed=(), landing=None):
+        self.target = target
+        self.kind = kind
+        self.crossed = crossed  # Loop and multiple shapes that are left
+        self.landing = landing  # The shape where the branch arrives
+        self.label = False  # Whether the label variable must be set
+
+    def __repr__(self):
+        return "Branch({}, {})".format(self.target, self.kind)
+
+
 class Relooper:
-    """ Implementation of the relooper algorithm """
+    """Implementation of the relooper algorithm.
+
+    The blocks are placed in a chain of shapes. Each shape is entered at
+    one or more entry blocks, and followed by a next shape:
+
+    - a basic shape holds a single block, which is only entered from the
+      previous shape.
+    - a loop shape holds all blocks from which one of its entries can be
+      reached again.
+    - a multiple shape holds groups of blocks, which are reachable from
+      only one of its entries. Depending on the label variable, one of
+      these groups is executed.
 
-    # TODO: implement the relooper algorithm
-    pass
+    Since any control flow graph can be placed in these shapes, there is
+    no need for a block dispatch loop. The label variable is only used
+    for loops with multiple entries and for branches which leave several
+    shapes at once.
+
+    See also: https://github.com/kripken/Relooper/blob/master/paper.pdf
+    """
+
+    logger = logging.getLogger("relooper")
+
+    def reloop(self, cfg):
+        """ Place the nodes of the control flow graph into shapes """
+        self.order = {node: index for index, node in enumerate(cfg.nodes)}
+        self.successors = {}
+        for node in cfg.nodes:
+            successors = set(node.successors)
+            successors.discard(cfg.exit_node)
+            self.successors[node] = self.sort(successors)
+        self.loop_entries = set()
+        blocks = set(cfg.nodes)
+        blocks.discard(cfg.exit_node)
+        shape = self.process(blocks, [cfg.entry_node])
+
+        # Determine how the branches are made:
+        self.branches = []
+        self.shapes = []
+        self.place_branches(shape, [])
+        for shape2 in self.shapes:
+            if isinstance(shape2, (LoopShape, MultipleShape)):
+                shape2.guarded = bool(shape2.escapes) and (
+                    shape2.next is not None
+                    or any(kind != FALL for kind in shape2.escapes.values())
+                )
+        for branch in self.branches:
+            branch.label = needs_label(branch.landing) or any(
+                shape2.guarded for shape2 in branch.crossed
+            )
+        return shape
+
+    def sort(self, nodes):
+        return sorted(nodes, key=self.order.__getitem__)
+
+    def process(self, blocks, entries):
+        """Create a chain of shapes for the given blocks.
+
+        The blocks must be reachable from the entries. The given set of
+        blocks is consumed.
+        """
+        first = previous = None
+        while entries:
+            if len(entries) == 1:
+                if self.has_branches_in(entries[0], blocks):
+                    shape, next_entries = self.make_loop(blocks, entries)
+                else:
+                    shape, next_entries = self.make_basic(blocks, entries[0])
+            else:
+                groups = self.find_independent_groups(blocks, entries)
+                if groups:
+                    shape, next_entries = self.make_multiple(
+                        blocks, entries, groups
+                    )
+                else:
+                    shape, next_entries = self.make_loop(blocks, entries)
+            shape.entries = frozenset(entries)
+            if previous is None:
+                first = shape
+            else:
+                previous.next = shape
+            previous = shape
+            entries = next_entries
+        return first
+
+    def internal_successors(self, node, blocks):
+        """ Get the successors of a node which are in the given blocks """
+        return [
+            s
+            for s in self.successors[node]
+            if s in blocks and s not in self.loop_entries
+        ]
+
+    def has_branches_in(self, node, blocks):
+        """ Test if the node can be reached from the given blocks """
+        if node in self.loop_entries:
+            # Branches to loop entries are continue statements.
+            return False
+        return any(p in blocks for p in node.predecessors)
+
+    def make_basic(self, blocks, entry):
+        self.logger.debug("basic shape %s", entry)
+        blocks.remove(entry)
+        return BasicShape(entry), self.internal_successors(entry, blocks)
+
+    def make_loop(self, blocks, entries):
+        # The loop consists of all blocks which can reach the entries:
+        inner = set(entries)
+        worklist = list(entries)
+        while worklist:
+            node = worklist.pop()
+            for predecessor in node.predecessors:
+                if predecessor in blocks and predecessor not in inner:
+                    inner.add(predecessor)
+                    worklist.append(predecessor)
+        self.logger.debug("loop shape with %s blocks", len(inner))
+
+        blocks -= inner
+        next_entries = set()
+        for node in inner:
+            next_entries.update(self.internal_successors(node, blocks))
+
+        self.loop_entries.update(entries)
+        body = self.process(inner, entries)
+        self.loop_entries.difference_update(entries)
+        return LoopShape(body), self.sort(next_entries)
+
+    def find_independent_groups(self, blocks, entries):
+        """Find for each entry the blocks which only this entry reaches.
+
+        Entries which are reachable from other entries have no group.
+        """
+        owners = {}
+        for entry in entries:
+            reached = {entry}
+            worklist = [entry]
+            while worklist:
+                node = worklist.pop()
+                for successor in self.internal_successors(node, blocks):
+                    if successor not in reached:
+                        reached.add(successor)
+                        worklist.append(successor)
+            for node in reached:
+                if owners.get(node, entry) is entry:
+                    owners[node] = entry
+                else:
+                    owners[node] = None
+
+        groups = {entry: set() for entry in entries if owners[entry] is entry}
+        for node, owner in owners.items():
+            if owner in groups:
+                groups[owner].add(node)
+        return groups
+
+    def make_multiple(self, blocks, entries, groups):
+        exits = {}
+        for entry, group in groups.items():
+            exits[entry] = set()
+            for node in group:
+                for successor in self.internal_successors(node, blocks):
+                    if successor not in group:
+                        exits[entry].add(successor)
+
+        # When all groups but one have no exits, the remaining group
+        # can simply follow the others, which avoids nesting:
+        if len(groups) == len(entries):
+            open_entries = [entry for entry in entries if exits[entry]]
+            if len(open_entries) <= 1:
+                if open_entries:
+                    remaining = open_entries[0]
+                else:
+                    remaining = max(entries, key=lambda e: len(groups[e]))
+                del groups[remaining]
+
+        self.logger.debug("multiple shape with %s groups", len(groups))
+        next_entries = set(entry for entry in entries if entry not in groups)
+        for entry, group in groups.items():
+            blocks -= group
+            next_entries.update(exits[entry])
+        handled = {}
+        for entry in entries:
+            if entry in groups:
+                handled[entry] = self.process(groups[entry], [entry])
+        return MultipleShape(handled), self.sort(next_entries)
+
+    def place_branches(self, shape, frames):
+        """Determine for each branch how it reaches its target.
+
+        The frames are the loop and multiple shapes which contain the
+        shape, innermost last.
+        """
+        while shape is not None:
+            self.shapes.append(shape)
+            if isinstance(shape, BasicShape):
+                follow = shape.next
+                for target in self.successors[shape.content]:
+                    if follow is not None and target in follow.entries:
+                        if not isinstance(follow, MultipleShape):
+                            branch = Branch(target, NEXT, landing=follow)
+                        elif target in follow.handled:
+                            branch = Branch(target, INLINE)
+                        else:
+                            branch = self.resolve(target, frames + [follow])
+                    else:
+                        branch = self.resolve(target, frames)
+                    shape.branches[target] = branch
+                    self.branches.append(branch)
+
+                if isinstance(follow, MultipleShape):
+                    # Place the groups in the branches of this block:
+                    follow.fused = True
+                    self.shapes.append(follow)
+                    for handled in follow.handled.values():
+                        self.place_branches(handled, frames + [follow])
+                    follow = follow.next
+                shape = follow
+            elif isinstance(shape, LoopShape):
+                self.place_branches(shape.body, frames + [shape])
+                shape = shape.next
+            elif isinstance(shape, MultipleShape):
+                for handled in shape.handled.values():
+                    self.place_branches(handled, frames + [shape])
+                shape = shape.next
+            else:  # pragma: no cover
+                raise NotImplementedError(str(shape))
+
+    def resolve(self, target, frames):
+        """Find the way from within the given frames to the target.
+
+        Every loop or multiple shape which is left on the way, records
+        the next step to take after it in its escapes.
+        """
+        steps = []
+        crossed = []
+        for frame in reversed(frames):
+            if isinstance(frame, LoopShape):
+                if target in frame.entries:
+                    steps.append(CONTINUE)
+                    landing = frame.body
+                    break
+                steps.append(BREAK)
+            else:
+                steps.append(FALL)
+            crossed.append(frame)
+            if frame.next is not None and target in frame.next.entries:
+                landing = frame.next
+                break
+        else:  # pragma: no cover
+            raise ValueError("No way to reach {}".format(target))
+
+        for frame, step in zip(crossed, steps[1:]):
+            frame.escapes[target] = step
+        return Branch(target, steps[0], crossed, landing)
+
+
+def needs_label(shape):
+    """ Test if the label must be set before entering the given shape """
+    if isinstance(shape, MultipleShape):
+        return not shape.fused
+    elif isinstance(shape, LoopShape):
+        return needs_label(shape.body)
+    else:
+        return False
 
 
 class Shape:
     """ A control flow shape. """
 
     def __init__(self):
-        pass
+        self.next = None  # The shape following this shape
+        self.entries = frozenset()
 
 
 class BasicShape(Shape):
     def __init__(self, content):
         super().__init__()
         self.content = content
+        self.branches = {}
+
+    def __repr__(self):
+        return "Basic-shape {}".format(self.content)
 
 
 class BreakShape(Shape):
@@ -258,6 +579,8 @@ class LoopShape(Shape):
     def __init__(self, body):
         super().__init__()
         self.body = body
+        self.escapes = {}
+        self.guarded = False
 
     def __repr__(self):
         return "Loop-shape"
@@ -274,6 +597,18 @@ class IfShape(Shape):
 
 
 class MultipleShape(Shape):
-    """ Can be a switch statement? """
+    """Executes one of several shapes, selected by the label variable.
+
+    When the multiple shape directly follows a basic shape, the handled
+    shapes are placed in the branches of that block instead.
+    """
 
-    pass
+    def __init__(self, handled):
+        super().__init__()
+        self.handled = handled
+        self.escapes = {}
+        self.guarded = False
+        self.fused = False
+
+    def __repr__(self):
+        return "Multiple-shape"
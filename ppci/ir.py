@@ -198,6 +198,16 @@ class Module:
         self._variables.append(variable)
         variable.module = self
 
+    def remove_function(self, function):
+        """ Remove a function from this module """
+        self._functions.remove(function)
+        function.module = None
+
+    def remove_variable(self, variable):
+        """ Remove a variable from this module """
+        self._variables.remove(variable)
+        variable.module = None
+
     def display(self):
         """ Display this module """
         from .irutils import print_module
@@ -230,9 +240,13 @@ class Module:
 
 
 class Value:
-    """ Base of all values """
+    """Base of all values.
 
-    __slots__ = ('name', 'ty', 'used_by')
+    The name, ty and _used_by slots are declared by the subclasses, so
+    that local values can also derive from :class:`Instruction`.
+    """
+
+    __slots__ = ()
 
     def __init__(self, name: str, ty: Typ):
         # Has a name and a type?
@@ -243,17 +257,22 @@ class Value:
         if not isinstance(ty, Typ):
             raise TypeError("ty argument must be an instance of Typ")
         self.ty = ty
-        self.used_by = OrderedSet()
+        self._used_by = {}  # Ordered set of users, as keys of a dict
+
+    @property
+    def used_by(self):
+        """ The instructions using this value, as a set like view """
+        return self._used_by.keys()
 
     def add_user(self, i):
         """ Add a usage for this value """
         assert isinstance(i, Instruction)
-        self.used_by.add(i)
+        self._used_by[i] = None
 
     def del_user(self, i):
         """ Add a usage for this value """
         assert isinstance(i, Instruction)
-        self.used_by.remove(i)
+        del self._used_by[i]
 
     @property
     def is_used(self):
@@ -263,7 +282,7 @@ class Value:
     @property
     def use_count(self):
         """ Determine how often this values is used """
-        return len(self.used_by)
+        return len(self._used_by)
 
     def replace_by(self, value):
         """ Replace all uses of this value by another value """
@@ -286,7 +305,7 @@ class Binding:
 class GlobalValue(Value):
     """ A global value (with a name and an address) """
 
-    __slots__ = ('binding',)
+    __slots__ = ("name", "ty", "_used_by", "binding")
 
     def __init__(self, name, binding):
         super().__init__(name, ptr)
@@ -361,12 +380,30 @@ class SubRoutine(GlobalValue):
 
     def __init__(self, name, binding):
         super().__init__(name, binding)
+        # Incremented on each change, so that analysis results such as
+        # verification can be reused while this routine is unchanged:
+        self.modification_count = 0
+
         self.blocks = []
         self.entry = None
         self.defined_names = OrderedSet()
         self.unique_counter = 0
         self.arguments = []
 
+    def note_modification(self):
+        """ Record that the blocks or instructions of this routine changed """
+        self.modification_count += 1
+
+    @property
+    def entry(self):
+        """ The entry block of this routine """
+        return self._entry
+
+    @entry.setter
+    def entry(self, block):
+        self._entry = block
+        self.note_modification()
+
     def make_unique_name(self, dut):
         """ Check if the name of the given dut is unique
             and if not make it so.
@@ -477,18 +514,21 @@ class SubRoutine(GlobalValue):
         block.function = self
         self.make_unique_name(block)
         self.blocks.append(block)
+        self.note_modification()
         return block
 
     def remove_block(self, block):
         """ Remove a block from this function """
         block.function = None
         self.blocks.remove(block)
+        self.note_modification()
 
     def add_parameter(self, parameter):
         """ Add an argument to this function """
         assert isinstance(parameter, Parameter)
         parameter.num = len(self.arguments)
         self.arguments.append(parameter)
+        self.note_modification()
         # p.parent = self.entry
 
     def num_instructions(self):
@@ -540,11 +580,29 @@ class Block:
     :class:`FinalInstruction`.
     """
 
+    __slots__ = (
+        "name",
+        "function",
+        "instructions",
+        "_references",
+        "execution_count",
+        "successor_counts",
+    )
+
     def __init__(self, name):
         self.name = name
         self.function = None
         self.instructions = list()
-        self.references = OrderedSet()
+        self._references = {}  # Ordered set of jumps to this block
+
+        # Profile information, see ppci.irutils.profile:
+        self.execution_count = None
+        self.successor_counts = None
+
+    def note_modification(self):
+        """ Record a change in the function containing this block """
+        if self.function is not None:
+            self.function.note_modification()
 
     def dump(self):
         print("  ", self)
@@ -579,6 +637,7 @@ class Block:
         self.instructions.insert(pos, instruction)
         if isinstance(instruction, Value):
             self.function.make_unique_name(instruction)
+        self.note_modification()
 
     def add_instruction(self, instruction):
         """ Add an instruction to the end of this block """
@@ -588,11 +647,13 @@ class Block:
         self.instructions.append(instruction)
         if isinstance(instruction, Value):
             self.function.make_unique_name(instruction)
+        self.note_modification()
 
     def remove_instruction(self, instruction):
         """ Remove instruction from block """
         instruction.block = None
         self.instructions.remove(instruction)
+        self.note_modification()
         return instruction
 
     @property
@@ -634,6 +695,11 @@ class Block:
         else:
             return []
 
+    @property
+    def references(self):
+        """ The instructions jumping to this block, as a set like view """
+        return self._references.keys()
+
     @property
     def predecessors(self):
         """ Return all predecessing blocks """
@@ -642,7 +708,7 @@ class Block:
     @property
     def is_used(self):
         """ True if this block is referenced by an instruction """
-        return len(self.references) > 0
+        return len(self._references) > 0
 
     def change_target(self, old, new):
         """ Change the target of this block from old to new """
@@ -671,14 +737,16 @@ class Block:
 
 
 def value_use(name):
-    """ Creates a property that also keeps track of usage """
+    """Creates a property that also keeps track of usage.
+
+    The value is stored in a slot with the name prefixed by an underscore,
+    which the class must declare.
+    """
+    slot = "_" + name
 
     def getter(self):
         """ Gets the value """
-        if name in self._var_map:
-            return self._var_map[name]
-        else:  # pragma: no cover
-            raise KeyError(name)
+        return getattr(self, slot)
 
     def setter(self, value):
         """ Sets the value """
@@ -687,44 +755,78 @@ def value_use(name):
                 "Expecting a Value instance, but got {}".format(value)
             )
         # If value was already set, remove usage
-        if name in self._var_map:
-            self.del_use(self._var_map[name])
+        old = getattr(self, slot, None)
+        if old is not None:
+            self.del_use(old)
 
-        # Place the value in the var map:
-        self._var_map[name] = value
+        # Place the value in the slot:
+        setattr(self, slot, value)
 
         # Add usage:
         self.add_use(value)
 
+    getter.value_use = name
     return property(getter, setter)
 
 
+def _used_names(cls, kind):
+    """ Get the names of value or block uses of a class, in order """
+    names = []
+    for klass in reversed(cls.__mro__):
+        for attribute in vars(klass).values():
+            if isinstance(attribute, property):
+                name = getattr(attribute.fget, kind, None)
+                if name is not None and name not in names:
+                    names.append(name)
+    return tuple(names)
+
+
 class Instruction:
     """ Base class for all instructions that go into a basic block """
 
+    __slots__ = ("block", "_uses")
+
+    # Names of the properties created with value_use:
+    _value_uses = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._value_uses = _used_names(cls, "value_use")
+
     def __init__(self):
-        # Create a collection to store the values this value uses.
-        # TODO: think of better naming..
-        self._var_map = {}
         self.block = None
-        self.uses = OrderedSet()
+        # Instructions use only a few values, so a list is most compact:
+        self._uses = []
+
+    @property
+    def uses(self):
+        """ The values used by this instruction, as a set like view """
+        return dict.fromkeys(self._uses).keys()
 
     @property
     def function(self):
         """ Return the function this instruction is part of """
         return self.block.function
 
+    def note_modification(self):
+        """ Record a change in the function containing this instruction """
+        if self.block is not None:
+            self.block.note_modification()
+
     def add_use(self, value):
         """ Add v to the list of values used by this instruction """
         if not isinstance(value, Value):
             raise TypeError("Expected Value, but got {}".format(value))
-        self.uses.add(value)
+        if value not in self._uses:
+            self._uses.append(value)
         value.add_user(self)
+        self.note_modification()
 
     def del_use(self, v):
         assert isinstance(v, Value)
-        self.uses.remove(v)
+        self._uses.remove(v)
         v.del_user(self)
+        self.note_modification()
 
     def delete(self):
         for use in list(self.uses):
@@ -741,13 +843,17 @@ class Instruction:
         """ replace value usage 'old' with new value, updating the def-use
             information.
         """
-        # TODO: update reference
-        # assert old in self._var_map.values()
-        for name in self._var_map:
-            if self._var_map[name] is old:
-                self.del_use(old)
-                self._var_map[name] = new
-                self.add_use(new)
+        # The same value can be used several times, as in 'a * a':
+        slots = [
+            "_" + name
+            for name in self._value_uses
+            if getattr(self, "_" + name, None) is old
+        ]
+        if slots:
+            self.del_use(old)
+            for slot in slots:
+                setattr(self, slot, new)
+            self.add_use(new)
 
     def remove_from_block(self):
         for use in list(self.uses):
@@ -774,6 +880,8 @@ class Instruction:
 class LocalValue(Value, Instruction):
     """ An instruction that results in a value has a type and a name """
 
+    __slots__ = ("name", "ty", "_used_by")
+
     def __init__(self, name: str, ty: Typ):
         super().__init__(name, ty)
 
@@ -808,6 +916,8 @@ class LocalValue(Value, Instruction):
 class AddressOf(LocalValue):
     """ This instruction takes the address of a block of data """
 
+    __slots__ = ("_src",)
+
     src = value_use("src")
 
     def __init__(self, src, name: str):
@@ -825,6 +935,8 @@ class AddressOf(LocalValue):
 class Cast(LocalValue):
     """ Base type conversion instruction """
 
+    __slots__ = ("_src",)
+
     src = value_use("src")
 
     def __init__(self, value, name, ty):
@@ -838,6 +950,8 @@ class Cast(LocalValue):
 class Undefined(LocalValue):
     """ Undefined value, this value must never be used. """
 
+    __slots__ = ()
+
     def __str__(self):
         return "{} = undefined".format(self.name)
 
@@ -845,6 +959,8 @@ class Undefined(LocalValue):
 class Const(LocalValue):
     """ Represents a constant value """
 
+    __slots__ = ("value",)
+
     def __init__(self, value, name, ty):
         super().__init__(name, ty)
         self.value = value
@@ -859,6 +975,8 @@ class LiteralData(LocalValue):
         instruction, a label and its data is emitted in the literal area
     """
 
+    __slots__ = ("data",)
+
     def __init__(self, data, name):
         super().__init__(name, BlobDataTyp(len(data), 1))
         self.data = data
@@ -872,6 +990,8 @@ class LiteralData(LocalValue):
 class FunctionCall(LocalValue):
     """ Call a function with some arguments and a return value """
 
+    __slots__ = ("_callee", "arguments")
+
     callee = value_use("callee")
 
     def __init__(self, callee, arguments, name, ty):
@@ -894,9 +1014,9 @@ class FunctionCall(LocalValue):
     def replace_use(self, old, new):
         super().replace_use(old, new)
         if old in self.arguments:
-            idx = self.arguments.index(old)
+            # The same value can be passed several times:
             self.del_use(old)
-            self.arguments[idx] = new
+            self.arguments = [new if a is old else a for a in self.arguments]
             self.add_use(new)
 
     def __str__(self):
@@ -909,6 +1029,8 @@ class FunctionCall(LocalValue):
 class ProcedureCall(Instruction):
     """ Call a procedure with some arguments """
 
+    __slots__ = ("_callee", "arguments")
+
     callee = value_use("callee")
 
     def __init__(self, callee, arguments):
@@ -929,9 +1051,9 @@ class ProcedureCall(Instruction):
     def replace_use(self, old, new):
         super().replace_use(old, new)
         if old in self.arguments:
-            idx = self.arguments.index(old)
+            # The same value can be passed several times:
             self.del_use(old)
-            self.arguments[idx] = new
+            self.arguments = [new if a is old else a for a in self.arguments]
             self.add_use(new)
 
     def __str__(self):
@@ -942,6 +1064,8 @@ class ProcedureCall(Instruction):
 class Unop(LocalValue):
     """ Generic unary operation """
 
+    __slots__ = ("_a", "operation")
+
     ops = ["-", "~"]  # someday perhaps: 'floor', 'sqrt'
     a = value_use("a")
 
@@ -965,6 +1089,8 @@ class Unop(LocalValue):
 class Binop(LocalValue):
     """ Generic binary operation """
 
+    __slots__ = ("_a", "_b", "operation")
+
     ops = ["+", "-", "*", "/", "%", "|", "&", "^", "<<", ">>", "rol", "ror"]
     a = value_use("a")
     b = value_use("b")
@@ -1016,6 +1142,8 @@ class Phi(LocalValue):
     the IR-code to be in SSA form.
     """
 
+    __slots__ = ("inputs",)
+
     def __init__(self, name, ty):
         super().__init__(name, ty)
         self.inputs = {}
@@ -1035,11 +1163,11 @@ class Phi(LocalValue):
     def replace_use(self, old, new):
         """ Replace old value reference by new value reference """
         assert old in self.inputs.values()
+        self.del_use(old)
         for inp in self.inputs:
-            if self.inputs[inp] == old:
-                self.del_use(old)
+            if self.inputs[inp] is old:
                 self.inputs[inp] = new
-                self.add_use(new)
+        self.add_use(new)
 
     def set_incoming(self, block, value):
         """ Set the value for the phi node when entering through block """
@@ -1050,7 +1178,7 @@ class Phi(LocalValue):
                 )
             )
         if block in self.inputs:
-            self.del_use(self.inputs[block])
+            self.del_incoming(block)
         self.inputs[block] = value
         self.add_use(value)
 
@@ -1061,12 +1189,16 @@ class Phi(LocalValue):
     def del_incoming(self, block):
         """ Remove incoming branch from this phi node and delete the usage """
         value = self.inputs.pop(block)
-        self.del_use(value)
+        # The value can still come in through another branch:
+        if value not in self.inputs.values():
+            self.del_use(value)
 
 
 class Alloc(LocalValue):
     """ Allocates space on the stack. The type of this value is a ptr """
 
+    __slots__ = ("amount", "alignment")
+
     def __init__(self, name: str, amount: int, alignment: int):
         super().__init__(name, BlobDataTyp(amount, alignment))
 
@@ -1096,6 +1228,8 @@ class Alloc(LocalValue):
 class CopyBlob(Instruction):
     """ Sort of memcpy operation. """
 
+    __slots__ = ("_dst", "_src", "amount")
+
     dst = value_use("dst")
     src = value_use("src")
 
@@ -1150,6 +1284,8 @@ class Variable(GlobalValue):
 class Parameter(LocalValue):
     """ Parameter of a :class:`SubRoutine`. """
 
+    __slots__ = ("num",)
+
     def __init__(self, name, ty):
         super().__init__(name, ty)
 
@@ -1167,6 +1303,8 @@ class Load(LocalValue):
         volatile: whether or not this memory access is volatile.
     """
 
+    __slots__ = ("_address", "volatile")
+
     address = value_use("address")
 
     def __init__(self, address, name, ty, volatile=False):
@@ -1184,6 +1322,8 @@ class Load(LocalValue):
 class Store(Instruction):
     """ Store a value into memory """
 
+    __slots__ = ("_address", "_value", "volatile")
+
     address = value_use("address")
     value = value_use("value")
 
@@ -1213,6 +1353,9 @@ class Store(Instruction):
 
 class InlineAsm(Instruction):
     """ Inline assembly code. """
+
+    __slots__ = ("template", "clobbers", "input_values", "output_values")
+
     def __init__(self, template, clobbers):
         super().__init__()
         self.template = template
@@ -1232,9 +1375,10 @@ class InlineAsm(Instruction):
     def replace_use(self, old, new):
         super().replace_use(old, new)
         if old in self.input_values:
-            idx = self.input_values.index(old)
             self.del_use(old)
-            self.input_values[idx] = new
+            self.input_values = [
+                new if v is old else v for v in self.input_values
+            ]
             self.add_use(new)
 
     def __str__(self):
@@ -1249,6 +1393,8 @@ class FinalInstruction(Instruction):
     instruction.
     """
 
+    __slots__ = ()
+
     pass
 
 
@@ -1259,9 +1405,11 @@ class Exit(FinalInstruction):
     in a :class:`Procedure`.
     """
 
-    def __init__(self):
-        super().__init__()
-        self.targets = []
+    __slots__ = ()
+
+    @property
+    def targets(self):
+        return []
 
     def __str__(self):
         return "exit"
@@ -1273,78 +1421,103 @@ class Return(FinalInstruction):
     This instruction is only legal in a :class:`Function`.
     """
 
+    __slots__ = ("_result",)
+
     result = value_use("result")
 
     def __init__(self, result):
         super().__init__()
         self.result = result
-        self.targets = []
+
+    @property
+    def targets(self):
+        return []
 
     def __str__(self):
         return "return {}".format(self.result.name)
 
 
 def block_use(name):
-    """ Creates a property that can be set and changed """
+    """Creates a property that can be set and changed.
+
+    Like with :func:`value_use`, the block is stored in a slot with the
+    name prefixed by an underscore.
+    """
+    slot = "_" + name
 
     def getter(self):
         """ Gets the block reference """
-        if name in self._block_map:
-            return self._block_map[name]
-        else:  # pragma: no cover
-            raise KeyError("No such block!")
+        return getattr(self, slot)
 
     def setter(self, block):
         """ Sets the block reference """
         assert isinstance(block, Block)
         self.set_target_block(name, block)
 
+    getter.block_use = name
     return property(getter, setter)
 
 
 class JumpBase(FinalInstruction):
     """ Base of all jumping instructions """
 
-    def __init__(self):
-        super().__init__()
-        self._block_map = {}
+    __slots__ = ()
+
+    # Names of the properties created with block_use:
+    _block_uses = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._block_uses = _used_names(cls, "block_use")
 
     def set_target_block(self, name, block):
         """ Set the target 'name' to block. Take into account that a block
             may already be pointed, so remove this reference!
         """
         # If block was present, remove this instruction from the block preds:
-        if name in self._block_map:
-            old_block = self._block_map[name]
-            # check if old_block occurs only once in the block_map:
-            if list(self._block_map.values()).count(old_block) == 1:
-                old_block.references.remove(self)
+        slot = "_" + name
+        old_block = getattr(self, slot, None)
+        if old_block is not None:
+            # check if old_block occurs only once in the targets:
+            if self.targets.count(old_block) == 1:
+                del old_block._references[self]
 
         # Use the new block:
-        self._block_map[name] = block
-        self._block_map[name].references.add(self)
+        setattr(self, slot, block)
+        block._references[self] = None
+        self.note_modification()
 
     def delete(self):
         """ Clear references """
-        while self._block_map:
-            _, block = self._block_map.popitem()
-            block.references.remove(self)
+        for name in self._block_uses:
+            block = getattr(self, "_" + name, None)
+            if block is not None:
+                block._references.pop(self, None)
+                delattr(self, "_" + name)
+        self.note_modification()
 
     @property
     def targets(self):
         """ Gets a list of targets that this instruction jumps to """
-        return list(self._block_map.values())
+        targets = []
+        for name in self._block_uses:
+            block = getattr(self, "_" + name, None)
+            if block is not None:
+                targets.append(block)
+        return targets
 
     def change_target(self, old, new):
         """ Change the target old into new """
-        for name in self._block_map:
-            if self._block_map[name] is old:
+        for name in self._block_uses:
+            if getattr(self, "_" + name, None) is old:
                 self.set_target_block(name, new)
 
 
 class Jump(JumpBase):
     """ Jump statement to another :class:`Block` within the same function """
 
+    __slots__ = ("_target",)
+
     target = block_use("target")
 
     def __init__(self, target):
@@ -1358,6 +1531,8 @@ class Jump(JumpBase):
 class CJump(JumpBase):
     """ Conditional jump to true or false labels. """
 
+    __slots__ = ("_a", "_b", "cond", "_lab_yes", "_lab_no")
+
     conditions = ["==", "<", ">", ">=", "<=", "!="]
     a = value_use("a")
     b = value_use("b")
@@ -1390,6 +1565,8 @@ class JumpTable(JumpBase):
     In the worst case, this is expanded to a whole bunch of CJump statements.
     """
 
+    __slots__ = ("_v", "table", "_lab_default")
+
     v = value_use("v")
     lab_default = block_use("lab_default")
 
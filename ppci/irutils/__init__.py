@@ -5,13 +5,16 @@ from .verify import verify_module, Verifier
 from .writer import Writer, print_module
 from .reader import Reader, read_module
 from .builder import Builder, split_block
-from .link import ir_link
+from .link import ir_link, internalize
 from .io import to_json, from_json
-from .instrument import add_tracer
+from .binary import to_binary, from_binary, read_binary, write_binary
+from .instrument import add_tracer, add_block_counters
+from .profile import Profile, apply_profile
 
 __all__ = [
     "Builder",
     "ir_link",
+    "internalize",
     "print_module",
     "read_module",
     "Reader",
@@ -21,5 +24,12 @@ __all__ = [
     "Writer",
     "to_json",
     "from_json",
+    "to_binary",
+    "from_binary",
+    "read_binary",
+    "write_binary",
     "add_tracer",
+    "add_block_counters",
+    "Profile",
+    "apply_profile",
 ]
@@ -0,0 +1,884 @@
+""" Compact binary serialization of IR-modules.
+
+The binary format is a faster alternative to the textual format and to
+json for passing IR-code between build steps, and for storing it.
+
+All values are numbered. The global values of the module come first,
+followed by the parameters and instructions of a function. Operands of
+an instruction refer to these numbers. Names and types are stored once
+in a string table and a type table, and are referred to by index.
+
+The code of each function is stored in a separate section. The sections
+are only decoded when a function is needed, so that a few functions can
+be loaded from a large module without decoding the whole module.
+
+.. doctest::
+
+    >>> import io
+    >>> from ppci.api import c_to_ir
+    >>> from ppci.irutils import to_binary, from_binary
+    >>> c_src = "int add(int a, int b) { return a + b; }"
+    >>> mod = c_to_ir(io.StringIO(c_src), "x86_64")
+    >>> data = to_binary(mod)
+    >>> mod2 = from_binary(data)
+    >>> mod2.stats()
+    'functions: 1, blocks: 2, instructions: 11'
+
+The layout of the data is as follows. Numbers are unsigned LEB128
+encoded, unless noted otherwise.
+
+- The magic ``ppci-ir\\0`` and the format version.
+- The string table: the number of strings, and per string the length
+  and the utf-8 encoded text.
+- The type table: the number of types, and per type 0 and the name
+  of a basic type, or 1, the size and the alignment of a blob type.
+- The module name, and the number of global values.
+- Per global value its kind and properties. Functions and procedures
+  contain the offset and size of their code section and the numbers of
+  the global values they refer to.
+- The code sections of the functions.
+
+The debug information of a module is not stored.
+"""
+
+import struct
+from .. import ir
+from ..utils.leb128 import signed_leb128_encode
+from .reader import IrParseException
+
+
+MAGIC = b"ppci-ir\x00"
+VERSION = 1
+
+# Kinds of global values:
+EXTERNAL_VARIABLE = 0
+EXTERNAL_PROCEDURE = 1
+EXTERNAL_FUNCTION = 2
+VARIABLE = 3
+PROCEDURE = 4
+FUNCTION = 5
+EXTERNALS = (EXTERNAL_VARIABLE, EXTERNAL_PROCEDURE, EXTERNAL_FUNCTION)
+
+# Instruction codes:
+(
+    LOAD,
+    STORE,
+    ALLOC,
+    ADDRESSOF,
+    BINOP,
+    UNOP,
+    CAST,
+    CONST,
+    LITERALDATA,
+    PHI,
+    JUMP,
+    CJUMP,
+    PROCEDURECALL,
+    FUNCTIONCALL,
+    EXIT,
+    RETURN,
+    COPYBLOB,
+    INLINEASM,
+    UNDEFINED,
+) = range(19)
+
+BINDINGS = [ir.Binding.LOCAL, ir.Binding.GLOBAL]
+BINOPS = ir.Binop.ops
+UNOPS = ir.Unop.ops
+CONDITIONS = ir.CJump.conditions
+DOUBLE = struct.Struct("<d")
+BASIC_TYPES = {ty.name: ty for ty in ir.all_types}
+
+
+def to_binary(module) -> bytes:
+    """Serialize an IR-module into the binary format.
+
+    Args:
+        module: the IR-module to serialize.
+
+    Returns:
+        The bytes which represent the module.
+    """
+    return BinaryWriter().write_module(module)
+
+
+def from_binary(data, functions=None) -> ir.Module:
+    """Construct an IR-module from binary data.
+
+    Args:
+        data: the bytes created by :func:`to_binary`.
+        functions: optional names of the functions to load. The functions
+            and variables which they refer to are loaded as well, all other
+            functions and variables are left out. By default, all
+            functions are loaded.
+
+    Returns:
+        The IR-module.
+    """
+    try:
+        return BinaryReader(data).read_module(functions=functions)
+    except (IndexError, struct.error, UnicodeDecodeError):
+        raise IrParseException("Truncated or corrupt binary IR-module")
+
+
+def write_binary(module, f):
+    """ Write an IR-module in binary format to a file opened in binary mode """
+    f.write(to_binary(module))
+
+
+def read_binary(f, functions=None) -> ir.Module:
+    """ Read a binary IR-module from a file opened in binary mode """
+    return from_binary(f.read(), functions=functions)
+
+
+def is_binary(data) -> bool:
+    """ Test if the given bytes start with a binary IR-module """
+    return data[: len(MAGIC)] == MAGIC
+
+
+def put_uint(out, value):
+    """ Append an unsigned LEB128 number to a bytearray """
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class BinaryWriter:
+    """ Serialize an IR-module into bytes """
+
+    def __init__(self):
+        self.strings = {}
+        self.types = {}
+        self.global_numbers = {}
+        self.local_numbers = {}
+        self.block_numbers = {}
+        self.writers = {
+            ir.Load: self.write_load,
+            ir.Store: self.write_store,
+            ir.Alloc: self.write_alloc,
+            ir.AddressOf: self.write_addressof,
+            ir.Binop: self.write_binop,
+            ir.Unop: self.write_unop,
+            ir.Cast: self.write_cast,
+            ir.Const: self.write_const,
+            ir.LiteralData: self.write_literaldata,
+            ir.Phi: self.write_phi,
+            ir.Jump: self.write_jump,
+            ir.CJump: self.write_cjump,
+            ir.ProcedureCall: self.write_procedurecall,
+            ir.FunctionCall: self.write_functioncall,
+            ir.Exit: self.write_exit,
+            ir.Return: self.write_return,
+            ir.CopyBlob: self.write_copyblob,
+            ir.InlineAsm: self.write_inlineasm,
+            ir.Undefined: self.write_undefined,
+        }
+
+    def write_module(self, module):
+        global_values = list(module.externals)
+        global_values.extend(module.variables)
+        global_values.extend(module.functions)
+        self.global_numbers = {
+            value: number for number, value in enumerate(global_values)
+        }
+
+        # Write the code of the functions first, this fills the tables:
+        sections = []
+        header = bytearray()
+        put_uint(header, self.string(module.name))
+        put_uint(header, len(global_values))
+        offset = 0
+        for value in global_values:
+            if isinstance(value, ir.SubRoutine):
+                section, references = self.write_subroutine(value)
+                self.write_global(header, value)
+                put_uint(header, offset)
+                put_uint(header, len(section))
+                put_uint(header, len(references))
+                for number in references:
+                    put_uint(header, number)
+                sections.append(section)
+                offset += len(section)
+            else:
+                self.write_global(header, value)
+
+        out = bytearray(MAGIC)
+        put_uint(out, VERSION)
+        put_uint(out, len(self.strings))
+        for text in self.strings:
+            data = text.encode("utf-8")
+            put_uint(out, len(data))
+            out.extend(data)
+        put_uint(out, len(self.types))
+        for ty in self.types:
+            if isinstance(ty, ir.BlobDataTyp):
+                out.append(1)
+                put_uint(out, ty.size)
+                put_uint(out, ty.alignment)
+            else:
+                out.append(0)
+                put_uint(out, self.string(ty.name))
+        out.extend(header)
+        for section in sections:
+            out.extend(section)
+        return bytes(out)
+
+    def string(self, text):
+        """ Get the index of a string in the string table """
+        if text not in self.strings:
+            self.strings[text] = len(self.strings)
+        return self.strings[text]
+
+    def type(self, ty):
+        """ Get the index of a type in the type table """
+        if ty not in self.types:
+            if isinstance(ty, (ir.BasicTyp, ir.PointerTyp)):
+                self.string(ty.name)
+            elif not isinstance(ty, ir.BlobDataTyp):  # pragma: no cover
+                raise NotImplementedError(str(ty))
+            self.types[ty] = len(self.types)
+        return self.types[ty]
+
+    def write_global(self, out, value):
+        if isinstance(value, ir.ExternalVariable):
+            out.append(EXTERNAL_VARIABLE)
+            put_uint(out, self.string(value.name))
+        elif isinstance(value, ir.ExternalSubRoutine):
+            if isinstance(value, ir.ExternalFunction):
+                out.append(EXTERNAL_FUNCTION)
+            else:
+                out.append(EXTERNAL_PROCEDURE)
+            put_uint(out, self.string(value.name))
+            put_uint(out, len(value.argument_types))
+            for ty in value.argument_types:
+                put_uint(out, self.type(ty))
+            if isinstance(value, ir.ExternalFunction):
+                put_uint(out, self.type(value.return_ty))
+        elif isinstance(value, ir.Variable):
+            out.append(VARIABLE)
+            put_uint(out, self.string(value.name))
+            put_uint(out, BINDINGS.index(value.binding))
+            put_uint(out, value.amount)
+            put_uint(out, value.alignment)
+            self.write_initial_value(out, value.value)
+        elif isinstance(value, ir.SubRoutine):
+            if isinstance(value, ir.Function):
+                out.append(FUNCTION)
+            else:
+                out.append(PROCEDURE)
+            put_uint(out, self.string(value.name))
+            put_uint(out, BINDINGS.index(value.binding))
+            if isinstance(value, ir.Function):
+                put_uint(out, self.type(value.return_ty))
+        else:  # pragma: no cover
+            raise NotImplementedError(str(value))
+
+    def write_initial_value(self, out, value):
+        """ Write the initial value of a variable, which can be None """
+        if value is None:
+            put_uint(out, 0)
+            return
+
+        put_uint(out, len(value) + 1)
+        for part in value:
+            if isinstance(part, bytes):
+                out.append(0)
+                put_uint(out, len(part))
+                out.extend(part)
+            else:
+                ty, label = part
+                out.append(1)
+                put_uint(out, self.type(ty))
+                put_uint(out, self.string(label))
+
+    def write_subroutine(self, subroutine):
+        """Write the code of a function into a section.
+
+        Returns the section and the numbers of the global values used.
+        """
+        # Number the local values after the global values:
+        global_numbers = self.global_numbers
+        numbers = {}
+        local_values = list(subroutine.arguments)
+        for block in subroutine.blocks:
+            for instruction in block:
+                if isinstance(instruction, ir.LocalValue):
+                    local_values.append(instruction)
+        for value in local_values:
+            numbers[value] = len(global_numbers) + len(numbers)
+
+        # Values which are used, but not defined, are undefined values:
+        references = set()
+        for block in subroutine.blocks:
+            for instruction in block:
+                for value in instruction.uses:
+                    if value in numbers:
+                        continue
+                    elif isinstance(value, ir.LocalValue):
+                        local_values.append(value)
+                        numbers[value] = len(global_numbers) + len(numbers)
+                    elif value in global_numbers:
+                        references.add(global_numbers[value])
+                    else:
+                        raise ValueError(
+                            "{} is not in the module".format(value)
+                        )
+        self.local_numbers = numbers
+        self.block_numbers = {
+            block: number for number, block in enumerate(subroutine.blocks)
+        }
+
+        out = bytearray()
+        put_uint(out, len(subroutine.arguments))
+        put_uint(out, len(local_values))
+        for value in local_values:
+            put_uint(out, self.string(value.name))
+            put_uint(out, self.type(value.ty))
+
+        put_uint(out, len(subroutine.blocks))
+        for block in subroutine.blocks:
+            put_uint(out, self.string(block.name))
+        put_uint(out, self.block_numbers[subroutine.entry])
+
+        writers = self.writers
+        for block in subroutine.blocks:
+            put_uint(out, len(block.instructions))
+            for instruction in block:
+                writers[type(instruction)](out, instruction)
+        return out, sorted(references)
+
+    def value(self, out, value):
+        number = self.local_numbers.get(value)
+        if number is None:
+            number = self.global_numbers[value]
+        put_uint(out, number)
+
+    def block(self, out, block):
+        put_uint(out, self.block_numbers[block])
+
+    def write_load(self, out, instruction):
+        out.append(LOAD)
+        self.value(out, instruction.address)
+        out.append(instruction.volatile)
+
+    def write_store(self, out, instruction):
+        out.append(STORE)
+        self.value(out, instruction.value)
+        self.value(out, instruction.address)
+        out.append(instruction.volatile)
+
+    def write_alloc(self, out, instruction):
+        out.append(ALLOC)
+        put_uint(out, instruction.amount)
+        put_uint(out, instruction.alignment)
+
+    def write_addressof(self, out, instruction):
+        out.append(ADDRESSOF)
+        self.value(out, instruction.src)
+
+    def write_binop(self, out, instruction):
+        out.append(BINOP)
+        self.value(out, instruction.a)
+        out.append(BINOPS.index(instruction.operation))
+        self.value(out, instruction.b)
+
+    def write_unop(self, out, instruction):
+        out.append(UNOP)
+        out.append(UNOPS.index(instruction.operation))
+        self.value(out, instruction.a)
+
+    def write_cast(self, out, instruction):
+        out.append(CAST)
+        self.value(out, instruction.src)
+
+    def write_const(self, out, instruction):
+        out.append(CONST)
+        value = instruction.value
+        if isinstance(value, int):
+            out.append(0)
+            out.extend(signed_leb128_encode(value))
+        elif isinstance(value, float):
+            out.append(1)
+            out.extend(DOUBLE.pack(value))
+        else:  # pragma: no cover
+            raise NotImplementedError(str(value))
+
+    def write_literaldata(self, out, instruction):
+        out.append(LITERALDATA)
+        put_uint(out, len(instruction.data))
+        out.extend(instruction.data)
+
+    def write_phi(self, out, instruction):
+        out.append(PHI)
+        put_uint(out, len(instruction.inputs))
+        for block, value in instruction.inputs.items():
+            self.block(out, block)
+            self.value(out, value)
+
+    def write_jump(self, out, instruction):
+        out.append(JUMP)
+        self.block(out, instruction.target)
+
+    def write_cjump(self, out, instruction):
+        out.append(CJUMP)
+        self.value(out, instruction.a)
+        out.append(CONDITIONS.index(instruction.cond))
+        self.value(out, instruction.b)
+        self.block(out, instruction.lab_yes)
+        self.block(out, instruction.lab_no)
+
+    def write_call(self, out, instruction):
+        self.value(out, instruction.callee)
+        put_uint(out, len(instruction.arguments))
+        for argument in instruction.arguments:
+            self.value(out, argument)
+
+    def write_procedurecall(self, out, instruction):
+        out.append(PROCEDURECALL)
+        self.write_call(out, instruction)
+
+    def write_functioncall(self, out, instruction):
+        out.append(FUNCTIONCALL)
+        self.write_call(out, instruction)
+
+    def write_exit(self, out, instruction):
+        out.append(EXIT)
+
+    def write_return(self, out, instruction):
+        out.append(RETURN)
+        self.value(out, instruction.result)
+
+    def write_copyblob(self, out, instruction):
+        out.append(COPYBLOB)
+        self.value(out, instruction.dst)
+        self.value(out, instruction.src)
+        put_uint(out, instruction.amount)
+
+    def write_inlineasm(self, out, instruction):
+        out.append(INLINEASM)
+        put_uint(out, self.string(instruction.template))
+        put_uint(out, len(instruction.clobbers))
+        for clobber in instruction.clobbers:
+            put_uint(out, self.string(clobber))
+        for values in (instruction.input_values, instruction.output_values):
+            put_uint(out, len(values))
+            for value in values:
+                self.value(out, value)
+
+    def write_undefined(self, out, instruction):
+        out.append(UNDEFINED)
+
+
+class BinaryReader:
+    """Construct IR-modules from binary data.
+
+    The global values are decoded when the reader is created, the code
+    of the functions only when a module is read.
+    """
+
+    def __init__(self, data):
+        if not is_binary(data):
+            raise IrParseException("Not a binary IR-module")
+        self.data = data
+        self.pos = len(MAGIC)
+        version = self.read_uint()
+        if version != VERSION:
+            raise IrParseException(
+                "Unsupported binary IR version {}".format(version)
+            )
+
+        read_uint = self.read_uint
+        self.strings = []
+        for _ in range(read_uint()):
+            self.strings.append(self.read_bytes(read_uint()).decode("utf-8"))
+
+        self.types = []
+        for _ in range(read_uint()):
+            if self.read_byte():
+                self.types.append(ir.BlobDataTyp(read_uint(), read_uint()))
+            else:
+                name = self.read_string()
+                if name not in BASIC_TYPES:
+                    raise IrParseException("Invalid type {}".format(name))
+                self.types.append(BASIC_TYPES[name])
+
+        self.name = self.read_string()
+        self.globals = [self.read_global() for _ in range(read_uint())]
+        self.sections_start = self.pos
+        self.readers = [
+            self.read_load,
+            self.read_store,
+            self.read_alloc,
+            self.read_addressof,
+            self.read_binop,
+            self.read_unop,
+            self.read_cast,
+            self.read_const,
+            self.read_literaldata,
+            self.read_phi,
+            self.read_jump,
+            self.read_cjump,
+            self.read_procedurecall,
+            self.read_functioncall,
+            self.read_exit,
+            self.read_return,
+            self.read_copyblob,
+            self.read_inlineasm,
+            self.read_undefined,
+        ]
+
+    @property
+    def function_names(self):
+        """ The names of the functions and procedures in the module """
+        return [
+            name
+            for kind, name, _, _ in self.globals
+            if kind in (FUNCTION, PROCEDURE)
+        ]
+
+    def read_uint(self):
+        data = self.data
+        pos = self.pos
+        byte = data[pos]
+        pos += 1
+        result = byte & 0x7F
+        shift = 7
+        while byte & 0x80:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            shift += 7
+        self.pos = pos
+        return result
+
+    def read_int(self):
+        """ Read a signed LEB128 number """
+        result = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            result |= (byte & 0x7F) << shift
+            shift += 7
+            if byte & 0x80 == 0:
+                break
+        if byte & 0x40:
+            result -= 1 << shift
+        return result
+
+    def read_byte(self):
+        byte = self.data[self.pos]
+        self.pos += 1
+        return byte
+
+    def read_bytes(self, size):
+        if self.pos + size > len(self.data):
+            raise IrParseException("Unexpected end of binary IR-module")
+        data = bytes(self.data[self.pos : self.pos + size])
+        self.pos += size
+        return data
+
+    def read_string(self):
+        return self.strings[self.read_uint()]
+
+    def read_type(self):
+        return self.types[self.read_uint()]
+
+    def read_global(self):
+        """Read the declaration of a global value.
+
+        Returns the kind, the name, the properties and the references of
+        the global value.
+        """
+        kind = self.read_byte()
+        name = self.read_string()
+        references = ()
+        if kind == EXTERNAL_VARIABLE:
+            properties = ()
+        elif kind in (EXTERNAL_PROCEDURE, EXTERNAL_FUNCTION):
+            argument_types = [
+                self.read_type() for _ in range(self.read_uint())
+            ]
+            if kind == EXTERNAL_FUNCTION:
+                properties = (argument_types, self.read_type())
+            else:
+                properties = (argument_types,)
+        elif kind == VARIABLE:
+            binding = BINDINGS[self.read_uint()]
+            amount = self.read_uint()
+            alignment = self.read_uint()
+            value = self.read_initial_value()
+            properties = (binding, amount, alignment, value)
+            if value:
+                references = [
+                    part[1] for part in value if isinstance(part, tuple)
+                ]
+        elif kind in (PROCEDURE, FUNCTION):
+            binding = BINDINGS[self.read_uint()]
+            return_ty = self.read_type() if kind == FUNCTION else None
+            offset = self.read_uint()
+            size = self.read_uint()
+            references = [self.read_uint() for _ in range(self.read_uint())]
+            properties = (binding, return_ty, offset, size)
+        else:
+            raise IrParseException("Invalid global value kind {}".format(kind))
+        return kind, name, properties, references
+
+    def read_initial_value(self):
+        count = self.read_uint()
+        if count == 0:
+            return None
+
+        parts = []
+        for _ in range(count - 1):
+            if self.read_byte():
+                parts.append((self.read_type(), self.read_string()))
+            else:
+                parts.append(self.read_bytes(self.read_uint()))
+        return tuple(parts)
+
+    def select(self, functions):
+        """ Determine the numbers of the global values to load """
+        numbers = {}
+        selected = set()
+        for number, (kind, name, _, _) in enumerate(self.globals):
+            numbers[name] = number
+            if kind in EXTERNALS:
+                selected.add(number)
+
+        stack = []
+        for name in functions:
+            if name not in numbers:
+                raise KeyError("No function {} in module".format(name))
+            stack.append(numbers[name])
+        while stack:
+            number = stack.pop()
+            if number in selected:
+                continue
+            selected.add(number)
+            kind, _, _, references = self.globals[number]
+            for reference in references:
+                if kind == VARIABLE:
+                    if reference in numbers:
+                        stack.append(numbers[reference])
+                else:
+                    stack.append(reference)
+        return selected
+
+    def read_module(self, functions=None) -> ir.Module:
+        """ Construct the IR-module, with all or the given functions """
+        if functions is None:
+            selected = range(len(self.globals))
+        else:
+            selected = sorted(self.select(functions))
+
+        module = ir.Module(self.name)
+        self.values = [None] * len(self.globals)
+        subroutines = []
+        for number in selected:
+            kind, name, properties, _ = self.globals[number]
+            if kind == EXTERNAL_VARIABLE:
+                value = ir.ExternalVariable(name)
+                module.add_external(value)
+            elif kind == EXTERNAL_PROCEDURE:
+                value = ir.ExternalProcedure(name, *properties)
+                module.add_external(value)
+            elif kind == EXTERNAL_FUNCTION:
+                value = ir.ExternalFunction(name, *properties)
+                module.add_external(value)
+            elif kind == VARIABLE:
+                value = ir.Variable(name, *properties)
+                module.add_variable(value)
+            else:
+                binding, return_ty, offset, size = properties
+                if kind == FUNCTION:
+                    value = ir.Function(name, binding, return_ty)
+                else:
+                    value = ir.Procedure(name, binding)
+                module.add_function(value)
+                subroutines.append((value, offset))
+            self.values[number] = value
+
+        for subroutine, offset in subroutines:
+            self.pos = self.sections_start + offset
+            self.read_subroutine(subroutine)
+        return module
+
+    def read_subroutine(self, subroutine):
+        read_uint = self.read_uint
+        num_parameters = read_uint()
+        num_locals = read_uint()
+        self.local_names = []
+        self.local_types = []
+        for _ in range(num_locals):
+            self.local_names.append(self.read_string())
+            self.local_types.append(self.read_type())
+        self.local_values = [None] * num_locals
+
+        for number in range(num_parameters):
+            parameter = ir.Parameter(
+                self.local_names[number], self.local_types[number]
+            )
+            subroutine.add_parameter(parameter)
+            self.local_values[number] = parameter
+        self.number = num_parameters
+
+        self.blocks = []
+        for _ in range(read_uint()):
+            block = ir.Block(self.read_string())
+            subroutine.add_block(block)
+            self.blocks.append(block)
+        subroutine.entry = self.blocks[read_uint()]
+
+        # The blocks are known to be well formed, so the instructions are
+        # added without the checks of add_instruction:
+        self.subroutine = subroutine
+        readers = self.readers
+        read_byte = self.read_byte
+        for block in self.blocks:
+            instructions = block.instructions
+            for _ in range(read_uint()):
+                instruction = readers[read_byte()]()
+                instruction.block = block
+                instructions.append(instruction)
+
+    def read_value(self):
+        number = self.read_uint() - len(self.values)
+        if number < 0:
+            return self.values[number]
+
+        value = self.local_values[number]
+        if value is None:
+            # Refer to the value before it is defined:
+            value = ir.Undefined(
+                self.local_names[number], self.local_types[number]
+            )
+            self.local_values[number] = value
+        return value
+
+    def read_block(self):
+        return self.blocks[self.read_uint()]
+
+    def define(self, value):
+        """ Give the local value its number """
+        number = self.number
+        placeholder = self.local_values[number]
+        if placeholder is not None:
+            placeholder.replace_by(value)
+        self.local_values[number] = value
+        self.number = number + 1
+        self.subroutine.make_unique_name(value)
+        return value
+
+    def name_and_type(self):
+        """ Get the name and the type of the next local value """
+        return self.local_names[self.number], self.local_types[self.number]
+
+    def read_load(self):
+        name, ty = self.name_and_type()
+        address = self.read_value()
+        volatile = bool(self.read_byte())
+        return self.define(ir.Load(address, name, ty, volatile=volatile))
+
+    def read_store(self):
+        value = self.read_value()
+        address = self.read_value()
+        volatile = bool(self.read_byte())
+        return ir.Store(value, address, volatile=volatile)
+
+    def read_alloc(self):
+        name, _ = self.name_and_type()
+        amount = self.read_uint()
+        alignment = self.read_uint()
+        return self.define(ir.Alloc(name, amount, alignment))
+
+    def read_addressof(self):
+        name, _ = self.name_and_type()
+        return self.define(ir.AddressOf(self.read_value(), name))
+
+    def read_binop(self):
+        name, ty = self.name_and_type()
+        a = self.read_value()
+        operation = BINOPS[self.read_byte()]
+        b = self.read_value()
+        return self.define(ir.Binop(a, operation, b, name, ty))
+
+    def read_unop(self):
+        name, ty = self.name_and_type()
+        operation = UNOPS[self.read_byte()]
+        a = self.read_value()
+        return self.define(ir.Unop(operation, a, name, ty))
+
+    def read_cast(self):
+        name, ty = self.name_and_type()
+        return self.define(ir.Cast(self.read_value(), name, ty))
+
+    def read_const(self):
+        name, ty = self.name_and_type()
+        if self.read_byte():
+            (value,) = DOUBLE.unpack(self.read_bytes(DOUBLE.size))
+        else:
+            value = self.read_int()
+        return self.define(ir.Const(value, name, ty))
+
+    def read_literaldata(self):
+        name, _ = self.name_and_type()
+        data = self.read_bytes(self.read_uint())
+        return self.define(ir.LiteralData(data, name))
+
+    def read_phi(self):
+        name, ty = self.name_and_type()
+        phi = self.define(ir.Phi(name, ty))
+        for _ in range(self.read_uint()):
+            block = self.read_block()
+            phi.set_incoming(block, self.read_value())
+        return phi
+
+    def read_jump(self):
+        return ir.Jump(self.read_block())
+
+    def read_cjump(self):
+        a = self.read_value()
+        cond = CONDITIONS[self.read_byte()]
+        b = self.read_value()
+        lab_yes = self.read_block()
+        lab_no = self.read_block()
+        return ir.CJump(a, cond, b, lab_yes, lab_no)
+
+    def read_call(self):
+        callee = self.read_value()
+        arguments = [self.read_value() for _ in range(self.read_uint())]
+        return callee, arguments
+
+    def read_procedurecall(self):
+        return ir.ProcedureCall(*self.read_call())
+
+    def read_functioncall(self):
+        name, ty = self.name_and_type()
+        callee, arguments = self.read_call()
+        return self.define(ir.FunctionCall(callee, arguments, name, ty))
+
+    def read_exit(self):
+        return ir.Exit()
+
+    def read_return(self):
+        return ir.Return(self.read_value())
+
+    def read_copyblob(self):
+        dst = self.read_value()
+        src = self.read_value()
+        return ir.CopyBlob(dst, src, self.read_uint())
+
+    def read_inlineasm(self):
+        template = self.read_string()
+        clobbers = [self.read_string() for _ in range(self.read_uint())]
+        instruction = ir.InlineAsm(template, clobbers)
+        for _ in range(self.read_uint()):
+            instruction.add_input_variable(self.read_value())
+        for _ in range(self.read_uint()):
+            instruction.add_output_variable(self.read_value())
+        return instruction
+
+    def read_undefined(self):
+        name, ty = self.name_and_type()
+        return self.define(ir.Undefined(name, ty))
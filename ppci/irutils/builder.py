@@ -32,6 +32,12 @@ def split_block(block, pos=None, newname="splitblock"):
     block2.instructions = rest
     for instruction in rest:
         instruction.block = block2
+    block.note_modification()
+
+    # Both parts run equally often, and the profiled branches move along:
+    block2.execution_count = block.execution_count
+    block2.successor_counts = block.successor_counts
+    block.successor_counts = None
 
     # Update successor phi nodes:
     for phi in downstream_phis:
@@ -3,6 +3,7 @@
 
 import logging
 from .. import ir
+from .profile import CounterMap
 
 
 def add_tracer(ir_module, trace_function_name="trace"):
@@ -21,3 +22,87 @@ def add_tracer(ir_module, trace_function_name="trace"):
         entry.insert_instruction(trace_call)
         entry.insert_instruction(name_ptr)
         entry.insert_instruction(name_literal)
+
+
+def add_block_counters(ir_module, name="ppci_profile_counters", edges=True):
+    """Instrument the given ir-module with execution counters.
+
+    Each block increments its own counter when it is executed. When
+    `edges` is True, the branches of conditional jumps are counted as
+    well, by placing a small counting block on each branch.
+
+    The counters are placed in a global variable called `name`, and an
+    exported function `name + '_address'` returns their address.
+
+    Returns a :class:`ppci.irutils.profile.CounterMap`, which can
+    decode the counter memory into a profile after the program ran.
+    """
+    logger = logging.getLogger("instrument")
+    counter_map = CounterMap(name)
+    counters = ir.Variable(
+        name, ir.Binding.GLOBAL, 0, counter_map.counter_size
+    )
+    logger.info("Add block counters to %s", ir_module)
+
+    for function in ir_module.functions:
+        for block in list(function.blocks):
+            offset = counter_map.new_counter((function.name, block.name))
+            _add_increment(block, counters, offset)
+
+        if edges:
+            for block in list(function.blocks):
+                jump = block.last_instruction
+                if not isinstance(jump, ir.CJump):
+                    continue
+                if jump.lab_yes is jump.lab_no:
+                    continue
+                for label in ("lab_yes", "lab_no"):
+                    target = getattr(jump, label)
+                    key = (function.name, block.name, target.name)
+                    offset = counter_map.new_counter(key)
+                    edge_block = _split_edge(block, jump, label)
+                    _add_increment(edge_block, counters, offset)
+
+    # Reserve at least some memory, so that the variable has an address:
+    counters.amount = max(counter_map.size, counter_map.counter_size)
+    ir_module.add_variable(counters)
+
+    # Provide a way to find the counters at runtime:
+    address_function = ir.Function(
+        counter_map.address_function_name, ir.Binding.GLOBAL, ir.ptr
+    )
+    entry = ir.Block("entry")
+    address_function.add_block(entry)
+    address_function.entry = entry
+    entry.add_instruction(ir.Return(counters))
+    ir_module.add_function(address_function)
+    return counter_map
+
+
+def _add_increment(block, counters, offset):
+    """ Increment the counter at the given offset on entry of the block """
+    ty = ir.i32
+    instructions = [
+        ir.Const(offset, "counter_offset", ir.ptr),
+        ir.Const(1, "one", ty),
+    ]
+    address = ir.add(counters, instructions[0], "counter_address", ir.ptr)
+    load = ir.Load(address, "count", ty)
+    count = ir.add(load, instructions[1], "new_count", ty)
+    instructions.extend([address, load, count, ir.Store(count, address)])
+
+    # Place the increment after the phi instructions:
+    before = next(i for i in block if not i.is_phi)
+    for instruction in instructions:
+        block.insert_instruction(instruction, before_instruction=before)
+
+
+def _split_edge(block, jump, label):
+    """ Place a new block on the edge denoted by label """
+    target = getattr(jump, label)
+    edge_block = ir.Block("{}_{}".format(block.name, target.name))
+    block.function.add_block(edge_block)
+    edge_block.add_instruction(ir.Jump(target))
+    setattr(jump, label, edge_block)
+    target.replace_incoming(block, [edge_block])
+    return edge_block
@@ -2,6 +2,7 @@
 
 """
 
+from itertools import chain
 from .. import ir
 from .verify import verify_module
 
@@ -19,37 +20,115 @@ def ir_link(ir_modules, name="linked") -> ir.Module:
         >>> m2 = ir.Module('m2')
         >>> m3 = ir_link([m1, m2])
 
+    Local functions and variables of different modules may have the
+    same name. These are renamed, so that all names in the linked
+    module are unique.
+
     Note that the original modules are not usable after this action.
 
     TODO: TBD: do not modify source modules?
     """
     mod0 = ir.Module(name)
 
+    # Determine the names of the global definitions:
+    global_values = {}
+    for module in ir_modules:
+        for value in chain(module.variables, module.functions):
+            if value.binding == ir.Binding.GLOBAL:
+                global_values.setdefault(value.name, value)
+    names = set(global_values)
+
     # Add all variables and functions:
     for module in ir_modules:
+        renames = {}
+        for value in chain(module.variables, module.functions):
+            if value.binding == ir.Binding.LOCAL:
+                if value.name in names:
+                    new_name = _unique_name(value.name, names)
+                    renames[value.name] = new_name
+                    value.name = new_name
+                names.add(value.name)
+
         for variable in module.variables:
+            if renames and variable.value:
+                variable.value = tuple(
+                    (part[0], renames.get(part[1], part[1]))
+                    if isinstance(part, tuple)
+                    else part
+                    for part in variable.value
+                )
             mod0.add_variable(variable)
 
         for p in module.functions:
             mod0.add_function(p)
 
     # Add externals, if not already resolved:
-    internal_functions = {p.name: p for p in mod0.functions}
     for module in ir_modules:
         for external in module.externals:
-            if isinstance(external, ir.ExternalSubRoutine):
-                # TODO: check argument similarity?
-                if external.name in internal_functions:
-                    p = internal_functions[external.name]
-                    external.replace_by(p)
-                else:
-                    mod0.add_external(external)
-                    internal_functions[external.name] = external
+            value = global_values.get(external.name, None)
+            if value is not None and _compatible(external, value):
+                external.replace_by(value)
+            elif value is None:
+                mod0.add_external(external)
+                global_values[external.name] = external
             else:
-                # TODO: link external variables?
                 mod0.add_external(external)
-                internal_functions[external.name] = external
 
     # Verify, just to be sure:
     verify_module(mod0)
     return mod0
+
+
+def _compatible(external, value):
+    """Check if an external can be replaced by the given value.
+
+    Modules from different languages may declare the same function with
+    other, but compatible, types, such as a signed and an unsigned byte.
+    Such externals are left as they are, and are resolved by the linker.
+    """
+    if isinstance(external, ir.ExternalSubRoutine):
+        if isinstance(value, ir.ExternalSubRoutine):
+            argument_types = value.argument_types
+        elif isinstance(value, ir.SubRoutine):
+            argument_types = [a.ty for a in value.arguments]
+        else:
+            return False
+        if list(argument_types) != list(external.argument_types):
+            return False
+        return getattr(value, "return_ty", None) is getattr(
+            external, "return_ty", None
+        )
+    else:
+        return isinstance(value, (ir.Variable, ir.ExternalVariable))
+
+
+def _unique_name(name, names):
+    """ Create a new name, which is not in the given names """
+    number = 1
+    while "{}_{}".format(name, number) in names:
+        number += 1
+    return "{}_{}".format(name, number)
+
+
+def internalize(ir_module, exported):
+    """Make all global functions and variables local, except for the
+    exported ones.
+
+    This is valid when the module contains the whole program, and only the
+    exported names are referred to from the outside. Local definitions
+    which are not used can be removed afterwards.
+
+    Args:
+        ir_module: the module to change in-place.
+        exported: a collection with the names which must stay global.
+
+    Returns:
+        The number of definitions which were made local.
+    """
+    exported = set(exported)
+    count = 0
+    for value in chain(ir_module.variables, ir_module.functions):
+        if value.binding == ir.Binding.GLOBAL and value.name not in exported:
+            value.binding = ir.Binding.LOCAL
+            count += 1
+    return count
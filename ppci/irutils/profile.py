@@ -0,0 +1,211 @@
+""" Execution profiles of IR-code.
+
+A profile contains execution counts of basic blocks and of the edges
+between them. Profiles are gathered by instrumenting a module with
+:func:`ppci.irutils.instrument.add_block_counters`, running the
+instrumented program and decoding the counters. Once attached to the
+blocks of a module with :func:`apply_profile`, the optimizer and the code
+generator use the counts to focus on hot code.
+
+Blocks are identified by the name of their function and their own name,
+so a profile gathered from one compilation can be applied to another
+compilation of the same source.
+"""
+
+import json
+import struct
+
+
+class Profile:
+    """ Execution counts of blocks and edges """
+
+    def __init__(self):
+        self.block_counts = {}  # (function, block) -> count
+        self.edge_counts = {}  # (function, block, successor) -> count
+
+    def __repr__(self):
+        return "Profile of {} blocks and {} edges".format(
+            len(self.block_counts), len(self.edge_counts)
+        )
+
+    def merge(self, other):
+        """ Add the counts of another profile to this profile """
+        for key, count in other.block_counts.items():
+            self.block_counts[key] = self.block_counts.get(key, 0) + count
+        for key, count in other.edge_counts.items():
+            self.edge_counts[key] = self.edge_counts.get(key, 0) + count
+
+    def save(self, f):
+        """ Save this profile as json to the given file """
+        data = {
+            "blocks": [list(k) + [c] for k, c in self.block_counts.items()],
+            "edges": [list(k) + [c] for k, c in self.edge_counts.items()],
+        }
+        json.dump(data, f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, f):
+        """ Load a profile which was saved with :meth:`save` """
+        data = json.load(f)
+        profile = cls()
+        for function, block, count in data["blocks"]:
+            profile.block_counts[(function, block)] = count
+        for function, block, successor, count in data["edges"]:
+            profile.edge_counts[(function, block, successor)] = count
+        return profile
+
+
+class CounterMap:
+    """Layout of the counters added to a module.
+
+    The counters are stored in a global variable named `name`. Each
+    counter is an unsigned integer of `counter_size` bytes. The keys list
+    contains for each counter either a (function, block) or a
+    (function, block, successor) tuple.
+    """
+
+    def __init__(self, name, counter_size=4):
+        self.name = name
+        self.counter_size = counter_size
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def size(self):
+        """ Size in bytes of all counters """
+        return len(self.keys) * self.counter_size
+
+    @property
+    def address_function_name(self):
+        """ Name of the function returning the address of the counters """
+        return self.name + "_address"
+
+    def new_counter(self, key):
+        """ Allocate a new counter, and return its byte offset """
+        offset = self.size
+        self.keys.append(key)
+        return offset
+
+    def decode(self, data, byteorder="little"):
+        """ Turn the raw counter memory into a :class:`Profile` """
+        if len(data) < self.size:
+            raise ValueError(
+                "Expected {} bytes of counters, got {}".format(
+                    self.size, len(data)
+                )
+            )
+        fmt = {2: "H", 4: "I", 8: "Q"}[self.counter_size]
+        fmt = "{}{}{}".format(
+            "<" if byteorder == "little" else ">", len(self.keys), fmt
+        )
+        counts = struct.unpack(fmt, bytes(data[: self.size]))
+        profile = Profile()
+        for key, count in zip(self.keys, counts):
+            if len(key) == 2:
+                profile.block_counts[key] = count
+            else:
+                profile.edge_counts[key] = count
+        return profile
+
+    def read_native(self, code_module, byteorder="little"):
+        """ Read the counters of a module loaded as native code.
+
+        Args:
+            code_module: a :class:`ppci.utils.codepage.Mod`
+        """
+        return self.decode(
+            code_module.read_data(self.name, self.size), byteorder
+        )
+
+    def read_python(self, namespace):
+        """Read the counters of a module compiled to python.
+
+        Args:
+            namespace: the globals of the code created by
+                :func:`ppci.lang.python.ir_to_python`.
+        """
+        read_mem = namespace["read_mem"]
+        return self.decode(read_mem(namespace[self.name], self.size))
+
+    def read_wasm(self, instance):
+        """Read the counters of a wasm instance.
+
+        The wasm module must be created by :func:`ppci.wasm.ir_to_wasm`
+        from the instrumented module, with export_memory set.
+        """
+        address = instance.exports[self.address_function_name]()
+        memory = instance.exports["memory"]
+        return self.decode(memory.read(address, self.size))
+
+
+def apply_profile(ir_module, profile):
+    """Attach the counts of a profile to the blocks of a module.
+
+    Each block gets an execution_count, and each block with more than one
+    successor gets a successor_counts map from successor to count.
+    Blocks which are not in the profile get no counts.
+    """
+    for function in ir_module.functions:
+        for block in function:
+            block.execution_count = profile.block_counts.get(
+                (function.name, block.name), None
+            )
+            successor_counts = {}
+            for successor in block.successors:
+                key = (function.name, block.name, successor.name)
+                if key in profile.edge_counts:
+                    successor_counts[successor] = profile.edge_counts[key]
+            block.successor_counts = successor_counts or None
+
+
+def has_profile(function):
+    """ Test if profile counts are attached to this function """
+    return any(block.execution_count is not None for block in function)
+
+
+def block_layout(function):
+    """Determine the order in which to place blocks in memory.
+
+    When a profile is attached, blocks are chained such that each block
+    is followed by its most frequently taken successor. Hot chains are
+    placed before cold ones, so that hot code is packed together.
+    Without a profile, the order of the blocks in the function is kept.
+    The entry block is always placed first.
+    """
+    if not has_profile(function):
+        return list(function.blocks)
+
+    def block_count(block):
+        count = block.execution_count
+        return 0 if count is None else count
+
+    def edge_count(block, successor):
+        if block.successor_counts:
+            return block.successor_counts.get(successor, 0)
+        return block_count(block)
+
+    placed = set()
+    order = []
+    position = {block: i for i, block in enumerate(function.blocks)}
+    # Sort all other blocks by decreasing count, stable on original order:
+    candidates = sorted(
+        function.blocks, key=lambda b: (-block_count(b), position[b])
+    )
+    candidates.remove(function.entry)
+    candidates.insert(0, function.entry)
+    for start in candidates:
+        block = start
+        while block is not None and block not in placed:
+            placed.add(block)
+            order.append(block)
+            successors = [s for s in block.successors if s not in placed]
+            if successors:
+                block = max(
+                    successors,
+                    key=lambda s: (edge_count(block, s), -position[s]),
+                )
+            else:
+                block = None
+    return order
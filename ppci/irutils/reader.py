@@ -24,50 +24,55 @@ class IrParseException(Exception):
     pass
 
 
+# Token types in order of priority, with a conversion of the value:
+TOKEN_SPEC = [
+    ("FLOAT", r"\-?\d+\.\d+", float),
+    ("INT", r"\-?\d+", int),
+    ("STRING", r"'[^']*'", lambda val: val[1:-1]),
+    ("ID", r"[A-Za-z][A-Za-z\d_]*", None),
+    (
+        "OTHER",
+        r"[,:;\-\?\+*%\[\]/\(\)]|<<|>>|!=|==|<=|>=|>|<|=|{|}|&|\^|\|",
+        None,
+    ),
+    ("ERROR", r".", None),
+]
+
+# One master pattern, which skips whitespace before each token. The
+# number of the matched group is used to look up the token type:
+TOKEN_RE = re.compile(
+    r"\s*(?:"
+    + "|".join("(?P<{}>{})".format(name, p) for name, p, _ in TOKEN_SPEC)
+    + ")"
+)
+TOKEN_NAMES = [None] + [name for name, _, _ in TOKEN_SPEC]
+TOKEN_CONVERTERS = [None] + [convert for _, _, convert in TOKEN_SPEC]
+OTHER = TOKEN_RE.groupindex["OTHER"]
+ERROR = TOKEN_RE.groupindex["ERROR"]
+
+
 def tokenize(lines):
-    # Create a regular expression for the lexing part:
-    tok_spec = [
-        ("FLOAT", r"\-?\d+\.\d+"),
-        ("INT", r"\-?\d+"),
-        ("STRING", r"'[^']*'"),
-        ("ID", r"[A-Za-z][A-Za-z\d_]*"),
-        ("SKIP", r"\s+"),
-        (
-            "OTHER",
-            r"[,:;\-\?\+*%\[\]/\(\)]|<<|>>|!=|==|<=|>=|>|<|=|{|}|&|\^|\|",
-        ),
-    ]
-    tok_re = "|".join("(?P<%s>%s)" % pair for pair in tok_spec)
-    gettok = re.compile(tok_re).match
+    """ Split lines of IR-code into (type, value, row, column) tuples """
+    finditer = TOKEN_RE.finditer
+    names = TOKEN_NAMES
+    converters = TOKEN_CONVERTERS
     for row, line in enumerate(lines, 1):
-        if not line:
-            continue  # Skip empty lines
-        mo = gettok(line)
-        pos = 0
-        while mo:
-            typ = mo.lastgroup
-            val = mo.group(typ)
-            if typ == "ID":
-                yield (typ, val, row, pos)
-            elif typ == "OTHER":
-                typ = val
-                yield (typ, val, row, pos)
-            elif typ == "SKIP":
-                pass
-            elif typ == "INT":
-                yield (typ, int(val), row, pos)
-            elif typ == "FLOAT":
-                yield (typ, float(val), row, pos)
-            elif typ == "STRING":
-                yield (typ, val[1:-1], row, pos)
+        for mo in finditer(line):
+            kind = mo.lastindex
+            val = mo.group(kind)
+            convert = converters[kind]
+            if convert:
+                yield (names[kind], convert(val), row, mo.start(kind))
+            elif kind == OTHER:
+                yield (val, val, row, mo.start(kind))
+            elif kind == ERROR:
+                raise IrParseException(
+                    "Lex fault at row {}, column {}".format(
+                        row, mo.start(kind)
+                    )
+                )
             else:
-                raise NotImplementedError(str(typ))
-            pos = mo.end()
-            mo = gettok(line, pos)
-        if len(line) != pos:
-            raise IrParseException(
-                "Lex fault at row {}, column {}".format(row, pos)
-            )
+                yield (names[kind], val, row, mo.start(kind))
     yield ("eof", "eof", 0, 0)
 
 
@@ -2,22 +2,41 @@
 
 This is a very useful module since it allows to isolate
 bugs in the compiler itself.
+
+Verification can be done at two levels:
+
+- full: verify all functions. This is the default.
+- fast: skip functions which did not change since they were last
+  verified successfully. Changes are detected using the modification
+  counter of each :class:`ppci.ir.SubRoutine`. This counter tracks
+  changes to blocks, instructions and their uses, but not renames,
+  type changes or changes to other functions, such as the signature
+  of a called function. Use this level only when the passes in between
+  are known to stick to the tracked operations.
 """
 
 import logging
+import weakref
 from collections import defaultdict
 from ..graph.domtree import CfgInfo
 from ..common import IrFormError
 from .. import ir
 
 
-def verify_module(module: ir.Module):
+VERIFICATION_LEVELS = ("fast", "full")
+
+# Modification counter of each subroutine when it was last verified:
+_verified = weakref.WeakKeyDictionary()
+
+
+def verify_module(module: ir.Module, level="full"):
     """Check if the module is properly constructed
 
     Args:
         module: The module to verify.
+        level: 'full' (default), or 'fast' to skip unchanged functions.
     """
-    Verifier().verify(module)
+    Verifier(level=level).verify(module)
 
 
 class Verifier:
@@ -25,15 +44,31 @@ class Verifier:
 
     logger = logging.getLogger("verifier")
 
-    def __init__(self):
+    def __init__(self, level="full"):
+        if level not in VERIFICATION_LEVELS:
+            raise ValueError(
+                "level must be one of {}".format(VERIFICATION_LEVELS)
+            )
+        self.level = level
         self.name_map = {}
 
     def verify(self, module):
         """ Verifies a module for some sanity """
         self.logger.debug("Verifying %s", module)
         assert isinstance(module, ir.Module)
+        skipped = 0
         for function in module.functions:
-            self.verify_function(function)
+            if self.level == "fast" and self.is_verified(function):
+                skipped += 1
+            else:
+                self.verify_function(function)
+        if skipped:
+            self.logger.debug("Skipped %s unchanged functions", skipped)
+
+    @staticmethod
+    def is_verified(function):
+        """ Test if a function is unchanged since it was last verified """
+        return _verified.get(function, None) == function.modification_count
 
     def verify_function(self, function):
         """ Verify all blocks in the function """
@@ -84,7 +119,8 @@ class Verifier:
                     # Check that phi 'use' info is good:
                     assert used_value in phi.uses
 
-        # Determine rank of instructions within blocks:
+        # Determine rank of instructions within blocks, this also
+        # serves as a constant time membership test:
         ranks = {}
         for block in function:
             for rank, instruction in enumerate(block):
@@ -98,6 +134,8 @@ class Verifier:
             assert block.function is function
             self.verify_block(block)
 
+        _verified[function] = function.modification_count
+
     def verify_block_termination(self, block):
         """ Verify that the block is terminated correctly """
         if block.is_empty:
@@ -122,7 +160,7 @@ class Verifier:
 
         # Check that instruction is contained in block:
         assert instruction.block == block
-        assert instruction in block.instructions
+        assert instruction in self._ranks
 
         # Check if value has unique name string:
         if isinstance(instruction, ir.Value):
@@ -251,7 +289,8 @@ class Verifier:
         # All other instructions must have a containing block:
         if one.block is None:
             raise ValueError("{} has no block".format(one))
-        assert one in one.block.instructions
+        if one not in self._ranks:
+            raise IrFormError("{} is not in this function".format(one))
 
         # Phis are special case:
         if isinstance(another, ir.Phi):
@@ -275,7 +314,4 @@ class Verifier:
 
     def block_dominates(self, one: ir.Block, another: ir.Block):
         """ Check if this block dominates other block """
-        assert one in one.function
-        one_node = self.cfg_info.get_node(one)
-        another_node = self.cfg_info.get_node(another)
-        return self.cfg_info.cfg.strictly_dominates(one_node, another_node)
+        return self.cfg_info.strictly_dominates(one, another)
@@ -225,6 +225,7 @@ class Variable(Symbol):
         self.isParameter = False
         self.loc = loc
         self.ival = None
+        self.external = False
 
     def __repr__(self):
         return "Var {} [{}]".format(self.name, self.typ)
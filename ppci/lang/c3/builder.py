@@ -1,12 +1,12 @@
 """ Entry point when building c3 sources. """
 
 import logging
-import itertools
 import io
 from ...arch.arch_info import ArchInfo
 from ...arch import get_arch
 from ...common import DiagnosticsManager, get_file, CompilerError
 from ...build.tasks import TaskError
+from ...build.cache import get_interface_cache
 from ...utils.reporting import DummyReportGenerator
 from ...irutils import Verifier, verify_module
 from .lexer import Lexer
@@ -15,6 +15,7 @@ from .typechecker import TypeChecker
 from .codegenerator import CodeGenerator
 from .scope import SemanticError
 from .context import Context
+from .interface import get_interface
 
 
 def c3_to_ir(sources, includes, march, reporter=None):
@@ -29,7 +30,8 @@ def c3_to_ir(sources, includes, march, reporter=None):
     sources = [get_file(fn) for fn in sources]
     includes = [get_file(fn) for fn in includes]
     diag = DiagnosticsManager()
-    c3b = C3Builder(diag, march.info)
+    interface_cache = get_interface_cache() if includes else None
+    c3b = C3Builder(diag, march.info, interface_cache=interface_cache)
 
     try:
         _, ir_module = c3b.build(sources, includes)
@@ -49,13 +51,17 @@ class C3Builder:
     """Generates IR-code from c3 source.
 
     Reports errors to the diagnostics system.
+
+    Includes are loaded via their module interface, which is taken from
+    the given interface cache when available.
     """
 
     logger = logging.getLogger("c3")
 
-    def __init__(self, diag, arch_info):
+    def __init__(self, diag, arch_info, interface_cache=None):
         assert isinstance(arch_info, ArchInfo)
         self.diag = diag
+        self.interface_cache = interface_cache
         self.lexer = Lexer(diag)
         self.parser = Parser(diag)
         self.codegen = CodeGenerator(diag)
@@ -81,8 +87,10 @@ class C3Builder:
         context = Context(self.arch_info)
 
         # Phase 1: Lexing and parsing stage
-        for src in itertools.chain(sources, imps):
+        for src in sources:
             self.do_parse(src, context)
+        for src in imps:
+            self.do_parse_interface(src, context)
 
         # Phase 1.8: Handle imports:
         try:
@@ -108,6 +116,16 @@ class C3Builder:
         tokens = self.lexer.lex(src)
         self.parser.parse_source(tokens, context)
 
+    def do_parse_interface(self, src, context):
+        """ Load the module interface of an include (phase 1) """
+        filename, interface = get_interface(
+            src, self.diag, self.arch_info, cache=self.interface_cache
+        )
+        interface_file = io.StringIO(interface)
+        interface_file.name = "{} (interface)".format(filename)
+        tokens = self.lexer.lex(interface_file)
+        self.parser.parse_interface(tokens, context)
+
 
 class C3ExprParser:
     """
@@ -123,6 +123,8 @@ class Context:
                 return int(a)
             elif self.equal_types("byte", expr.to_type):
                 return int(a) & 0xFF
+            elif isinstance(to_type, ast.UnsignedIntegerType):
+                return int(a) & ((1 << to_type.bits) - 1)
             elif isinstance(to_type, ast.FloatType):
                 return float(a)
             elif isinstance(to_type, ast.PointerType):
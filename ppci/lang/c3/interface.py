@@ -0,0 +1,208 @@
+""" Module interfaces of c3 packages.
+
+Includes are packages which are only used for their types, constants,
+function signatures and variables. Instead of parsing and checking
+the whole included source on every compilation, the interface of the
+package is written as c3 text, which contains only the declarations.
+
+The interface is stored in a cache, keyed by a hash over the included
+source text. A changed source results in a new interface.
+
+.. doctest::
+
+    >>> import io
+    >>> from ppci.api import get_arch
+    >>> from ppci.common import DiagnosticsManager
+    >>> from ppci.lang.c3.interface import make_interface
+    >>> src = "module a; public function int f(int x) { return x + 1; }"
+    >>> diag = DiagnosticsManager()
+    >>> arch_info = get_arch('arm').info
+    >>> print(make_interface(io.StringIO(src), diag, arch_info), end='')
+    module a;
+    public function int f(int x);
+
+"""
+
+import decimal
+import io
+from ...common import get_file
+from ...build.cache import CompileCache
+from . import astnodes as ast
+from .context import Context
+from .lexer import Lexer
+from .parser import Parser
+
+
+def get_interface(source, diag, arch_info, cache=None):
+    """Get the interface text of the given include.
+
+    Returns the name of the include and its interface.
+    """
+    source = get_file(source)
+    filename = getattr(source, "name", "")
+    text = source.read()
+    if cache is not None:
+        key = CompileCache.make_key("c3-interface", text)
+        try:
+            interface = cache.get_text(key)
+        except OSError as ex:
+            CompileCache.logger.warning("Interface cache not readable: %s", ex)
+            interface = None
+        if interface is not None:
+            return filename, interface
+
+    copy = io.StringIO(text)
+    copy.name = filename
+    interface = make_interface(copy, diag, arch_info)
+    if cache is not None:
+        try:
+            cache.put_text(key, interface)
+        except OSError as ex:
+            CompileCache.logger.warning("Could not store interface: %s", ex)
+    return filename, interface
+
+
+def make_interface(source, diag, arch_info):
+    """ Parse a c3 source file and return the interface text of it """
+    context = Context(arch_info)
+    tokens = Lexer(diag).lex(source)
+    module = Parser(diag).parse_source(tokens, context)
+    f = io.StringIO()
+    InterfaceWriter().write(module, f)
+    return f.getvalue()
+
+
+class InterfaceWriter:
+    """Write the declarations of a parsed module as c3 text.
+
+    All types and constants are written, since public declarations may
+    refer to private types. Functions are written without body, and
+    private functions are left out. Variables are written without their
+    initial value.
+    """
+
+    def write(self, module, f):
+        self.f = f
+        self.emit("module {};".format(module.name))
+        for name in module.imports:
+            self.emit("import {};".format(name))
+
+        for typedef in module.types:
+            self.emit(
+                "{}type {} {};".format(
+                    self.public(typedef),
+                    self.type_spec(typedef.typ),
+                    typedef.name,
+                )
+            )
+
+        for constant in module.constants:
+            self.emit(
+                "const {} {} = {};".format(
+                    self.type_spec(constant.typ),
+                    constant.name,
+                    self.expression(constant.value),
+                )
+            )
+
+        for variable in module.variables:
+            self.emit(
+                "var {} {};".format(
+                    self.type_spec(variable.typ), variable.name
+                )
+            )
+
+        for function in module.functions:
+            if not function.public:
+                continue
+            parameters = ", ".join(
+                "{} {}".format(self.type_spec(p.typ), p.name)
+                for p in function.parameters
+            )
+            self.emit(
+                "public function {} {}({});".format(
+                    self.type_spec(function.typ.returntype),
+                    function.name,
+                    parameters,
+                )
+            )
+
+    def emit(self, line):
+        print(line, file=self.f)
+
+    @staticmethod
+    def public(symbol):
+        return "public " if symbol.public else ""
+
+    def type_spec(self, typ):
+        """ Get the text of a type specification as parsed """
+        if isinstance(typ, ast.PointerType):
+            text = self.type_spec(typ.ptype) + "*"
+        elif isinstance(typ, ast.ArrayType):
+            text = "{}[{}]".format(
+                self.type_spec(typ.element_type), self.expression(typ.size)
+            )
+        elif isinstance(typ, ast.StructureType):
+            fields = "".join(
+                " {} {};".format(self.type_spec(field.typ), field.name)
+                for field in typ.fields
+            )
+            text = "struct {" + fields + " }"
+        elif isinstance(typ, (ast.Identifier, ast.Member)):
+            text = self.expression(typ)
+        else:  # pragma: no cover
+            raise NotImplementedError(str(typ))
+
+        if getattr(typ, "volatile", False):
+            text += " volatile"
+        return text
+
+    def expression(self, expr):
+        """ Get the text of an expression """
+        if isinstance(expr, ast.Literal):
+            return self.literal(expr.val)
+        elif isinstance(expr, ast.Identifier):
+            return expr.target
+        elif isinstance(expr, ast.Member):
+            return "{}.{}".format(self.expression(expr.base), expr.field)
+        elif isinstance(expr, ast.Binop):
+            return "({} {} {})".format(
+                self.expression(expr.a), expr.op, self.expression(expr.b)
+            )
+        elif isinstance(expr, ast.Unop):
+            return "({} {})".format(expr.op, self.expression(expr.a))
+        elif isinstance(expr, ast.Deref):
+            return "(*{})".format(self.expression(expr.ptr))
+        elif isinstance(expr, ast.Index):
+            return "{}[{}]".format(
+                self.expression(expr.base), self.expression(expr.i)
+            )
+        elif isinstance(expr, ast.TypeCast):
+            return "cast<{}>({})".format(
+                self.type_spec(expr.to_type), self.expression(expr.a)
+            )
+        elif isinstance(expr, ast.Sizeof):
+            return "sizeof({})".format(self.type_spec(expr.query_typ))
+        elif isinstance(expr, ast.FunctionCall):
+            return "{}({})".format(
+                self.expression(expr.proc),
+                ", ".join(self.expression(a) for a in expr.args),
+            )
+        else:  # pragma: no cover
+            raise NotImplementedError(str(expr))
+
+    @staticmethod
+    def literal(value):
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        elif isinstance(value, int):
+            return str(value)
+        elif isinstance(value, float):
+            text = repr(value)
+            if "e" in text:
+                # The lexer has no exponent notation, write the exact value:
+                text = format(decimal.Decimal(value), "f")
+            return text if "." in text else text + ".0"
+        else:
+            assert isinstance(value, str)
+            return '"{}"'.format(value)
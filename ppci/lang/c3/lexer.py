@@ -3,7 +3,7 @@
 import re
 from ...common import make_num
 from ..common import SourceLocation, Token
-from ..tools.baselex import BaseLexer
+from ..tools.baselex import BaseLexer, GLYPH, KEYWORD
 
 
 class Lexer(BaseLexer):
@@ -92,16 +92,16 @@ class Lexer(BaseLexer):
                 lambda typ, val: ("NUMBER", make_num(val)),
             ),
             ("NUMBER", r"\d+", lambda typ, val: (typ, int(val))),
-            ("ID", r"[A-Za-z_][A-Za-z\d_]*", self.handle_id),
+            ("ID", r"[A-Za-z_][A-Za-z\d_]*", KEYWORD),
             ("NEWLINE", r"\n", lambda typ, val: self.newline()),
             ("SKIP", r"[ \t]+", None),
             ("COMMENTS", r"//.*", None),
             ("LONGCOMMENTBEGIN", r"\/\*", self.handle_comment_start),
             ("LONGCOMMENTEND", r"\*\/", self.handle_comment_stop),
-            ("GLYPH", op_txt, lambda typ, val: (val, val)),
-            ("STRING", r'".*?"', lambda typ, val: (typ, val[1:-1])),
+            ("GLYPH", op_txt, GLYPH),
+            ("STRING", r'"[^"\n]*"', lambda typ, val: (typ, val[1:-1])),
         ]
-        super().__init__(tok_spec)
+        super().__init__(tok_spec, keywords=self.keywords)
 
     def lex(self, input_file):
         filename = input_file.name if hasattr(input_file, "name") else ""
@@ -127,8 +127,3 @@ class Lexer(BaseLexer):
                 yield token
         loc = SourceLocation(self.filename, self.line, 0, 0)
         yield Token("EOF", "EOF", loc)
-
-    def handle_id(self, typ, val):
-        if val in self.keywords:
-            typ = val
-        return typ, val
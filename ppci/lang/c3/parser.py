@@ -17,6 +17,7 @@ class Parser(RecursiveDescentParser):
         self.diag = diag
         self.current_scope = None
         self.mod = None
+        self.declarations_only = False
 
     def parse_source(self, tokens, context):
         """ Parse a module from tokens """
@@ -30,6 +31,17 @@ class Parser(RecursiveDescentParser):
             raise
         return module
 
+    def parse_interface(self, tokens, context):
+        """Parse a module interface from tokens.
+
+        The variables of an interface are defined elsewhere.
+        """
+        self.declarations_only = True
+        try:
+            return self.parse_source(tokens, context)
+        finally:
+            self.declarations_only = False
+
     def add_symbol(self, sym):
         """ Add a symbol to the current scope """
         if self.current_scope.has_symbol(sym.name, include_parent=False):
@@ -155,6 +167,7 @@ class Parser(RecursiveDescentParser):
         while True:
             name = self.consume("ID")
             var = ast.Variable(name.val, var_type, public, name.loc)
+            var.external = self.declarations_only
             # Munch initial value:
             if self.peek == "=":
                 self.consume("=")
@@ -20,7 +20,7 @@ class LlvmIrFrontend:
 
     def compile(self, f):
         src = f.read()
-        if f.name:
+        if getattr(f, "name", None):
             self.lexer.filename = f.name
         tokens = self.lexer.tokenize(src, eof=True)
         self.parser.init_lexer(tokens)
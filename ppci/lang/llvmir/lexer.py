@@ -1,7 +1,7 @@
 import re
 
 # from ...common import make_num
-from ..tools.baselex import BaseLexer
+from ..tools.baselex import BaseLexer, GLYPH, TEXT
 from . import nodes
 
 
@@ -101,26 +101,26 @@ class LlvmIrLexer(BaseLexer):
             (
                 "HEXDOUBLE",
                 r"0x[KLMHJ]?[\da-fA-F]+",
-                lambda typ, val: (typ, val),
+                TEXT,
             ),
             # ('HEXNUMBER', r'0x[\da-fA-F]+',
             #  lambda typ, val: ('NUMBER', make_num(val))),
             ("NUMBER", r"[\-\+]?\d+", lambda typ, val: (typ, int(val))),
-            ("GID", r"@[A-Za-z\d_]+", lambda t, v: (t, v)),
+            ("GID", r"@[A-Za-z\d_]+", TEXT),
             (
                 "LID",
                 r'%[A-Za-z\d_]+|%"[A-Za-z\d_\.\:\<\>\&\[\]]+"',
-                lambda t, v: (t, v),
+                TEXT,
             ),
-            ("ATTRID", r"#\d+", lambda t, v: (t, v)),
-            ("MDVAR", r"![a-zA-Z_][a-zA-Z\d\.]*", lambda t, v: (t, v)),
-            ("LBL", r"[A-Za-z_][A-Za-z\d_]*:", lambda t, v: (t, v)),
+            ("ATTRID", r"#\d+", TEXT),
+            ("MDVAR", r"![a-zA-Z_][a-zA-Z\d\.]*", TEXT),
+            ("LBL", r"[A-Za-z_][A-Za-z\d_]*:", TEXT),
             ("ID", r"[A-Za-z_][A-Za-z\d_]*", self.handle_id),
             ("LINECOMMENT", r";[^\n\r]*", None),
             ("STR", r'"[^"]*"', lambda typ, val: (typ, val[1:-1])),
             ("NEWLINE", r"\n", lambda typ, val: self.newline()),
             ("SKIP", r"[ \t]", None),
-            ("GLYPH", op_txt, lambda typ, val: (val, val)),
+            ("GLYPH", op_txt, GLYPH),
         ]
         super().__init__(tok_spec)
         self.context = context
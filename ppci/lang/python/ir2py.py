@@ -44,11 +44,13 @@ class IrToPythonCompiler:
         self.stack_size = 0
         self.func_ptr_map = {}
         self._level = 0
+        self._lines = 0
 
     def print(self, level, *args):
         """ Print args to current file with level indents """
         print("    " * level, end="", file=self.output_file)
         print(*args, file=self.output_file)
+        self._lines += 1
 
     def _indent(self):
         self._level += 1
@@ -62,6 +64,15 @@ class IrToPythonCompiler:
         yield
         self._dedent()
 
+    @contextlib.contextmanager
+    def suite(self):
+        """ Indent, and emit a pass statement if nothing else was emitted """
+        lines = self._lines
+        with self.indented():
+            yield
+            if self._lines == lines:
+                self.emit("pass")
+
     def emit(self, txt):
         """ Emit python code at current indentation level """
         self.print(self._level, txt)
@@ -236,26 +247,26 @@ class IrToPythonCompiler:
 
     def generate_function(self, ir_function):
         """ Generate a function to python code """
-        self.stack_size = 0
+        self.stack_size = sum(
+            ins.amount
+            for block in ir_function
+            for ins in block
+            if isinstance(ins, ir.Alloc)
+        )
         args = ",".join(a.name for a in ir_function.arguments)
         self.emit("def {}({}):".format(ir_function.name, args))
         with self.indented():
-            # TODO: enable shape style:
-            # try:
-            #     # TODO: remove this to enable shape style:
-            #     raise ValueError
-            #     shape, _rmap = relooper.find_structure(ir_function)
-            #     src = io.StringIO()
-            #     relooper.print_shape(shape, file=src)
-            #     self.reporter.dump_source(ir_function.name, src.getvalue())
-            #     self._rmap = _rmap
-            #     self._shape_style = True
-            #     self.generate_shape(shape)
-            # except ValueError:
-            self.logger.debug("Falling back to block-switch-style")
-            # Fall back to block switch stack!
-            self._shape_style = False
-            self.generate_function_fallback(ir_function)
+            try:
+                shape, self._rmap = relooper.reloop(ir_function)
+                self._nmap = {b: n for n, b in self._rmap.items()}
+            except ValueError:
+                self.logger.debug("Falling back to block-switch-style")
+                # Fall back to block switch stack!
+                self._shape_style = False
+                self.generate_function_fallback(ir_function)
+            else:
+                self._shape_style = True
+                self.generate_shape(shape)
 
         # Register function for function pointers:
         self.emit("_irpy_func_pointers.append({})".format(ir_function.name))
@@ -263,40 +274,147 @@ class IrToPythonCompiler:
         self.emit("")
 
     def generate_shape(self, shape):
-        """ Generate python code for a shape structured program """
+        """Generate python code for a chain of relooper shapes.
+
+        Loops become `while True` loops and multiple shapes become
+        if-elif chains on the `_irpy_label` variable.
+        """
         if isinstance(shape, relooper.BasicShape):
-            self.generate_block(self._rmap[shape.content])
-        elif isinstance(shape, relooper.SequenceShape):
-            if shape.shapes:
-                for sub_shape in shape.shapes:
-                    self.generate_shape(sub_shape)
-            else:
-                self.emit("pass")
-        elif isinstance(shape, relooper.IfShape):
-            blk = self._rmap[shape.content]
-            self.generate_block(blk)
-            with self.indented():
-                if shape.yes_shape:
-                    self.generate_shape(shape.yes_shape)
-                else:
-                    self.emit("pass")
-            if shape.no_shape:
-                self.emit("else:")
-                with self.indented():
-                    self.generate_shape(shape.no_shape)
+            self.generate_basic_shape(shape)
         elif isinstance(shape, relooper.LoopShape):
             self.emit("while True:")
-            with self.indented():
+            with self.suite():
                 self.generate_shape(shape.body)
-        elif isinstance(shape, relooper.ContinueShape):
-            self.emit("continue")
-        elif isinstance(shape, relooper.BreakShape):
-            self.emit("break")
-        elif shape is None:
-            self.emit("pass")
+            self.generate_escapes(shape)
+        elif isinstance(shape, relooper.MultipleShape):
+            keyword = "if"
+            for entry, handled in shape.handled.items():
+                self.emit(
+                    '{} _irpy_label == "{}":'.format(
+                        keyword, self._rmap[entry].name
+                    )
+                )
+                with self.suite():
+                    self.generate_shape(handled)
+                keyword = "elif"
+            self.generate_escapes(shape)
         else:  # pragma: no cover
             raise NotImplementedError(str(shape))
 
+    def generate_basic_shape(self, shape):
+        """Generate a block and the shapes following it.
+
+        A multiple shape directly after the block is placed inside the
+        branches of the block.
+        """
+        block = self._rmap[shape.content]
+        self.generate_block(block)
+        last = block.last_instruction
+        if not isinstance(last, ir.JumpBase):
+            return
+
+        follow = shape.next
+        if isinstance(follow, relooper.MultipleShape):
+            fused = follow
+
+            def continuation():
+                self.generate_escapes(fused)
+
+        else:
+            fused = None
+
+            def continuation():
+                if follow is not None:
+                    self.generate_shape(follow)
+
+        # Branches which leave the enclosing multiple shape must skip the
+        # shapes after this block, so place those in the other branches.
+        branches = [shape.branches[self._nmap[t]] for t in last.targets]
+        if any(
+            branch.kind == relooper.FALL
+            and (fused is None or branch.target not in fused.entries)
+            for branch in branches
+        ):
+            nested = continuation
+        else:
+            nested = None
+
+        if isinstance(last, ir.CJump) and last.lab_yes is not last.lab_no:
+            a = self.fetch_value(last.a)
+            b = self.fetch_value(last.b)
+            self.emit("if {} {} {}:".format(a, last.cond, b))
+            with self.suite():
+                self.generate_branch(block, branches[0], fused, nested)
+            self.emit("else:")
+            with self.suite():
+                self.generate_branch(block, branches[1], fused, nested)
+        else:
+            self.generate_branch(block, branches[0], fused, nested)
+
+        if nested is None:
+            continuation()
+
+    def generate_branch(self, block, branch, fused, continuation):
+        """ Generate the code which takes a branch in shape style """
+        target = self._rmap[branch.target]
+        self.fill_phis(block, target)
+        if branch.label:
+            self.emit('_irpy_label = "{}"'.format(target.name))
+
+        if branch.kind == relooper.INLINE:
+            self.generate_shape(fused.handled[branch.target])
+        elif branch.kind == relooper.BREAK:
+            self.emit("break")
+        elif branch.kind == relooper.CONTINUE:
+            self.emit("continue")
+
+        proceeds = branch.kind in (relooper.NEXT, relooper.INLINE) or (
+            branch.kind == relooper.FALL
+            and fused is not None
+            and branch.target in fused.entries
+        )
+        if continuation and proceeds:
+            continuation()
+
+    def generate_escapes(self, shape):
+        """Take the next step for branches which left a loop or multiple.
+
+        Then continue with the shapes after the loop or multiple.
+        """
+        falls = []
+        if shape.guarded:
+            keyword = "if"
+            for target, kind in shape.escapes.items():
+                if kind == relooper.FALL:
+                    falls.append(self._rmap[target].name)
+                    continue
+                self.emit(
+                    '{} _irpy_label == "{}":'.format(
+                        keyword, self._rmap[target].name
+                    )
+                )
+                with self.indented():
+                    if kind == relooper.BREAK:
+                        self.emit("break")
+                    else:
+                        self.emit("continue")
+                keyword = "elif"
+
+        if shape.next is not None:
+            if len(falls) == 1:
+                self.emit('if _irpy_label != "{}":'.format(falls[0]))
+            elif falls:
+                self.emit(
+                    "if _irpy_label not in ({}):".format(
+                        ", ".join('"{}"'.format(name) for name in falls)
+                    )
+                )
+            if falls:
+                with self.suite():
+                    self.generate_shape(shape.next)
+            else:
+                self.generate_shape(shape.next)
+
     def generate_function_fallback(self, ir_function):
         """Generate a while-true with a switch-case on current block.
 
@@ -313,24 +431,38 @@ class IrToPythonCompiler:
         self.emit("")
 
     def generate_block(self, block):
-        """ Generate code for one block """
+        """Generate code for one block.
+
+        In shape style, the jump at the end of the block is generated
+        together with the shapes following the block.
+        """
         for ins in block:
+            if self._shape_style and isinstance(ins, ir.JumpBase):
+                break
             self.generate_instruction(ins, block)
 
         if not self._shape_style:
             self.fill_phis(block)
 
-    def fill_phis(self, block):
-        # Generate eventual phi fill code:
-        phis = [p for s in block.successors for p in s.phis]
+    def fill_phis(self, block, target=None):
+        """Generate eventual phi fill code.
+
+        Fill the phis of the given target, or of all successors when no
+        target is given.
+        """
+        if target is None:
+            phis = [p for s in block.successors for p in s.phis]
+        else:
+            phis = target.phis
         if phis:
             phi_names = ", ".join(p.name for p in phis)
-            value_names = ", ".join(p.inputs[block].name for p in phis)
+            value_names = ", ".join(
+                self.fetch_value(p.inputs[block]) for p in phis
+            )
             self.emit("{} = {}".format(phi_names, value_names))
 
     def reset_stack(self):
         self.emit("_irpy_free({})".format(self.stack_size))
-        self.stack_size = 0
 
     def emit_jump(self, target: ir.Block):
         """ Perform a jump in block mode. """
@@ -346,7 +478,6 @@ class IrToPythonCompiler:
             self.gen_jump(ins)
         elif isinstance(ins, ir.Alloc):
             self.emit("{} = _irpy_alloca({})".format(ins.name, ins.amount))
-            self.stack_size += ins.amount
         elif isinstance(ins, ir.AddressOf):
             src = self.fetch_value(ins.src)
             self.emit("{} = {}[0]".format(ins.name, src))
@@ -414,23 +545,15 @@ class IrToPythonCompiler:
     def gen_cjump(self, ins):
         a = self.fetch_value(ins.a)
         b = self.fetch_value(ins.b)
-        if self._shape_style:
-            self.fill_phis(block)
-            self.emit("if {} {} {}:".format(a, ins.cond, b))
-        else:
-            self.emit("if {} {} {}:".format(a, ins.cond, b))
-            with self.indented():
-                self.emit_jump(ins.lab_yes)
-            self.emit("else:")
-            with self.indented():
-                self.emit_jump(ins.lab_no)
+        self.emit("if {} {} {}:".format(a, ins.cond, b))
+        with self.indented():
+            self.emit_jump(ins.lab_yes)
+        self.emit("else:")
+        with self.indented():
+            self.emit_jump(ins.lab_no)
 
     def gen_jump(self, ins):
-        if self._shape_style:
-            self.fill_phis(block)
-            self.emit("pass")
-        else:
-            self.emit_jump(ins.target)
+        self.emit_jump(ins.target)
 
     def gen_binop(self, ins):
         a = self.fetch_value(ins.a)
@@ -1,10 +1,16 @@
 import re
 from ...common import CompilerError
 from ..common import Token, SourceLocation
+from .regex.scanner import get_scanner
 
 EOF = "EOF"
 EPS = "EPS"
 
+# Token actions which are carried out without calling a function:
+TEXT = "text"  # The matched text is the value
+GLYPH = "glyph"  # The matched text is the type and the value
+KEYWORD = "keyword"  # The type is the keyword, when the text is one
+
 
 def on(pattern, flags=0, order=0):
     """Register method to the given pattern.
@@ -34,9 +40,46 @@ class LexMeta(type):
                 lexmap.append((prog, order, value))
         lexmap.sort(key=lambda l: l[1])
         attrs["lexmap"] = lexmap
+        attrs["lexprog"], attrs["lexfuncs"] = combine_lexmap(lexmap)
         return type.__new__(cls, name, bases, attrs)
 
 
+# Inline letters of the regular expression flags:
+FLAG_LETTERS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"))
+
+
+def combine_lexmap(lexmap):
+    """Combine the patterns of a lexmap into a single pattern.
+
+    The first pattern that matches wins, just like when trying the
+    patterns one by one. The number of the matched group gives the
+    handler function. Returns None as pattern when the patterns cannot
+    be combined, for example because of flags which cannot be scoped.
+    """
+    parts = []
+    for index, (prog, _, _) in enumerate(lexmap):
+        letters = ""
+        flags = prog.flags & ~re.UNICODE
+        for flag, letter in FLAG_LETTERS:
+            if flags & flag:
+                letters += letter
+                flags &= ~flag
+        if flags:
+            return None, None
+        pattern = prog.pattern
+        if letters:
+            pattern = "(?{}:{})".format(letters, pattern)
+        parts.append("(?P<t{}>{})".format(index, pattern))
+    try:
+        master = re.compile("|".join(parts))
+    except re.error:
+        return None, None
+    funcs = [None] * (master.groups + 1)
+    for index, (_, _, func) in enumerate(lexmap):
+        funcs[master.groupindex["t{}".format(index)]] = func
+    return master, funcs
+
+
 class Lexer:
     pass
 
@@ -50,29 +93,28 @@ class SimpleLexer(Lexer, metaclass=LexMeta):
 
     def gettok(self):
         """ Find a match at the given position """
-        for prog, _, func in self.lexmap:
-            mo = prog.match(self.txt, self.pos)
-            if mo:
-                column = mo.start() - self.line_start
-                length = mo.end() - mo.start()
-                loc = SourceLocation(self.filename, self.line, column, length)
-                self.pos = mo.end()
-                val = mo.group(0)
-
-                # Update row and column information:
-                if "\n" in val:
-                    self.line += val.count("\n")
-                    # TODO: this is wrong, and must be improved:
-                    self.line_start = mo.start()
-
-                # print(func, '"%s"' % val)
-
-                res = func(self, val)
-                if res:
-                    typ, val = res
-                    return Token(typ, val, loc)
-                else:
-                    return
+        mo, func = self.match()
+        if mo:
+            column = mo.start() - self.line_start
+            length = mo.end() - mo.start()
+            loc = SourceLocation(self.filename, self.line, column, length)
+            self.pos = mo.end()
+            val = mo.group(0)
+
+            # Update row and column information:
+            if "\n" in val:
+                self.line += val.count("\n")
+                # TODO: this is wrong, and must be improved:
+                self.line_start = mo.start()
+
+            # print(func, '"%s"' % val)
+
+            res = func(self, val)
+            if res:
+                typ, val = res
+                return Token(typ, val, loc)
+            else:
+                return
 
         # No match found!
         char = self.txt[self.pos]
@@ -82,6 +124,19 @@ class SimpleLexer(Lexer, metaclass=LexMeta):
             "Unexpected char: {0} (0x{1:X})".format(char, ord(char)), loc=loc
         )
 
+    def match(self):
+        """ Match the first pattern which matches at the position """
+        if self.lexprog is not None:
+            mo = self.lexprog.match(self.txt, self.pos)
+            return mo, mo and self.lexfuncs[mo.lastindex]
+
+        # Try the patterns one by one:
+        for prog, _, func in self.lexmap:
+            mo = prog.match(self.txt, self.pos)
+            if mo:
+                return mo, func
+        return None, None
+
     def tokenize(self, txt, eof=False):
         """Generator that generates lexical tokens from text.
 
@@ -101,6 +156,10 @@ class SimpleLexer(Lexer, metaclass=LexMeta):
             loc = SourceLocation(self.filename, self.line, 0, 0)
             yield Token(EOF, EOF, loc)
 
+    def tokenize_all(self, txt, eof=False):
+        """ Split the whole text into a list of tokens """
+        return list(self.tokenize(txt, eof=eof))
+
 
 class BaseLexer(Lexer):
     """Base class for a lexer.
@@ -108,23 +167,68 @@ class BaseLexer(Lexer):
     This class can be overridden to create a
     lexer. This class handles the regular expression generation and
     source position accounting.
+
+    The token patterns are compiled into a single minimal automaton,
+    which is executed by a generated table driven scanner (see
+    :mod:`ppci.lang.tools.regex`). The longest match wins, and of
+    equally long matches the first token in the specification wins.
+    When a pattern cannot be handled by the automaton, for example
+    because of non-greedy repetition, the python re module is used,
+    where the first token that matches wins.
+
+    The action of a token is None to skip the token, a function which
+    returns the type and value of the token, or one of the actions
+    TEXT, GLYPH and KEYWORD, which require no function call.
     """
 
-    def __init__(self, tok_spec):
+    def __init__(self, tok_spec, keywords=()):
         tok_re = "|".join(
             "(?P<{}>{})".format(pair[0], pair[1]) for pair in tok_spec
         )
-        self.gettok = re.compile(tok_re).match
+        prog = re.compile(tok_re)
+        self.gettok = prog.match
         self.func_map = {pair[0]: pair[2] for pair in tok_spec}
+        self.token_names = [pair[0] for pair in tok_spec]
+        self.token_patterns = [pair[1] for pair in tok_spec]
+        self.token_funcs = [pair[2] for pair in tok_spec]
+        self.keyword_map = {keyword: keyword for keyword in keywords}
+
+        # Map group numbers of the combined pattern to the tokens:
+        self.group_tokens = [None] * (prog.groups + 1)
+        for index, name in enumerate(self.token_names):
+            self.group_tokens[prog.groupindex[name]] = index
+
+        self.scan = None
         self.filename = None
         self.line = 1
         self.line_start = 0
         self.pos = 0
 
+    def add_keyword(self, keyword):
+        """ Add a keyword, which is recognized by the KEYWORD action """
+        self.keyword_map[keyword] = keyword
+
     def feed(self, txt):
         """ Feeds the lexer with extra input """
         self.tokens = self.tokenize(txt)
 
+    def make_scanner(self):
+        """ Create the function which finds the matches in a text """
+        try:
+            return get_scanner(self.token_patterns)
+        except ValueError:
+            return self.scan_re
+
+    def scan_re(self, txt):
+        """ Find the matches with the re module """
+        group_tokens = self.group_tokens
+        gettok = self.gettok
+        mo = gettok(txt)
+        while mo:
+            end = mo.end()
+            yield group_tokens[mo.lastindex], mo.start(), end
+            mo = gettok(txt, end)
+
     def tokenize(self, txt, eof=False):
         """Generator that generates lexical tokens from text.
 
@@ -134,22 +238,31 @@ class BaseLexer(Lexer):
         self.line_start = 0
         self.pos = 0
         self.txt = txt
-        mo = self.gettok(txt)
-        while mo:
-            typ = mo.lastgroup
-            val = mo.group(typ)
-            column = mo.start() - self.line_start
-            length = mo.end() - mo.start()
-            loc = SourceLocation(self.filename, self.line, column, length)
-            func = self.func_map[typ]
-            new_pos = mo.end()
+        if self.scan is None:
+            self.scan = self.make_scanner()
+        names = self.token_names
+        funcs = self.token_funcs
+        keyword_map = self.keyword_map
+        filename = self.filename
+        for index, start, end in self.scan(txt):
+            func = funcs[index]
             if func:
-                res = func(typ, val)
-                if res:
-                    typ, val = res
-                    yield Token(typ, val, loc)
-            self.pos = new_pos
-            mo = self.gettok(txt, self.pos)
+                val = txt[start:end]
+                loc = SourceLocation(
+                    filename, self.line, start - self.line_start, end - start
+                )
+                if func == TEXT:
+                    yield Token(names[index], val, loc)
+                elif func == GLYPH:
+                    yield Token(val, val, loc)
+                elif func == KEYWORD:
+                    yield Token(keyword_map.get(val, names[index]), val, loc)
+                else:
+                    res = func(names[index], val)
+                    if res:
+                        typ, val = res
+                        yield Token(typ, val, loc)
+            self.pos = end
         if len(txt) != self.pos:
             char = txt[self.pos]
             column = self.pos - self.line_start
@@ -162,6 +275,10 @@ class BaseLexer(Lexer):
             loc = SourceLocation(self.filename, self.line, 0, 0)
             yield Token(EOF, EOF, loc)
 
+    def tokenize_all(self, txt, eof=False):
+        """ Split the whole text into a list of tokens """
+        return list(self.tokenize(txt, eof=eof))
+
     def newline(self):
         """ Enters a new line """
         self.line_start = self.pos
@@ -1,4 +1,8 @@
+import inspect
+import itertools
+import json
 import logging
+import sys
 from .baselex import EPS, EOF
 from ..common import Token
 from .common import ParserException, ParserGenerationException
@@ -104,74 +108,290 @@ class State:
 
 
 class LrParser:
-    """LR parser automata. This class takes goto and action table
+    """LR parser automata. This class takes the parse tables
     and can then process a sequence of tokens.
     """
 
-    def __init__(self, grammar, action_table, goto_table):
-        self.action_table = action_table
-        self.goto_table = goto_table
+    def __init__(self, grammar, table):
+        assert isinstance(table, LrTable)
         self.grammar = grammar
+        self.table = table
+
+    @property
+    def action_table(self):
+        """ The action table as a dictionary of actions """
+        return self.table.to_tables(self.grammar)[0]
+
+    @property
+    def goto_table(self):
+        """ The goto table as a dictionary """
+        return self.table.to_tables(self.grammar)[1]
 
     def parse(self, lexer):
         """ Parse an iterable with tokens """
         assert hasattr(lexer, "next_token")
-        stack = [0]
-        r_data_stack = []
+        table = self.table
+        terminal_numbers = table.terminal_numbers
+        action_base = table.action_base
+        action_check = table.action_check
+        action_value = table.action_value
+        goto_base = table.goto_base
+        goto_check = table.goto_check
+        goto_value = table.goto_value
+
+        # For each rule: its length, semantics, non-terminal and whether
+        # reducing it in the initial state accepts the input:
+        rules = [
+            (
+                len(production.symbols),
+                production.f,
+                table.nonterminal_numbers[production.name],
+                production.name == self.grammar.start_symbol,
+            )
+            for production in self.grammar.productions
+        ]
+
+        states = [0]
+        values = []
         look_ahead = lexer.next_token()
         assert type(look_ahead) is Token
-
-        # TODO: exit on this condition:
-        while stack != [0, self.grammar.start_symbol, 0]:
-            state = stack[-1]  # top of stack
-            key = (state, look_ahead.typ)
-            if key not in self.action_table:
+        while True:
+            state = states[-1]
+            terminal = terminal_numbers.get(look_ahead.typ)
+            if terminal is not None:
+                index = action_base[state] + terminal
+            if terminal is None or action_check[index] != state:
                 raise ParserException(
                     "Error parsing at character {0}".format(look_ahead)
                 )
-            action = self.action_table[key]
-            if isinstance(action, Reduce):
-                f_args = []
-                prod = self.grammar.productions[action.rule]
-                for s in prod.symbols:
-                    stack.pop()
-                    stack.pop()
-                    f_args.append(r_data_stack.pop())
-                f_args.reverse()
-                r_data = None
-                if prod.f:
-                    r_data = prod.f(*f_args)
-                state = stack[-1]
-                stack.append(prod.name)
-                stack.append(self.goto_table[(state, prod.name)])
-                r_data_stack.append(r_data)
-            elif isinstance(action, Shift):
-                stack.append(look_ahead.typ)
-                stack.append(action.to_state)
-                r_data_stack.append(look_ahead)
+            action = action_value[index]
+            if action > 0:
+                # Shift:
+                states.append(action)
+                values.append(look_ahead)
                 look_ahead = lexer.next_token()
-                assert type(look_ahead) is Token
-            elif isinstance(action, Accept):
-                # Pop last rule data off the stack:
-                f_args = []
-                param = self.grammar.productions[action.rule]
-                for s in param.symbols:
-                    stack.pop()
-                    stack.pop()
-                    f_args.append(r_data_stack.pop())
-                f_args.reverse()
-                if param.f:
-                    ret_val = param.f(*f_args)
+            else:
+                # Reduce:
+                length, semantics, nonterminal, is_start = rules[-action - 1]
+                if length:
+                    f_args = values[-length:]
+                    del values[-length:]
+                    del states[-length:]
+                else:
+                    f_args = []
+                value = semantics(*f_args) if semantics else None
+                state = states[-1]
+                if is_start and state == 0 and look_ahead.typ == EOF:
+                    return value
+                index = goto_base[state] + nonterminal
+                assert goto_check[index] == state
+                states.append(goto_value[index])
+                values.append(value)
+
+
+class LrTable:
+    """Compact integer parse tables.
+
+    Terminals and non-terminals are numbered. The action table row of
+    each state is placed in a single array at an offset per state, such
+    that rows do not overlap. A check array tells to which state an entry
+    belongs. The goto table is packed in the same way.
+
+    A shift to state s is encoded as s, a reduce by rule r as -r - 1.
+    Reducing a rule of the start symbol at the end of the input accepts.
+    """
+
+    def __init__(
+        self,
+        terminals,
+        nonterminals,
+        action_base,
+        action_check,
+        action_value,
+        goto_base,
+        goto_check,
+        goto_value,
+    ):
+        self.terminals = terminals
+        self.nonterminals = nonterminals
+        self.terminal_numbers = {t: i for i, t in enumerate(terminals)}
+        self.nonterminal_numbers = {n: i for i, n in enumerate(nonterminals)}
+        self.action_base = action_base
+        self.action_check = action_check
+        self.action_value = action_value
+        self.goto_base = goto_base
+        self.goto_check = goto_check
+        self.goto_value = goto_value
+
+    def __repr__(self):
+        return "LrTable with {} states of {} numbers".format(
+            len(self.action_base), self.size
+        )
+
+    @property
+    def size(self):
+        """ The total amount of numbers in this table """
+        return (
+            len(self.action_base)
+            + len(self.action_check)
+            + len(self.action_value)
+            + len(self.goto_base)
+            + len(self.goto_check)
+            + len(self.goto_value)
+        )
+
+    @classmethod
+    def from_tables(cls, grammar, action_table, goto_table):
+        """ Create compact tables from action and goto dictionaries """
+        terminals = sorted(grammar.terminals | {EOF})
+        nonterminals = sorted(grammar.nonterminals)
+        terminal_numbers = {t: i for i, t in enumerate(terminals)}
+        nonterminal_numbers = {n: i for i, n in enumerate(nonterminals)}
+        num_states = 1 + max(
+            [state for state, _ in itertools.chain(action_table, goto_table)]
+            + [0]
+        )
+
+        action_rows = [{} for _ in range(num_states)]
+        for (state, terminal), action in action_table.items():
+            if isinstance(action, Shift):
+                assert action.to_state > 0
+                value = action.to_state
+            else:
+                value = -action.rule - 1
+            action_rows[state][terminal_numbers[terminal]] = value
+
+        goto_rows = [{} for _ in range(num_states)]
+        for (state, nonterminal), to_state in goto_table.items():
+            goto_rows[state][nonterminal_numbers[nonterminal]] = to_state
+
+        action_base, action_check, action_value = pack_rows(
+            action_rows, len(terminals)
+        )
+        goto_base, goto_check, goto_value = pack_rows(
+            goto_rows, len(nonterminals)
+        )
+        return cls(
+            terminals,
+            nonterminals,
+            action_base,
+            action_check,
+            action_value,
+            goto_base,
+            goto_check,
+            goto_value,
+        )
+
+    def to_tables(self, grammar):
+        """ Get the action and goto tables as dictionaries """
+        action_table = {}
+        for state, base in enumerate(self.action_base):
+            for number, terminal in enumerate(self.terminals):
+                index = base + number
+                if self.action_check[index] != state:
+                    continue
+                value = self.action_value[index]
+                if value > 0:
+                    action = Shift(value)
                 else:
-                    ret_val = None
-                # Break out!
-                stack.append(param.name)
-                stack.append(0)
-                break
-        # At exit, the stack must be 1 long
-        # TODO: fix that this holds:
-        # assert stack == [0, self.grammar.start_symbol, 0]
-        return ret_val
+                    rule = -value - 1
+                    production = grammar.productions[rule]
+                    if (
+                        production.name == grammar.start_symbol
+                        and terminal == EOF
+                    ):
+                        action = Accept(rule)
+                    else:
+                        action = Reduce(rule)
+                action_table[(state, terminal)] = action
+
+        goto_table = {}
+        for state, base in enumerate(self.goto_base):
+            for number, nonterminal in enumerate(self.nonterminals):
+                index = base + number
+                if self.goto_check[index] == state:
+                    goto_table[(state, nonterminal)] = self.goto_value[index]
+        return action_table, goto_table
+
+    def serialize(self):
+        """ Serialize the table into a dictionary suitable for json """
+        return {
+            "terminals": self.terminals,
+            "nonterminals": self.nonterminals,
+            "action_base": self.action_base,
+            "action_check": self.action_check,
+            "action_value": self.action_value,
+            "goto_base": self.goto_base,
+            "goto_check": self.goto_check,
+            "goto_value": self.goto_value,
+        }
+
+    @classmethod
+    def deserialize(cls, data):
+        """ Create a table from a serialized dictionary """
+        return cls(**data)
+
+
+def pack_rows(rows, width):
+    """Place sparse table rows into a single array.
+
+    Each row is placed at the lowest offset at which its entries do
+    not collide with entries of earlier placed rows. The arrays are
+    padded, such that any column of any row can be looked up.
+    """
+    base = [0] * len(rows)
+    check = []
+    values = []
+    order = sorted(range(len(rows)), key=lambda r: -len(rows[r]))
+    for row_number in order:
+        row = rows[row_number]
+        if not row:
+            continue
+        offset = 0
+        while any(
+            offset + column < len(check) and check[offset + column] != -1
+            for column in row
+        ):
+            offset += 1
+        base[row_number] = offset
+        for column, value in row.items():
+            index = offset + column
+            if index >= len(check):
+                missing = index + 1 - len(check)
+                check.extend([-1] * missing)
+                values.extend([0] * missing)
+            check[index] = row_number
+            values[index] = value
+
+    missing = max(base + [0]) + width - len(check)
+    if missing > 0:
+        check.extend([-1] * missing)
+        values.extend([0] * missing)
+    return base, check, values
+
+
+def calculate_nullable(grammar):
+    """Determine the non-terminals which can derive the empty string.
+
+    Returns a dictionary from each grammar symbol to whether it is
+    nullable.
+    """
+    nullable = {}
+    for terminal in grammar.terminals | {EOF, EPS}:
+        nullable[terminal] = False
+
+    for nt in grammar.nonterminals:
+        nullable[nt] = False
+
+    some_change = True
+    while some_change:
+        some_change = False
+        for rule in grammar.productions:
+            if not nullable[rule.name]:
+                if all(nullable[beta] for beta in rule.symbols):
+                    nullable[rule.name] = True
+                    some_change = True
+    return nullable
 
 
 def calculate_first_sets(grammar):
@@ -182,24 +402,16 @@ def calculate_first_sets(grammar):
     when looking for the symbol.
     """
     first = {}
-    nullable = {}
+    nullable = calculate_nullable(grammar)
     for terminal in grammar.terminals | {EOF, EPS}:
         first[terminal] = set([terminal])
-        nullable[terminal] = False
 
     for nt in grammar.nonterminals:
         first[nt] = set()
-        nullable[nt] = False
 
     while True:
         some_change = False
         for rule in grammar.productions:
-            # Check for null-ability:
-            if all(nullable[beta] for beta in rule.symbols):
-                if not nullable[rule.name]:
-                    nullable[rule.name] = True
-                    some_change = True
-
             # Update first sets:
             for beta in rule.symbols:
                 if not nullable[beta]:
@@ -212,9 +424,50 @@ def calculate_first_sets(grammar):
     return first
 
 
+def digraph(nodes, relation, initial):
+    """Determine for each node the union of the initial sets of all nodes
+    reachable via the relation.
+
+    This is the digraph algorithm of DeRemer and Pennello, which handles
+    the strongly connected components of the relation in one pass.
+    """
+    stack = []
+    depth = {node: 0 for node in nodes}
+    result = {}
+    done = len(depth) + 1
+
+    def traverse(node):
+        stack.append(node)
+        d = len(stack)
+        depth[node] = d
+        result[node] = set(initial[node])
+        for other in relation.get(node, ()):
+            if depth[other] == 0:
+                traverse(other)
+            depth[node] = min(depth[node], depth[other])
+            result[node] |= result[other]
+        if depth[node] == d:
+            while True:
+                member = stack.pop()
+                depth[member] = done
+                result[member] = result[node]
+                if member == node:
+                    break
+
+    for node in nodes:
+        if depth[node] == 0:
+            traverse(node)
+    return result
+
+
 class LrParserBuilder:
     """
     Construct goto and action tables according to LALR algorithm
+
+    The LR(0) states are created first. Then the look ahead symbols of
+    the reduce items are calculated with the method of DeRemer and
+    Pennello, which follows the relations between the transitions over
+    non-terminals.
     """
 
     def __init__(self, grammar):
@@ -286,14 +539,63 @@ class LrParserBuilder:
                 next_set.add(item.shifted())
         return self.closure(next_set)
 
-    def generate_parser(self):
+    def generate_parser(self, cache=None):
         """ Generates a parser from the grammar """
         self.logger.debug("Generating parser from {}".format(self.grammar))
-        self.generate_tables()
-        p = LrParser(self.grammar, self.action_table, self.goto_table)
+        table = self.generate_table(cache=cache)
+        p = LrParser(self.grammar, table)
         self.logger.debug("Parser generated")
         return p
 
+    def generate_table(self, cache=None):
+        """Generate compact parse tables.
+
+        The tables are looked up in the given cache, or in the shared
+        cache when no cache is given, by a hash over the grammar.
+        """
+        from ...build.cache import get_shared_cache
+
+        if cache is None:
+            cache = get_shared_cache("lr")
+
+        if cache is not None:
+            try:
+                key = self.cache_key()
+                text = cache.get_text(key)
+            except OSError as ex:
+                self.logger.warning("Parse table cache unusable: %s", ex)
+                cache = None
+            else:
+                if text is not None:
+                    return LrTable.deserialize(json.loads(text))
+
+        action_table, goto_table = self.generate_tables()
+        table = LrTable.from_tables(self.grammar, action_table, goto_table)
+        self.logger.debug("%s", table)
+        if cache is not None:
+            try:
+                cache.put_text(key, json.dumps(table.serialize()))
+            except OSError as ex:
+                self.logger.warning("Could not store parse tables: %s", ex)
+        return table
+
+    def cache_key(self):
+        """ Create a key for the tables of the grammar """
+        from ...build.cache import CompileCache
+
+        if not self.grammar.start_symbol:
+            self.grammar.start_symbol = self.grammar.productions[0].name
+        grammar = [
+            self.grammar.start_symbol,
+            sorted(self.grammar.terminals),
+            [[p.name, list(p.symbols)] for p in self.grammar.productions],
+        ]
+        return CompileCache.make_key(
+            "lr",
+            inspect.getsource(sys.modules[__name__]),
+            json.dumps(grammar),
+        )
+
     def gen_canonical_set(self, iis):
         """ Create all LR1 states """
         states = set()
@@ -319,6 +621,136 @@ class LrParserBuilder:
                 transitions[(indici[itemset], symbol)] = indici[nis]
         return states, transitions, indici
 
+    def gen_lr0_states(self):
+        """Create all LR(0) states.
+
+        An item is a tuple of a production number and a dot position.
+        Returns the list of item sets and the transitions between them.
+        """
+        grammar = self.grammar
+        productions = grammar.productions
+        rules_for_name = {name: [] for name in grammar.nonterminals}
+        for number, production in enumerate(productions):
+            rules_for_name.setdefault(production.name, []).append(number)
+
+        # Determine for each non-terminal the non-terminals which can
+        # appear left most in its derivations, including itself:
+        left_most = {}
+        for name in grammar.nonterminals:
+            names = {name}
+            worklist = [name]
+            while worklist:
+                for number in rules_for_name[worklist.pop()]:
+                    symbols = productions[number].symbols
+                    if symbols and symbols[0] in grammar.nonterminals:
+                        if symbols[0] not in names:
+                            names.add(symbols[0])
+                            worklist.append(symbols[0])
+            left_most[name] = sorted(names)
+
+        def closure(kernel):
+            items = set(kernel)
+            for number, dot in kernel:
+                symbols = productions[number].symbols
+                if dot < len(symbols) and symbols[dot] in left_most:
+                    for name in left_most[symbols[dot]]:
+                        for rule in rules_for_name[name]:
+                            items.add((rule, 0))
+            return sorted(items)
+
+        initial = frozenset(
+            (number, 0) for number in rules_for_name[grammar.start_symbol]
+        )
+        kernels = [initial]
+        numbers = {initial: 0}
+        states = []
+        transitions = {}
+        while len(states) < len(kernels):
+            state = len(states)
+            items = closure(kernels[state])
+            states.append(items)
+            next_kernels = {}
+            for number, dot in items:
+                symbols = productions[number].symbols
+                if dot < len(symbols):
+                    next_kernels.setdefault(symbols[dot], set()).add(
+                        (number, dot + 1)
+                    )
+            for symbol in sorted(next_kernels):
+                kernel = frozenset(next_kernels[symbol])
+                if kernel not in numbers:
+                    numbers[kernel] = len(kernels)
+                    kernels.append(kernel)
+                transitions[(state, symbol)] = numbers[kernel]
+        return states, transitions
+
+    def calculate_look_aheads(self, states, transitions):
+        """Calculate the LALR(1) look ahead sets of the reduce items.
+
+        Returns a dictionary from state number and production number
+        to the set of terminals on which to reduce.
+        """
+        grammar = self.grammar
+        productions = grammar.productions
+        nonterminals = grammar.nonterminals
+        nullable = calculate_nullable(grammar)
+
+        # The terminals which can be shifted in each state:
+        shifts = [set() for _ in states]
+        for (state, symbol), to_state in transitions.items():
+            if symbol not in nonterminals:
+                shifts[state].add(symbol)
+
+        # The transitions over non-terminals. The start symbol is followed
+        # by the end of input, also when it is never shifted:
+        start = (0, grammar.start_symbol)
+        nt_transitions = [t for t in transitions if t[1] in nonterminals]
+        if start not in transitions:
+            nt_transitions.append(start)
+
+        direct_reads = {}
+        reads = {}
+        for transition in nt_transitions:
+            direct_reads[transition] = set()
+            reads[transition] = []
+            if transition in transitions:
+                to_state = transitions[transition]
+                direct_reads[transition] |= shifts[to_state]
+                for symbol in nonterminals:
+                    if nullable[symbol] and (to_state, symbol) in transitions:
+                        reads[transition].append((to_state, symbol))
+        direct_reads[start].add(EOF)
+
+        # Walk each production from each transition over its non-terminal:
+        includes = {}
+        lookback = {}
+        for transition in nt_transitions:
+            for number, production in enumerate(productions):
+                if production.name != transition[1]:
+                    continue
+                state = transition[0]
+                symbols = production.symbols
+                for position, symbol in enumerate(symbols):
+                    if symbol in nonterminals and all(
+                        nullable[s] for s in symbols[position + 1 :]
+                    ):
+                        includes.setdefault((state, symbol), []).append(
+                            transition
+                        )
+                    state = transitions[(state, symbol)]
+                lookback.setdefault((state, number), []).append(transition)
+
+        read_sets = digraph(nt_transitions, reads, direct_reads)
+        follow_sets = digraph(nt_transitions, includes, read_sets)
+
+        look_aheads = {}
+        for key, lookback_transitions in lookback.items():
+            look_ahead = set()
+            for transition in lookback_transitions:
+                look_ahead |= follow_sets[transition]
+            look_aheads[key] = look_ahead
+        return look_aheads
+
     def set_action(self, state, t, action):
         assert isinstance(action, Action)
         assert isinstance(state, int)
@@ -353,49 +785,43 @@ class LrParserBuilder:
         if not self.grammar.start_symbol:
             self.grammar.start_symbol = self.grammar.productions[0].name
 
-        # Make grammar normal:
-        # self.grammar.rewrite_eps_productions()
-        # assert self.grammar.is_normal
-
         self.grammar.check_symbols()
-        iis = self.initial_item_set()
-        self.logger.debug("Initial item set: {} items".format(len(iis)))
 
-        # First generate all item sets by using the nextItemset function:
-        states, transitions, indici = self.gen_canonical_set(iis)
+        # First generate all LR(0) states and their look ahead sets:
+        states, transitions = self.gen_lr0_states()
         self.logger.debug("Number of states: {}".format(len(states)))
         self.logger.debug("Number of transitions: {}".format(len(transitions)))
+        look_aheads = self.calculate_look_aheads(states, transitions)
 
         # Fill action table:
-        for state in states:
-            state_nr = indici[state]
-            # Detect conflicts:
-            for item in state:
-                if item.is_shift and item.Next in self.grammar.terminals:
-                    # Rule 1, a shift item:
-                    nextstate = transitions[(state_nr, item.Next)]
-                    self.set_action(state_nr, item.Next, Shift(nextstate))
-                if item.is_reduce:
+        productions = self.grammar.productions
+        for state_nr, items in enumerate(states):
+            for number, dot in items:
+                production = productions[number]
+                if dot < len(production.symbols):
+                    symbol = production.symbols[dot]
+                    if symbol in self.grammar.terminals:
+                        # Rule 1, a shift item:
+                        nextstate = transitions[(state_nr, symbol)]
+                        self.set_action(state_nr, symbol, Shift(nextstate))
+                    continue
+
+                for look_ahead in sorted(look_aheads[(state_nr, number)]):
                     if (
-                        item.production.name == self.grammar.start_symbol
-                        and item.look_ahead == EOF
+                        production.name == self.grammar.start_symbol
+                        and look_ahead == EOF
                     ):
                         # Rule 3: accept:
-                        act = Accept(
-                            self.grammar.productions.index(item.production)
-                        )
+                        act = Accept(number)
                     else:
                         # Rule 2, reduce item:
-                        act = Reduce(
-                            self.grammar.productions.index(item.production)
-                        )
-                    self.set_action(state_nr, item.look_ahead, act)
+                        act = Reduce(number)
+                    self.set_action(state_nr, look_ahead, act)
 
-            # Fill the goto table:
-            for nt in self.grammar.nonterminals:
-                key = (state_nr, nt)
-                if key in transitions:
-                    self.goto_table[key] = transitions[key]
+        # Fill the goto table:
+        for (state_nr, symbol), to_state in transitions.items():
+            if symbol in self.grammar.nonterminals:
+                self.goto_table[(state_nr, symbol)] = to_state
 
         self.logger.debug("Goto table: {}".format(len(self.goto_table)))
         self.logger.debug("Action table: {}".format(len(self.action_table)))
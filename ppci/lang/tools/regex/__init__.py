@@ -1,6 +1,7 @@
 """ Regular expression routines.
 
-Implement regular expressions using derivatives.
+Implement regular expressions using derivatives. The resulting automaton
+can be minimized, and turned into a table driven scanner.
 
 Largely copied from: https://github.com/MichaelPaddon/epsilon
 
@@ -14,16 +15,19 @@ https://swtch.com/~rsc/regexp/
 
 from .regex import Symbol, SymbolSet, Kleene, EPSILON, NULL
 from .parser import parse
-from .compiler import compile
-from .scanner import make_scanner, scan
-from .codegen import generate_code
+from .compiler import compile, minimize
+from .scanner import make_scanner, scan, get_scanner
+from .codegen import generate_code, generate_python
 
 
 __all__ = (
     "parse",
     "compile",
+    "minimize",
+    "get_scanner",
     "Symbol",
     "SymbolSet",
     "Kleene",
     "generate_code",
+    "generate_python",
 )
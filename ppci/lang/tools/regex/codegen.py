@@ -1,9 +1,11 @@
 """ Generate code for a scanner.
 
 This can be used to create a C file which does the scanning
-of tokens.
+of tokens, or a python module with a table driven scanner.
 """
 
+from .compiler import make_tables
+
 C_PROLOGUE = """
 
 struct state_transition {
@@ -63,3 +65,98 @@ def generate_code(prog, f):
             print("    0,", file=f)
     print("};", file=f)
     print(file=f)
+
+
+PYTHON_SCANNER = '''
+
+class ClassMap(dict):
+    """ Map symbols to class characters, for use with str.translate """
+
+    def __missing__(self, symbol):
+        index = bisect.bisect(starts, symbol) - 1
+        value = self[symbol] = chr(classes[index])
+        return value
+
+
+class_map = ClassMap(
+    (symbol, chr(lookup_class(symbol))) for symbol in range(256)
+)
+
+
+def scan(text):
+    """Find the longest matches in the given text.
+
+    Yields the accept value, start and end of each match, and stops
+    at the first position where nothing matches.
+    """
+    # The end of the text is marked with a class without transitions:
+    data = text.translate(class_map).encode("latin-1") + end_marker
+    size = len(text)
+    next_state = table
+    accept_of = accepts
+    start = 0
+    while start < size:
+        state = 0
+        accept = None
+        pos = start
+        while True:
+            state = next_state[state + data[pos]]
+            if state < 0:
+                break
+            pos += 1
+            if accept_of[state] is not None:
+                accept = accept_of[state]
+                end = pos
+        if accept is None:
+            return
+        yield accept, start, end
+        start = end
+'''
+
+
+def generate_python(prog, f):
+    """Generate a python module with a table driven scanner.
+
+    The module contains a ``scan`` function which yields the longest
+    matches of the program. A program with more than 256 symbol classes
+    raises a ValueError, since the classes are stored in bytes.
+    """
+    write_python(make_python_tables(prog), f)
+
+
+def make_python_tables(prog):
+    """Create the tables of a python scanner for the given program.
+
+    The tables are a dictionary of numbers and lists of numbers, so they
+    can be stored as JSON. Raises a ValueError when the program has more
+    than 256 symbol classes.
+    """
+    ranges, num_classes, table, accepts = make_tables(prog, end_class=True)
+    if num_classes > 256:
+        raise ValueError("Too many symbol classes")
+    return {
+        "starts": [r[0] for r in ranges],
+        "classes": [r[2] for r in ranges],
+        "table": table,
+        "accepts": accepts,
+        "num_classes": num_classes,
+    }
+
+
+def write_python(tables, f):
+    """ Write a python scanner module for the given scanner tables """
+    print('""" Automatically generated scanner. Do not edit. """', file=f)
+    print(file=f)
+    print("import bisect", file=f)
+    print(file=f)
+    print("starts = {!r}".format(tables["starts"]), file=f)
+    print("classes = {!r}".format(tables["classes"]), file=f)
+    print("table = {!r}".format(tables["table"]), file=f)
+    print("accepts = {!r}".format(tables["accepts"]), file=f)
+    end_marker = bytes([tables["num_classes"] - 1])
+    print("end_marker = {!r}".format(end_marker), file=f)
+    print(file=f)
+    print(file=f)
+    print("def lookup_class(symbol):", file=f)
+    print("    return classes[bisect.bisect(starts, symbol) - 1]", file=f)
+    print(PYTHON_SCANNER, file=f, end="")
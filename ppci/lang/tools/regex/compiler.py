@@ -1,5 +1,19 @@
+""" Turn regular expressions into deterministic finite automata.
+
+The automaton is created with derivatives, and can be made minimal with
+the algorithm of Hopcroft. For fast scanning, the symbols are grouped
+into classes with equal behavior, and a dense transition table over
+these classes is created.
+
+A program is a tuple with the transitions per state, the accept value
+per state and the number of the error state. The transitions of a state
+are sorted (first, last, next_state) triples, which cover all symbols.
+State 0 is the start state.
+"""
+
+import bisect
 from .parser import parse
-from .regex import NULL
+from .regex import NULL, SIGMA
 from ....utils.integer_set import IntegerSet
 
 
@@ -50,6 +64,190 @@ def compile(r: str):
         transitions[state_number].sort()
 
     accepts = [state.nullable() for state in states]
-    error = state_numbers[expr.null]
+    if expr.null in state_numbers:
+        error = state_numbers[expr.null]
+    else:
+        # The error state is never reached, add it for completeness:
+        error = len(transitions)
+        transitions.append(
+            [(first, last, error) for first, last in SIGMA.symbols.ranges]
+        )
+        accepts.append(expr.null.nullable())
 
     return transitions, accepts, error
+
+
+def symbol_classes(prog):
+    """Group the symbols into classes with equal transitions.
+
+    Returns a list of sorted (first, last, class) triples, which cover
+    all symbols, and for each state the next state per class.
+    """
+    transitions = prog[0]
+
+    # Split the symbols at every boundary of a transition:
+    bounds = set()
+    for state_transitions in transitions:
+        for first, last, _ in state_transitions:
+            bounds.add(first)
+            bounds.add(last + 1)
+    bounds = sorted(bounds)
+
+    # Determine the next state of every state for each interval:
+    columns = [[] for _ in bounds[:-1]]
+    for state_transitions in transitions:
+        index = 0
+        for first, last, next_state in state_transitions:
+            while index < len(columns) and bounds[index] <= last:
+                columns[index].append(next_state)
+                index += 1
+
+    # Intervals with the same column form a class:
+    class_numbers = {}
+    ranges = []
+    for index, column in enumerate(columns):
+        column = tuple(column)
+        if column not in class_numbers:
+            class_numbers[column] = len(class_numbers)
+        cls = class_numbers[column]
+        first, last = bounds[index], bounds[index + 1] - 1
+        if ranges and ranges[-1][2] == cls:
+            ranges[-1] = (ranges[-1][0], last, cls)
+        else:
+            ranges.append((first, last, cls))
+
+    table = [[None] * len(class_numbers) for _ in transitions]
+    for column, cls in class_numbers.items():
+        for state, next_state in enumerate(column):
+            table[state][cls] = next_state
+    return ranges, table
+
+
+def minimize(prog):
+    """Create the minimal automaton which is equivalent to the given one.
+
+    This is the algorithm of Hopcroft. States are distinguished when
+    they have a different accept value, so that a scanner can still tell
+    which expression matched.
+    """
+    _, accepts, error = prog
+    ranges, table = symbol_classes(prog)
+    num_states = len(table)
+    num_classes = len(ranges and table[0])
+
+    # Determine the states leading to a state per class:
+    inverse = [[[] for _ in range(num_states)] for _ in range(num_classes)]
+    for state, row in enumerate(table):
+        for cls, next_state in enumerate(row):
+            inverse[cls][next_state].append(state)
+
+    # Start with a partition into states with the same accept value:
+    groups = {}
+    for state, accept in enumerate(accepts):
+        groups.setdefault(make_hashable(accept), []).append(state)
+    blocks = [set(states) for states in groups.values()]
+    block_of = [0] * num_states
+    for number, block in enumerate(blocks):
+        for state in block:
+            block_of[state] = number
+    largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+    work = set(range(len(blocks))) - {largest}
+
+    # Refine the partition until it is stable:
+    while work:
+        splitter = list(blocks[work.pop()])
+        for cls in range(num_classes):
+            predecessors = {}
+            for state in splitter:
+                for predecessor in inverse[cls][state]:
+                    predecessors.setdefault(
+                        block_of[predecessor], set()
+                    ).add(predecessor)
+
+            for number, inside in predecessors.items():
+                block = blocks[number]
+                if len(inside) == len(block):
+                    continue
+
+                # Split the block in the part inside and outside:
+                new_number = len(blocks)
+                blocks[number] = inside
+                blocks.append(block - inside)
+                for state in blocks[new_number]:
+                    block_of[state] = new_number
+                if number in work or len(inside) > len(block) // 2:
+                    work.add(new_number)
+                else:
+                    work.add(number)
+
+    # Number the new states, starting with the block of the start state:
+    order = sorted(range(len(blocks)), key=lambda b: min(blocks[b]))
+    numbers = {block: number for number, block in enumerate(order)}
+    new_transitions = []
+    new_accepts = []
+    for block in order:
+        state = min(blocks[block])
+        row = table[state]
+        state_transitions = []
+        for first, last, cls in ranges:
+            next_state = numbers[block_of[row[cls]]]
+            if state_transitions and state_transitions[-1][2] == next_state:
+                if state_transitions[-1][1] + 1 == first:
+                    first = state_transitions[-1][0]
+                    state_transitions.pop()
+            state_transitions.append((first, last, next_state))
+        new_transitions.append(state_transitions)
+        new_accepts.append(accepts[state])
+    return new_transitions, new_accepts, numbers[block_of[error]]
+
+
+def make_hashable(accept):
+    """ Accept values of expression vectors are lists """
+    return tuple(accept) if isinstance(accept, list) else accept
+
+
+def make_tables(prog, end_class=False):
+    """Create dense tables for a table driven scanner.
+
+    The symbols are grouped into classes, and the transition table is
+    a flat list indexed by state plus class. The states are multiplied
+    by the number of classes beforehand, which saves a multiplication
+    per symbol. The error state is removed, and transitions to it are
+    encoded as -1.
+
+    When end_class is true, an extra last class is added, which leads
+    to the error state from every state. It can be used to mark the end
+    of the input.
+
+    Returns the (first, last, class) ranges of the symbol classes, the
+    number of classes, the transition table and the accept value per
+    premultiplied state.
+    """
+    _, accepts, error = prog
+    ranges, table = symbol_classes(prog)
+    if end_class:
+        for row in table:
+            row.append(error)
+    num_classes = len(table[0])
+    numbers = {}
+    for state in range(len(table)):
+        if state != error:
+            numbers[state] = len(numbers) * num_classes
+    numbers[error] = -1
+
+    dense = []
+    dense_accepts = []
+    for state, row in enumerate(table):
+        if state != error:
+            dense.extend(numbers[next_state] for next_state in row)
+            dense_accepts.append(accepts[state])
+            dense_accepts.extend([None] * (num_classes - 1))
+    return ranges, num_classes, dense, dense_accepts
+
+
+def lookup_class(ranges, symbol):
+    """ Find the class of a symbol in sorted class ranges """
+    index = bisect.bisect(ranges, (symbol, SIGMA.symbols.ranges[0][1] + 1))
+    first, last, cls = ranges[index - 1]
+    assert first <= symbol <= last
+    return cls
@@ -2,8 +2,17 @@
 
 This module is able to parse regular expressions.
 
+The supported syntax is a subset of the syntax of the python :mod:`re`
+module: concatenation, alternation, grouping, the ``*``, ``+``, ``?``
+and ``{m,n}`` repetitions, character sets (also complemented ones),
+``.`` and the escapes ``\\d``, ``\\w``, ``\\s`` and their complements.
+Features which cannot be expressed by a finite automaton, such as
+non-greedy repetition, anchors and back references, raise a ValueError.
+
 """
 
+import functools
+import re
 from . import regex
 
 
@@ -13,19 +22,43 @@ def parse(r):
     return parser.parse(r)
 
 
+# Escape sequences which denote a single character:
+ESCAPE_CHARS = {
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+    "f": "\f",
+    "v": "\v",
+    "a": "\a",
+    "0": "\0",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def escape_class(letter):
+    """Get the character ranges of an escape class such as '\\d'.
+
+    The ranges are determined with the re module itself, so that the
+    unicode meaning of the classes is exactly the same.
+    """
+    universe = "".join(map(chr, range(regex.SIGMA.symbols.ranges[0][1] + 1)))
+    ranges = []
+    for mo in re.finditer("[\\" + letter + "]+", universe):
+        ranges.append((mo.start(), mo.end() - 1))
+    return regex.IntegerSet(*ranges)
+
+
 class Parser:
     """ Regular expression program parser """
 
     def parse(self, txt):
         self.txt = txt
         self.pos = 0
-        if self.at_end():
-            expr = regex.EPSILON
-        else:
-            expr = self._parse_top()
-            while not self.at_end():
-                expr2 = self._parse_top()
-                expr = expr + expr2
+        expr = self._parse_top()
+        if not self.at_end():
+            raise ValueError(
+                "Unexpected {} at position {}".format(self.current(), self.pos)
+            )
         return expr
 
     def current(self):
@@ -78,19 +111,31 @@ class Parser:
         return expr
 
     def _parse_and(self):
-        return self._parse_element()
+        expr = regex.EPSILON
+        while not (self.at_end() or self.peek("|") or self.peek(")")):
+            expr = expr + self._parse_element()
+        return expr
 
     def _parse_element(self):
         """ Parse single element of regex """
         if self.peek("("):
             self.eat("(")
+            if self.did_eat("?"):
+                # Only non capturing groups are meaningful here:
+                self.eat(":")
             expr = self._parse_top()
             self.eat(")")
         elif self.peek("["):
             expr = self._parse_set()
         elif self.peek("."):
             self.eat(".")
-            expr = regex.SIGMA
+            expr = regex.SymbolSet(regex.SIGMA.symbols - regex.IntegerSet(10))
+        elif self.peek("\\"):
+            expr = regex.SymbolSet(self._parse_escape())
+        elif self.current() in "*+?":
+            raise ValueError("Nothing to repeat at {}".format(self.pos))
+        elif self.current() in "^$":
+            raise ValueError("Anchors are not supported")
         else:
             expr = self._parse_symbol()
 
@@ -103,43 +148,59 @@ class Parser:
         sym = self.eat()
         return regex.Symbol(sym)
 
+    def _parse_escape(self):
+        """ Parse an escape sequence into a set of symbols """
+        self.eat("\\")
+        letter = self._next_char()
+        if letter in "dws":
+            return escape_class(letter)
+        elif letter in "DWS":
+            return regex.SIGMA.symbols - escape_class(letter.lower())
+        elif letter in ESCAPE_CHARS:
+            return regex.IntegerSet(ord(ESCAPE_CHARS[letter]))
+        elif letter.isalnum():
+            raise ValueError("Unsupported escape \\{}".format(letter))
+        else:
+            return regex.IntegerSet(ord(letter))
+
+    def _parse_set_item(self):
+        """ Parse a single character or escape class in a set """
+        if self.peek("\\"):
+            return self._parse_escape()
+        else:
+            return regex.IntegerSet(ord(self.eat()))
+
     def _parse_set(self):
         """ Parse a set of options '[0-9abc]' """
         self.eat("[")
-        ranges = []
+        symbols = regex.IntegerSet()
         # Check inversion:
-        if self.peek("^"):
-            self.eat("^")
-            complement = True
-        else:
-            complement = False
+        complement = self.did_eat("^")
 
-        # options.append(complement)
         while not self.peek("]"):
-            start = ord(self.eat())
-            if self.peek("-"):
+            start = self._parse_set_item()
+            if self.peek("-") and self.txt[self.pos + 1 : self.pos + 2] != "]":
                 self.eat("-")
-                end = ord(self.eat())
-                if not (start < end):
+                end = self._parse_set_item()
+                if len(start) != 1 or len(end) != 1:
+                    raise ValueError("Invalid range in set")
+                start, end = start.ranges[0][0], end.ranges[0][0]
+                if start > end:
                     raise ValueError("Start must be before end")
-                ranges.append((start, end))
+                symbols = symbols | regex.IntegerSet((start, end))
             else:
-                ranges.append(start)
+                symbols = symbols | start
         self.eat("]")
 
-        if not ranges:
+        if not symbols:
             raise ValueError(
                 "Expected at least 1 item in regex option group [...]"
             )
 
-        expr = regex.SymbolSet(ranges)
-
         if complement:
-            expr = not expr
-            raise NotImplementedError("TODO?")
-            # Something like this: expr = SIGMA - expr?
+            symbols = regex.SIGMA.symbols - symbols
 
-        return expr
+        return regex.SymbolSet(symbols)
 
     def _parse_modifier(self, expr):
         """ Parse any modifiers after an expression """
@@ -149,5 +210,37 @@ class Parser:
             expr = expr + regex.Kleene(expr)
         elif self.did_eat("?"):
             expr = expr | regex.EPSILON
+        else:
+            mo = re.compile(r"\{(\d*)(,?)(\d*)\}").match(self.txt, self.pos)
+            if not mo or not (mo.group(1) or mo.group(3)):
+                return expr
+            self.pos = mo.end()
+            minimum = int(mo.group(1) or "0")
+            if mo.group(2):
+                maximum = int(mo.group(3)) if mo.group(3) else None
+            else:
+                maximum = minimum
+            expr = self._repeat(expr, minimum, maximum)
 
+        if self.current() in ("?", "+"):
+            raise ValueError("Non-greedy and possessive repetition")
+        elif self.current() in ("*", "{"):
+            raise ValueError("Multiple repeat at {}".format(self.pos))
         return expr
+
+    @staticmethod
+    def _repeat(expr, minimum, maximum):
+        """ Create expr{minimum,maximum}, where maximum can be None """
+        result = regex.EPSILON
+        for _ in range(minimum):
+            result = result + expr
+        if maximum is None:
+            result = result + regex.Kleene(expr)
+        else:
+            if maximum < minimum:
+                raise ValueError("Maximum must not be less than minimum")
+            optional = regex.EPSILON
+            for _ in range(maximum - minimum):
+                optional = (expr + optional) | regex.EPSILON
+            result = result + optional
+        return result
@@ -91,7 +91,10 @@ class SymbolSet(Regex):
     """ Match a symbol set """
 
     def __init__(self, symbols):
-        self.symbols = IntegerSet(*symbols)
+        if isinstance(symbols, IntegerSet):
+            self.symbols = symbols
+        else:
+            self.symbols = IntegerSet(*symbols)
 
     def nu(self):
         return NULL
@@ -116,7 +119,7 @@ class SymbolSet(Regex):
 
 
 NULL = SymbolSet([])
-SIGMA = SymbolSet([(0, 255)])  # ASCII for now.
+SIGMA = SymbolSet([(0, 0x10FFFF)])  # All unicode code points.
 
 
 def Symbol(symbol):
@@ -213,16 +216,34 @@ def logical_or(left, right):
     if isinstance(left, SymbolSet) and isinstance(right, SymbolSet):
         return SymbolSet(left.symbols | right.symbols)
 
-    if left == right:
-        return left
+    # Create a sorted set of alternatives. This keeps the number of
+    # different derivatives finite.
+    alternatives = set()
+    symbols = NULL.symbols
+    for expr in alternatives_of(left) + alternatives_of(right):
+        if isinstance(expr, SymbolSet):
+            symbols = symbols | expr.symbols
+        else:
+            alternatives.add(expr)
+    if symbols:
+        alternatives.add(SymbolSet(symbols))
 
-    if left == NULL:
-        return right
+    if not alternatives:
+        return NULL
+
+    alternatives = sorted(alternatives, key=str)
+    expr = alternatives[0]
+    for rhs in alternatives[1:]:
+        expr = LogicalOr(expr, rhs)
+    return expr
 
-    if right == NULL:
-        return left
 
-    return LogicalOr(left, right)
+def alternatives_of(expr):
+    """ Get the alternatives of a nested logical or """
+    if isinstance(expr, LogicalOr):
+        return alternatives_of(expr.lhs) + alternatives_of(expr.rhs)
+    else:
+        return [expr]
 
 
 class LogicalOr(Regex):
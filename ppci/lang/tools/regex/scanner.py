@@ -1,7 +1,12 @@
-import functools
 import bisect
+import inspect
+import io
+import json
+import sys
+import types
 from .regex import ExpressionVector
-from .compiler import compile
+from .compiler import compile, minimize
+from .codegen import make_python_tables, write_python
 from .parser import parse
 
 
@@ -56,65 +61,132 @@ def pick_transition(state_transitions, state, char):
 
 def make_scanner(token_descriptions):
     """Create a scanner based upon a set of token descriptions."""
-    vector = []
-    for name in token_descriptions:
-        r = token_descriptions[name]
-        expr = parse(r)
-        print(name, expr)
-        vector.append((name, expr))
-
-    vector = ExpressionVector(vector)
-
-    prog = compile(vector)
-
-    return Scanner(prog)
+    names = list(token_descriptions)
+    scan_function = get_scanner([token_descriptions[n] for n in names])
+    return Scanner(names, scan_function)
 
 
 class Scanner:
-    def __init__(self, prog):
-        self._state = 0
-        self._prog = prog
+    def __init__(self, names, scan_function):
+        self._names = names
+        self._scan = scan_function
 
     def scan(self, txt):
-
-        # Initialize some variables:
-        (
-            self._state_transitions,
-            self._accept_states,
-            self._error_state,
-        ) = self._prog
-        self._start = self._offset = 0
-        self._state = 0
-        self._accept = False
-
-        while True:
-            # Check if we are in accepting state:
-            if self._accept_states[self._state]:
-                self._accept = self._accept_states[self._state]
-                # print("Accept", self._accept)
-                end = self._offset
-
-            if self._offset < len(txt):
-                char = ord(txt[self._offset])
-                self._state = pick_transition(
-                    self._state_transitions, self._state, char
-                )
-                self._offset += 1
-            else:
-                self._state = self._error_state
-
-            if self._state == self._error_state:
-                if self._accept:
-                    token_txt = txt[self._start : end]
-                    # print(self._state, token_txt)
-
-                    yield (self._accept[0], token_txt)
-                    # Start over:
-                    self._offset = self._start = end
-                    self._state = 0
-                    self._accept = False
-
-                elif self._offset > self._start:
-                    raise ValueError("No match!")
-                else:
-                    break
+        offset = 0
+        for index, start, end in self._scan(txt):
+            yield (self._names[index], txt[start:end])
+            offset = end
+        if offset < len(txt):
+            raise ValueError("No match!")
+
+
+def compile_patterns(patterns):
+    """Compile a list of patterns into a single minimal automaton.
+
+    The accept value of a state is the index of the first pattern
+    which matches, so that earlier patterns have priority.
+    """
+    vector = ExpressionVector(
+        [(index, parse(pattern)) for index, pattern in enumerate(patterns)]
+    )
+    transitions, accepts, error = compile(vector)
+    accepts = [min(accept) if accept else None for accept in accepts]
+    return minimize((transitions, accepts, error))
+
+
+_scanners = {}
+
+
+def get_scanner(patterns, cache=None):
+    """Get a function which scans text for the given patterns.
+
+    The returned function yields tuples with the index of the pattern,
+    and the start and end of the longest match, see
+    :func:`ppci.lang.tools.regex.codegen.generate_python`.
+    Patterns which cannot be handled raise a ValueError.
+
+    The scanner tables are looked up in the given cache, or in the
+    shared cache when no cache is given, by a hash over the patterns.
+    The cache holds the tables as JSON data, and the scanner code is
+    always generated from these tables.
+    """
+    patterns = tuple(patterns)
+    if patterns in _scanners:
+        return _scanners[patterns]
+
+    from ....build.cache import CompileCache, get_shared_cache
+
+    if cache is None:
+        cache = get_shared_cache("regex")
+
+    tables = None
+    if cache is not None:
+        try:
+            key = CompileCache.make_key(
+                "scanner",
+                *(
+                    inspect.getsource(sys.modules[m])
+                    for m in _generator_modules
+                ),
+                json.dumps(patterns)
+            )
+            text = cache.get_text(key)
+        except OSError as ex:
+            CompileCache.logger.warning("Scanner cache unusable: %s", ex)
+            cache = None
+        else:
+            if text is not None:
+                tables = load_tables(text)
+
+    if tables is None:
+        tables = make_python_tables(compile_patterns(patterns))
+        if cache is not None:
+            try:
+                cache.put_text(key, json.dumps(tables))
+            except OSError as ex:
+                CompileCache.logger.warning("Could not store scanner: %s", ex)
+
+    f = io.StringIO()
+    write_python(tables, f)
+    module = types.ModuleType("generated_scanner")
+    exec(f.getvalue(), module.__dict__)
+    _scanners[patterns] = module.scan
+    return module.scan
+
+
+def load_tables(text):
+    """Load scanner tables from JSON text.
+
+    Returns None when the text does not contain valid tables.
+    """
+    try:
+        tables = json.loads(text)
+        number_lists = [tables[n] for n in ("starts", "classes", "table")]
+        accepts = tables["accepts"]
+        num_classes = tables["num_classes"]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+    def is_number(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    def is_list_of(values, check):
+        return isinstance(values, list) and all(check(v) for v in values)
+
+    if not (
+        all(is_list_of(values, is_number) for values in number_lists)
+        and is_list_of(accepts, lambda v: v is None or is_number(v))
+        and is_number(num_classes)
+        and 0 < num_classes <= 256
+    ):
+        return None
+    return tables
+
+
+_generator_modules = (
+    __name__,
+    parse.__module__,
+    compile.__module__,
+    make_python_tables.__module__,
+    ExpressionVector.__module__,
+)
@@ -7,7 +7,7 @@ import io
 import datetime
 import logging
 
-from .baselex import BaseLexer, EOF
+from .baselex import BaseLexer, EOF, GLYPH, TEXT
 from ..common import Token, SourceLocation
 from .grammar import Grammar
 from .lr import LrParserBuilder
@@ -17,10 +17,10 @@ from .recursivedescent import RecursiveDescentParser
 class XaccLexer(BaseLexer):
     def __init__(self):
         tok_spec = [
-            ("ID", r"[A-Za-z][A-Za-z\d_]*", lambda typ, val: (typ, val)),
+            ("ID", r"[A-Za-z][A-Za-z\d_]*", TEXT),
             ("STRING", r"'[^']*'", lambda typ, val: ("ID", val[1:-1])),
-            ("BRACEDCODE", r"\{[^\}]*\}", lambda typ, val: (typ, val)),
-            ("OTHER", r"[:;\|]", lambda typ, val: (val, val)),
+            ("BRACEDCODE", r"\{[^\}]*\}", TEXT),
+            ("OTHER", r"[:;\|]", GLYPH),
             ("SKIP", r"[ ]", None),
         ]
         super().__init__(tok_spec)
@@ -117,7 +117,7 @@ class XaccGenerator:
         self.headers = headers
         self.logger.debug("Generating parser for {}".format(grammar))
         pb = LrParserBuilder(grammar)
-        self.action_table, self.goto_table = pb.generate_tables()
+        self.table = pb.generate_table()
         self.generate_python_script()
 
     def print(self, *args):
@@ -130,9 +130,7 @@ class XaccGenerator:
         stamp = datetime.datetime.now().ctime()
         self.print('""" Automatically generated on {} """'.format(stamp))
         self.print("from ppci.lang.tools.grammar import Production, Grammar")
-        self.print(
-            "from ppci.lang.tools.lr import LrParser, Reduce, Shift, Accept"
-        )
+        self.print("from ppci.lang.tools.lr import LrParser, LrTable")
         self.print("from ppci.lang.common import Token")
         self.print("")
         for h in self.headers:
@@ -157,22 +155,12 @@ class XaccGenerator:
                     rule.name, rule.symbols, rule.f_name
                 )
             )
-        # Fill action table:
-        self.print("        action_table = {}")
-        for state in self.action_table:
-            action = self.action_table[state]
-            self.print("        action_table[{}] = {}".format(state, action))
-        self.print("")
-
-        # Fill goto table:
-        self.print("        goto_table = {}")
-        for state_number in self.goto_table:
-            to = self.goto_table[state_number]
-            self.print("        goto_table[{}] = {}".format(state_number, to))
-        self.print("")
-        self.print(
-            "        super().__init__(grammar, action_table, goto_table)"
-        )
+        # Fill the parse tables:
+        self.print("        table = LrTable(")
+        for name, value in sorted(self.table.serialize().items()):
+            self.print("            {}={},".format(name, value))
+        self.print("        )")
+        self.print("        super().__init__(grammar, table)")
         self.print("")
 
         # Generate a function for each action:
@@ -3,8 +3,10 @@ from .mem2reg import Mem2RegPromotor
 from .cse import CommonSubexpressionEliminationPass
 from .constantfolding import ConstantFolder
 from .load_after_store import LoadAfterStorePass
+from .inline import InlinePass
 from .transform import RemoveAddZeroPass
 from .transform import DeleteUnusedInstructionsPass
+from .transform import DeleteUnusedGlobalsPass
 from .transform import ModulePass, FunctionPass, BlockPass, InstructionPass
 
 
@@ -16,7 +18,9 @@ __all__ = [
     "CleanPass",
     "CommonSubexpressionEliminationPass",
     "ConstantFolder",
+    "DeleteUnusedGlobalsPass",
     "DeleteUnusedInstructionsPass",
+    "InlinePass",
     "LoadAfterStorePass",
     "Mem2RegPromotor",
     "RemoveAddZeroPass",
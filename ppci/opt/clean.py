@@ -49,12 +49,19 @@ class CleanPass(FunctionPass):
             if block in predecessors:
                 continue
 
+            # Do not remove if a predecessor also jumps to the target
+            # directly, since the phis would get two values for it:
+            tgt = block.last_instruction.target
+            if tgt.phis and any(
+                pred in tgt.predecessors for pred in predecessors
+            ):
+                continue
+
             # Update successor incoming blocks:
             for successor in successors:
                 successor.replace_incoming(block, predecessors)
 
             # Change the target of predecessors:
-            tgt = block.last_instruction.target
             for pred in predecessors:
                 pred.change_target(block, tgt)
 
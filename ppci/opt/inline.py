@@ -1,12 +1,382 @@
+""" Function inlining.
+
+Inlining replaces a call by a copy of the body of the called function.
+This removes the call overhead and exposes the body to the other
+optimizations of the caller, at the expense of code size.
+"""
+
 from .. import ir
+from ..graph.callgraph import mod_to_call_graph, bottom_up_order
+from ..irutils.builder import split_block
+from .transform import ModulePass
+
+
+class InlinePass(ModulePass):
+    """Inline calls, guided by a cost model.
+
+    The functions are visited bottom-up over the call graph, so that the
+    size of a callee is known after the calls inside the callee were
+    inlined. Calls between the functions of a cycle in the call graph,
+    such as recursive calls, are never inlined.
+
+    The cost of a function is the number of instructions which will
+    result in code, and constants are free. A call is inlined when the
+    cost of the callee is at most `max_size`. Constant arguments lower
+    the cost by `constant_argument_bonus` each, since they can be folded
+    into the copied body. A local function with a single call is inlined
+    up to `single_call_max_size`, since the function itself is removed
+    afterwards. Callers do not grow beyond `max_caller_size`: large
+    functions are hard on the register allocator, and the arm backend
+    places the constants of a function after its code, within a limited
+    distance.
+
+    When optimizing for size, only calls are inlined where the body is
+    not larger than the call sequence, or where the callee is removed
+    afterwards.
+
+    When a profile is attached to the module (see
+    :mod:`ppci.irutils.profile`), calls which were never executed are left
+    alone, and calls executed at least `hot_count` times may inline
+    functions up to `hot_max_size`.
+    """
+
+    max_size = 12
+    hot_max_size = 60
+    hot_count = 100
+    single_call_max_size = 100
+    max_caller_size = 200
+    constant_argument_bonus = 2
+
+    def __init__(self, optimize_size=False):
+        super().__init__()
+        self.optimize_size = optimize_size
+        self.costs = {}
+
+    def run(self, ir_module):
+        functions = set(ir_module.functions)
+        call_graph = mod_to_call_graph(ir_module)
+        references = _referenced_names(ir_module)
+        self.costs = {}
+        inlined = 0
+        inlined_callees = set()
+        for component in bottom_up_order(call_graph):
+            cycle = [node.routine for node in component]
+            for function in cycle:
+                if function not in functions:
+                    continue  # External function
+                for call in function.get_out_calls():
+                    if call.block is None:
+                        continue  # Removed as dead code after inlining
+                    callee = call.callee
+                    if callee not in functions or callee in cycle:
+                        continue  # External, indirect or recursive call
+                    if self.should_inline(function, call, callee, references):
+                        caller_cost = self.cost(function)
+                        inline_function(call, callee)
+                        self.costs[function] = caller_cost + self.cost(
+                            callee
+                        )
+                        inlined_callees.add(callee)
+                        inlined += 1
+        if inlined:
+            self.logger.debug("Inlined %s calls", inlined)
+
+        # Remove local functions which are no longer called. Removing a
+        # function can make the functions inlined into it unused:
+        changed = True
+        while changed:
+            changed = False
+            for callee in list(inlined_callees):
+                if (
+                    callee.binding == ir.Binding.LOCAL
+                    and not callee.is_used
+                    and callee.name not in references
+                ):
+                    for instruction in list(callee.get_instructions()):
+                        instruction.delete()
+                    ir_module.remove_function(callee)
+                    inlined_callees.remove(callee)
+                    changed = True
+                    self.logger.debug(
+                        "Removed inlined function %s", callee.name
+                    )
+
+    def cost(self, function):
+        """ Estimate the size of the code of a function """
+        if function not in self.costs:
+            self.costs[function] = sum(
+                1
+                for instruction in function.get_instructions()
+                if not isinstance(instruction, FREE_INSTRUCTIONS)
+            )
+        return self.costs[function]
+
+    def should_inline(self, function, call, callee, references=()):
+        """ Decide whether to inline callee at the given call """
+        if not can_inline(callee):
+            return False
+        count = call.block.execution_count
+        if count == 0:
+            return False
+
+        size = self.cost(callee)
+        if self.cost(function) + size > self.max_caller_size:
+            return False
+
+        # Inline the only call of a function which is removed afterwards:
+        if (
+            callee.binding == ir.Binding.LOCAL
+            and callee.use_count == 1
+            and callee.name not in references
+        ):
+            return size <= self.single_call_max_size
+
+        if self.optimize_size:
+            return size <= call_cost(call)
+
+        bonus = self.constant_argument_bonus * sum(
+            1 for a in call.arguments if isinstance(a, ir.Const)
+        )
+        if count is not None and count >= self.hot_count:
+            limit = self.hot_max_size
+        else:
+            limit = self.max_size
+        return size - bonus <= limit
+
+
+# Instructions which do not result in code on their own:
+FREE_INSTRUCTIONS = (ir.Const, ir.Undefined, ir.Jump, ir.Exit, ir.Return)
+
+
+def call_cost(call):
+    """ Estimate the size of a call sequence, including the arguments """
+    cost = 1 + len(call.arguments)
+    if isinstance(call, ir.FunctionCall):
+        cost += 1
+    return cost
+
+
+def _referenced_names(ir_module):
+    """ Get the names referred to by the initial values of variables """
+    names = set()
+    for variable in ir_module.variables:
+        if variable.value:
+            for part in variable.value:
+                if isinstance(part, tuple):
+                    names.add(part[1])
+    return names
+
+
+def can_inline(function):
+    """ Check if the body of the function can be copied """
+    for instruction in function.get_instructions():
+        if isinstance(instruction, (ir.InlineAsm, ir.JumpTable)):
+            return False
+        if isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall)):
+            # Do not inline functions calling themselves:
+            if instruction.callee is function:
+                return False
+    return True
+
+
+def inline_function(call, function: ir.SubRoutine):
+    """Replace the call instruction with the function implementation.
+
+    The block containing the call is split after the call. The block
+    before the call jumps into a copy of the function body, and all
+    returns in the copy jump to the part after the call.
+    """
+    assert call.callee is function
+    assert can_inline(function)
+    caller = call.function
+    block = call.block
+
+    # Split the block after the call, the call ends the first part:
+    _, continuation = split_block(
+        block,
+        pos=call.position + 1,
+        newname="{}_after_{}".format(block.name, function.name),
+    )
+
+    # Copy the reachable part of the body:
+    blocks = _reverse_post_order(function)
+    value_map = dict(zip(function.arguments, call.arguments))
+    block_map = {}
+    for original in blocks:
+        # Block names are used as labels, so prefix them with the caller:
+        clone = ir.Block("{}_{}".format(caller.name, original.name))
+        caller.add_block(clone)
+        block_map[original] = clone
+        if original.execution_count is not None:
+            clone.execution_count = _scale(
+                original.execution_count,
+                block.execution_count,
+                function.entry.execution_count,
+            )
+
+    results = []
+    phis = []
+    for original in blocks:
+        clone = block_map[original]
+        for instruction in original:
+            if isinstance(instruction, ir.Phi):
+                new_instruction = ir.Phi(instruction.name, instruction.ty)
+                phis.append((instruction, new_instruction))
+            elif isinstance(instruction, ir.Return):
+                result = instruction.result
+                results.append((clone, value_map.get(result, result)))
+                new_instruction = ir.Jump(continuation)
+            elif isinstance(instruction, ir.Exit):
+                new_instruction = ir.Jump(continuation)
+            else:
+                new_instruction = _copy_instruction(
+                    instruction, value_map, block_map
+                )
+            clone.add_instruction(new_instruction)
+            value_map[instruction] = new_instruction
+
+    for phi, new_phi in phis:
+        for incoming, value in phi.inputs.items():
+            if incoming in block_map:
+                new_phi.set_incoming(
+                    block_map[incoming], value_map.get(value, value)
+                )
+
+    for original, clone in block_map.items():
+        if original.successor_counts and clone.execution_count is not None:
+            clone.successor_counts = {
+                block_map[successor]: _scale(
+                    count,
+                    clone.execution_count,
+                    original.execution_count,
+                )
+                for successor, count in original.successor_counts.items()
+            }
+
+    # Route the result of the function into the users of the call:
+    if isinstance(call, ir.FunctionCall):
+        if not results:
+            # The function never returns:
+            result = ir.Undefined("inline_result", call.ty)
+            continuation.insert_instruction(result)
+        elif len(results) == 1:
+            result = results[0][1]
+        else:
+            result = ir.Phi("inline_result", call.ty)
+            for clone, value in results:
+                result.set_incoming(clone, value)
+            continuation.insert_instruction(result)
+        call.replace_by(result)
+
+    # Jump into the copied body instead of calling the function:
+    jump = block.last_instruction
+    block.remove_instruction(jump)
+    jump.delete()
+    call.remove_from_block()
+    block.add_instruction(ir.Jump(block_map[function.entry]))
+
+    # When the function never returns, the code after the call is dead:
+    if not continuation.is_used:
+        caller.delete_unreachable()
+
+
+def _scale(count, call_count, entry_count):
+    """ Scale a count of the callee to the count of the call site """
+    if call_count is None or not entry_count:
+        return None
+    return count * call_count // entry_count
+
+
+def _reverse_post_order(function):
+    """Get the reachable blocks, such that definitions come before their
+    uses.
+    """
+    visited = set()
+    order = []
+    stack = [(function.entry, iter(function.entry.successors))]
+    visited.add(function.entry)
+    while stack:
+        block, successors = stack[-1]
+        for successor in successors:
+            if successor not in visited:
+                visited.add(successor)
+                stack.append((successor, iter(successor.successors)))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+    order.reverse()
+    return order
+
 
+def _copy_instruction(instruction, value_map, block_map):
+    """ Create a copy of an instruction with the operands mapped """
 
-def inline_function(call: ir.ProcedureCall, function: ir.SubRoutine):
-    """ Replace the call instruction with the function implementation """
-    dst_function = call.function
-    for block in function:
-        block_copy = block.copy
-        dst_function.add_block(block_copy)
+    def v(value):
+        return value_map.get(value, value)
 
-    for value, parameter in zip(call.arguments, function.arguments):
-        block
+    name = getattr(instruction, "name", None)
+    if isinstance(instruction, ir.Const):
+        return ir.Const(instruction.value, name, instruction.ty)
+    elif isinstance(instruction, ir.LiteralData):
+        return ir.LiteralData(instruction.data, name)
+    elif isinstance(instruction, ir.Undefined):
+        return ir.Undefined(name, instruction.ty)
+    elif isinstance(instruction, ir.AddressOf):
+        return ir.AddressOf(v(instruction.src), name)
+    elif isinstance(instruction, ir.Cast):
+        return ir.Cast(v(instruction.src), name, instruction.ty)
+    elif isinstance(instruction, ir.Unop):
+        return ir.Unop(
+            instruction.operation, v(instruction.a), name, instruction.ty
+        )
+    elif isinstance(instruction, ir.Binop):
+        return ir.Binop(
+            v(instruction.a),
+            instruction.operation,
+            v(instruction.b),
+            name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.Alloc):
+        return ir.Alloc(name, instruction.amount, instruction.alignment)
+    elif isinstance(instruction, ir.Load):
+        return ir.Load(
+            v(instruction.address),
+            name,
+            instruction.ty,
+            volatile=instruction.volatile,
+        )
+    elif isinstance(instruction, ir.Store):
+        return ir.Store(
+            v(instruction.value),
+            v(instruction.address),
+            volatile=instruction.volatile,
+        )
+    elif isinstance(instruction, ir.CopyBlob):
+        return ir.CopyBlob(
+            v(instruction.dst), v(instruction.src), instruction.amount
+        )
+    elif isinstance(instruction, ir.FunctionCall):
+        return ir.FunctionCall(
+            v(instruction.callee),
+            [v(a) for a in instruction.arguments],
+            name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.ProcedureCall):
+        return ir.ProcedureCall(
+            v(instruction.callee), [v(a) for a in instruction.arguments]
+        )
+    elif isinstance(instruction, ir.Jump):
+        return ir.Jump(block_map[instruction.target])
+    elif isinstance(instruction, ir.CJump):
+        return ir.CJump(
+            v(instruction.a),
+            instruction.cond,
+            v(instruction.b),
+            block_map[instruction.lab_yes],
+            block_map[instruction.lab_no],
+        )
+    else:  # pragma: no cover
+        raise NotImplementedError(str(instruction))
@@ -116,3 +116,57 @@ class DeleteUnusedInstructionsPass(BlockPass):
             instruction.remove_from_block()
         if count > 0:
             self.logger.debug("Deleted %i unused instructions", count)
+
+
+class DeleteUnusedGlobalsPass(ModulePass):
+    """Remove local functions and variables which cannot be reached.
+
+    Global definitions are the roots. From there, all functions and
+    variables used by instructions or referred to by the initial value
+    of a variable are reachable. Local definitions which are not
+    reachable are removed, also when they only refer to each other.
+    """
+
+    def run(self, ir_module):
+        definitions = {
+            value.name: value
+            for value in ir_module.variables + ir_module.functions
+        }
+        reachable = set()
+        worklist = [
+            value
+            for value in definitions.values()
+            if value.binding == ir.Binding.GLOBAL
+        ]
+        while worklist:
+            value = worklist.pop()
+            if value in reachable:
+                continue
+            reachable.add(value)
+            if isinstance(value, ir.SubRoutine):
+                for instruction in value.get_instructions():
+                    for use in instruction.uses:
+                        if isinstance(use, (ir.SubRoutine, ir.Variable)):
+                            worklist.append(use)
+            elif value.value:
+                for part in value.value:
+                    if isinstance(part, tuple) and part[1] in definitions:
+                        worklist.append(definitions[part[1]])
+
+        unused_functions = [
+            f for f in ir_module.functions if f not in reachable
+        ]
+        for function in unused_functions:
+            for instruction in list(function.get_instructions()):
+                instruction.delete()
+            ir_module.remove_function(function)
+
+        unused_variables = [
+            v for v in ir_module.variables if v not in reachable
+        ]
+        for variable in unused_variables:
+            ir_module.remove_variable(variable)
+
+        count = len(unused_functions) + len(unused_variables)
+        if count > 0:
+            self.logger.debug("Deleted %i unused globals", count)
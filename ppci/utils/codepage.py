@@ -5,10 +5,12 @@ using ctypes
 Credits for idea: Luke Campagnola
 """
 
+import hashlib
 import inspect
 import sys
 import logging
 import ctypes
+import weakref
 from ..arch import get_current_arch
 from .. import ir
 from ..binutils import debuginfo, layout
@@ -73,19 +75,12 @@ class Mod:
     """ Container for machine code """
 
     def __init__(self, obj, imports=None):
-        code_size = obj.get_section("code").size
-        data_size = obj.get_section("data").size
-
         if not obj.debug_info:
             raise ValueError(
                 'Unable to load "{}"'
                 " because it does not contain debug info.".format(obj)
             )
 
-        # Create a code page into memory:
-        self._code_page = MemoryPage(code_size)
-        self._data_page = MemoryPage(data_size)
-
         # Create callback pointers if any:
         imports = imports or {}
 
@@ -122,41 +117,36 @@ class Mod:
                     "Cannot import {} of type {}".format(name, type(imp_obj))
                 )
 
-        # Link to e.g. apply offset to global literals
-        memory_layout = layout.Layout()
-        layout_code_mem = layout.Memory("codepage")
-        layout_code_mem.location = self._code_page.addr
-        layout_code_mem.size = code_size
-        layout_code_mem.add_input(layout.Section("code"))
-        memory_layout.add_memory(layout_code_mem)
-        layout_data_mem = layout.Memory("datapage")
-        layout_data_mem.location = self._data_page.addr
-        layout_data_mem.size = data_size
-        layout_data_mem.add_input(layout.Section("data"))
-        memory_layout.add_memory(layout_data_mem)
-
-        # Link the object into memory:
-        obj = link(
-            [obj],
-            layout=memory_layout,
-            debug=True,
-            extra_symbols=extra_symbols,
-        )
+        # Link once, and only relocate for each load:
+        image = get_code_image(obj, tuple(sorted(extra_symbols)))
+
+        # Create a code page into memory:
+        self._code_page = MemoryPage(len(image.code))
+        self._data_page = MemoryPage(len(image.data))
+        self._bases = {
+            "code": self._code_page.addr,
+            "data": self._data_page.addr,
+        }
 
         # Load the code into the page:
-        code = bytes(obj.get_section("code").data)
-        assert len(code) <= code_size
+        code, data = image.relocate(self._bases, extra_symbols)
         self._code_page.write(code)
-
-        data = bytes(obj.get_section("data").data)
-        assert len(data) <= data_size
         self._data_page.write(data)
 
-        # TODO: we might have more sections!
+        # Store object for later usage:
+        self._image = image
+        self._obj = image.obj
+        self._extra_symbols = extra_symbols
+
+    def __getattr__(self, name):
+        """ Create function and variable pointers on first use """
+        image = self.__dict__.get("_image")
+        if image is None:
+            raise AttributeError(name)
 
-        # Get a function pointer
-        for function in obj.debug_info.functions:
-            function_name = function.name
+        if name in image.functions:
+            # Get a function pointer
+            function = image.functions[name]
 
             # Determine the function type:
             restype = get_ctypes_type(function.return_type)
@@ -165,31 +155,183 @@ class Mod:
             ftype = ctypes.CFUNCTYPE(restype, *argtypes)
 
             # Create a function pointer:
-            vaddress = obj.get_symbol_id_value(function.begin.symbol_id)
-            fpointer = ftype(vaddress)
-
-            # Set the attribute:
-            setattr(self, function_name, fpointer)
-
-        # Get a variable pointers
-        for variable in obj.debug_info.variables:
-            variable_name = variable.name
-            assert isinstance(variable, debuginfo.DebugVariable)
+            vaddress = self._get_symbol_id_address(function.begin.symbol_id)
+            value = ftype(vaddress)
+        elif name in image.variables:
+            # Get a variable pointer
+            variable = image.variables[name]
             assert isinstance(variable.address, debuginfo.DebugAddress)
-            vaddress = obj.get_symbol_id_value(variable.address.symbol_id)
+            vaddress = self._get_symbol_id_address(
+                variable.address.symbol_id
+            )
             var_ctyp = ctypes.POINTER(get_ctypes_type(variable.typ))
-            vpointer = ctypes.cast(vaddress, var_ctyp)
+            value = ctypes.cast(vaddress, var_ctyp)
+        else:
+            raise AttributeError(name)
 
-            # Set the attribute:
-            setattr(self, variable_name, vpointer)
+        # Set the attribute:
+        setattr(self, name, value)
+        return value
 
-        # Store object for later usage:
-        self._obj = obj
+    def _get_symbol_id_address(self, symbol_id):
+        symbol = self._obj.symbols_by_id[symbol_id]
+        return self._image.symbol_address(
+            symbol, self._bases, self._extra_symbols
+        )
 
     def get_symbol_offset(self, name):
         """ Get the memory address of a symbol """
         return self._obj.get_symbol(name).value
 
+    def get_symbol_address(self, name):
+        """ Get the absolute memory address of a symbol """
+        return self._get_symbol_id_address(self._obj.get_symbol(name).id)
+
+    def read_data(self, name, size):
+        """ Read size bytes of memory at the given symbol """
+        return ctypes.string_at(self.get_symbol_address(name), size)
+
+
+class CodeImage:
+    """Code and data of an object, linked once to be loaded many times.
+
+    The object is linked with the code and data sections at placeholder
+    addresses. Relocations which give the same result wherever their
+    section is placed, such as relative jumps within the code, are applied
+    once. The remaining relocations are kept in a table, and applied
+    in a single pass when the image is loaded at its real addresses.
+    """
+
+    # Placeholder addresses, far apart to prevent relaxations between
+    # the code and data:
+    placeholders = {"code": 0x10000000, "data": 0x50000000}
+    import_placeholder = 0x70000000
+
+    def __init__(self, obj, import_names):
+        # Link the object at the placeholder addresses:
+        memory_layout = layout.Layout()
+        for name in ("code", "data"):
+            memory = layout.Memory(name + "page")
+            memory.location = self.placeholders[name]
+            memory.size = obj.get_section(name).size
+            memory.add_input(layout.Section(name))
+            memory_layout.add_memory(memory)
+        extra_symbols = {n: self.import_placeholder for n in import_names}
+        self.obj = obj = link(
+            [obj],
+            layout=memory_layout,
+            debug=True,
+            extra_symbols=extra_symbols,
+        )
+        self.import_names = import_names
+        self.code = bytes(obj.get_section("code").data)
+        self.data = bytes(obj.get_section("data").data)
+        self.functions = {f.name: f for f in obj.debug_info.functions}
+        self.variables = {v.name: v for v in obj.debug_info.variables}
+
+        # TODO: we might have more sections!
+        self.relocations = []
+        for relocation in obj.relocations:
+            if relocation.section not in self.placeholders:
+                continue
+            rcls = obj.arch.isa.relocation_map[relocation.reloc_type]
+            reloc = rcls(
+                None, offset=relocation.offset, addend=relocation.addend
+            )
+            symbol = obj.symbols_by_id[relocation.symbol_id]
+            if not self.is_position_independent(reloc, symbol, relocation):
+                self.relocations.append((reloc, relocation.section, symbol))
+        logger.debug(
+            "%s of %s relocations depend on the load address",
+            len(self.relocations),
+            len(obj.relocations),
+        )
+
+    def is_position_independent(self, reloc, symbol, relocation):
+        """ Test if moving its section keeps the relocation the same """
+        if symbol.section != relocation.section:
+            return False
+        base = self.placeholders[relocation.section]
+        sym_value = base + symbol.value
+        reloc_value = base + relocation.offset
+        section = self.obj.get_section(relocation.section)
+        data = section.data[reloc.offset : reloc.offset + reloc.size()]
+        delta = 0x10000
+        try:
+            moved = reloc.apply(sym_value + delta, data, reloc_value + delta)
+        except ValueError:
+            return False
+        return moved == data
+
+    def symbol_address(self, symbol, bases, extra_symbols):
+        """ Determine the address of a symbol for the given addresses """
+        if symbol.section is None:
+            if symbol.name in self.import_names:
+                return extra_symbols[symbol.name]
+            else:
+                return symbol.value
+        else:
+            return bases[symbol.section] + symbol.value
+
+    def relocate(self, bases, extra_symbols):
+        """ Get the code and data, relocated to the given addresses """
+        sections = {"code": bytearray(self.code), "data": bytearray(self.data)}
+        for reloc, section, symbol in self.relocations:
+            sym_value = self.symbol_address(symbol, bases, extra_symbols)
+            reloc_value = bases[section] + reloc.offset
+            data = sections[section]
+            begin = reloc.offset
+            end = begin + reloc.size()
+            data[begin:end] = reloc.apply(
+                sym_value, data[begin:end], reloc_value
+            )
+        return sections["code"], sections["data"]
+
+
+# Images per object, keyed by object identity. Each entry holds a digest
+# of the object contents, and the images by import names:
+_code_images = {}
+
+
+def object_digest(obj):
+    """ Get a digest of the sections, symbols and relocations of an object """
+    hasher = hashlib.sha256()
+    for section in obj.sections:
+        hasher.update(repr(section).encode())
+        hasher.update(section.data)
+    for symbol in obj.symbols:
+        hasher.update("{} {!r}".format(symbol.id, symbol).encode())
+    for reloc in obj.relocations:
+        hasher.update(
+            "{} {} {} {} {}".format(
+                reloc.reloc_type,
+                reloc.symbol_id,
+                reloc.section,
+                reloc.offset,
+                reloc.addend,
+            ).encode()
+        )
+    return hasher.digest()
+
+
+def get_code_image(obj, import_names):
+    """Get the linked image of an object, linking it only once.
+
+    The image is cached as long as the object lives. When the object is
+    modified, the image is linked again.
+    """
+    key = id(obj)
+    digest = object_digest(obj)
+    if key not in _code_images:
+        weakref.finalize(obj, _code_images.pop, key, None)
+    elif _code_images[key][0] != digest:
+        logger.debug("Object was modified, linking it again")
+        del _code_images[key]
+    images = _code_images.setdefault(key, (digest, {}))[1]
+    if import_names not in images:
+        images[import_names] = CodeImage(obj, import_names)
+    return images[import_names]
+
 
 def load_code_as_module(source_file, reporter=None):
     """ Load c3 code as a module """
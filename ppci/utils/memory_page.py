@@ -42,6 +42,17 @@ class MemoryPage:
         else:
             return bytes()
 
+    def view(self):
+        """ Get a memoryview on the page, without copying """
+        if isinstance(self._page, WinPage):
+            buf = (ctypes.c_char * self.size).from_address(self.addr)
+            buf._owner = self._page  # Keep the page alive with the view
+            return memoryview(buf).cast("B")
+        elif self._page:
+            return memoryview(self._page)
+        else:
+            return memoryview(bytes())
+
 
 uintt = ctypes.c_uint64 if struct.calcsize("P") == 8 else ctypes.c_uint32
 
@@ -83,3 +94,130 @@ class WinPage:
         vfree = kern.VirtualFree
         vfree.argtypes = (uintt,) * 3
         vfree(self.addr, self.size, 0x8000)
+
+
+class VirtualMemory:
+    """Reserve a range of address space, and commit memory on demand.
+
+    Only the committed part of the range can be accessed. Growing the
+    committed part only maps the added pages, and the base address
+    never changes, so pointers into this memory stay valid.
+    """
+
+    def __init__(self, reserve_size, size=0):
+        self.reserve_size = reserve_size
+        self.size = 0
+        if sys.platform == "win32":
+            self._os = _WinVirtualMemory()
+        else:
+            self._os = _PosixVirtualMemory()
+        self.addr = self._os.reserve(reserve_size)
+        logger.debug("Reserved %s bytes at 0x%x", reserve_size, self.addr)
+        self.commit(size)
+
+    def commit(self, size):
+        """ Make the first size bytes of the reserved range accessible """
+        if size > self.reserve_size:
+            raise ValueError(
+                "Cannot commit {} bytes, only {} bytes are reserved".format(
+                    size, self.reserve_size
+                )
+            )
+        if size > self.size:
+            self._os.commit(self.addr + self.size, size - self.size)
+            self.size = size
+
+    def view(self):
+        """Get a memoryview on the committed memory.
+
+        The view keeps this object, and thereby the mapping, alive.
+        """
+        if self.size:
+            buf = (ctypes.c_char * self.size).from_address(self.addr)
+            buf._owner = self
+            return memoryview(buf).cast("B")
+        else:
+            return memoryview(bytes())
+
+    def __del__(self):
+        if getattr(self, "addr", None):
+            self._os.release(self.addr, self.reserve_size)
+            self.addr = None
+
+
+class _PosixVirtualMemory:
+    """ Reserve with an inaccessible mapping, commit with mprotect """
+
+    PROT_NONE = 0
+
+    def __init__(self):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._mmap = libc.mmap
+        self._mmap.restype = ctypes.c_void_p
+        self._mmap.argtypes = (
+            ctypes.c_void_p,
+            ctypes.c_size_t,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_long,
+        )
+        self._mprotect = libc.mprotect
+        self._mprotect.argtypes = (
+            ctypes.c_void_p,
+            ctypes.c_size_t,
+            ctypes.c_int,
+        )
+        self._munmap = libc.munmap
+        self._munmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+
+    def reserve(self, size):
+        flags = (
+            mmap.MAP_PRIVATE
+            | mmap.MAP_ANONYMOUS
+            | getattr(mmap, "MAP_NORESERVE", 0)
+        )
+        addr = self._mmap(None, size, self.PROT_NONE, flags, -1, 0)
+        if addr in (None, ctypes.c_void_p(-1).value):
+            raise OSError(ctypes.get_errno(), "Could not reserve memory")
+        return addr
+
+    def commit(self, addr, size):
+        prot = mmap.PROT_READ | mmap.PROT_WRITE
+        if self._mprotect(addr, size, prot) != 0:
+            raise OSError(ctypes.get_errno(), "Could not commit memory")
+
+    def release(self, addr, size):
+        self._munmap(addr, size)
+
+
+class _WinVirtualMemory:
+    """ Reserve and commit with VirtualAlloc """
+
+    MEM_COMMIT = 0x1000
+    MEM_RESERVE = 0x2000
+    MEM_RELEASE = 0x8000
+    PAGE_NOACCESS = 0x01
+    PAGE_READWRITE = 0x04
+
+    def __init__(self):
+        kern = ctypes.windll.kernel32
+        self._valloc = kern.VirtualAlloc
+        self._valloc.argtypes = (uintt,) * 4
+        self._valloc.restype = uintt
+        self._vfree = kern.VirtualFree
+        self._vfree.argtypes = (uintt,) * 3
+
+    def reserve(self, size):
+        addr = self._valloc(0, size, self.MEM_RESERVE, self.PAGE_NOACCESS)
+        if not addr:
+            raise OSError("Could not reserve memory")
+        return addr
+
+    def commit(self, addr, size):
+        addr = self._valloc(addr, size, self.MEM_COMMIT, self.PAGE_READWRITE)
+        if not addr:
+            raise OSError("Could not commit memory")
+
+    def release(self, addr, size):
+        self._vfree(addr, 0, self.MEM_RELEASE)
@@ -16,6 +16,7 @@ from .. import __version__
 from ..common import CompilerError
 from ..irutils import Writer
 from .graph2svg import Graph, LayeredLayout
+from ..codegen.flowgraph import FlowGraph
 from ..codegen.selectiongraph import SGValue
 from ..binutils.outstream import TextOutputStream
 from ..binutils.debuginfo import DebugLocation
@@ -209,9 +210,11 @@ class TextReportGenerator(TextWritingReporter):
             self.print("$ {}".format(ins))
 
     def dump_cfg_nodes(self, frame):
+        cfg = FlowGraph(frame.instructions)
+        cfg.calculate_liveness()
         for ins in frame.instructions:
-            if frame.cfg.has_node(ins):
-                nde = frame.cfg.get_node(ins)
+            if cfg.has_node(ins):
+                nde = cfg.get_node(ins)
                 self.print("ins: {} {}".format(ins, nde.longrepr))
 
     def function_header(self, irfunc, target):
@@ -320,6 +323,13 @@ def str2(x):
     return ", ".join(sorted(str(y) for y in x))
 
 
+def frame_liveness(frame):
+    """ Get the live in and live out registers of each frame instruction """
+    cfg = FlowGraph(frame.instructions)
+    cfg.calculate_liveness()
+    return cfg.instruction_liveness()
+
+
 class MyHandler(logging.Handler):
     def __init__(self, backlog):
         super().__init__()
@@ -480,12 +490,13 @@ class HtmlReportGenerator(TextWritingReporter):
             self.print("<th>#</th><th>instruction</th>")
             self.print("<th>use</th><th>def</th><th>clobber</th>")
             self.print("<th>jump</th><th>move</th>")
-            self.print("<th>gen</th><th>kill</th>")
             self.print("<th>live_in</th><th>live_out</th>")
             for ur in used_regs:
                 self.print("<th>{}</th>".format(ur))
             self.print("</tr>")
+            liveness = frame_liveness(frame)
             for idx, ins in enumerate(frame.instructions):
+                live_in, live_out = liveness.get(ins, ((), ()))
                 self.print("<tr>")
                 self.tcell(idx)
                 self.tcell(ins)
@@ -502,28 +513,11 @@ class HtmlReportGenerator(TextWritingReporter):
                     self.print("yes", end="")
                 self.print("</td>")
 
-                self.print("<td>", end="")
-                if hasattr(ins, "gen"):
-                    self.print(str2(ins.gen), end="")
-                self.print("</td>")
-
-                self.print("<td>", end="")
-                if hasattr(ins, "kill"):
-                    self.print(str2(ins.kill), end="")
-                self.print("</td>")
-
-                self.print("<td>", end="")
-                if hasattr(ins, "live_in"):
-                    self.print(str2(ins.live_in), end="")
-                self.print("</td>")
-
-                self.print("<td>", end="")
-                if hasattr(ins, "live_out"):
-                    self.print(str2(ins.live_out), end="")
-                self.print("</td>")
+                self.tcell(str2(live_in))
+                self.tcell(str2(live_out))
                 for ur in used_regs:
                     self.print("<td>")
-                    for r2 in ins.live_out:
+                    for r2 in sorted(live_out, key=lambda r: r.name):
                         if r2.color == ur.color:
                             self.print(r2.name)
                     self.print("</td>")
@@ -532,9 +526,11 @@ class HtmlReportGenerator(TextWritingReporter):
             self.print("</div></p>")
 
     def dump_cfg_nodes(self, frame):
+        cfg = FlowGraph(frame.instructions)
+        cfg.calculate_liveness()
         for ins in frame.instructions:
-            if frame.cfg.has_node(ins):
-                nde = frame.cfg.get_node(ins)
+            if cfg.has_node(ins):
+                nde = cfg.get_node(ins)
                 self.print("ins: {} {}".format(ins, nde.longrepr))
 
     def dump_ig(self, ig):
@@ -5,7 +5,7 @@ parse tree structures from text.
 
 """
 
-from ppci.lang.tools.baselex import BaseLexer
+from ppci.lang.tools.baselex import BaseLexer, GLYPH, TEXT
 
 
 class Tree:
@@ -55,9 +55,9 @@ class Tree:
 class TreeLexer(BaseLexer):
     def __init__(self):
         tok_spec = [
-            ("ID", r"[A-Za-z][A-Za-z\d_]*", lambda typ, val: (typ, val)),
+            ("ID", r"[A-Za-z][A-Za-z\d_]*", TEXT),
             ("SKIP", r"[ \t]", None),
-            ("LEESTEKEN", r"[,\(\)]", lambda typ, val: (val, val)),
+            ("LEESTEKEN", r"[,\(\)]", GLYPH),
         ]
         super().__init__(tok_spec)
 
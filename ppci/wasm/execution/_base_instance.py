@@ -1,5 +1,7 @@
+import array
 import logging
 import abc
+import sys
 from .. import components
 
 logger = logging.getLogger("instantiate")
@@ -57,6 +59,15 @@ class ModuleInstance(abc.ABC):
     def get_func_by_index(self, index: int):
         raise NotImplementedError()
 
+    def get_func_mapper(self, index: int):
+        """Get a function which calls a function for many arguments.
+
+        The mapper is called with a list of argument arrays, the result
+        array and the number of calls. Returns None when the function
+        can only be called one at a time.
+        """
+        return None
+
     @abc.abstractmethod
     def get_global_by_index(self, index: int):
         raise NotImplementedError()
@@ -66,7 +77,14 @@ class ModuleInstance(abc.ABC):
         for definition in module:
             if isinstance(definition, components.Export):
                 if definition.kind == "func":
-                    item = self.get_func_by_index(definition.ref.index)
+                    index = definition.ref.index
+                    params, results = self._wasm_function_types[index]
+                    item = ExportedFunction(
+                        self.get_func_by_index(index),
+                        params,
+                        results,
+                        self.get_func_mapper(index),
+                    )
                     # TODO: handle multiple return values, maybe here?
                 elif definition.kind == "global":
                     logger.debug("global exported")
@@ -82,6 +100,71 @@ class ModuleInstance(abc.ABC):
                 self.exports._function_map[definition.name] = item
 
 
+# Array type codes of wasm value types:
+TYPECODES = {"i32": "i", "i64": "q", "f32": "f", "f64": "d"}
+
+
+class ExportedFunction:
+    """An exported wasm function.
+
+    Next to calling it, the function can be called for many arguments at
+    once with :meth:`map`.
+    """
+
+    def __init__(self, function, params, results, mapper=None):
+        self._function = function
+        self.params = params
+        self.results = results
+        self._mapper = mapper
+
+    def __call__(self, *args):
+        return self._function(*args)
+
+    def map(self, *columns):
+        """Call the function for each item in the argument columns.
+
+        There is one column with values for each parameter, like the builtin
+        :func:`map` function. The results are returned in an
+        :class:`array.array`:
+
+        >>> exports.add.map([1, 2, 3], [10, 20, 30])  # doctest: +SKIP
+        array('i', [11, 22, 33])
+
+        For natively compiled modules, the loop over the arguments runs in
+        native code, so that the cost of calling from python is paid once.
+        """
+        if len(columns) != len(self.params):
+            raise TypeError(
+                "Expected {} argument columns, got {}".format(
+                    len(self.params), len(columns)
+                )
+            )
+        columns = [
+            array.array(TYPECODES[typ], column)
+            for typ, column in zip(self.params, columns)
+        ]
+        count = len(columns[0]) if columns else 0
+        if any(len(column) != count for column in columns):
+            raise ValueError("Argument columns must have the same length")
+
+        if len(self.results) > 1:  # pragma: no cover
+            raise NotImplementedError("Multiple return values")
+        elif self.results:
+            typecode = TYPECODES[self.results[0]]
+            results = array.array(typecode, [0]) * count
+        else:
+            results = None
+
+        if self._mapper:
+            self._mapper(columns, results, count)
+        else:
+            for index, args in enumerate(zip(*columns)):
+                value = self._function(*args)
+                if results is not None:
+                    results[index] = value
+        return results
+
+
 class WasmMemory(abc.ABC):
     """ Base class for exported wasm memory. """
 
@@ -114,14 +197,91 @@ class WasmMemory(abc.ABC):
         assert len(data) == size
         return data
 
-    @abc.abstractmethod
-    def write(self, address, data):
-        raise NotImplementedError()
+    def write(self, address: int, data):
+        """ Write data to memory """
+        self.view(address, len(data))[:] = data
+
+    def read(self, address: int, size: int) -> bytes:
+        """ Read a copy of a piece of memory """
+        return bytes(self.view(address, size))
 
     @abc.abstractmethod
-    def read(self, address, size):
+    def _memoryview(self):
+        """ Get a memoryview over the whole linear memory """
         raise NotImplementedError()
 
+    def view(self, address=0, size=None):
+        """Get a memoryview on the live linear memory.
+
+        No data is copied, changes made through the view are directly
+        visible to the wasm code and vice versa. A view pins the size of
+        the memory: depending on the target, growing the memory either
+        fails, and memory.grow returns -1, or leaves the view on the
+        old data. So do not keep a view around while running wasm code.
+        Using the view as a context manager releases it in time:
+
+        >>> with memory.view(0x100, 4) as v:  # doctest: +SKIP
+        ...     v[:] = b"abcd"
+
+        """
+        memory = self._memoryview()
+        if size is None:
+            size = len(memory) - address
+        if address < 0 or size < 0 or address + size > len(memory):
+            memory.release()
+            raise IndexError(
+                "Memory range 0x{:x}-0x{:x} out of bounds".format(
+                    address, address + size
+                )
+            )
+        return memory[address : address + size]
+
+    def read_array(self, address: int, count: int, typecode="B"):
+        """Read count values of the given type into an array.
+
+        The typecode is one of the type codes of the :mod:`array` module.
+        The values are read with a single copy.
+        """
+        values = array.array(typecode)
+        with self.view(address, count * values.itemsize) as data:
+            values.frombytes(data)
+        if sys.byteorder == "big":  # pragma: no cover
+            values.byteswap()
+        return values
+
+    def write_array(self, address: int, values):
+        """Write an array of values to memory with a single copy.
+
+        Values can be an :class:`array.array`, a numpy array or any other
+        object supporting the buffer protocol. Wasm memory is little
+        endian, only array.array values are swapped on big endian hosts.
+        """
+        if sys.byteorder == "big" and isinstance(
+            values, array.array
+        ):  # pragma: no cover
+            values = array.array(values.typecode, values)
+            values.byteswap()
+        with memoryview(values) as source:
+            data = source.cast("B")
+            with self.view(address, len(data)) as destination:
+                destination[:] = data
+
+    def numpy_view(self, dtype, address=0, count=-1):
+        """Get a numpy array on the live linear memory.
+
+        Like :meth:`view`, no data is copied. This requires numpy.
+        """
+        import numpy as np
+
+        dtype = np.dtype(dtype).newbyteorder("<")
+        if count < 0:
+            data = self.view(address)
+            count = len(data) // dtype.itemsize
+            data = data[: count * dtype.itemsize]
+        else:
+            data = self.view(address, count * dtype.itemsize)
+        return np.frombuffer(data, dtype=dtype, count=count)
+
 
 class WasmGlobal(abc.ABC):
     """ Base class for an exported wasm global. """
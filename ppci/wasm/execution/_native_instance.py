@@ -2,15 +2,18 @@
 
 """
 
+import ctypes
 import logging
 import os
 import shelve
 import struct
 
+from ... import ir
 from ...utils.codepage import load_obj, MemoryPage
-from ...irutils import verify_module
+from ...utils.memory_page import VirtualMemory
+from ...irutils import verify_module, Builder
 from .. import wasm_to_ir
-from ..components import Table
+from ..components import Table, Export
 from ..util import PAGE_SIZE
 from ._base_instance import ModuleInstance, WasmMemory, WasmGlobal
 
@@ -40,6 +43,12 @@ def native_instantiate(module, imports, reporter, cache_file):
         ppci_module = wasm_to_ir(
             module, arch.info.get_type_info("ptr"), reporter=reporter
         )
+        exported_functions = [
+            ppci_module._wasm_function_names[definition.ref.index]
+            for definition in module
+            if isinstance(definition, Export) and definition.kind == "func"
+        ]
+        add_map_functions(ppci_module, exported_functions, arch)
         verify_module(ppci_module)
 
         # This is fun: optimizing might slow down actual performance X-(
@@ -54,10 +63,89 @@ def native_instantiate(module, imports, reporter, cache_file):
                 s["ppci_module"] = ppci_module
     instance = NativeModuleInstance(obj, imports)
     instance._wasm_function_names = ppci_module._wasm_function_names
+    instance._wasm_function_types = ppci_module._wasm_function_types
     instance._wasm_global_names = ppci_module._wasm_global_names
     return instance
 
 
+MAP_PREFIX = "_ppci_map_"
+
+
+def add_map_functions(ppci_module, names, arch):
+    """Add a map function for each of the given functions.
+
+    A map function calls the function in a loop, with arguments taken from
+    an array of argument arrays, and stores the results in an array.
+    """
+    builder = Builder()
+    builder.set_module(ppci_module)
+    functions = {f.name: f for f in ppci_module.functions}
+    for name in names:
+        if name not in functions:
+            # Imported functions are called one at a time.
+            continue
+        function = functions[name]
+        types = [a.ty for a in function.arguments]
+        procedure = builder.new_procedure(
+            MAP_PREFIX + name, ir.Binding.GLOBAL
+        )
+        builder.set_function(procedure)
+        columns = ir.Parameter("columns", ir.ptr)
+        results = ir.Parameter("results", ir.ptr)
+        count = ir.Parameter("count", ir.i32)
+        for parameter in (columns, results, count):
+            procedure.add_parameter(parameter)
+
+        entry = builder.new_block()
+        procedure.entry = entry
+        check = builder.new_block()
+        body = builder.new_block()
+        done = builder.new_block()
+
+        # Load the argument array pointers:
+        builder.set_block(entry)
+        ptr_size = arch.info.get_size(ir.ptr)
+        column_pointers = []
+        for index in range(len(types)):
+            address = builder.emit_add(columns, index * ptr_size, ir.ptr)
+            column_pointers.append(builder.emit_load(address, ir.ptr))
+        zero = builder.emit_const(0, ir.i32)
+        builder.emit_jump(check)
+
+        builder.set_block(check)
+        counter = builder.emit(ir.Phi("i", ir.i32))
+        builder.emit(ir.CJump(counter, "<", count, body, done))
+
+        # Call the function with the arguments of this iteration:
+        builder.set_block(body)
+        offset = builder.emit_cast(counter, ir.ptr)
+        args = []
+        for typ, column in zip(types, column_pointers):
+            size = builder.emit_const(arch.info.get_size(typ), ir.ptr)
+            address = builder.emit_add(
+                column, builder.emit_mul(offset, size, ir.ptr), ir.ptr
+            )
+            args.append(builder.emit_load(address, typ))
+        if isinstance(function, ir.Function):
+            typ = function.return_ty
+            value = builder.emit(ir.FunctionCall(function, args, "rv", typ))
+            size = builder.emit_const(arch.info.get_size(typ), ir.ptr)
+            address = builder.emit_add(
+                results, builder.emit_mul(offset, size, ir.ptr), ir.ptr
+            )
+            builder.emit(ir.Store(value, address))
+        else:
+            builder.emit(ir.ProcedureCall(function, args))
+        next_counter = builder.emit_add(counter, 1, ir.i32)
+        builder.emit_jump(check)
+
+        counter.set_incoming(entry, zero)
+        counter.set_incoming(body, next_counter)
+
+        builder.set_block(done)
+        builder.emit_exit()
+
+
 class NativeModuleInstance(ModuleInstance):
     """ Wasm module loaded as natively compiled code """
 
@@ -99,7 +187,10 @@ class NativeModuleInstance(ModuleInstance):
     def memory_grow(self, amount: int) -> int:
         """Grow memory and return the old size.
 
-        Current strategy:
+        Memory is normally reserved up front, and growing only commits the
+        added pages, which keeps the base address of the memory stable.
+
+        When no address space could be reserved, the fallback strategy is:
         - claim new memory
         - copy all data
         - free old memory
@@ -116,6 +207,14 @@ class NativeModuleInstance(ModuleInstance):
         if max_size is not None and new_size > max_size:
             return -1
 
+        if isinstance(self._memory_data_page, VirtualMemory):
+            try:
+                self._memory_data_page.commit(new_size * PAGE_SIZE)
+            except OSError:
+                logger.warning("Could not commit memory")
+                return -1
+            return old_size
+
         # Read old data:
         self._memory_data_page.seek(0)
         old_data = self._memory_data_page.read(old_size * PAGE_SIZE)
@@ -131,7 +230,13 @@ class NativeModuleInstance(ModuleInstance):
 
     def memory_create(self, min_size, max_size):
         assert len(self._memories) == 0
-        self._memory_data_page = MemoryPage(min_size * PAGE_SIZE)
+        try:
+            self._memory_data_page = VirtualMemory(
+                min(max_size, 0x10000) * PAGE_SIZE, min_size * PAGE_SIZE
+            )
+        except OSError as ex:
+            logger.warning("Could not reserve memory, using copies: %s", ex)
+            self._memory_data_page = MemoryPage(min_size * PAGE_SIZE)
         mem0 = NativeWasmMemory(self, min_size, max_size)
         self._memories.append(mem0)
         self.set_mem_base_ptr(self._memory_data_page.addr)
@@ -149,6 +254,28 @@ class NativeModuleInstance(ModuleInstance):
         exported_name = self._wasm_function_names[index]
         return getattr(self._code_module, exported_name)
 
+    def get_func_mapper(self, index: int):
+        name = MAP_PREFIX + self._wasm_function_names[index]
+        if not self._code_module._obj.has_symbol(name):
+            return None
+        address = self._code_module.get_symbol_address(name)
+        ftype = ctypes.CFUNCTYPE(
+            None, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int
+        )
+        map_function = ftype(address)
+
+        def mapper(columns, results, count):
+            pointers = (ctypes.c_void_p * max(len(columns), 1))(
+                *[column.buffer_info()[0] for column in columns]
+            )
+            if results is None:
+                result_pointer = None
+            else:
+                result_pointer = results.buffer_info()[0]
+            map_function(pointers, result_pointer, count)
+
+        return mapper
+
     def get_global_by_index(self, index: int):
         global_name = self._wasm_global_names[index]
         return NativeWasmGlobal(global_name, self._code_module)
@@ -163,18 +290,10 @@ class NativeWasmMemory(WasmMemory):
 
     def memory_size(self) -> int:
         """ return memory size in pages """
-        return self._memory_data_page.size // PAGE_SIZE
-
-    def write(self, address: int, data):
-        """ Write some data to memory """
-        self._instance._memory_data_page.seek(address)
-        self._instance._memory_data_page.write(data)
+        return self._instance._memory_data_page.size // PAGE_SIZE
 
-    def read(self, address: int, size: int) -> bytes:
-        self._instance._memory_data_page.seek(address)
-        data = self._instance._memory_data_page.read(size)
-        assert len(data) == size
-        return data
+    def _memoryview(self):
+        return self._instance._memory_data_page.view()
 
 
 class NativeWasmGlobal(WasmGlobal):
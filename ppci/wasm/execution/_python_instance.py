@@ -32,6 +32,7 @@ def python_instantiate(module, imports, reporter, cache_file):
 
     instance = PythonModuleInstance(_py_module, imports)
     instance._wasm_function_names = ppci_module._wasm_function_names
+    instance._wasm_function_types = ppci_module._wasm_function_types
     instance._wasm_global_names = ppci_module._wasm_global_names
     return instance
 
@@ -94,7 +95,12 @@ class PythonModuleInstance(ModuleInstance):
         if new_size > max_size:
             return -1
         else:
-            self._py_module._irpy_heap.extend(bytes(amount * PAGE_SIZE))
+            try:
+                self._py_module._irpy_heap.extend(bytes(amount * PAGE_SIZE))
+            except BufferError:
+                # A memoryview on the heap pins its size:
+                logger.warning("Cannot grow memory while a view on it exists")
+                return -1
             return old_size
 
     def memory_size(self):
@@ -121,15 +127,12 @@ class PythonWasmMemory(WasmMemory):
         super().__init__(min_size, max_size)
         self._module = instance
 
-    def write(self, address: int, data: bytes):
-        address = self._module.mem0_start + address
-        self._module._py_module.write_mem(address, data)
-
-    def read(self, address: int, size: int) -> bytes:
-        address = self._module.mem0_start + address
-        data = self._module._py_module.read_mem(address, size)
-        assert len(data) == size
-        return data
+    def _memoryview(self):
+        py_module = self._module._py_module
+        start = self._module.mem0_start - py_module.HEAP_START
+        size = self._module.memory_size() * PAGE_SIZE
+        with memoryview(py_module._irpy_heap) as heap:
+            return heap[start : start + size]
 
 
 # TODO: we might implement the descriptor protocol in some way?
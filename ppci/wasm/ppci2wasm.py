@@ -27,12 +27,16 @@ from .arch import WasmArchitecture
 from .arch import I32Register, I64Register, F32Register, F64Register
 
 
-def ir_to_wasm(ir_module: ir.Module, reporter=None) -> components.Module:
+def ir_to_wasm(
+    ir_module: ir.Module, reporter=None, export_memory=False
+) -> components.Module:
     """Compiles ir-code to a wasm module.
 
     Args:
         ir_module (ir.Module): The ir-module to compile
         reporter: optionally report compilation steps
+        export_memory (bool): export the memory as "memory", so that
+            the host can inspect global data
 
     Returns:
         A wasm module.
@@ -42,7 +46,9 @@ def ir_to_wasm(ir_module: ir.Module, reporter=None) -> components.Module:
         reporter.message("{} exporting ir to wasm:".format(ir_module))
         reporter.dump_ir(ir_module)
 
-    ir_to_wasm_compiler = IrToWasmCompiler(reporter=reporter)
+    ir_to_wasm_compiler = IrToWasmCompiler(
+        reporter=reporter, export_memory=export_memory
+    )
     ir_to_wasm_compiler.prepare_compilation()
     ir_to_wasm_compiler.compile(ir_module)
     return ir_to_wasm_compiler.create_wasm_module()
@@ -54,8 +60,9 @@ class IrToWasmCompiler:
     logger = logging.getLogger("ir2wasm")
     STACKSIZE = 1000  # Virtual stack size
 
-    def __init__(self, reporter=None):
+    def __init__(self, reporter=None, export_memory=False):
         self.reporter = reporter
+        self.export_memory = export_memory
 
     def prepare_compilation(self):
         self.type_refs = {}  # Track signatures for re-use
@@ -187,6 +194,14 @@ class IrToWasmCompiler:
         self.add_definition(
             components.Memory(0, 10, None)
         )  # Start with 10 pages?
+
+        # Export the memory, so that the host can inspect global data:
+        if self.export_memory:
+            self.add_definition(
+                components.Export(
+                    "memory", "memory", components.Ref("memory", index=0)
+                )
+            )
         for memid, addr, data in self.initial_memory:
             offset = [components.Instruction("i32.const", addr)]
             self.add_definition(
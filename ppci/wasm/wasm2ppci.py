@@ -205,10 +205,15 @@ class WasmToIrCompiler:
         self.gen_init_procedure()
 
         function_names = [f[0].name for f in self.functions]
+        function_types = [
+            (tuple(p[1] for p in f[1].params), tuple(f[1].results))
+            for f in self.functions
+        ]
         global_names = [g for g in self.globalz]
 
         # TODO: hack to pass this information alongside module
         self.builder.module._wasm_function_names = function_names
+        self.builder.module._wasm_function_types = function_types
         self.builder.module._wasm_global_names = global_names
 
         return self.builder.module
@@ -30,6 +30,7 @@ setup(
             'ppci-ld = ppci.cli.link:link',
             'ppci-llc = ppci.cli.llc:llc',
             'ppci-mkuimage = ppci.cli.mkuimage:mkuimage',
+            'ppci-mkruntime = ppci.cli.mkruntime:mkruntime',
             'ppci-objcopy = ppci.cli.objcopy:objcopy',
             'ppci-objdump = ppci.cli.objdump:objdump',
             'ppci-ocaml = ppci.cli.ocaml:ocaml',
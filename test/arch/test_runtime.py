@@ -0,0 +1,63 @@
+import io
+import random
+import unittest
+from ppci import api
+from ppci.arch.runtime import get_runtime_files
+from ppci.lang.python import ir_to_python
+
+
+def wrap(value, bits):
+    value &= (1 << bits) - 1
+    if value >> (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+class RuntimeTestCase(unittest.TestCase):
+    """ Check the multiply and divide routines against python """
+
+    def load(self, march, int_size):
+        module = api.c3_to_ir(get_runtime_files([], int_size), [], march)
+        api.optimize(module, level=2)
+        f = io.StringIO()
+        ir_to_python([module], f)
+        namespace = {}
+        exec(f.getvalue(), namespace)
+        return namespace
+
+    def check(self, march, int_size):
+        namespace = self.load(march, int_size)
+        bits = int_size * 8
+        low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+        special = [0, 1, -1, 2, -7, 255, 256, low, high, low + 1]
+        rng = random.Random(0)
+        values = special + [rng.randint(low, high) for _ in range(20)]
+        for a in values:
+            for b in values:
+                ua, ub = a % (1 << bits), b % (1 << bits)
+
+                def call(name):
+                    return wrap(namespace["runtime_" + name](a, b), bits)
+
+                self.assertEqual(wrap(a * b, bits), call("mulsi3"))
+                self.assertEqual(wrap(a * b, bits), call("umulsi3"))
+                if b == 0:
+                    continue
+                quotient = abs(a) // abs(b)
+                if (a < 0) != (b < 0):
+                    quotient = -quotient
+                remainder = a - quotient * b
+                self.assertEqual(wrap(quotient, bits), call("divsi3"))
+                self.assertEqual(wrap(remainder, bits), call("modsi3"))
+                self.assertEqual(wrap(ua // ub, bits), call("udivsi3"))
+                self.assertEqual(wrap(ua % ub, bits), call("umodsi3"))
+
+    def test_16_bit(self):
+        self.check("msp430", 2)
+
+    def test_32_bit(self):
+        self.check("riscv", 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,20 @@
+import asyncio
+import binascii
+import socket
+import threading
+import time
 import unittest
 
 from ppci.api import get_arch
+from ppci.arch.example import R3
 from ppci.binutils.dbg.debug_driver import DebugState
 from ppci.binutils.dbg.gdb.client import GdbDebugDriver
-from ppci.binutils.dbg.gdb.rsp import decoder, RspHandler
+from ppci.binutils.dbg.gdb.client import AsyncGdbDebugDriver
+from ppci.binutils.dbg.gdb.client import BlockingDebugDriver
+from ppci.binutils.dbg.gdb.memcache import MemoryCache
+from ppci.binutils.dbg.gdb.rsp import decoder, RspHandler, RspError
+from ppci.binutils.dbg.gdb.rsp import rsp_decode
+from ppci.binutils.dbg.gdb.transport import TCP, AsyncTCP
 
 
 class GdbDecoderTestCase(unittest.TestCase):
@@ -57,6 +68,10 @@ class RspTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             RspHandler.rsp_unpack(pkt)
 
+    def test_rsp_decode(self):
+        self.assertEqual('000012', rsp_decode('0* 12'))
+        self.assertEqual('a#b', rsp_decode('a}\x03b'))
+
 
 class TransportMock:
     """ Test dummy to test the GDB protocol """
@@ -133,7 +148,19 @@ class GdbClientTestCase(unittest.TestCase):
         self.check_send(b'$z0,62,4#9E+')
 
     def test_read_mem(self):
-        """ Test reading of memory """
+        """ Test reading of memory, a whole page is fetched """
+        page = bytearray(64)
+        page[37:41] = bytes([1, 2, 0x73, 9])
+        self.prepare_response(b'+' + self.pkt(page.hex()))
+        contents = self.gdbc.read_mem(101, 4)
+        self.assertEqual(bytes([1, 2, 0x73, 9]), contents)
+        self.check_send(b'$m 40,40#81+')
+
+    def test_read_mem_uncached(self):
+        """ Test reading of memory without cache """
+        self.gdbc = GdbDebugDriver(
+            self.arch, transport=self.transport_mock, memory_cache=False)
+        self.gdbc.status = DebugState.STOPPED
         self.prepare_response(b'+$01027309#96')
         contents = self.gdbc.read_mem(101, 4)
         self.assertEqual(bytes([1, 2, 0x73, 9]), contents)
@@ -145,6 +172,10 @@ class GdbClientTestCase(unittest.TestCase):
         self.gdbc.write_mem(100, bytes([1, 2, 0x73, 9]))
         self.check_send(b'$M 64,4:01027309#07+')
 
+    @staticmethod
+    def pkt(data):
+        return RspHandler.rsp_pack(data).encode('ascii')
+
     def prepare_response(self, data):
         """ Prepare mock that we expect this data to be received """
         self.transport_mock.response = data
@@ -158,5 +189,444 @@ class GdbClientTestCase(unittest.TestCase):
         self.assertEqual(data, self.transport_mock.send_data)
 
 
+class MemoryCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.memory = bytes(range(256))
+        self.fetches = []
+        self.cache = MemoryCache(self.fetch, page_size=16)
+
+    def fetch(self, address, size):
+        self.fetches.append((address, size))
+        return self.memory[address:address + size]
+
+    def test_adjacent_pages_in_one_fetch(self):
+        self.assertEqual(self.memory[5:40], self.cache.read(5, 35))
+        self.assertEqual([(0, 48)], self.fetches)
+        self.assertEqual(self.memory[20:30], self.cache.read(20, 10))
+        self.assertEqual(1, len(self.fetches))
+
+    def test_only_missing_pages(self):
+        self.cache.read(32, 4)
+        self.cache.read(0, 64)
+        self.assertEqual([(32, 16), (0, 32), (48, 16)], self.fetches)
+
+    def test_write_updates_cache(self):
+        self.cache.read(0, 32)
+        self.cache.write(14, bytes([0xaa, 0xbb, 0xcc]))
+        self.assertEqual(
+            bytes([13, 0xaa, 0xbb, 0xcc, 17]), self.cache.read(13, 5))
+        self.assertEqual(1, len(self.fetches))
+
+    def test_failed_fetch(self):
+        self.assertIsNone(self.cache.read(250, 10))
+        self.assertEqual(0, len(self.cache))
+
+
+class FakeRspServer:
+    """ Local stand-in for a gdb server, counting the packets it receives.
+
+    Registers are those of the 'example' architecture, three 32 bits
+    registers. The `g` reply only holds the first `reported` bytes.
+    """
+    def __init__(self, memory):
+        self.memory = memory
+        self.registers = bytearray(12)
+        self.reported = 12
+        self.packets = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(('localhost', 0))
+        self._sock.listen(1)
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.start()
+
+    def count(self, prefix):
+        return sum(1 for p in self.packets if p.startswith(prefix))
+
+    def close(self):
+        self._thread.join()
+        self._sock.close()
+
+    def _serve(self):
+        conn, _ = self._sock.accept()
+        with conn:
+            data = bytearray()
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data.extend(chunk)
+                while True:
+                    start = data.find(b'$')
+                    if start < 0 or len(data) < data.find(b'#', start) + 3:
+                        break
+                    end = data.find(b'#', start)
+                    if end < 0:
+                        break
+                    pkt = data[start + 1:end].decode('ascii')
+                    del data[:end + 3]
+                    conn.sendall(b'+')
+                    reply = self._handle(pkt)
+                    if pkt == 's':
+                        time.sleep(0.05)
+                    if reply is not None:
+                        conn.sendall(RspHandler.rsp_pack(reply).encode())
+
+    def _handle(self, pkt):
+        self.packets.append(pkt)
+        if pkt == 'g':
+            return self.registers[:self.reported].hex()
+        elif pkt.startswith('p'):
+            idx = int(pkt[1:], 16)
+            return self.registers[idx * 4:idx * 4 + 4].hex()
+        elif pkt.startswith('m'):
+            address, size = (int(v, 16) for v in pkt[1:].split(','))
+            if address + size > len(self.memory):
+                return 'E01'
+            return self.memory[address:address + size].hex()
+        elif pkt.startswith('M'):
+            header, value = pkt[1:].split(':')
+            address, size = (int(v, 16) for v in header.split(','))
+            self.memory[address:address + size] = binascii.a2b_hex(value)
+            return 'OK'
+        elif pkt == 's':
+            self.memory[0] += 1
+            return 'S05'
+
+
+class GdbPacketCountTestCase(unittest.TestCase):
+    """ Check how many round trips the gdb client takes """
+    arch = get_arch('example')
+
+    def setUp(self):
+        self.memory = bytearray(range(256)) * 4
+        self.server = FakeRspServer(self.memory)
+        self.gdbc = GdbDebugDriver(self.arch, transport=TCP(self.server.port))
+        self.gdbc.connect()
+        self.gdbc.status = DebugState.STOPPED
+
+    def tearDown(self):
+        self.gdbc.disconnect()
+        self.server.close()
+
+    def test_small_reads_use_cache(self):
+        """ Evaluating an array element by element takes one packet """
+        for address in range(0x100, 0x140, 4):
+            self.assertEqual(
+                self.memory[address:address + 4],
+                self.gdbc.read_mem(address, 4))
+        self.assertEqual(1, self.server.count('m'))
+
+    def test_prefetch(self):
+        self.gdbc.prefetch_mem(0x80, 0x100)
+        self.assertEqual(1, self.server.count('m'))
+        self.gdbc.read_mem(0x90, 8)
+        self.gdbc.read_mem(0x170, 8)
+        self.assertEqual(1, self.server.count('m'))
+
+    def test_read_at_end_of_memory(self):
+        """ A page crossing into invalid memory falls back to exact read """
+        self.memory.extend(bytes(8))
+        self.assertEqual(bytes(8), self.gdbc.read_mem(1024, 8))
+        self.assertEqual(2, self.server.count('m'))
+
+    def test_write_and_step_invalidate(self):
+        self.gdbc.read_mem(0, 4)
+        self.gdbc.write_mem(1, bytes([0x55]))
+        self.assertEqual(bytes([0, 0x55, 2, 3]), self.gdbc.read_mem(0, 4))
+        self.assertEqual(1, self.server.count('m'))
+        self.gdbc.step()
+        for _ in range(100):
+            if self.gdbc.status == DebugState.STOPPED:
+                break
+            time.sleep(0.01)
+        self.assertEqual(DebugState.STOPPED, self.gdbc.status)
+        self.assertEqual(bytes([1, 0x55, 2, 3]), self.gdbc.read_mem(0, 4))
+        self.assertEqual(2, self.server.count('m'))
+
+    def test_registers_read_at_once(self):
+        self.gdbc.get_pc()
+        for register in self.arch.gdb_registers:
+            self.gdbc._get_register(register)
+        self.gdbc.get_registers(self.arch.gdb_registers)
+        self.assertEqual(1, self.server.count('g'))
+        self.assertEqual(0, self.server.count('p'))
+
+    def test_unreported_register(self):
+        """ A register missing from the `g` reply is read with `p` """
+        self.server.registers[8:12] = bytes([1, 2, 3, 4])
+        self.server.reported = 8
+        r2 = self.arch.gdb_registers[2]
+        self.assertEqual(0x04030201, self.gdbc._get_register(r2))
+        self.assertEqual(1, self.server.count('p'))
+        with self.assertRaises(RspError):
+            self.gdbc._get_register(R3)
+
+
+class AsyncFakeRspServer:
+    """ Asyncio stand-in for a gdb server.
+
+    Supports no-ack mode and a small packet size. When `hold` is set,
+    replies are only sent once that many commands have been received,
+    which only works when the client pipelines its commands.
+    """
+    def __init__(self, packet_size=0x40, no_ack=True):
+        self.memory = bytearray(range(256))
+        self.registers = bytearray(12)
+        self.packet_size = packet_size
+        self.no_ack = no_ack
+        self.ack_mode = True
+        self.packets = []
+        self.acks = 0
+        self.hold = 0
+        self.console = None
+        self._held = []
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._serve, 'localhost', 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def count(self, prefix):
+        return sum(1 for p in self.packets if p.startswith(prefix))
+
+    async def _serve(self, reader, writer):
+        data = bytearray()
+        while True:
+            chunk = await reader.read(4096)
+            if not chunk:
+                break
+            data.extend(chunk)
+            while data:
+                if data[0] == ord('+'):
+                    self.acks += 1
+                    del data[0]
+                elif data[0] == 3:
+                    del data[0]
+                    self._reply(writer, 'S02')
+                elif data[0] == ord('$'):
+                    end = data.find(b'#')
+                    if end < 0 or len(data) < end + 3:
+                        break
+                    pkt = data[1:end].decode('ascii')
+                    del data[:end + 3]
+                    if self.ack_mode:
+                        writer.write(b'+')
+                    self._handle(writer, pkt)
+                else:
+                    del data[0]
+            await writer.drain()
+        writer.close()
+
+    def _reply(self, writer, reply):
+        writer.write(RspHandler.rsp_pack(reply).encode('ascii'))
+
+    def _handle(self, writer, pkt):
+        self.packets.append(pkt)
+        if pkt == 'qSupported':
+            reply = 'PacketSize=%x' % self.packet_size
+            if self.no_ack:
+                reply += ';QStartNoAckMode+'
+        elif pkt == 'QStartNoAckMode':
+            self._reply(writer, 'OK')
+            self.ack_mode = False
+            return
+        elif pkt == 'g':
+            reply = self.registers.hex()
+        elif pkt.startswith('m'):
+            address, size = (int(v, 16) for v in pkt[1:].split(','))
+            assert size * 2 <= self.packet_size
+            if self.console:
+                self._reply(writer, 'O' + self.console.encode().hex())
+            if address + size > len(self.memory):
+                reply = 'E01'
+            else:
+                reply = self.memory[address:address + size].hex()
+        elif pkt.startswith('M'):
+            header, value = pkt[1:].split(':')
+            address, size = (int(v, 16) for v in header.split(','))
+            self.memory[address:address + size] = binascii.a2b_hex(value)
+            reply = 'OK'
+        elif pkt.startswith(('Z0', 'z0', 'P')):
+            reply = 'OK'
+        elif pkt == 'c':
+            return  # Run until interrupted
+        elif pkt == 's':
+            self.registers[0] += 1
+            stop = 'T0500:%s;' % self.registers[:4].hex()
+            asyncio.get_event_loop().call_later(
+                0.01, self._reply, writer, stop)
+            return
+        else:
+            reply = ''
+        self._held.append(reply)
+        if len(self._held) >= self.hold:
+            for reply in self._held:
+                self._reply(writer, reply)
+            self._held.clear()
+
+
+class AsyncGdbClientTestCase(unittest.TestCase):
+    arch = get_arch('example')
+
+    def run_async(self, coro):
+        return asyncio.run(asyncio.wait_for(coro, 5))
+
+    async def connect(self, server):
+        port = await server.start()
+        driver = AsyncGdbDebugDriver(self.arch, AsyncTCP(port))
+        await driver.connect()
+        return driver
+
+    def test_no_ack_mode(self):
+        async def main():
+            server = AsyncFakeRspServer()
+            driver = await self.connect(server)
+            driver.status = DebugState.STOPPED
+            await driver.get_registers(self.arch.gdb_registers)
+            await driver.disconnect()
+            await server.close()
+            return server, driver
+        server, driver = self.run_async(main())
+        self.assertFalse(driver._rsp.ack_mode)
+        self.assertEqual(0x40, driver.packet_size)
+        # Only the qSupported and QStartNoAckMode replies were acked
+        self.assertEqual(2, server.acks)
+
+    def test_ack_mode(self):
+        async def main():
+            server = AsyncFakeRspServer(no_ack=False)
+            driver = await self.connect(server)
+            driver.status = DebugState.STOPPED
+            data = await driver.read_mem(0, 64)
+            await driver.disconnect()
+            await server.close()
+            return server, driver, data
+        server, driver, data = self.run_async(main())
+        self.assertTrue(driver._rsp.ack_mode)
+        self.assertEqual(bytes(range(64)), data)
+        self.assertEqual(1 + server.count('m'), server.acks)
+
+    def test_pipelined_read_write(self):
+        """ A large transfer is split and sent without waiting """
+        async def main():
+            server = AsyncFakeRspServer()
+            driver = await self.connect(server)
+            driver.status = DebugState.STOPPED
+            server.hold = 8
+            data = await driver.read_mem(8, 128)
+            await driver.write_mem(8, bytes(128))
+            server.hold = 0
+            data2 = await driver.read_mem(0, 16)
+            await driver.disconnect()
+            await server.close()
+            return server, data, data2
+        server, data, data2 = self.run_async(main())
+        self.assertEqual(bytes(range(8, 136)), data)
+        self.assertEqual(bytes(range(8)) + bytes(8), data2)
+        self.assertEqual(9, server.count('m'))
+        self.assertEqual(8, server.count('M'))
+
+    def test_unreported_register(self):
+        """ A register the target does not report raises """
+        async def main():
+            server = AsyncFakeRspServer()
+            server.registers = bytearray(8)
+            driver = await self.connect(server)
+            driver.status = DebugState.STOPPED
+            r0, _, r2 = self.arch.gdb_registers
+            value = await driver._get_register(r0)
+            with self.assertRaises(RspError):
+                await driver._get_register(r2)
+            await driver.disconnect()
+            await server.close()
+            return server, value
+        server, value = self.run_async(main())
+        self.assertEqual(0, value)
+        self.assertEqual(1, server.count('p'))
+
+    def test_read_mem_error(self):
+        """ An error reply raises, and later replies stay in order """
+        async def main():
+            server = AsyncFakeRspServer()
+            driver = await self.connect(server)
+            driver.status = DebugState.STOPPED
+            with self.assertRaises(RspError):
+                await driver.read_mem(250, 16)
+            data = await driver.read_mem(0, 4)
+            await driver.disconnect()
+            await server.close()
+            return data
+        self.assertEqual(bytes(range(4)), self.run_async(main()))
+
+    def test_console_output(self):
+        """ Console output packets are not taken as replies """
+        async def main():
+            server = AsyncFakeRspServer()
+            server.console = 'hello'
+            driver = await self.connect(server)
+            output = []
+            driver._rsp.on_console = output.append
+            driver.status = DebugState.STOPPED
+            data = await driver.read_mem(0, 4)
+            data2 = await driver.read_mem(4, 4)
+            await driver.disconnect()
+            await server.close()
+            return output, data, data2
+        output, data, data2 = self.run_async(main())
+        self.assertEqual(['hello', 'hello'], output)
+        self.assertEqual(bytes(range(4)), data)
+        self.assertEqual(bytes(range(4, 8)), data2)
+
+    def test_concurrent_targets(self):
+        """ Step two targets from one event loop """
+        async def main():
+            servers = [AsyncFakeRspServer() for _ in range(2)]
+            drivers = [await self.connect(server) for server in servers]
+            stops = []
+            for driver in drivers:
+                driver.events.on_stop += lambda: stops.append(1)
+                driver.status = DebugState.STOPPED
+            await asyncio.gather(*(d.step() for d in drivers))
+            await asyncio.gather(*(d.wait_stopped(1) for d in drivers))
+            pcs = await asyncio.gather(*(d.get_pc() for d in drivers))
+            for driver in drivers:
+                await driver.disconnect()
+            for server in servers:
+                await server.close()
+            return servers, drivers, pcs, stops
+        servers, drivers, pcs, stops = self.run_async(main())
+        self.assertEqual([1, 1], pcs)
+        self.assertEqual(2, len(stops))
+        for server, driver in zip(servers, drivers):
+            self.assertEqual(DebugState.STOPPED, driver.status)
+            # The pc came with the stop packet
+            self.assertEqual(0, server.count('g'))
+
+    def test_blocking_driver(self):
+        """ The async driver can be used from blocking code """
+        server = AsyncFakeRspServer()
+        transport = AsyncTCP(0)
+        blocking = BlockingDebugDriver(
+            AsyncGdbDebugDriver(self.arch, transport))
+        transport._port = asyncio.run_coroutine_threadsafe(
+            server.start(), blocking.loop).result(2)
+        blocking.connect()
+        blocking.run()
+        blocking.stop()
+        self.assertEqual(DebugState.STOPPED, blocking.get_status())
+        self.assertEqual(bytes(range(4)), blocking.read_mem(0, 4))
+        blocking.step()
+        self.assertEqual(1, blocking.get_pc())
+        asyncio.run_coroutine_threadsafe(
+            server.close(), blocking.loop).result(2)
+        blocking.disconnect()
+
+
 if __name__ == '__main__':
     unittest.main()
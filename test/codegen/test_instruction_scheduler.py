@@ -0,0 +1,111 @@
+import io
+import unittest
+from ppci.api import c_to_ir, ir_to_assembly, optimize
+from ppci.codegen.instructionscheduler import InstructionScheduler
+from ppci.api import get_arch
+from ppci.arch.arch import Frame
+from ppci.arch.generic_instructions import Label
+from ppci.arch.riscv.instructions import Addr, Lw, Sw, Mul
+from ppci.arch.riscv.registers import RiscvRegister, R10
+
+
+class InstructionSchedulerTestCase(unittest.TestCase):
+    """ Use the riscv target to test the list scheduler """
+
+    def setUp(self):
+        arch = get_arch("riscv")
+        self.scheduler = InstructionScheduler(arch.isa)
+        self.t1 = RiscvRegister("t1")
+        self.t2 = RiscvRegister("t2")
+        self.t3 = RiscvRegister("t3")
+        self.t4 = RiscvRegister("t4")
+        self.t5 = RiscvRegister("t5")
+
+    def schedule(self, instructions):
+        frame = Frame("tst")
+        frame.instructions.extend(instructions)
+        self.scheduler.schedule(frame)
+        return frame.instructions
+
+    def test_fill_load_delay(self):
+        """ An independent instruction is placed after a load """
+        load = Lw(self.t2, 0, self.t1)
+        use = Addr(self.t3, self.t2, self.t2)
+        other = Addr(self.t5, self.t4, self.t4)
+        instructions = self.schedule([load, use, other])
+        self.assertEqual([load, other, use], instructions)
+
+    def test_keep_dependencies(self):
+        """ A value is not overwritten before it is used """
+        load = Lw(self.t2, 0, self.t1)
+        use = Addr(self.t3, self.t2, self.t1)
+        redefine = Addr(self.t1, self.t4, self.t4)
+        instructions = self.schedule([load, use, redefine])
+        self.assertEqual([load, use, redefine], instructions)
+
+    def test_memory_order(self):
+        """ Loads are not moved over stores """
+        store = Sw(self.t2, 0, self.t1)
+        load = Lw(self.t3, 0, self.t4)
+        mul = Mul(self.t5, self.t4, self.t4)
+        instructions = self.schedule([store, load, mul])
+        self.assertEqual([store, mul, load], instructions)
+        store2 = Sw(self.t5, 4, self.t1)
+        instructions = self.schedule([load, store2, mul])
+        self.assertLess(
+            instructions.index(load), instructions.index(store2)
+        )
+
+    def test_load_order(self):
+        """ Loads are not swapped, they might be volatile """
+        load1 = Lw(self.t2, 0, self.t1)
+        load2 = Lw(self.t3, 0, self.t4)
+        mul1 = Mul(self.t5, self.t3, self.t3)
+        mul2 = Mul(self.t5, self.t5, self.t5)
+        instructions = self.schedule([load1, load2, mul1, mul2])
+        self.assertLess(
+            instructions.index(load1), instructions.index(load2)
+        )
+
+    def test_barriers(self):
+        """ Instructions are not moved over labels or hardware registers """
+        load = Lw(self.t2, 0, self.t1)
+        label = Label("a")
+        use = Addr(self.t3, self.t2, self.t2)
+        other = Addr(self.t5, self.t4, self.t4)
+        instructions = self.schedule([load, label, use, other])
+        self.assertEqual([load, label, use, other], instructions)
+        argument = Addr(R10, self.t4, self.t4)
+        instructions = self.schedule([load, use, argument])
+        self.assertEqual([load, use, argument], instructions)
+
+
+class VolatileOrderTestCase(unittest.TestCase):
+    """ Compile volatile accesses with the scheduler enabled """
+
+    def test_volatile_loads(self):
+        src = """
+        int f(void) {
+          int a = *(volatile int*)0x1000;
+          int b = *(volatile int*)0x2000;
+          return b * b * b + a;
+        }
+        """
+        ir_module = c_to_ir(io.StringIO(src), "arm")
+        optimize(ir_module, level=2)
+        asm = ir_to_assembly([ir_module], "arm")
+        lines = [line.split() for line in asm.splitlines()]
+        literals = {}
+        for label, value in zip(lines, lines[1:]):
+            if len(label) == 1 and value[:1] == ["dd"]:
+                literals[label[0].rstrip(":")] = value[1]
+        loaded = [
+            literals[line[2]]
+            for line in lines
+            if line[:1] == ["ldr"] and line[-1] in literals
+        ]
+        self.assertEqual(["4096", "8192"], loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,18 @@
+""" Pytest configuration for the ppci test suite """
+
+import os
+import shutil
+import tempfile
+
+
+def pytest_configure(config):
+    """ Keep the tests out of the cache directory of the user """
+    if "PPCI_CACHE_DIR" not in os.environ:
+        directory = tempfile.mkdtemp(prefix="ppci-test-cache-")
+        os.environ["PPCI_CACHE_DIR"] = directory
+
+        def cleanup():
+            del os.environ["PPCI_CACHE_DIR"]
+            shutil.rmtree(directory, ignore_errors=True)
+
+        config.add_cleanup(cleanup)
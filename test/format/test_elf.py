@@ -1,10 +1,30 @@
 import unittest
 import io
+import os
+import shutil
+import subprocess
+import tempfile
 
-from ppci.binutils.objectfile import ObjectFile
-from ppci.format.elf import ElfFile, write_elf
+from ppci.binutils.objectfile import ObjectFile, get_object
+from ppci.format.elf import ElfFile, write_elf, read_elf_object
+from ppci.format.elf.reader import arch_map
 from ppci.format.elf.writer import elf_hash
-from ppci.api import get_arch
+from ppci.api import get_arch, cc, link, get_current_arch
+from ppci.common import CompilerError
+from ppci.utils.codepage import load_obj
+
+
+C_SOURCE = """
+int counter;
+int scale = 10;
+int lookup(int i) { counter++; return i * scale; }
+"""
+
+USE_SOURCE = """
+int lookup(int i);
+extern int counter;
+int use(int a) { return lookup(a) + counter; }
+"""
 
 
 class ElfFileTestCase(unittest.TestCase):
@@ -32,5 +52,90 @@ class ElfFileTestCase(unittest.TestCase):
             self.assertEqual(elf_hash(name), hash_value)
 
 
+class ElfImportTestCase(unittest.TestCase):
+    """ Import relocatable ELF files as object files """
+
+    def make_elf(self, obj, type='relocatable'):
+        f = io.BytesIO()
+        write_elf(obj, f, type=type)
+        return f.getvalue()
+
+    def test_roundtrip(self):
+        """ Linking an imported ELF gives the same result as the original """
+        obj = cc(io.StringIO(C_SOURCE), 'x86_64')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'lib.o')
+            with open(filename, 'wb') as f:
+                f.write(self.make_elf(obj))
+            obj2 = get_object(filename)
+            # Section data refers to the mapped file:
+            self.assertIsInstance(obj2.get_section('code').data, memoryview)
+            self.assertEqual(
+                obj.get_section('code').data, obj2.get_section('code').data)
+            self.assertEqual(
+                sorted(obj.get_defined_symbols()),
+                sorted(obj2.get_defined_symbols()))
+            use = cc(io.StringIO(USE_SOURCE), 'x86_64')
+            linked = link([use, obj])
+            linked2 = link([use, obj2])
+            del obj2
+        self.assertEqual(
+            linked.get_section('code').data, linked2.get_section('code').data)
+        self.assertEqual(
+            linked.get_symbol_value('lookup'),
+            linked2.get_symbol_value('lookup'))
+
+    def test_file_object(self):
+        """ Files which cannot be mapped are read """
+        obj = cc(io.StringIO(C_SOURCE), 'x86_64')
+        obj2 = get_object(io.BytesIO(self.make_elf(obj)))
+        self.assertIs(get_arch('x86_64'), obj2.arch)
+        self.assertEqual(
+            obj.get_section('data').data, obj2.get_section('data').data)
+        self.assertEqual(len(obj.relocations), len(obj2.relocations))
+
+    def test_machines(self):
+        """ Each supported ELF machine gives an object of its arch """
+        for machine, arch_name in arch_map.items():
+            obj = ObjectFile(get_arch(arch_name))
+            obj2 = read_elf_object(io.BytesIO(self.make_elf(obj)))
+            self.assertIs(get_arch(arch_name), obj2.arch)
+
+    def test_unsupported_machine(self):
+        obj = ObjectFile(get_arch('arm'))
+        with self.assertRaisesRegex(CompilerError, 'Unsupported ELF machine'):
+            read_elf_object(io.BytesIO(self.make_elf(obj)))
+
+    def test_unsupported_relocations(self):
+        obj = cc(io.StringIO(C_SOURCE), 'x86_64')
+        with self.assertRaisesRegex(CompilerError, 'not supported'):
+            read_elf_object(io.BytesIO(self.make_elf(obj)), arch='arm')
+
+    def test_not_relocatable(self):
+        obj = link([cc(io.StringIO(C_SOURCE), 'x86_64')])
+        with self.assertRaisesRegex(Exception, 'relocatable'):
+            read_elf_object(io.BytesIO(self.make_elf(obj, 'executable')))
+
+    @unittest.skipUnless(shutil.which('gcc'), 'gcc not found')
+    @unittest.skipUnless(
+        get_current_arch() is not None
+        and get_current_arch().name == 'x86_64'
+        and os.name == 'posix', 'requires x86_64 host')
+    def test_gcc_object(self):
+        """ Link an object compiled by gcc and run it """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, 'lib.c')
+            with open(source, 'w') as f:
+                f.write(C_SOURCE)
+            filename = os.path.join(tmpdir, 'lib.o')
+            subprocess.check_call(
+                ['gcc', '-O2', '-fno-pic', '-c', source, '-o', filename])
+            obj = read_elf_object(filename)
+        use = cc(io.StringIO(USE_SOURCE), get_current_arch(), debug=True)
+        m = load_obj(link([use, obj], debug=True))
+        self.assertEqual(41, m.use(4))
+        self.assertEqual(42, m.use(4))
+
+
 if __name__ == '__main__':
     unittest.main()
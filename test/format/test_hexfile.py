@@ -52,6 +52,37 @@ class HexFileTestCase(unittest.TestCase):
         hf.add_region(0x13, bytes.fromhex('abcdab'))
         self.assertEqual(1, len(hf.regions))
 
+    def test_fill_gap(self):
+        """ Adding data between two regions joins all three """
+        hf = HexFile()
+        hf.add_region(0x20, bytes.fromhex('cc'))
+        hf.add_region(0x10, bytes.fromhex('aa') * 8)
+        hf.add_region(0x21, bytes.fromhex('dd'))
+        self.assertEqual(2, len(hf.regions))
+        hf.add_region(0x18, bytes.fromhex('bb') * 8)
+        self.assertEqual(1, len(hf.regions))
+        self.assertEqual(0x10, hf.regions[0].address)
+        self.assertEqual(0x22, hf.regions[0].end_address)
+
+    def test_overlap_next(self):
+        hf = HexFile()
+        hf.add_region(0x10, bytes.fromhex('abcdab'))
+        with self.assertRaisesRegex(HexFileException, 'verlap'):
+            hf.add_region(0xe, bytes.fromhex('abcdab'))
+
+    def test_many_records(self):
+        """ Loading many small records gives a single region """
+        data = bytes(range(256)) * 0x400
+        f = io.StringIO()
+        hf = HexFile()
+        hf.add_region(0x1fff0, data)
+        hf.start_address = 0x20000
+        hf.save(f)
+        hf2 = HexFile.load(io.StringIO(f.getvalue()))
+        self.assertEqual(1, len(hf2.regions))
+        self.assertEqual(0x20000, hf2.start_address)
+        self.assertSequenceEqual(data, hf2.regions[0].data)
+
     def test_overlapped(self):
         hf = HexFile()
         hf.add_region(0x10, bytes.fromhex('abcdab'))
@@ -1,6 +1,7 @@
 
+import io
 import unittest
-from ppci.format.srecord import SRecord
+from ppci.format.srecord import SRecord, write_srecords
 
 
 class SRecordTestCase(unittest.TestCase):
@@ -18,6 +19,15 @@ class SRecordTestCase(unittest.TestCase):
         self.assertEqual(
             record.to_line(), 'S1137AF00A0A0D0000000000000000000000000061')
 
+    def test_address_size(self):
+        """ Data beyond 64 KiB is written with 24 bit addresses """
+        f = io.StringIO()
+        write_srecords(f, bytes(0x20), address=0xfff0)
+        lines = f.getvalue().splitlines()
+        self.assertEqual(4, len(lines))
+        self.assertTrue(lines[1].startswith('S2'))
+        self.assertEqual('S804000000FB', lines[-1])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,70 @@
+""" Test dominance queries on control flow graphs """
+
+import random
+import unittest
+from ppci.graph.cfg import ControlFlowGraph, ControlFlowNode
+from ppci.graph.algorithm.fixed_point_dominator import calculate_dominators
+from ppci.graph.algorithm.fixed_point_dominator import (
+    calculate_post_dominators,
+)
+
+
+def make_cfg(num_nodes, edges):
+    cfg = ControlFlowGraph()
+    nodes = [ControlFlowNode(cfg, name=str(i)) for i in range(num_nodes)]
+    cfg.entry_node = nodes[0]
+    cfg.exit_node = nodes[-1]
+    for a, b in edges:
+        nodes[a].add_edge(nodes[b])
+    return cfg, nodes
+
+
+class CfgDominanceTestCase(unittest.TestCase):
+    def test_diamond(self):
+        """ 0 -> 1 -> (2, 3) -> 4 -> 5 """
+        cfg, n = make_cfg(6, [(0, 1), (1, 2), (1, 3), (2, 4), (3, 4), (4, 5)])
+        self.assertTrue(cfg.dominates(n[1], n[4]))
+        self.assertFalse(cfg.dominates(n[2], n[4]))
+        self.assertTrue(cfg.dominates(n[4], n[4]))
+        self.assertFalse(cfg.strictly_dominates(n[4], n[4]))
+        self.assertTrue(cfg.post_dominates(n[4], n[1]))
+        self.assertFalse(cfg.post_dominates(n[2], n[1]))
+        self.assertTrue(cfg.post_dominates(n[4], n[4]))
+        self.assertFalse(cfg.strictly_post_dominates(n[4], n[4]))
+        self.assertTrue(cfg.strictly_post_dominates(n[5], n[0]))
+        self.assertIs(n[4], cfg.get_immediate_post_dominator(n[1]))
+        self.assertIs(n[1], cfg.get_immediate_dominator(n[4]))
+        self.assertIsNone(cfg.get_immediate_post_dominator(n[5]))
+
+    def test_unreachable_and_endless(self):
+        """ Node 3 is unreachable, node 4 loops forever """
+        cfg, n = make_cfg(
+            6, [(0, 1), (1, 5), (3, 1), (0, 4), (4, 4)])
+        self.assertFalse(cfg.dominates(n[0], n[3]))
+        self.assertTrue(cfg.dominates(n[3], n[3]))
+        self.assertFalse(cfg.post_dominates(n[5], n[4]))
+        self.assertTrue(cfg.post_dominates(n[4], n[4]))
+        self.assertIsNone(cfg.get_immediate_post_dominator(n[4]))
+
+    def test_random_graphs(self):
+        """ Compare with the fixed point dominator sets """
+        rng = random.Random(2)
+        for _ in range(20):
+            num_nodes = rng.randint(2, 25)
+            edges = [(i, i + 1) for i in range(num_nodes - 1)]
+            # No edges into the entry or out of the exit node:
+            for _ in range(num_nodes):
+                edges.append(
+                    (rng.randrange(num_nodes - 1), rng.randrange(1, num_nodes))
+                )
+            cfg, nodes = make_cfg(num_nodes, edges)
+            dom = calculate_dominators(nodes, nodes[0])
+            pdom = calculate_post_dominators(nodes, nodes[-1])
+            for a in nodes:
+                for b in nodes:
+                    self.assertEqual(a in dom[b], cfg.dominates(a, b))
+                    self.assertEqual(a in pdom[b], cfg.post_dominates(a, b))
+
+
+if __name__ == '__main__':
+    unittest.main()
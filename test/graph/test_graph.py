@@ -1,7 +1,9 @@
 #!/usr/bin/python
 
 import unittest
+from ppci import ir
 from ppci.graph import Graph, Node, DiGraph, DiNode, MaskableGraph
+from ppci.graph.callgraph import mod_to_call_graph, bottom_up_order
 from ppci.codegen.interferencegraph import InterferenceGraph
 from ppci.codegen.flowgraph import FlowGraph
 from ppci.arch.generic_instructions import Nop
@@ -117,6 +119,30 @@ class DigraphTestCase(unittest.TestCase):
         self.assertEqual(set(), b.successors)
 
 
+class CallGraphTestCase(unittest.TestCase):
+    def test_bottom_up_order(self):
+        """ Callees come before callers, recursive functions are grouped """
+        module = ir.Module('test')
+        functions = {}
+        for name in ('main', 'a', 'b', 'c'):
+            functions[name] = ir.Procedure(name, ir.Binding.GLOBAL)
+            module.add_function(functions[name])
+        calls = {'main': 'ab', 'a': 'b', 'b': 'c', 'c': 'b'}
+        for name, callees in calls.items():
+            function = functions[name]
+            function.entry = ir.Block(name + '_entry')
+            function.add_block(function.entry)
+            for callee in callees:
+                function.entry.add_instruction(
+                    ir.ProcedureCall(functions[callee], []))
+            function.entry.add_instruction(ir.Exit())
+        call_graph = mod_to_call_graph(module)
+        order = [
+            sorted(node.routine.name for node in component)
+            for component in bottom_up_order(call_graph)]
+        self.assertEqual([['b', 'c'], ['a'], ['main']], order)
+
+
 class InterferenceGraphTestCase(unittest.TestCase):
     def test_normal_use(self):
         """ Test if interference graph works """
@@ -328,6 +354,47 @@ class InterferenceGraphTestCase(unittest.TestCase):
         # For repr called:
         self.assertTrue(str(ig.get_node(t4)))
 
+    def test_register_bitsets(self):
+        """ Registers are numbered in order of appearance """
+        a = ExampleRegister('a')
+        b = ExampleRegister('b')
+        instrs = [Def(b), DefUse(a, b), Use(a)]
+        cfg = FlowGraph(instrs)
+        self.assertEqual([b, a], cfg.registers)
+        self.assertEqual(0b11, cfg.mask([a, b]))
+        self.assertEqual([b, a], cfg.registers_in(0b11))
+        self.assertEqual([a], cfg.registers_in(0b10))
+
+    def test_instruction_liveness(self):
+        """ Liveness of single instructions within a node """
+        a = ExampleRegister('a')
+        b = ExampleRegister('b')
+        instrs = [Def(b), DefUse(a, b), Use(a)]
+        cfg = FlowGraph(instrs)
+        cfg.calculate_liveness()
+        liveness = cfg.instruction_liveness()
+        self.assertEqual((set(), {b}), liveness[instrs[0]])
+        self.assertEqual(({b}, {a}), liveness[instrs[1]])
+        self.assertEqual(({a}, set()), liveness[instrs[2]])
+
+    def test_many_registers(self):
+        """ Chain of many registers, all live until the end of a loop """
+        regs = [ExampleRegister('r{}'.format(i)) for i in range(100)]
+        uses = [Use(r) for r in regs]
+        defs = [Def(r) for r in regs]
+        loop = Nop(jumps=[uses[0]])
+        instrs = defs + uses + [loop]
+        defs[-1].jumps = [uses[0]]
+        cfg = FlowGraph(instrs)
+        cfg.calculate_liveness()
+        body = cfg.get_node(uses[0])
+        self.assertEqual(set(regs), body.live_in)
+        self.assertEqual(set(regs), body.live_out)
+        ig = InterferenceGraph()
+        ig.calculate_interference(cfg)
+        self.assertTrue(ig.interfere(regs[0], regs[-1]))
+        self.assertEqual(99, ig.get_node(regs[5]).degree)
+
 
 if __name__ == '__main__':
     unittest.main()
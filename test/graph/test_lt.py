@@ -38,6 +38,22 @@ class LengauerTarjanTestCase(unittest.TestCase):
         }
         self.assertEqual(correct_idom, idom)
 
+    def test_reverse(self):
+        """ Post dominators by following edges backwards """
+        graph = DiGraph()
+        node_1, node_2, node_3, node_4 = [DiNode(graph) for _ in range(4)]
+        node_1.add_edge(node_2)
+        node_1.add_edge(node_3)
+        node_2.add_edge(node_4)
+        node_3.add_edge(node_4)
+        ipdom = calculate_idom(graph, node_4, reverse=True)
+        correct_ipdom = {
+            node_1: node_4,
+            node_2: node_4,
+            node_3: node_4,
+        }
+        self.assertEqual(correct_ipdom, ipdom)
+
     def test_appel_example_19_8(self):
         """ figure 19.8 """
         graph = DiGraph()
@@ -43,6 +43,80 @@ class RelooperTestCase(unittest.TestCase):
         # relooper.print_shape(shape)
         # print(shape)
 
+    def test_irreducible_loop(self):
+        """ A loop with two entries is dispatched on the label variable """
+        mod = """module foo;
+        global procedure x() {
+            block1: {
+                i32 a = 2;
+                i32 b = 5;
+                cjmp a < b ? block2 : block3;
+            }
+            block2: {
+                i32 c = 2;
+                i32 d = 5;
+                cjmp c < d ? block3 : block4;
+            }
+            block3: {
+                jmp block2;
+            }
+            block4: {
+                exit;
+            }
+        }
+        """
+        ir_module = irutils.read_module(io.StringIO(mod))
+        shape, rmap = relooper.reloop(ir_module['x'])
+        self.assertIsInstance(shape, relooper.BasicShape)
+        loop = shape.next
+        self.assertIsInstance(loop, relooper.LoopShape)
+        self.assertIsInstance(loop.body, relooper.MultipleShape)
+        self.assertEqual(
+            {'block2', 'block3'}, {rmap[e].name for e in loop.body.entries})
+        self.assertEqual(['block4'], [rmap[e].name for e in loop.next.entries])
+        self.assertTrue(all(b.label for b in shape.branches.values()))
+        f = io.StringIO()
+        relooper.print_shape(shape, file=f)
+        self.assertIn('multiple', f.getvalue())
+
+    def test_multiple_exits(self):
+        """ Break from a nested loop directly out of the outer loop """
+        mod = """module foo;
+        global procedure x() {
+            block1: {
+                jmp block2;
+            }
+            block2: {
+                jmp block3;
+            }
+            block3: {
+                i32 a = 2;
+                i32 b = 5;
+                cjmp a < b ? block4 : block6;
+            }
+            block4: {
+                i32 c = 2;
+                i32 d = 5;
+                cjmp c < d ? block3 : block5;
+            }
+            block5: {
+                jmp block2;
+            }
+            block6: {
+                exit;
+            }
+        }
+        """
+        ir_module = irutils.read_module(io.StringIO(mod))
+        shape, rmap = relooper.reloop(ir_module['x'])
+        outer = shape.next
+        self.assertIsInstance(outer, relooper.LoopShape)
+        self.assertEqual(
+            ['block6'], [rmap[e].name for e in outer.next.entries])
+        inner = outer.body.next
+        self.assertIsInstance(inner, relooper.LoopShape)
+        self.assertEqual(relooper.BREAK, inner.escapes[outer.next.content])
+
 
 if __name__ == '__main__':
     unittest.main()
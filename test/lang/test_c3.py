@@ -1,7 +1,11 @@
 import unittest
+import unittest.mock
 import logging
 import io
+import tempfile
+from ppci.build.cache import CompileCache
 from ppci.lang.c3 import C3Builder, Lexer, Parser, AstPrinter, Context
+from ppci.lang.c3.interface import make_interface
 from ppci.lang.c3 import astnodes
 from ppci.arch.example import ExampleArch
 from ppci.common import DiagnosticsManager, CompilerError
@@ -292,6 +296,88 @@ class ModuleTestCase(BuildTestCaseBase):
         self.expect_ok([src1, src2])
 
 
+class InterfaceTestCase(unittest.TestCase):
+    """ Test loading includes via their module interface """
+    include = """
+    module bsp;
+    type struct { int a, b; byte volatile* p; int[N * 2] c; } regs_t;
+    public type regs_t* handle_t;
+    const int N = 3 + cast<int>(2.5);
+    const double F = 0.1;
+    var handle_t h;
+    var int counter = 7;
+    function void hidden() { }
+    public function int add(int x, handle_t y) { return x + y->a; }
+    public function void put(byte c);
+    """
+
+    source = """
+    module main;
+    import bsp;
+    function int f()
+    {
+        bsp.counter = 3;
+        return bsp.add(1, bsp.h) + sizeof(bsp.handle_t);
+    }
+    """
+
+    def setUp(self):
+        self.diag = DiagnosticsManager()
+        self.arch = ExampleArch()
+
+    def test_interface(self):
+        interface = make_interface(
+            io.StringIO(self.include), self.diag, self.arch.info)
+        self.assertEqual(
+            "module bsp;\n"
+            "public type regs_t* handle_t;\n"
+            "type struct { int a; int b; byte volatile* p; int[(N * 2)] c; }"
+            " regs_t;\n"
+            "const double F = 0.1;\n"
+            "const int N = (3 + cast<int>(2.5));\n"
+            "var int counter;\n"
+            "var handle_t h;\n"
+            "public function int add(int x, handle_t y);\n"
+            "public function void put(byte c);\n",
+            interface)
+
+    def test_include_has_no_code(self):
+        builder = C3Builder(self.diag, self.arch.info)
+        _, ir_module = builder.build(
+            [io.StringIO(self.source)], [io.StringIO(self.include)])
+        verify_module(ir_module)
+        self.assertEqual(['main_f'], [f.name for f in ir_module.functions])
+        self.assertEqual([], ir_module.variables)
+        self.assertEqual(
+            ['bsp_add', 'bsp_counter', 'bsp_h', 'bsp_put'],
+            sorted(e.name for e in ir_module.externals))
+
+    def test_interface_cache(self):
+        cache = CompileCache(tempfile.mkdtemp())
+        for _ in range(2):
+            builder = C3Builder(
+                self.diag, self.arch.info, interface_cache=cache)
+            builder.build(
+                [io.StringIO(self.source)], [io.StringIO(self.include)])
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        builder.build(
+            [io.StringIO(self.source)],
+            [io.StringIO(self.include + "var int extra;")])
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+    def test_broken_interface_cache(self):
+        """ Cache errors are logged, and the interface is made anyway """
+        cache = unittest.mock.Mock()
+        cache.get_text.side_effect = OSError(5, 'I/O error')
+        cache.put_text.side_effect = OSError(28, 'No space left')
+        builder = C3Builder(self.diag, self.arch.info, interface_cache=cache)
+        with self.assertLogs('cache', level='WARNING'):
+            _, ir_module = builder.build(
+                [io.StringIO(self.source)], [io.StringIO(self.include)])
+        self.assertEqual(['main_f'], [f.name for f in ir_module.functions])
+        self.assertEqual(1, cache.put_text.call_count)
+
+
 class ConstantTestCase(BuildTestCaseBase):
     """ Testcase for constants """
     def test_constant(self):
@@ -2,7 +2,7 @@ import unittest
 from unittest.mock import Mock
 import io
 from ppci import api, irutils
-from ppci.lang.python import load_py, python_to_ir
+from ppci.lang.python import load_py, python_to_ir, ir_to_python
 from ppci.utils.reporting import html_reporter
 
 
@@ -138,5 +138,65 @@ class PythonToIrCompilerTestCase(unittest.TestCase):
         self.do(src7)
 
 
+class IrToPythonTestCase(unittest.TestCase):
+    """ Check the generation of python code from ir """
+    def test_irreducible_loop(self):
+        """ Control flow which is not structured becomes while and if """
+        mod = """module foo;
+        global function i32 collatz(i32 n) {
+            start: {
+                i32 zero = 0;
+                i32 one = 1;
+                i32 two = 2;
+                i32 three = 3;
+                i32 odd = n % two;
+                cjmp odd == one ? block_odd : block_loop;
+            }
+            block_loop: {
+                i32 x = phi start: n, block_even: half, block_count: y;
+                i32 steps = phi start: zero, block_even: steps2,
+                                block_count: steps3;
+                cjmp x == one ? block_done : block_test;
+            }
+            block_test: {
+                i32 parity = x % two;
+                cjmp parity == zero ? block_even : block_odd;
+            }
+            block_even: {
+                i32 half = x / two;
+                i32 steps2 = steps + one;
+                jmp block_loop;
+            }
+            block_odd: {
+                i32 x2 = phi start: n, block_test: x;
+                i32 steps4 = phi start: zero, block_test: steps;
+                i32 tripple = x2 * three;
+                i32 y = tripple + one;
+                jmp block_count;
+            }
+            block_count: {
+                i32 steps3 = steps4 + one;
+                jmp block_loop;
+            }
+            block_done: {
+                return steps;
+            }
+        }
+        """
+        ir_module = irutils.read_module(io.StringIO(mod))
+        irutils.verify_module(ir_module)
+        f = io.StringIO()
+        ir_to_python([ir_module], f)
+        source = f.getvalue()
+        self.assertNotIn('_irpy_current_block', source)
+        namespace = {}
+        exec(source, namespace)
+        collatz = namespace['collatz']
+        self.assertEqual(1, collatz(2))
+        self.assertEqual(7, collatz(3))
+        self.assertEqual(8, collatz(6))
+        self.assertEqual(111, collatz(27))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 import io
+import tempfile
 
 from ppci.lang.tools.grammar import Grammar, print_grammar
 from ppci.lang.tools.common import ParserGenerationException
@@ -10,7 +11,8 @@ from ppci.lang.tools.yacc import load_as_module, transform
 from ppci.lang.tools.lr import calculate_first_sets
 from ppci.common import CompilerError
 from ppci.lang.common import Token, SourceLocation
-from ppci.lang.tools.lr import LrParserBuilder
+from ppci.lang.tools.lr import LrParserBuilder, LrTable
+from ppci.build.cache import CompileCache
 from ppci.lang.tools.earley import EarleyParser
 from ppci.lang.tools.baselex import EOF
 
@@ -162,6 +164,51 @@ class LrParserBuilderTestCase(unittest.TestCase):
         tokens = gen_tokens([])
         p.parse(tokens)
 
+    def test_recursive_start(self):
+        """ Only the outer most start symbol accepts the input """
+        g = Grammar()
+        g.add_terminals(['a', 'b'])
+        g.add_production('s', ['a', 's'], lambda a, s: 'a' + s)
+        g.add_production('s', ['b'], lambda b: 'b')
+        g.start_symbol = 's'
+        p = LrParserBuilder(g).generate_parser()
+        self.assertEqual('aab', p.parse(gen_tokens(['a', 'a', 'b'])))
+
+    def test_cache(self):
+        """ Test that the tables are cached by the grammar """
+        def make_grammar(terminal):
+            g = Grammar()
+            g.add_terminals(['a', terminal])
+            g.add_production('goal', ['a', terminal])
+            return g
+        cache = CompileCache(tempfile.mkdtemp())
+        table1 = LrParserBuilder(make_grammar('b')).generate_table(cache)
+        table2 = LrParserBuilder(make_grammar('b')).generate_table(cache)
+        LrParserBuilder(make_grammar('c')).generate_table(cache)
+        self.assertEqual(table1.serialize(), table2.serialize())
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+    def test_broken_cache(self):
+        """ Cache errors are logged, and the tables generated anyway """
+        g = Grammar()
+        g.add_terminals(['a'])
+        g.add_production('goal', ['a'])
+        cache = Mock()
+        cache.get_text.return_value = None
+        cache.put_text.side_effect = OSError(28, 'No space left')
+        with self.assertLogs(level='WARNING'):
+            table = LrParserBuilder(g).generate_table(cache)
+        cache.get_text.side_effect = OSError(5, 'I/O error')
+        with self.assertLogs(level='WARNING'):
+            table2 = LrParserBuilder(g).generate_table(cache)
+        self.assertEqual(table.serialize(), table2.serialize())
+
+        # Without sources there is no key:
+        with patch('inspect.getsource', side_effect=OSError):
+            with self.assertLogs(level='WARNING'):
+                LrParserBuilder(g).generate_table(CompileCache(
+                    tempfile.mkdtemp()))
+
     def test_cb(self):
         """ Test callback of one rule and order or parameters """
         self.cb_called = False
@@ -242,6 +289,22 @@ class ExpressionGrammarTestCase(unittest.TestCase):
         # Must result in 12 sets:
         self.assertEqual(len(s), 24)
 
+    def test_lr0_states(self):
+        pb = LrParserBuilder(self.g)
+        states, transitions = pb.gen_lr0_states()
+        self.assertEqual(len(states), 13)
+
+    def test_table(self):
+        """ Test the compact tables against the action and goto tables """
+        pb = LrParserBuilder(self.g)
+        action_table, goto_table = pb.generate_tables()
+        table = LrTable.from_tables(self.g, action_table, goto_table)
+        self.assertEqual(
+            (action_table, goto_table), table.to_tables(self.g))
+        table = LrTable.deserialize(table.serialize())
+        self.assertEqual(
+            (action_table, goto_table), table.to_tables(self.g))
+
 
 class ParserGeneratorTestCase(unittest.TestCase):
     """ Tests several parts of the parser generator """
@@ -307,8 +370,9 @@ class ParserGeneratorTestCase(unittest.TestCase):
         tokens = ['(', '(', ')', ')', '(', ')']
         # 3. build parser:
         p = LrParserBuilder(self.g).generate_parser()
-        self.assertEqual(len(p.goto_table), 5)
-        self.assertEqual(len(p.action_table), 19)
+        # The LALR states, the LR(1) states after '(' are merged:
+        self.assertEqual(len(p.goto_table), 4)
+        self.assertEqual(len(p.action_table), 16)
 
         # 4. feed input:
         p.parse(gen_tokens(tokens))
@@ -363,6 +427,30 @@ class EarleyParserTestCase(unittest.TestCase):
         result = parser.parse(gen_tokens(['mov', ('num', 1), '+', ('num', 1)]))
         self.assertEqual(3, result)
 
+    def test_recursive_start(self):
+        """ Only the outer most start symbol accepts the input """
+        g = Grammar()
+        g.add_terminals(['a', 'b'])
+        g.add_production('s', ['a', 's'], lambda a, s: 'a' + s)
+        g.add_production('s', ['b'], lambda b: 'b')
+        g.start_symbol = 's'
+        p = LrParserBuilder(g).generate_parser()
+        self.assertEqual('aab', p.parse(gen_tokens(['a', 'a', 'b'])))
+
+    def test_cache(self):
+        """ Test that the tables are cached by the grammar """
+        def make_grammar(terminal):
+            g = Grammar()
+            g.add_terminals(['a', terminal])
+            g.add_production('goal', ['a', terminal])
+            return g
+        cache = CompileCache(tempfile.mkdtemp())
+        table1 = LrParserBuilder(make_grammar('b')).generate_table(cache)
+        table2 = LrParserBuilder(make_grammar('b')).generate_table(cache)
+        LrParserBuilder(make_grammar('c')).generate_table(cache)
+        self.assertEqual(table1.serialize(), table2.serialize())
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
     def test_cb(self):
         """ Test callback of one rule and order or parameters """
         self.cb_called = False
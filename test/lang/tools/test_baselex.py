@@ -0,0 +1,127 @@
+import re
+import unittest
+from ppci.common import CompilerError
+from ppci.lang.tools.baselex import BaseLexer, SimpleLexer, on
+from ppci.lang.tools.baselex import GLYPH, KEYWORD, TEXT
+
+
+class BaseLexerTestCase(unittest.TestCase):
+    """ Test the base lexer """
+
+    def make_lexer(self, extra_spec=()):
+        tok_spec = [
+            ("IF", r"if", lambda typ, val: (typ, val)),
+            ("ID", r"[a-z]+", lambda typ, val: (typ, val)),
+            ("NUMBER", r"\d+", lambda typ, val: (typ, int(val))),
+            ("NEWLINE", r"\n", lambda typ, val: lexer.newline()),
+            ("SKIP", r" ", None),
+        ]
+        lexer = BaseLexer(tok_spec + list(extra_spec))
+        return lexer
+
+    def lex(self, lexer, text):
+        return [
+            (t.typ, t.val, t.loc.row, t.loc.col)
+            for t in lexer.tokenize(text)
+        ]
+
+    def test_longest_match(self):
+        """ The longest match wins, then the first token """
+        lexer = self.make_lexer()
+        self.assertIsNot(lexer.make_scanner(), lexer.scan_re)
+        tokens = self.lex(lexer, "if iffy\n 12")
+        self.assertEqual(
+            [
+                ("IF", "if", 1, 0),
+                ("ID", "iffy", 1, 3),
+                ("NUMBER", 12, 2, 2),
+            ],
+            tokens,
+        )
+
+    def test_re_fallback(self):
+        """ Non-greedy patterns are handled by the re module """
+        lexer = self.make_lexer([("STRING", r"'.*?'", lambda t, v: (t, v))])
+        self.assertEqual(lexer.make_scanner(), lexer.scan_re)
+        tokens = self.lex(lexer, "'a' 'b'")
+        self.assertEqual(
+            [("STRING", "'a'", 1, 0), ("STRING", "'b'", 1, 4)], tokens
+        )
+
+    def test_unexpected_char(self):
+        lexer = self.make_lexer()
+        with self.assertRaises(CompilerError) as cm:
+            list(lexer.tokenize("ab\n +"))
+        self.assertEqual(2, cm.exception.loc.row)
+
+    def test_actions(self):
+        """ Tokens can be created without calling a function """
+        lexer = BaseLexer(
+            [
+                ("ID", r"[a-z]+", KEYWORD),
+                ("NUMBER", r"\d+", TEXT),
+                ("GLYPH", r"[+=]", GLYPH),
+                ("SKIP", r" ", None),
+            ],
+            keywords=["if"],
+        )
+        lexer.add_keyword("then")
+        tokens = self.lex(lexer, "if a = 12 then b")
+        self.assertEqual(
+            [
+                ("if", "if", 1, 0),
+                ("ID", "a", 1, 3),
+                ("=", "=", 1, 5),
+                ("NUMBER", "12", 1, 7),
+                ("then", "then", 1, 10),
+                ("ID", "b", 1, 15),
+            ],
+            tokens,
+        )
+
+    def test_tokenize_all(self):
+        lexer = self.make_lexer()
+        tokens = lexer.tokenize_all("a 1", eof=True)
+        self.assertEqual(["ID", "NUMBER", "EOF"], [t.typ for t in tokens])
+
+
+class SimpleLexerTestCase(unittest.TestCase):
+    """ Test the lexer with decorated handler functions """
+
+    class MyLexer(SimpleLexer):
+        def __init__(self):
+            self.filename = None
+
+        @on(r"[ \n]+")
+        def handle_skip(self, val):
+            pass
+
+        @on(r"[a-z]+")
+        def handle_id(self, val):
+            return "ID", val
+
+        @on(r"(\d)+")
+        def handle_number(self, val):
+            return "NUMBER", int(val)
+
+        @on(r"\{.*?\}", flags=re.DOTALL, order=-1)
+        def handle_comment(self, val):
+            pass
+
+        @on(r"\d+\.\d+", order=-2)
+        def handle_float(self, val):
+            return "FLOAT", float(val)
+
+    def test_combined_pattern(self):
+        """ All patterns are tried at once, in the given order """
+        lexer = self.MyLexer()
+        self.assertIsNotNone(lexer.lexprog)
+        tokens = lexer.tokenize_all("a {x\n} 1.5 23", eof=True)
+        self.assertEqual(
+            [("ID", "a"), ("FLOAT", 1.5), ("NUMBER", 23), ("EOF", "EOF")],
+            [(t.typ, t.val) for t in tokens],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
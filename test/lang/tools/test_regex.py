@@ -1,5 +1,9 @@
+import io
+import json
 import unittest
+import unittest.mock
 from ppci.lang.tools import regex
+from ppci.lang.tools.regex import scanner
 
 
 class RegexTestCase(unittest.TestCase):
@@ -43,6 +47,40 @@ class RegexParsingTestCase(unittest.TestCase):
         expr = regex.parse(re_txt)
         self.assertEqual(expr, regex.Symbol("a").optional() + regex.Symbol("b"))
 
+    def test_parse_concatenation_in_group(self):
+        expr = regex.parse("(ab|c)d")
+        ab = regex.Symbol("a") + regex.Symbol("b")
+        self.assertEqual(expr, (ab | regex.Symbol("c")) + regex.Symbol("d"))
+
+    def test_parse_complement(self):
+        expr = regex.parse("[^a-y]")
+        self.assertEqual(expr.derivative("z"), regex.EPSILON)
+        self.assertEqual(expr.derivative("b"), regex.NULL)
+        self.assertEqual(expr.derivative(0x6C34), regex.EPSILON)
+
+    def test_parse_escapes(self):
+        self.assertEqual(regex.parse(r"\n"), regex.Symbol("\n"))
+        self.assertEqual(
+            regex.parse(r"[\-\]]"), regex.SymbolSet(map(ord, "-]"))
+        )
+        digit = regex.parse(r"\d")
+        self.assertEqual(digit.derivative("7"), regex.EPSILON)
+        self.assertEqual(digit.derivative("a"), regex.NULL)
+        not_space = regex.parse(r"[\S]")
+        self.assertEqual(not_space.derivative(" "), regex.NULL)
+
+    def test_parse_repetition(self):
+        a = regex.Symbol("a")
+        self.assertEqual(regex.parse("a{2}"), a + a)
+        self.assertEqual(regex.parse("a{1,2}"), a + (a | regex.EPSILON))
+        self.assertEqual(regex.parse("a{1,}"), a + a.kleene())
+        self.assertEqual(regex.parse("{}"), regex.parse(r"\{\}"))
+
+    def test_parse_unsupported(self):
+        for re_txt in ["a*?", "^a", "*", r"\b", "(?P<a>b)"]:
+            with self.assertRaises(ValueError):
+                regex.parse(re_txt)
+
 
 class RegexCompilationTestCase(unittest.TestCase):
     def test_compile(self):
@@ -101,6 +139,79 @@ class RegexCompilationTestCase(unittest.TestCase):
             ],
         )
 
+    def test_minimize(self):
+        prog = regex.compile("x(ab)*|xa(ba)*b")
+        self.assertEqual(5, len(prog[0]))
+        prog = regex.minimize(prog)
+        transitions, accepts, error = prog
+        # Start, accept after x and b, error state and after a:
+        self.assertEqual(4, len(transitions))
+        self.assertEqual([False, True, False, False], accepts)
+        self.assertEqual(2, error)
+        res = list(regex.scan(prog, "xababxxab"))
+        self.assertEqual(res, ["xabab", "x", "xab"])
+
+    def test_python_scanner(self):
+        scan = regex.get_scanner(["if", "[a-z]+", "[0-9]+", " "])
+        text = "if iffy 12"
+        self.assertEqual(
+            [
+                (0, 0, 2),
+                (3, 2, 3),
+                (1, 3, 7),
+                (3, 7, 8),
+                (2, 8, 10),
+            ],
+            list(scan(text)),
+        )
+        self.assertEqual([(1, 0, 1)], list(scan("a?")))
+        self.assertEqual([], list(scan("\u6c34")))
+
+    @unittest.mock.patch.dict(scanner._scanners, clear=True)
+    def test_scanner_cache(self):
+        """ The cache holds the scanner tables as data, not as code """
+        patterns = ["[a-z]+", " "]
+        cache = unittest.mock.Mock()
+        cache.get_text.return_value = None
+        scan = regex.get_scanner(patterns, cache=cache)
+        key, text = cache.put_text.call_args[0]
+        self.assertEqual(
+            {"starts", "classes", "table", "accepts", "num_classes"},
+            set(json.loads(text)))
+
+        # The tables are loaded from the cache:
+        scanner._scanners.clear()
+        cache.get_text.return_value = text
+        scan2 = regex.get_scanner(patterns, cache=cache)
+        cache.get_text.assert_called_with(key)
+        self.assertEqual(list(scan("ab c")), list(scan2("ab c")))
+
+    @unittest.mock.patch.dict(scanner._scanners, clear=True)
+    def test_broken_scanner_cache(self):
+        """ Bad cache entries and cache errors do not break scanning """
+        patterns = ["[0-9]+", " "]
+        expected = [(0, 0, 2), (1, 2, 3), (0, 3, 4)]
+        cache = unittest.mock.Mock()
+        for text in ['raise Exception("executed")', '{"table": [1]}']:
+            scanner._scanners.clear()
+            cache.get_text.return_value = text
+            scan = regex.get_scanner(patterns, cache=cache)
+            self.assertEqual(expected, list(scan("12 3")))
+
+        scanner._scanners.clear()
+        cache.get_text.side_effect = OSError(5, 'I/O error')
+        with self.assertLogs('cache', level='WARNING'):
+            scan = regex.get_scanner(patterns, cache=cache)
+        self.assertEqual(expected, list(scan("12 3")))
+
+    def test_generate_python(self):
+        f = io.StringIO()
+        regex.generate_python(regex.compile("ab*"), f)
+        module = {}
+        exec(f.getvalue(), module)
+        res = list(module["scan"]("abbaab"))
+        self.assertEqual(res, [(True, 0, 3), (True, 3, 4), (True, 4, 6)])
+
     def test_examples(self):
         for pattern, text, is_found in re_cases:
             print('Test pattern', pattern, 'with text', text)
@@ -75,7 +75,9 @@ def build_sample_to_ir(src, lang, bsp_c3, march, reporter):
     return ir_modules
 
 
-def build_sample_to_code(src, lang, bsp_c3, opt_level, march, debug, reporter):
+def build_sample_to_code(
+    src, lang, bsp_c3, opt_level, march, debug, reporter, lto=False
+):
     """ Turn example sample into code objects. """
     if lang == "c3":
         srcs = [relpath("..", "librt", "io.c3"), bsp_c3, io.StringIO(src)]
@@ -86,6 +88,7 @@ def build_sample_to_code(src, lang, bsp_c3, opt_level, march, debug, reporter):
             opt_level=opt_level,
             reporter=reporter,
             debug=debug,
+            lto=lto,
         )
         objs = [o2]
     elif lang == "bf":
@@ -93,14 +96,19 @@ def build_sample_to_code(src, lang, bsp_c3, opt_level, march, debug, reporter):
         o2 = api.c3c([bsp_c3], [], march, reporter=reporter)
         objs = [o2, o3]
     elif lang == "c":
-        o2 = api.c3c([bsp_c3], [], march, reporter=reporter)
+        o2 = api.c3c([bsp_c3], [], march, reporter=reporter, lto=lto)
         coptions = COptions()
         libc_path = relpath("..", "librt", "libc")
         include_path1 = os.path.join(libc_path, "include")
         coptions.add_include_path(include_path1)
         with open(relpath("..", "librt", "libc", "lib.c"), "r") as f:
             o3 = api.cc(
-                f, march, coptions=coptions, debug=debug, reporter=reporter
+                f,
+                march,
+                coptions=coptions,
+                debug=debug,
+                reporter=reporter,
+                lto=lto,
             )
         o4 = api.cc(
             io.StringIO(src),
@@ -108,6 +116,7 @@ def build_sample_to_code(src, lang, bsp_c3, opt_level, march, debug, reporter):
             coptions=coptions,
             debug=debug,
             reporter=reporter,
+            lto=lto,
         )
         objs = [o2, o3, o4]
     elif lang == "pas":
@@ -148,18 +157,24 @@ def build(
     bin_format=None,
     elf_format=None,
     code_image="code",
+    lto=False,
 ):
     """ Construct object file from source snippet """
     list_filename = base_filename + ".html"
 
     with html_reporter(list_filename) as reporter:
         objs = build_sample_to_code(
-            src, lang, bsp_c3, opt_level, march, True, reporter
+            src, lang, bsp_c3, opt_level, march, True, reporter, lto=lto
         )
         o1 = api.asm(crt0_asm, march)
         objs.append(o1)
         obj = api.link(
-            objs, layout=mmap, use_runtime=True, reporter=reporter, debug=True
+            objs,
+            layout=mmap,
+            use_runtime=True,
+            reporter=reporter,
+            debug=True,
+            lto=lto,
         )
 
     # Save object:
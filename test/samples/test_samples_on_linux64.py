@@ -16,6 +16,7 @@ from ppci.api import asm, link, objcopy
 class TestSamplesOnX86Linux(unittest.TestCase):
     opt_level = 0
     march = "x86_64"
+    lto = False
 
     def do(self, src, expected_output, lang="c3"):
         bsp_c3 = io.StringIO(BSP_C3_SRC)
@@ -30,6 +31,7 @@ class TestSamplesOnX86Linux(unittest.TestCase):
             io.StringIO(ARCH_MMAP),
             lang=lang,
             bin_format="elf",
+            lto=self.lto,
         )
 
         exe = base_filename + ".elf"
@@ -47,6 +49,11 @@ class TestSamplesOnX86LinuxO2(TestSamplesOnX86Linux):
     opt_level = 2
 
 
+class TestSamplesOnX86LinuxLto(TestSamplesOnX86Linux):
+    opt_level = 2
+    lto = True
+
+
 STARTERCODE = """
 global bsp_exit
 global bsp_syscall
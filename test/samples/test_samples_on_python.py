@@ -8,6 +8,7 @@ from helper_util import do_long_tests, make_filename
 from ppci import api
 from ppci.utils.reporting import html_reporter
 from ppci.irutils import print_module, read_module, to_json, from_json
+from ppci.irutils import to_binary, from_binary
 from ppci.irutils import verify_module
 
 
@@ -81,6 +82,14 @@ def serialization_roundtrip(ir_module):
     txt2 = f.getvalue()
     assert txt1 == txt2
 
+    # Round trip via binary format:
+    ir_module4 = from_binary(to_binary(ir_module))
+
+    f = io.StringIO()
+    print_module(ir_module4, file=f)
+    txt4 = f.getvalue()
+    assert txt1 == txt4
+
     # Round trip via textual representation:
     f = io.StringIO(txt1)
     ir_module3 = read_module(f)
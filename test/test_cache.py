@@ -0,0 +1,178 @@
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from ppci.api import c3c, cc, get_arch
+from ppci.binutils.objectfile import ObjectFile
+from ppci.build.cache import CompileCache, get_cached_runtime
+from ppci.build.cache import get_runtime_cache, runtime_cache_key
+from ppci.lang.c import COptions
+
+
+class CompileCacheTestCase(unittest.TestCase):
+    """ Test the persistent object file cache """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = CompileCache(self.directory)
+
+    def make_object(self, size):
+        obj = ObjectFile(get_arch('arm'))
+        obj.get_section('code', create=True).add_data(bytes(range(size)))
+        return obj
+
+    def test_miss_and_hit(self):
+        key = CompileCache.make_key('a')
+        self.assertIsNone(self.cache.get(key))
+        obj = self.make_object(10)
+        self.cache.put(key, obj)
+        self.assertEqual(obj, self.cache.get(key))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+        self.assertGreater(self.cache.bytes_saved, 0)
+
+    def test_text(self):
+        key = CompileCache.make_key('b')
+        self.assertIsNone(self.cache.get_text(key))
+        self.cache.put_text(key, 'module a;')
+        self.assertEqual('module a;', self.cache.get_text(key))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_key_parts_do_not_blend(self):
+        self.assertNotEqual(
+            CompileCache.make_key('ab', 'c'),
+            CompileCache.make_key('a', 'bc'))
+
+    def test_persistent_index(self):
+        key = CompileCache.make_key('a')
+        self.cache.put(key, self.make_object(10))
+        self.cache.get(key)
+        cache2 = CompileCache(self.directory)
+        self.assertIn(key, cache2)
+        self.assertEqual(1, cache2.hits)
+        self.assertIsNotNone(cache2.get(key))
+        self.assertIn('hits', cache2.report())
+
+    def test_lru_eviction(self):
+        keys = [CompileCache.make_key(str(i)) for i in range(3)]
+        self.cache.put(keys[0], self.make_object(200))
+        size = self.cache.size
+        self.cache.max_size = 2 * size + size // 2
+        self.cache.put(keys[1], self.make_object(200))
+        self.cache.get(keys[0])  # Key 1 is now least recently used
+        self.cache.put(keys[2], self.make_object(200))
+        self.assertIn(keys[0], self.cache)
+        self.assertNotIn(keys[1], self.cache)
+        self.assertIn(keys[2], self.cache)
+        files = [f for _, _, fs in os.walk(self.directory) for f in fs]
+        self.assertEqual(3, len(files))  # Including the statistics
+
+    def test_shared_directory(self):
+        """ Caches on the same directory do not lose each other's work """
+        cache2 = CompileCache(self.directory)
+        keys = [CompileCache.make_key(str(i)) for i in range(2)]
+        self.cache.put(keys[0], self.make_object(10))
+        cache2.put(keys[1], self.make_object(20))
+        self.cache.get(keys[1])
+        cache2.get(keys[0])
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(2, CompileCache(self.directory).hits)
+
+    def test_unwritable_cache(self):
+        """ Errors while writing into the cache are not fatal """
+        key = CompileCache.make_key('a')
+        self.cache.put(key, self.make_object(10))
+        error = OSError(28, 'No space left on device')
+        with unittest.mock.patch.object(
+                CompileCache, '_write_file', side_effect=error):
+            self.assertIsNotNone(self.cache.get(key))
+            self.cache.put(CompileCache.make_key('b'), self.make_object(10))
+        self.assertEqual(1, self.cache.hits)
+
+        # The statistics are written later on:
+        self.assertIsNone(self.cache.get(CompileCache.make_key('b')))
+        cache2 = CompileCache(self.directory)
+        self.assertEqual((1, 1), (cache2.hits, cache2.misses))
+
+    def test_broken_entry(self):
+        key = CompileCache.make_key('a')
+        self.cache.put(key, self.make_object(10))
+        with open(self.cache._object_path(key), 'wb') as f:
+            f.write(b'garbage')
+        self.assertIsNone(self.cache.get(key))
+        self.assertNotIn(key, self.cache)
+
+    def test_c3c(self):
+        src = 'module main; var int a;'
+        obj1 = c3c([io.StringIO(src)], [], 'arm', cache=self.cache)
+        obj2 = c3c([io.StringIO(src)], [], 'arm', cache=self.cache)
+        obj3 = c3c(
+            [io.StringIO(src)], [], 'arm', opt_level=2, cache=self.cache)
+        self.assertEqual(obj1, obj2)
+        self.assertEqual(obj1, obj3)
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(2, self.cache.misses)
+
+    def test_cc_uses_preprocessed_source(self):
+        """ Changing a header invalidates, changing a comment does not """
+        include_dir = tempfile.mkdtemp()
+        header = os.path.join(include_dir, 'value.h')
+        coptions = COptions()
+        coptions.add_include_path(include_dir)
+
+        def compile(src, value):
+            with open(header, 'w') as f:
+                f.write('#define VALUE {}\n'.format(value))
+            return cc(
+                io.StringIO(src), 'arm', coptions=coptions,
+                cache=self.cache)
+
+        src = '#include <value.h>\nint f() { return VALUE; }\n'
+        compile(src, 1)
+        compile(src.replace('}', '} // hi'), 1)
+        self.assertEqual(1, self.cache.hits)
+        compile(src, 2)
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(2, self.cache.misses)
+
+
+class RuntimeCacheTestCase(unittest.TestCase):
+    """ Test the cache for the compiler runtime objects """
+    def setUp(self):
+        self.cache = get_runtime_cache(tempfile.mkdtemp())
+
+    def test_runtime_is_compiled_once(self):
+        march = get_arch('msp430')
+        obj1 = get_cached_runtime(march, cache=self.cache)
+        obj2 = get_cached_runtime(march, cache=self.cache)
+        self.assertEqual(obj1, obj2)
+        self.assertIs(march, obj2.arch)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_key_depends_on_options(self):
+        self.assertNotEqual(
+            runtime_cache_key(get_arch('arm')),
+            runtime_cache_key(get_arch('arm:thumb')))
+
+    def test_key_depends_on_package(self):
+        key = runtime_cache_key(get_arch('arm'))
+        with unittest.mock.patch(
+                'ppci.build.cache.package_digest', return_value='changed'):
+            self.assertNotEqual(key, runtime_cache_key(get_arch('arm')))
+
+    def test_unreadable_package(self):
+        """ Without a key the runtime is compiled without cache """
+        with unittest.mock.patch(
+                'ppci.build.cache.package_digest', side_effect=OSError(13)):
+            obj = get_cached_runtime(get_arch('msp430'), cache=self.cache)
+        self.assertTrue(obj.byte_size)
+        self.assertEqual(0, len(self.cache))
+
+    def test_disabled_cache(self):
+        with unittest.mock.patch.dict(os.environ, {'PPCI_CACHE_DIR': ''}):
+            self.assertIsNone(get_runtime_cache())
+
+
+if __name__ == '__main__':
+    unittest.main()
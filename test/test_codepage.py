@@ -5,7 +5,7 @@ import ctypes
 from helper_util import make_filename
 from ppci.api import cc, get_current_arch, is_platform_supported
 from ppci.utils.codepage import load_code_as_module
-from ppci.utils.codepage import load_obj
+from ppci.utils.codepage import load_obj, get_code_image
 from ppci.utils.reporting import html_reporter
 
 
@@ -77,6 +77,59 @@ class CodePageTestCase(unittest.TestCase):
         y = m.x(101)
         self.assertEqual(117, y)
 
+    def test_reload(self):
+        """ Loading an object twice links it only once """
+        source = io.StringIO("""
+            int add(int x, int y);
+            int counter = 3;
+            int twice(int a) {
+                return a + a;
+            }
+            int x(int a) {
+                counter += 1;
+                return add(twice(a), counter);
+            }
+            """)
+        arch = get_current_arch()
+        obj = cc(source, arch, debug=True)
+        def my_add(x: int, y: int) -> int:
+            return x + y
+        def my_sub(x: int, y: int) -> int:
+            return x - y
+        m1 = load_obj(obj, imports={'add': my_add})
+        m2 = load_obj(obj, imports={'add': my_sub})
+        image = get_code_image(obj, ('add',))
+        self.assertIs(image, m1._image)
+        self.assertIs(image, m2._image)
+        # Relative jumps and calls within the code need no relocation:
+        self.assertLess(len(image.relocations), len(image.obj.relocations))
+        self.assertEqual(24, m1.x(10))
+        self.assertEqual(25, m1.x(10))
+        # The second module has its own data:
+        self.assertEqual(16, m2.x(10))
+        self.assertEqual(
+            5, int.from_bytes(m1.read_data('counter', 4), 'little'))
+        self.assertNotEqual(
+            m1.get_symbol_address('x'), m2.get_symbol_address('x'))
+
+    def test_modified_object(self):
+        """ A modified object is linked again when it is loaded """
+        source = io.StringIO("""
+            int counter = 3;
+            int get(void) { return counter; }
+            """)
+        obj = cc(source, get_current_arch(), debug=True)
+        m1 = load_obj(obj)
+        self.assertEqual(3, m1.get())
+        image = get_code_image(obj, ())
+        data = obj.get_section('data')
+        offset = obj.get_symbol('counter').value
+        data.data[offset:offset + 4] = (7).to_bytes(4, 'little')
+        self.assertIsNot(image, get_code_image(obj, ()))
+        m2 = load_obj(obj)
+        self.assertEqual(7, m2.get())
+        self.assertEqual(3, m1.get())
+
     def test_jit_example(self):
         """ Test loading of C code from jit example """
         source = io.StringIO("""
@@ -13,6 +13,8 @@ from ppci.cli.cc import cc
 from ppci.cli.hexdump import hexdump
 from ppci.cli.java import java
 from ppci.cli.link import link
+from ppci.cli.llc import llc
+from ppci.cli.mkruntime import mkruntime
 from ppci.cli.objdump import objdump
 from ppci.cli.objcopy import objcopy
 from ppci.cli.ocaml import ocaml
@@ -22,6 +24,7 @@ from ppci.cli.yacc import yacc
 from ppci import api
 from ppci.common import DiagnosticsManager, SourceLocation
 from ppci.binutils.objectfile import ObjectFile, Section, Image
+from ppci.build.cache import CompileCache
 from helper_util import relpath, do_long_tests
 
 
@@ -121,6 +124,20 @@ class CcTestCase(unittest.TestCase):
         oj_file = new_temp_file('.oj')
         cc(['-m', 'arm', '--ir', self.c_file, '-o', oj_file])
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_cc_command_cache(self, mock_stdout, mock_stderr):
+        """ Second compilation is served from the object cache """
+        cache_dir = tempfile.mkdtemp()
+        oj_file1 = new_temp_file('.oj')
+        oj_file2 = new_temp_file('.oj')
+        cc(['-m', 'arm', '--cache', cache_dir, self.c_file, '-o', oj_file1])
+        cc(['-m', 'arm', '--cache', cache_dir, self.c_file, '-o', oj_file2])
+        with open(oj_file1) as f1, open(oj_file2) as f2:
+            self.assertEqual(f1.read(), f2.read())
+        cache = CompileCache(cache_dir)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
     @patch('sys.stdout', new_callable=io.StringIO)
     def test_cc_command_help(self, mock_stdout):
         with self.assertRaises(SystemExit) as cm:
@@ -226,6 +243,22 @@ class OptimizeCommandTestCase(unittest.TestCase):
         out = new_temp_file('.ir')
         opt([in_file, out])
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_binary_ir(self, mock_stdout, mock_stderr):
+        """ Pass binary ir-code from cc via opt to llc """
+        c_file = relpath('..', 'examples', 'c', 'hello', 'std.c')
+        ir_file = new_temp_file('.irb')
+        opt_file = new_temp_file('.irb')
+        oj_file = new_temp_file('.oj')
+        cc(['-m', 'arm', '--ir-binary', c_file, '-o', ir_file])
+        opt(['--binary', ir_file, opt_file])
+        llc(['-m', 'arm', opt_file, '-o', oj_file])
+        with open(opt_file, 'rb') as f:
+            data = f.read()
+        obj = api.llc(data, 'arm')
+        self.assertIn('printf', obj.symbol_map)
+
 
 @unittest.skipUnless(do_long_tests('any'), 'skipping slow tests')
 class LinkCommandTestCase(unittest.TestCase):
@@ -255,6 +288,54 @@ class LinkCommandTestCase(unittest.TestCase):
         link(
             ['-o', obj3, '-L', mmap, obj1, obj2])
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_link_time_optimization(self, mock_stdout, mock_stderr):
+        """ Compile c3 modules separately and optimize them together """
+        asm_src = relpath('..', 'examples', 'lm3s6965evb', 'startup.asm')
+        mmap = relpath('..', 'examples', 'lm3s6965evb', 'memlayout.mmap')
+        c3_srcs = [
+            relpath('..', 'examples', 'src', 'snake', 'main.c3'),
+            relpath('..', 'examples', 'src', 'snake', 'game.c3'),
+            relpath('..', 'librt', 'io.c3'),
+            relpath('..', 'examples', 'lm3s6965evb', 'bsp.c3'),
+            ]
+        obj_files = [new_temp_file('.obj')]
+        asm(['-m', 'arm', '--mtune', 'thumb', '-o', obj_files[0], asm_src])
+        for c3_src in c3_srcs:
+            obj_files.append(new_temp_file('.obj'))
+            includes = []
+            for include in c3_srcs:
+                if include != c3_src:
+                    includes.extend(['-i', include])
+            c3c(
+                ['-m', 'arm', '--mtune', 'thumb', '-O', '2', '--lto',
+                 '-o', obj_files[-1], c3_src] + includes)
+        obj_file = new_temp_file('.obj')
+        link(['-o', obj_file, '--lto', '-r'] + obj_files[1:])
+        with open(obj_file) as f:
+            obj = ObjectFile.load(f)
+        self.assertIsNotNone(obj.ir)
+        self.assertTrue(obj.has_symbol('main_main'))
+        lto_obj = api.link([obj_files[0], obj], layout=mmap, lto=True)
+        plain_obj = api.link(obj_files, layout=mmap)
+        self.assertLess(
+            lto_obj.get_image('flash').size,
+            plain_obj.get_image('flash').size)
+
+
+class MkruntimeTestCase(unittest.TestCase):
+    """ Test the compiler runtime prebuild command """
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_prebuild(self, mock_stdout, mock_stderr):
+        cache_dir = tempfile.mkdtemp()
+        mkruntime(['--cache-dir', cache_dir, 'msp430', 'riscv:rvc'])
+        mkruntime(['--cache-dir', cache_dir, 'msp430'])
+        cache = CompileCache(os.path.join(cache_dir, 'runtime'))
+        self.assertEqual(2, len(cache))
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
 
 class YaccTestCase(unittest.TestCase):
     @patch('sys.stdout', new_callable=io.StringIO)
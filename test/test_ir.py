@@ -32,6 +32,42 @@ class IrCodeTestCase(unittest.TestCase):
         self.assertEqual({c3, c4}, add.uses)
         self.assertEqual(c4, add.b)
 
+    def test_replace_repeated_argument(self):
+        """ A value passed several times to a call is replaced everywhere """
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        callee = ir.ExternalProcedure("f", [ir.i32, ir.i32, ir.i32])
+        call = ir.ProcedureCall(callee, [c1, c2, c1])
+        c1.replace_by(c2)
+        self.assertEqual([c2, c2, c2], call.arguments)
+        self.assertFalse(c1.is_used)
+        self.assertEqual({call}, c2.used_by)
+
+    def test_replace_repeated_operand(self):
+        """ A value used as both operands of a binop is replaced """
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        add = ir.add(c1, c1, "add", ir.i32)
+        c1.replace_by(c2)
+        self.assertIs(c2, add.a)
+        self.assertIs(c2, add.b)
+        self.assertFalse(c1.is_used)
+        self.assertEqual({add}, c2.used_by)
+
+    def test_slots(self):
+        """ Instructions and blocks are compact, slotted objects """
+        block = ir.Block("b1")
+        c1 = ir.Const(1, "one", ir.i32)
+        add = ir.add(c1, c1, "add", ir.i32)
+        jump = ir.Jump(block)
+        for obj in (block, c1, add, jump, ir.Exit()):
+            self.assertFalse(hasattr(obj, "__dict__"), str(type(obj)))
+        self.assertEqual({jump}, block.references)
+        self.assertEqual([block], jump.targets)
+        self.assertEqual({add}, c1.used_by)
+        jump.delete()
+        self.assertFalse(block.is_used)
+
 
 class IrBuilderTestCase(unittest.TestCase):
     def setUp(self):
@@ -55,6 +91,66 @@ class IrBuilderTestCase(unittest.TestCase):
         # self.assertEqual(3, r)
 
 
+class VerifierTestCase(unittest.TestCase):
+    def make_module(self):
+        builder = irutils.Builder()
+        module = ir.Module("test")
+        builder.set_module(module)
+        function = builder.new_procedure("f", ir.Binding.GLOBAL)
+        builder.set_function(function)
+        entry = builder.new_block()
+        function.entry = entry
+        builder.set_block(entry)
+        const = builder.emit(ir.Const(1, "one", ir.i32))
+        builder.emit(ir.Exit())
+        return module, function, entry, const
+
+    def test_fast_skips_unchanged(self):
+        module, function, _, _ = self.make_module()
+        verifier = irutils.Verifier(level="fast")
+        self.assertFalse(verifier.is_verified(function))
+        verifier.verify(module)
+        self.assertTrue(verifier.is_verified(function))
+
+    def test_modification_is_detected(self):
+        module, function, entry, const = self.make_module()
+        irutils.verify_module(module)
+        # Use a value before it is defined:
+        entry.insert_instruction(ir.Binop(const, "+", const, "x", ir.i32))
+        self.assertFalse(irutils.Verifier.is_verified(function))
+        with self.assertRaises(AssertionError):
+            irutils.verify_module(module, level="fast")
+
+    def test_entry_change_is_detected(self):
+        module, function, entry, _ = self.make_module()
+        exit_block = ir.Block("exit")
+        function.add_block(exit_block)
+        exit_block.add_instruction(
+            entry.remove_instruction(entry.last_instruction)
+        )
+        entry.add_instruction(ir.Jump(exit_block))
+        irutils.verify_module(module)
+        function.entry = exit_block
+        self.assertFalse(irutils.Verifier.is_verified(function))
+        with self.assertRaises(AssertionError):
+            irutils.verify_module(module, level="fast")
+
+    def test_full_is_default(self):
+        module, function, entry, const = self.make_module()
+        binop = ir.Binop(const, "+", const, "x", ir.i32)
+        entry.insert_instruction(binop, entry.last_instruction)
+        irutils.verify_module(module)
+        # A type change is not tracked by the modification counter:
+        const.ty = ir.i64
+        irutils.verify_module(module, level="fast")
+        with self.assertRaises(TypeError):
+            irutils.verify_module(module)
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            irutils.Verifier(level="sloppy")
+
+
 class ConstantFolderTestCase(unittest.TestCase):
     def setUp(self):
         self.b = irutils.Builder()
@@ -119,6 +215,87 @@ class TestReader(unittest.TestCase):
             self.assertTrue(m)
 
 
+class BinaryFormatTestCase(unittest.TestCase):
+    """ Test the binary format of IR-modules """
+
+    def make_module(self):
+        module = ir.Module("mod1")
+        external = ir.ExternalFunction("ext", [ir.i32], ir.i32)
+        module.add_external(external)
+        variable = ir.Variable(
+            "var1", ir.Binding.LOCAL, 8, 4, value=(b"ab", (ir.ptr, "f"))
+        )
+        module.add_variable(variable)
+        builder = irutils.Builder()
+        builder.set_module(module)
+
+        # A function with a loop, and thus a phi referring forward:
+        f = builder.new_function("f", ir.Binding.GLOBAL, ir.i32)
+        builder.set_function(f)
+        x = ir.Parameter("x", ir.i32)
+        f.add_parameter(x)
+        entry = builder.new_block()
+        loop = builder.new_block()
+        final = builder.new_block()
+        f.entry = entry
+        builder.set_block(entry)
+        one = builder.emit_const(1, ir.i32)
+        builder.emit_const(2.5, ir.f64)
+        builder.emit_jump(loop)
+        builder.set_block(loop)
+        phi = builder.emit(ir.Phi("i", ir.i32))
+        phi.set_incoming(entry, one)
+        inc = builder.emit_add(phi, one, ir.i32)
+        phi.set_incoming(loop, inc)
+        builder.emit(ir.CJump(inc, "<", x, loop, final))
+        builder.set_block(final)
+        result = builder.emit(ir.FunctionCall(external, [inc], "r", ir.i32))
+        builder.emit(ir.Return(result))
+
+        g = builder.new_procedure("g", ir.Binding.GLOBAL)
+        builder.set_function(g)
+        entry = builder.new_block()
+        g.entry = entry
+        builder.set_block(entry)
+        builder.emit(ir.Exit())
+        return module
+
+    def as_text(self, module):
+        f = io.StringIO()
+        irutils.print_module(module, file=f)
+        return f.getvalue()
+
+    def test_round_trip(self):
+        module = self.make_module()
+        module2 = irutils.from_binary(irutils.to_binary(module))
+        self.assertEqual(self.as_text(module), self.as_text(module2))
+        self.assertEqual((b"ab", (ir.ptr, "f")), module2.variables[0].value)
+        phi = module2.get_function("f").blocks[1].instructions[0]
+        self.assertEqual(2, len(phi.inputs))
+
+    def test_load_function(self):
+        """ Only the given function and what it refers to is loaded """
+        data = irutils.to_binary(self.make_module())
+        module = irutils.from_binary(data, functions=["g"])
+        self.assertEqual(["g"], [f.name for f in module.functions])
+        self.assertEqual([], module.variables)
+        self.assertEqual(["ext"], [e.name for e in module.externals])
+
+        # The variable refers to f:
+        module = irutils.from_binary(data, functions=["var1"])
+        self.assertEqual(["f"], [f.name for f in module.functions])
+
+    def test_invalid_data(self):
+        with self.assertRaises(irutils.reader.IrParseException):
+            irutils.from_binary(b"module m;")
+
+    def test_truncated_data(self):
+        data = irutils.to_binary(self.make_module())
+        for size in range(len(irutils.binary.MAGIC), len(data)):
+            with self.assertRaises(irutils.reader.IrParseException):
+                irutils.from_binary(data[:size])
+
+
 class TestIrToPython(unittest.TestCase):
     def test_add_example(self):
         reader = irutils.Reader()
@@ -9,9 +9,10 @@ from ppci import irutils
 from ppci.binutils.debuginfo import DebugDb
 from ppci.irutils import verify_module
 from ppci.opt import Mem2RegPromotor
-from ppci.opt import CleanPass
+from ppci.opt import CleanPass, DeleteUnusedGlobalsPass
 from ppci.opt.constantfolding import correct
 from ppci.opt.tailcall import TailCallOptimization
+from ppci.opt.inline import InlinePass, inline_function
 
 
 class OptTestCase(unittest.TestCase):
@@ -76,6 +77,29 @@ class CleanTestCase(OptTestCase):
         self.clean_pass.run(self.module)
         self.assertNotIn(block4, self.function)
 
+    def test_keep_empty_blocks_into_phi(self):
+        """ Empty branches give different values to a phi, keep them """
+        a = self.builder.emit(ir.Const(1, 'a', ir.i32))
+        b = self.builder.emit(ir.Const(2, 'b', ir.i32))
+        yes = self.builder.new_block()
+        no = self.builder.new_block()
+        final = self.builder.new_block()
+        self.builder.emit(ir.CJump(a, '<', b, yes, no))
+        self.builder.set_block(yes)
+        self.builder.emit(ir.Jump(final))
+        self.builder.set_block(no)
+        self.builder.emit(ir.Jump(final))
+        self.builder.set_block(final)
+        phi = self.builder.emit(ir.Phi('phi', ir.i32))
+        phi.set_incoming(yes, a)
+        phi.set_incoming(no, b)
+        self.builder.emit(ir.ProcedureCall(
+            ir.ExternalProcedure('f', [ir.i32]), [phi]))
+        self.builder.emit(ir.Exit())
+
+        self.clean_pass.run(self.module)
+        self.assertEqual({a, b}, set(phi.inputs.values()))
+
 
 class Mem2RegTestCase(OptTestCase):
     """ Test the memory to register lifter """
@@ -199,6 +223,125 @@ class TailCallTestCase(unittest.TestCase):
         self.assertTrue(function.is_leaf())
 
 
+class InlineTestCase(unittest.TestCase):
+    """ Test function inlining """
+    def make_module(self, additions=1):
+        """ Create a module where add1 is called twice by main """
+        builder = irutils.Builder()
+        module = ir.Module('test')
+        builder.set_module(module)
+        add1 = builder.new_function('add1', ir.Binding.GLOBAL, ir.i32)
+        builder.set_function(add1)
+        a = ir.Parameter('a', ir.i32)
+        add1.add_parameter(a)
+        entry = builder.new_block()
+        add1.entry = entry
+        builder.set_block(entry)
+        yes = builder.new_block()
+        no = builder.new_block()
+        zero = builder.emit_const(0, ir.i32)
+        builder.emit(ir.CJump(a, '<', zero, yes, no))
+        builder.set_block(yes)
+        builder.emit_return(zero)
+        builder.set_block(no)
+        for _ in range(additions):
+            a = builder.emit_add(a, 1, ir.i32)
+        builder.emit_return(a)
+
+        main = builder.new_function('main', ir.Binding.GLOBAL, ir.i32)
+        builder.set_function(main)
+        b = ir.Parameter('b', ir.i32)
+        main.add_parameter(b)
+        entry = builder.new_block()
+        main.entry = entry
+        builder.set_block(entry)
+        c = builder.emit(ir.FunctionCall(add1, [b], 'c', ir.i32))
+        d = builder.emit(ir.FunctionCall(add1, [c], 'd', ir.i32))
+        builder.emit_return(d)
+        verify_module(module)
+        return module
+
+    def make_recursive_module(self):
+        """ Create a module where even and odd call each other """
+        builder = irutils.Builder()
+        module = ir.Module('test')
+        builder.set_module(module)
+        even = builder.new_function('even', ir.Binding.GLOBAL, ir.i32)
+        odd = builder.new_function('odd', ir.Binding.GLOBAL, ir.i32)
+        for function, other in ((even, odd), (odd, even)):
+            builder.set_function(function)
+            a = ir.Parameter('a', ir.i32)
+            function.add_parameter(a)
+            function.entry = builder.new_block()
+            builder.set_block(function.entry)
+            b = builder.emit_sub(a, 1, ir.i32)
+            c = builder.emit(ir.FunctionCall(other, [b], 'c', ir.i32))
+            builder.emit_return(c)
+        return module
+
+    def test_inline_function(self):
+        module = self.make_module()
+        main = module.get_function('main')
+        call = next(main.get_instructions_of_type(ir.FunctionCall))
+        inline_function(call, module.get_function('add1'))
+        verify_module(module)
+        self.assertEqual(1, len(main.get_out_calls()))
+        self.assertEqual(1, len(list(main.get_instructions_of_type(ir.Phi))))
+
+    def test_inline_pass(self):
+        module = self.make_module()
+        InlinePass().run(module)
+        verify_module(module)
+        self.assertTrue(module.get_function('main').is_leaf())
+
+    def test_delete_inlined_local_function(self):
+        """ A local function is removed once all calls are inlined """
+        module = self.make_module()
+        module.get_function('add1').binding = ir.Binding.LOCAL
+        InlinePass().run(module)
+        DeleteUnusedGlobalsPass().run(module)
+        verify_module(module)
+        self.assertEqual(['main'], [f.name for f in module.functions])
+
+    def test_recursive_calls_not_inlined(self):
+        """ Calls within a cycle of the call graph are left alone """
+        module = self.make_recursive_module()
+        InlinePass().run(module)
+        verify_module(module)
+        for function in module.functions:
+            self.assertEqual(1, len(function.get_out_calls()))
+
+    def test_optimize_size(self):
+        """ Calls are only inlined when the code gets smaller """
+        module = self.make_module(additions=4)
+        InlinePass(optimize_size=True).run(module)
+        self.assertEqual(2, len(module.get_function('main').get_out_calls()))
+        InlinePass().run(module)
+        self.assertTrue(module.get_function('main').is_leaf())
+
+        # A local function with a single call is removed after inlining:
+        module = self.make_module(additions=4)
+        main = module.get_function('main')
+        add1 = module.get_function('add1')
+        add1.binding = ir.Binding.LOCAL
+        call = main.get_out_calls()[0]
+        call.replace_by(call.arguments[0])
+        call.remove_from_block()
+        call.delete()
+        InlinePass(optimize_size=True).run(module)
+        verify_module(module)
+        self.assertTrue(main.is_leaf())
+        self.assertEqual(['main'], [f.name for f in module.functions])
+
+    def test_cold_calls_not_inlined(self):
+        """ Calls which the profile marks as never executed are kept """
+        module = self.make_module()
+        main = module.get_function('main')
+        main.entry.execution_count = 0
+        InlinePass().run(module)
+        self.assertEqual(2, len(main.get_out_calls()))
+
+
 if __name__ == '__main__':
     unittest.main()
     sys.exit()
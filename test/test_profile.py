@@ -0,0 +1,167 @@
+""" Tests for profile counters and profile guided optimization. """
+
+import io
+import unittest
+from ppci.api import c_to_ir, optimize, ir_to_object
+from ppci.api import get_current_arch, is_platform_supported
+from ppci.arch.generic_instructions import Comment
+from ppci.arch.stack import Frame
+from ppci.irutils import add_block_counters, apply_profile, verify_module
+from ppci.irutils.profile import Profile, block_layout
+from ppci.lang.python import ir_to_python
+from ppci.utils.codepage import load_obj
+
+
+SOURCE = """
+int count_odd(int n) {
+  int s = 0;
+  for (int i = 0; i < n; i++) {
+    if (i % 4 == 3) {
+      s += 1;
+    }
+  }
+  return s;
+}
+"""
+
+
+def make_module(arch="x86_64"):
+    return c_to_ir(io.StringIO(SOURCE), arch)
+
+
+class BlockCounterTestCase(unittest.TestCase):
+    def check_profile(self, profile):
+        counts = sorted(profile.block_counts.values())
+        # Entry and exit once, loop header 11 times, body 10 times and
+        # the if-branch 2 times:
+        self.assertEqual(1, counts[0])
+        self.assertEqual(11, counts[-1])
+        self.assertIn(2, counts)
+        self.assertIn(2, profile.edge_counts.values())
+
+    def test_python(self):
+        ir_module = make_module()
+        counter_map = add_block_counters(ir_module)
+        verify_module(ir_module)
+        f = io.StringIO()
+        ir_to_python([ir_module], f)
+        namespace = {}
+        exec(f.getvalue(), namespace)
+        self.assertEqual(2, namespace["count_odd"](10))
+        self.check_profile(counter_map.read_python(namespace))
+
+    def test_wasm(self):
+        from ppci.wasm import ir_to_wasm, instantiate
+
+        ir_module = make_module()
+        counter_map = add_block_counters(ir_module)
+        wasm_module = ir_to_wasm(ir_module, export_memory=True)
+        instance = instantiate(wasm_module, {}, target="python")
+        self.assertEqual(2, instance.exports.count_odd(10))
+        self.check_profile(counter_map.read_wasm(instance))
+
+    @unittest.skipUnless(is_platform_supported(), "skipping codepage tests")
+    def test_native(self):
+        arch = get_current_arch()
+        ir_module = make_module(arch)
+        counter_map = add_block_counters(ir_module)
+        obj = ir_to_object([ir_module], arch, debug=True)
+        code_module = load_obj(obj)
+        self.assertEqual(2, code_module.count_odd(10))
+        self.check_profile(counter_map.read_native(code_module))
+
+    def test_save_load(self):
+        profile = Profile()
+        profile.block_counts[("f", "b1")] = 3
+        profile.edge_counts[("f", "b1", "b2")] = 2
+        f = io.StringIO()
+        profile.save(f)
+        f.seek(0)
+        profile2 = Profile.load(f)
+        profile.merge(profile2)
+        self.assertEqual({("f", "b1"): 6}, profile.block_counts)
+        self.assertEqual({("f", "b1", "b2"): 4}, profile.edge_counts)
+
+
+class ProfileGuidedTestCase(unittest.TestCase):
+    def make_profile(self):
+        ir_module = make_module()
+        counter_map = add_block_counters(ir_module)
+        f = io.StringIO()
+        ir_to_python([ir_module], f)
+        namespace = {}
+        exec(f.getvalue(), namespace)
+        namespace["count_odd"](100)
+        return counter_map.read_python(namespace)
+
+    def test_apply_profile(self):
+        ir_module = make_module()
+        apply_profile(ir_module, self.make_profile())
+        function = ir_module.get_function("count_odd")
+        self.assertEqual(1, function.entry.execution_count)
+        branches = [b for b in function if b.successor_counts]
+        self.assertTrue(branches)
+        for block in branches:
+            self.assertEqual(
+                block.execution_count, sum(block.successor_counts.values())
+            )
+
+    def test_block_layout(self):
+        """ Cold blocks are placed after the hot loop """
+        ir_module = make_module()
+        function = ir_module.get_function("count_odd")
+        self.assertEqual(function.blocks, block_layout(function))
+        apply_profile(ir_module, self.make_profile())
+        layout = block_layout(function)
+        self.assertEqual(function.entry, layout[0])
+        self.assertEqual(set(function.blocks), set(layout))
+        # The if statement is followed by its most taken branch:
+        branch = next(
+            b
+            for b in function
+            if b.successor_counts and len(set(b.successor_counts.values())) > 1
+        )
+        hot = max(branch.successor_counts, key=branch.successor_counts.get)
+        self.assertIs(hot, layout[layout.index(branch) + 1])
+        # The rarely taken branch is placed after the loop body:
+        cold = min(branch.successor_counts, key=branch.successor_counts.get)
+        self.assertGreater(layout.index(cold), layout.index(hot))
+
+    def test_compile(self):
+        """ Compile with a profile, and check the program still works """
+        ir_module = make_module()
+        optimize(ir_module, level=2, profile=self.make_profile())
+        verify_module(ir_module)
+        obj = ir_to_object([ir_module], "arm")
+        self.assertTrue(obj.get_section("code").data)
+
+        f = io.StringIO()
+        ir_to_python([ir_module], f)
+        namespace = {}
+        exec(f.getvalue(), namespace)
+        self.assertEqual(25, namespace["count_odd"](100))
+
+    def test_spill_weights(self):
+        """ Spill code executes as often as the instruction it serves """
+        frame = Frame("f")
+        frame.current_weight = 10
+        hot = frame.emit(Comment("hot"))
+        frame.current_weight = None
+        cold = frame.emit(Comment("cold"))
+        spill = Comment("spill")
+        frame.insert_code_before(hot, [spill])
+        self.assertEqual(10, frame.weight_of(hot))
+        self.assertEqual(10, frame.weight_of(spill))
+        self.assertEqual(1, frame.weight_of(cold))
+
+    def test_profile_without_counts(self):
+        """ A profile of other code leaves the blocks without counts """
+        ir_module = make_module()
+        apply_profile(ir_module, Profile())
+        for block in ir_module.get_function("count_odd"):
+            self.assertIsNone(block.execution_count)
+            self.assertIsNone(block.successor_counts)
+
+
+if __name__ == "__main__":
+    unittest.main()
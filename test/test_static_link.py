@@ -2,6 +2,7 @@
 import io
 import unittest
 from ppci.api import cc, link
+from ppci.binutils.objectfile import ObjectFile
 
 
 class StaticLinkTestCase(unittest.TestCase):
@@ -25,6 +26,41 @@ class StaticLinkTestCase(unittest.TestCase):
         """), arch)
         link([o1, o2])
 
+    def test_link_time_optimization(self):
+        """ Local functions with the same name in two modules are kept
+        apart, and functions not used by the entry are removed. """
+        arch = 'arm'
+        sources = [
+            """
+            static int add(int a, int b) { return a + b; }
+            int unused(int a) { return add(a, 1); }
+            int voodoo1(int a) { return add(a, 12); }
+            """,
+            """
+            int voodoo1(int a);
+            static int add(int a, int b) { return a - b; }
+            int voodoo2(int a) { return add(voodoo1(a), 2); }
+            """,
+        ]
+        objs = [cc(io.StringIO(s), arch, opt_level=2, lto=True)
+                for s in sources]
+
+        # The IR-code is saved together with the object:
+        f = io.StringIO()
+        objs[0].save(f)
+        f.seek(0)
+        self.assertEqual(objs[0].ir, ObjectFile.load(f).ir)
+
+        obj = link(objs, entry='voodoo2', lto=True)
+        self.assertTrue(obj.has_symbol('voodoo2'))
+        self.assertFalse(obj.has_symbol('unused'))
+        self.assertLess(obj.byte_size, link(objs, entry='voodoo2').byte_size)
+
+        # A partial link keeps all global symbols and the IR-code:
+        obj = link(objs, partial_link=True, lto=True)
+        self.assertTrue(obj.has_symbol('unused'))
+        self.assertIsNotNone(obj.ir)
+
 
 if __name__ == '__main__':
     unittest.main()
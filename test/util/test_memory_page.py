@@ -1,6 +1,7 @@
+import gc
 import unittest
 
-from ppci.utils.memory_page import MemoryPage
+from ppci.utils.memory_page import MemoryPage, VirtualMemory
 
 
 class MemoryPageTestCase(unittest.TestCase):
@@ -17,3 +18,28 @@ class MemoryPageTestCase(unittest.TestCase):
         p.seek(8)
         data = p.read(6)
         self.assertEqual(data, bytes([9, 88, 89, 92, 13, 0]))
+
+
+class VirtualMemoryTestCase(unittest.TestCase):
+    def test_commit(self):
+        vm = VirtualMemory(1 << 20, 65536)
+        addr = vm.addr
+        vm.view()[65535] = 7
+        vm.commit(2 * 65536)
+        self.assertEqual(addr, vm.addr)
+        view = vm.view()
+        self.assertEqual(2 * 65536, len(view))
+        self.assertEqual(7, view[65535])
+        with self.assertRaises(ValueError):
+            vm.commit(2 << 20)
+
+    def test_view_outlives_instance(self):
+        """ The mapping must stay alive while a view on it exists """
+        vm = VirtualMemory(1 << 20, 65536)
+        view = vm.view()
+        del vm
+        gc.collect()
+        view[0] = 1
+        view[65535] = 2
+        self.assertEqual(1, view[0])
+        self.assertEqual(2, view[65535])
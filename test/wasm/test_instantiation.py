@@ -1,6 +1,7 @@
 """ Test the ppci.wasm.instantiate function
 """
 
+import array
 import math
 import unittest
 from ppci.wasm import instantiate, Module
@@ -111,3 +112,138 @@ class WasmInstantiationTestCase(unittest.TestCase):
         self.assertEqual(b"abcd", instance.exports.mem0ry[0:4])
         instance.exports.mem0ry[1:3] = bytes([1,2])
         self.assertEqual(b'a\x01\x02d', instance.exports.mem0ry[0:4])
+
+
+sum_src = """
+(module
+  (memory (export "mem") 1)
+  (func (export "sum") (param i32 i32) (result i32) (local i32)
+    (block
+      (loop
+        (br_if 1 (i32.eqz (local.get 1)))
+        (local.set 2 (i32.add (local.get 2) (i32.load (local.get 0))))
+        (local.set 0 (i32.add (local.get 0) (i32.const 4)))
+        (local.set 1 (i32.sub (local.get 1) (i32.const 1)))
+        (br 0)))
+    (local.get 2)))
+"""
+
+
+def has_numpy():
+    try:
+        import numpy
+        return True
+    except ImportError:
+        return False
+
+
+class WasmMemoryTestCase(unittest.TestCase):
+    """ Test access to the linear memory of wasm instances """
+    def test_python_memory(self):
+        self.check_memory('python')
+
+    @unittest.skipUnless(is_platform_supported(), "native code not supported")
+    def test_native_memory(self):
+        self.check_memory('native')
+
+    def check_memory(self, target):
+        instance = instantiate(Module(sum_src), {}, target=target)
+        memory = instance.exports.mem
+        memory.write_array(16, array.array('i', range(100)))
+        self.assertEqual(4950, instance.exports.sum(16, 100))
+        self.assertEqual(
+            array.array('i', [0, 1, 2]), memory.read_array(16, 3, 'i'))
+        self.assertEqual(65536, len(memory.view()))
+
+        # Changes through a view are seen by wasm code:
+        with memory.view(16, 8) as view:
+            view[:] = bytes([5, 0, 0, 0, 6, 0, 0, 0])
+        self.assertEqual(11, instance.exports.sum(16, 2))
+        self.assertEqual(bytes([5, 0, 0, 0]), memory[16:20])
+
+        with self.assertRaises(IndexError):
+            memory.view(65530, 10)
+
+    @unittest.skipUnless(is_platform_supported(), "native code not supported")
+    def test_native_memory_grow(self):
+        """ Growing native memory keeps the data and the base address """
+        module = Module(
+            '(module (memory (export "mem") 1 1000)'
+            '(func (export "grow") (param i32) (result i32)'
+            '(memory.grow (local.get 0))))'
+        )
+        instance = instantiate(module, {}, target='native')
+        memory = instance.exports.mem
+        memory.write(100, b'abc')
+        base = instance._memory_data_page.addr
+        self.assertEqual(1, instance.exports.grow(99))
+        self.assertEqual(100, instance.memory_size())
+        self.assertEqual(base, instance._memory_data_page.addr)
+        self.assertEqual(b'abc', memory.read(100, 3))
+        memory.write(99 * 65536, b'end')
+        self.assertEqual(-1, instance.exports.grow(1000))
+
+    def test_python_memory_grow_with_view(self):
+        """ A view pins the memory size, so growing fails gracefully """
+        module = Module(
+            '(module (memory (export "mem") 1 10)'
+            '(func (export "grow") (param i32) (result i32)'
+            '(memory.grow (local.get 0))))'
+        )
+        instance = instantiate(module, {}, target='python')
+        memory = instance.exports.mem
+        view = memory.view()
+        with self.assertLogs('instantiate', level='WARNING'):
+            self.assertEqual(-1, instance.exports.grow(1))
+        self.assertEqual(1, instance.memory_size())
+        view.release()
+        self.assertEqual(1, instance.exports.grow(1))
+        self.assertEqual(2, instance.memory_size())
+
+    @unittest.skipUnless(has_numpy(), "numpy not installed")
+    def test_numpy_view(self):
+        import numpy as np
+        instance = instantiate(Module(sum_src), {}, target='python')
+        memory = instance.exports.mem
+        values = memory.numpy_view('i4', 16, 10)
+        values[:] = np.arange(10)
+        self.assertEqual(45, instance.exports.sum(16, 10))
+        del values
+
+
+map_src = r"""
+(module
+  (func (export "add") (param i32 i32) (result i32)
+    local.get 0 local.get 1 i32.add)
+  (func (export "scale") (param f64 i64) (result f64)
+    local.get 0 local.get 1 f64.convert_i64_s f64.mul)
+  (func (export "nop") (param i32))
+)
+"""
+
+
+class WasmMapTestCase(unittest.TestCase):
+    """ Call exported functions for many arguments at once """
+    def test_python_map(self):
+        self.check_map('python')
+
+    @unittest.skipUnless(is_platform_supported(), "native code not supported")
+    def test_native_map(self):
+        self.check_map('native')
+
+    def check_map(self, target):
+        instance = instantiate(Module(map_src), {}, target=target)
+        exports = instance.exports
+        self.assertEqual(7, exports.add(3, 4))
+        self.assertEqual(
+            array.array('i', [11, 22, -27]),
+            exports.add.map([1, 2, 3], array.array('i', [10, 20, -30])))
+        self.assertEqual(
+            array.array('d', [3.0, 6.0]),
+            exports.scale.map([1.5, 2.0], [2, 3]))
+        self.assertIsNone(exports.nop.map([1, 2]))
+        self.assertEqual(array.array('i'), exports.add.map([], []))
+        with self.assertRaises(TypeError):
+            exports.add.map([1, 2])
+        with self.assertRaises(ValueError):
+            exports.add.map([1, 2], [3])
@@ -32,6 +32,21 @@ class WasmGeneratorTestCase(unittest.TestCase):
         ir_to_wasm(mod2)
         # Idea: maybe convert the wasm back to ir, and run that?
 
+    def test_exports(self):
+        """ Functions are exported, the memory only when asked for """
+        src = io.StringIO("""
+        int add(int a, int b) {
+          return a + b;
+        }
+        """)
+        mod = api.c_to_ir(src, 'x86_64')
+        wasm_module = ir_to_wasm(mod)
+        exports = [(e.name, e.kind) for e in wasm_module['export']]
+        self.assertEqual([('add', 'func')], exports)
+        wasm_module = ir_to_wasm(mod, export_memory=True)
+        exports = [(e.name, e.kind) for e in wasm_module['export']]
+        self.assertEqual([('add', 'func'), ('memory', 'memory')], exports)
+
 
 class WasmLoadAndSaveTestCase(unittest.TestCase):
     def test_load_save(self):
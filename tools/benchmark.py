@@ -28,6 +28,19 @@ def test_compile_8cc(benchmark):
     benchmark(compile_8cc)
 
 
+def test_dominance_10k_blocks(benchmark):
+    benchmark(dominance_queries, 10000)
+
+
+def test_wasm_memory_grow_512mb(benchmark):
+    benchmark(grow_wasm_memory, 512)
+
+
+def test_python_backend_collatz(benchmark):
+    collatz = load_c_as_python(COLLATZ_SRC, "collatz")
+    benchmark(collatz, 2000)
+
+
 def compile_nos_for_riscv():
     """ Compile nOS for riscv architecture. """
     logging.basicConfig(level=logging.INFO)
@@ -62,6 +75,101 @@ def compile_nos_for_riscv():
     )
 
 
+def make_large_cfg(num_diamonds):
+    """ Create a control flow graph with a chain of if-then-else blocks """
+    from ppci.graph.cfg import ControlFlowGraph, ControlFlowNode
+
+    cfg = ControlFlowGraph()
+    cfg.entry_node = ControlFlowNode(cfg, name="entry")
+    node = cfg.entry_node
+    for i in range(num_diamonds):
+        yes = ControlFlowNode(cfg, name="yes{}".format(i))
+        no = ControlFlowNode(cfg, name="no{}".format(i))
+        join = ControlFlowNode(cfg, name="join{}".format(i))
+        node.add_edge(yes)
+        node.add_edge(no)
+        yes.add_edge(join)
+        no.add_edge(join)
+        node = join
+    cfg.exit_node = node
+    return cfg
+
+
+def dominance_queries(num_blocks):
+    """ Build dominator trees and query all nodes against a few others """
+    cfg = make_large_cfg(num_blocks // 3)
+    nodes = list(cfg.nodes)
+    probes = nodes[:: len(nodes) // 10]
+    count = 0
+    for one in probes:
+        for other in nodes:
+            if cfg.dominates(one, other):
+                count += 1
+            if cfg.post_dominates(one, other):
+                count += 1
+    return count
+
+
+def grow_wasm_memory(megabytes, step=16):
+    """ Grow native wasm memory in steps of `step` pages """
+    from ppci import wasm
+
+    module = wasm.Module(
+        '(module (memory (export "mem") 1)'
+        '(func (export "grow") (param i32) (result i32)'
+        "(memory.grow (local.get 0))))"
+    )
+    instance = wasm.instantiate(module, {}, target="native")
+    pages = megabytes * 1024 * 1024 // 65536
+    while instance.memory_size() + step <= pages:
+        instance.exports.grow(step)
+        # Touch the new memory:
+        instance.exports.mem.write((instance.memory_size() - 1) * 65536, b"x")
+    return instance.memory_size()
+
+
+COLLATZ_SRC = """
+int collatz(int count)
+{
+  int total = 0;
+  int n, i;
+  for (i = 1; i < count; i++)
+  {
+    n = i;
+    /* Enter the loop halfway for odd numbers, which is irreducible: */
+    if (n & 1) goto odd;
+    while (n != 1)
+    {
+      if (n & 1)
+      {
+      odd:
+        n = 3 * n + 1;
+      }
+      else
+      {
+        n = n / 2;
+      }
+      total++;
+    }
+  }
+  return total;
+}
+"""
+
+
+def load_c_as_python(source, name):
+    """ Compile C code to python code, and return the python function """
+    import io
+
+    ir_module = api.c_to_ir(io.StringIO(source), "x86_64")
+    api.optimize(ir_module, level=2)
+    f = io.StringIO()
+    api.ir_to_python([ir_module], f)
+    namespace = {}
+    exec(f.getvalue(), namespace)
+    return namespace[name]
+
+
 def get_sources(folder, extension):
     resfiles = []
     resdirs = []
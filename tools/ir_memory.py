@@ -0,0 +1,68 @@
+""" Measure the memory used by the IR of a large wasm module.
+
+This converts a generated wasm module into IR and reports the memory
+retained per IR instruction. Run this before and after a change to the
+IR object model to see how many bytes per instruction are saved:
+
+python ir_memory.py [number of functions]
+
+"""
+
+import argparse
+import gc
+import tracemalloc
+from ppci import wasm
+from ppci.wasm.wasm2ppci import wasm_to_ir
+from ppci.arch import get_arch
+
+
+def make_wasm_module(num_functions):
+    """ Create a module with many arithmetic functions """
+    functions = []
+    for i in range(num_functions):
+        functions.append(
+            """
+            (func $f{0} (export "f{0}") (param i32 i32) (result i32)
+              (local i32)
+              (local.set 2 (i32.const {0}))
+              (block
+                (loop
+                  (local.set 2 (i32.add (local.get 2)
+                    (i32.mul (local.get 0) (local.get 1))))
+                  (local.set 0 (i32.sub (local.get 0) (i32.const 1)))
+                  (br_if 1 (i32.eqz (local.get 0)))
+                  (br 0)))
+              (i32.xor (local.get 2) (i32.shl (local.get 1) (i32.const 3))))
+            """.format(i)
+        )
+    return wasm.Module("(module {})".format("".join(functions)))
+
+
+def measure(num_functions):
+    wasm_module = make_wasm_module(num_functions)
+    ptr_info = get_arch("x86_64").info.get_type_info("ptr")
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    ir_module = wasm_to_ir(wasm_module, ptr_info)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    num_instructions = sum(
+        f.num_instructions() for f in ir_module.functions
+    )
+    return after - before, num_instructions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("functions", type=int, nargs="?", default=2000)
+    args = parser.parse_args()
+    size, num_instructions = measure(args.functions)
+    print("Instructions: {}".format(num_instructions))
+    print("Memory: {} bytes".format(size))
+    print("Per instruction: {:.1f} bytes".format(size / num_instructions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+""" Count the cycles spent in the msp430 compiler runtime.
+
+The multiply and divide routines of the compiler runtime are linked and
+run on a small, cycle counting msp430 simulator, once for the runtime of
+ppci 0.5.8 and once for the current runtime. The cycle counts follow the
+instruction cycle table of the msp430x1xx family user guide.
+
+Run this script from the tools folder:
+
+    $ python runtime_cycles.py
+
+"""
+
+import io
+import random
+import statistics
+from ppci import api
+from ppci.arch.msp430.arch import RT_ASM_SRC
+
+MASK = 0xFFFF
+STACK_TOP = 0xFF00
+RETURN_ADDRESS = 0xFFFE
+CYCLE_LIMIT = 100000
+
+
+class Msp430Simulator:
+    """ Simulate msp430 machine code, and count the cycles """
+
+    def __init__(self, image, address):
+        self.memory = bytearray(0x10000)
+        self.memory[address : address + len(image)] = image
+        self.regs = [0] * 16
+        self.cycles = 0
+
+    def call(self, address, *args):
+        """Call a function and return its result.
+
+        Returns None when the function did not return within the cycle
+        limit.
+        """
+        self.regs = [0] * 16
+        self.regs[1] = STACK_TOP
+        for reg, arg in zip((12, 13, 14, 15), args):
+            self.regs[reg] = arg & MASK
+        self.push(RETURN_ADDRESS)
+        self.regs[0] = address
+        limit = self.cycles + CYCLE_LIMIT
+        while self.regs[0] != RETURN_ADDRESS:
+            self.step()
+            if self.cycles > limit:
+                return None
+        return self.regs[12]
+
+    def read(self, address, byte=False):
+        if byte:
+            return self.memory[address]
+        return self.memory[address] | (self.memory[address + 1] << 8)
+
+    def write(self, address, value, byte=False):
+        self.memory[address] = value & 0xFF
+        if not byte:
+            self.memory[address + 1] = (value >> 8) & 0xFF
+
+    def push(self, value):
+        self.regs[1] = (self.regs[1] - 2) & MASK
+        self.write(self.regs[1], value)
+
+    def fetch(self):
+        value = self.read(self.regs[0])
+        self.regs[0] = (self.regs[0] + 2) & MASK
+        return value
+
+    def flag(self, bit):
+        return (self.regs[2] >> bit) & 1
+
+    def set_flags(self, n, z, c, v):
+        sr = self.regs[2] & ~0x107
+        self.regs[2] = sr | c | (z << 1) | (n << 2) | (v << 8)
+
+    def source(self, mode, reg, byte):
+        """Decode a source operand.
+
+        Returns the value, the address (or None for registers and
+        constants) and whether the operand is a register or constant.
+        """
+        if reg == 3 or (reg == 2 and mode >= 2):
+            constants = {(3, 0): 0, (3, 1): 1, (3, 2): 2, (3, 3): MASK}
+            constants.update({(2, 2): 4, (2, 3): 8})
+            value = constants[(reg, mode)]
+            return (value & 0xFF if byte else value), None, "reg"
+        if mode == 0:
+            value = self.regs[reg]
+            return (value & 0xFF if byte else value), None, "reg"
+        elif mode == 1:
+            offset = self.fetch()
+            base = 0 if reg == 2 else self.regs[reg] - (2 if reg == 0 else 0)
+            address = (base + offset) & MASK
+            return self.read(address, byte), address, "indexed"
+        elif mode == 2:
+            address = self.regs[reg]
+            return self.read(address, byte), address, "indirect"
+        else:
+            address = self.regs[reg]
+            step = 1 if byte and reg not in (0, 1) else 2
+            self.regs[reg] = (address + step) & MASK
+            return self.read(address, byte), address, "increment"
+
+    def step(self):
+        opcode = self.fetch()
+        if opcode >> 13 == 1:
+            self.jump(opcode)
+        elif opcode >> 10 == 0b000100:
+            self.single_operand(opcode)
+        elif opcode >> 12 >= 4:
+            self.double_operand(opcode)
+        else:  # pragma: no cover
+            raise NotImplementedError(hex(opcode))
+
+    def jump(self, opcode):
+        offset = opcode & 0x3FF
+        if offset & 0x200:
+            offset -= 0x400
+        n, z, c, v = (self.flag(2), self.flag(1), self.flag(0), self.flag(8))
+        condition = (opcode >> 10) & 7
+        taken = [not z, z, not c, c, n, not (n ^ v), n ^ v, True][condition]
+        if taken:
+            self.regs[0] = (self.regs[0] + offset * 2) & MASK
+        self.cycles += 2
+
+    def single_operand(self, opcode):
+        operation = (opcode >> 7) & 7
+        byte = bool(opcode & 0x40)
+        mode = (opcode >> 4) & 3
+        reg = opcode & 15
+        value, address, kind = self.source(mode, reg, byte)
+        if operation == 4:  # push
+            self.push(value)
+            self.cycles += {"reg": 3, "indirect": 4, "increment": 4}.get(
+                kind, 5
+            )
+            return
+        elif operation == 5:  # call
+            self.push(self.regs[0])
+            self.regs[0] = value
+            self.cycles += {"reg": 4, "indirect": 4}.get(kind, 5)
+            return
+
+        bits = 8 if byte else 16
+        msb = 1 << (bits - 1)
+        carry = value & 1
+        if operation == 0:  # rrc
+            result = (value >> 1) | (msb if self.flag(0) else 0)
+        elif operation == 2:  # rra
+            result = (value >> 1) | (value & msb)
+        elif operation == 3:  # sxt
+            result = (value & 0xFF) - ((value & 0x80) << 1)
+            carry = int(result != 0)
+        else:  # pragma: no cover
+            raise NotImplementedError(str(operation))
+        result &= (1 << bits) - 1 if operation != 3 else MASK
+        self.set_flags(int(bool(result & msb)), int(result == 0), carry, 0)
+        self.store(address, reg, result, byte)
+        self.cycles += {"reg": 1, "indexed": 4}.get(kind, 3)
+
+    def double_operand(self, opcode):
+        operation = opcode >> 12
+        src_reg = (opcode >> 8) & 15
+        dst_indexed = bool(opcode & 0x80)
+        byte = bool(opcode & 0x40)
+        src_mode = (opcode >> 4) & 3
+        dst_reg = opcode & 15
+        src, _, kind = self.source(src_mode, src_reg, byte)
+        if dst_indexed:
+            offset = self.fetch()
+            base = self.regs[dst_reg] - (2 if dst_reg == 0 else 0)
+            address = 0 if dst_reg == 2 else base
+            address = (address + offset) & MASK
+            dst = self.read(address, byte)
+        else:
+            address = None
+            dst = self.regs[dst_reg] & (0xFF if byte else MASK)
+
+        bits = 8 if byte else 16
+        mask = (1 << bits) - 1
+        msb = 1 << (bits - 1)
+        write = True
+        if operation == 4:  # mov
+            result = src
+        elif operation in (5, 6, 7, 8, 9):  # add, addc, subc, sub, cmp
+            if operation >= 7:
+                src = ~src & mask
+            carry_in = {5: 0, 6: self.flag(0), 7: self.flag(0)}.get(
+                operation, 1
+            )
+            total = dst + src + carry_in
+            result = total & mask
+            overflow = int(bool(~(dst ^ src) & (dst ^ result) & msb))
+            self.set_flags(
+                int(bool(result & msb)), int(result == 0), total >> bits,
+                overflow
+            )
+            write = operation != 9
+        elif operation in (11, 15):  # bit, and
+            result = dst & src
+            self.set_flags(
+                int(bool(result & msb)), int(result == 0), int(result != 0), 0
+            )
+            write = operation == 15
+        elif operation == 12:  # bic
+            result = dst & ~src
+        elif operation == 13:  # bis
+            result = dst | src
+        elif operation == 14:  # xor
+            result = dst ^ src
+            overflow = int(bool(dst & src & msb))
+            self.set_flags(
+                int(bool(result & msb)), int(result == 0), int(result != 0),
+                overflow
+            )
+        else:  # pragma: no cover
+            raise NotImplementedError(str(operation))
+
+        if write:
+            self.store(address, dst_reg, result & mask, byte)
+
+        if dst_indexed:
+            cycles = {"reg": 4, "indexed": 6}.get(kind, 5)
+        else:
+            cycles = {"reg": 1, "indexed": 3}.get(kind, 2)
+            if dst_reg == 0 and kind in ("reg", "increment"):
+                cycles += 1
+        self.cycles += cycles
+
+    def store(self, address, reg, value, byte):
+        if address is None:
+            if reg != 3:
+                self.regs[reg] = value
+        else:
+            self.write(address, value, byte)
+
+
+RT_MUL_C3_SRC_058 = """
+module runtime;
+
+function int mulsi3(int a, int b)
+{
+  return mul_helper(a, b);
+}
+
+function int umulsi3(int a, int b)
+{
+  return mul_helper(a, b);
+}
+
+function int mul_helper(int a, int b)
+{
+  var int res = 0;
+  while (b > 0)
+  {
+    if ((b & 1) == 1)
+    {
+      res += a;
+    }
+    a = a << 1;
+    b = b >> 1;
+  }
+  return res;
+}
+"""
+
+RT_DIV_C3_SRC_058 = """
+module runtime;
+
+function int divsi3(int a, int b)
+{
+  return udiv_helper(a, b, 0);
+}
+
+function int udivsi3(int a, int b)
+{
+  return udiv_helper(a, b, 0);
+}
+
+function int modsi3(int a, int b)
+{
+  return udiv_helper(a, b, 1);
+}
+
+function int umodsi3(int a, int b)
+{
+  return udiv_helper(a, b, 1);
+}
+
+function int udiv_helper(int num, int den, int remainder)
+{
+  var int res = 0;
+  var int current = 1;
+
+  while (den < num)
+  {
+    den = den << 1;
+    current = current << 1;
+  }
+
+  while (current != 0)
+  {
+    if (num >= den)
+    {
+      num -= den;
+      res = res | current;
+    }
+    den = den >> 1;
+    current = current >> 1;
+  }
+
+  if (remainder != 0)
+  {
+    res = num;
+  }
+
+  return res;
+}
+"""
+
+
+def load_runtime(objects):
+    """ Link the runtime at a fixed address and load it into a simulator """
+    layout = "MEMORY flash LOCATION=0x4000 SIZE=0x8000 { SECTION(code) }"
+    obj = api.link(objects, layout=io.StringIO(layout))
+    image = obj.get_image("flash")
+    simulator = Msp430Simulator(image.data, image.address)
+    symbols = {s.name: obj.get_symbol_id_value(s.id) for s in obj.symbols}
+    return simulator, symbols
+
+
+def wrap(value):
+    value &= MASK
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def reference(name, a, b):
+    """ Calculate the result of a routine in python """
+    ua, ub = a & MASK, b & MASK
+    if name in ("mulsi3", "umulsi3"):
+        return wrap(a * b)
+    elif name == "udivsi3":
+        return wrap(ua // ub)
+    elif name == "umodsi3":
+        return wrap(ua % ub)
+    quotient = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        quotient = -quotient
+    if name == "divsi3":
+        return wrap(quotient)
+    return wrap(a - quotient * b)
+
+
+def operand_sets():
+    """ Operands as found in dsp loops, and random operands """
+    rng = random.Random(4)
+    small = [(rng.randint(0, 200), rng.randint(1, 100)) for _ in range(200)]
+    positive = [
+        (rng.randint(0, 30000), rng.randint(1, 30000)) for _ in range(200)
+    ]
+    mixed = [
+        (rng.randint(-30000, 30000), rng.randint(-300, 300) or 1)
+        for _ in range(200)
+    ]
+    return [
+        ("small", small),
+        ("positive", positive),
+        ("mixed sign", mixed),
+    ]
+
+
+def run(runtime, name, operands):
+    """Call a routine for each operand pair.
+
+    Returns the cycles for each call, or None for wrong results.
+    """
+    simulator, symbols = runtime
+    cycles = []
+    for a, b in operands:
+        before = simulator.cycles
+        result = simulator.call(symbols["runtime_" + name], a, b)
+        if result is None or wrap(result) != reference(name, a, b):
+            cycles.append(None)
+        else:
+            cycles.append(simulator.cycles - before)
+    return cycles
+
+
+def main():
+    c3_sources = [
+        io.StringIO(RT_MUL_C3_SRC_058),
+        io.StringIO(RT_DIV_C3_SRC_058),
+    ]
+    old_runtime = load_runtime(
+        [
+            api.asm(io.StringIO(RT_ASM_SRC), "msp430"),
+            api.c3c(c3_sources, [], "msp430"),
+        ]
+    )
+    new_runtime = load_runtime([api.get_arch("msp430").get_runtime()])
+    line = "{:8} {:11} {:>6} {:>8} {:>8} {:>8} {:>8}"
+    print(
+        line.format(
+            "routine", "operands", "wrong", "0.5.8", "current", "speedup",
+            "wrong"
+        )
+    )
+    for name in ["mulsi3", "divsi3", "modsi3", "udivsi3", "umodsi3"]:
+        for set_name, operands in operand_sets():
+            old = run(old_runtime, name, operands)
+            new = run(new_runtime, name, operands)
+            both = [(o, n) for o, n in zip(old, new) if None not in (o, n)]
+            if both:
+                old_mean = statistics.mean(o for o, _ in both)
+                new_mean = statistics.mean(n for _, n in both)
+                speedup = "{:.1f}x".format(old_mean / new_mean)
+                old_mean, new_mean = round(old_mean), round(new_mean)
+            else:
+                old_mean = new_mean = speedup = "-"
+            print(
+                line.format(
+                    name, set_name, old.count(None), old_mean, new_mean,
+                    speedup, new.count(None)
+                )
+            )
+    print(
+        "Mean cycles per call over the operands which both versions handle,"
+    )
+    print("wrong counts wrong results and calls which did not return.")
+
+
+if __name__ == "__main__":
+    main()